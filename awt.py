@@ -1,29 +1,4 @@
 #!/usr/bin/env python3
-from abiflib import (
-    convert_abif_to_jabmod,
-    htmltable_pairwise_and_winlosstie as abiflib_htmltable_pairwise_and_winlosstie,
-    get_Copeland_winners,
-    html_score_and_star as abiflib_html_score_and_star,
-    ABIFVotelineException,
-    full_copecount_from_abifmodel,
-    copecount_diagram,
-    IRV_dict_from_jabmod,
-    get_IRV_report,
-    FPTP_result_from_abifmodel,
-    get_FPTP_report,
-    pairwise_count_dict,
-    STAR_result_from_abifmodel,
-    scaled_scores,
-    add_ratings_to_jabmod_votelines,
-    get_abiftool_dir
-)
-from abiflib.approval_tally import (
-    approval_result_from_abifmodel,
-    get_approval_report
-)
-from abiflib.util import find_ballot_type
-from abiflib.score_star_tally import STAR_report
-from abiflib.pairwise_tally import winlosstie_dict_from_pairdict
 import argparse
 from cache_awt import (
     cache_key_from_request,
@@ -37,26 +12,34 @@ from cache_awt import (
     DEFAULT_CACHE_DIR,
     DEFAULT_REQUEST_LOG_DB,
 )
-import conduits
-from src.server_util import RouteProfiler
-from dotenv import load_dotenv
-from flask import Flask, render_template, request, redirect, send_from_directory, url_for, Response
+from src.server_util import RouteProfiler, load_awt_paths
+from src.metrics import (enable_metrics, instrument_cache, metrics_request_allowed, render_metrics,
+                         CONTENT_TYPE as METRICS_CONTENT_TYPE)
+from src.span_store import enable_span_store
+from src.static_assets import (asset_build_dir, asset_manifest, build_static_assets, fingerprinted_filename,
+                               send_built_asset)
+from src.submissions import (SubmissionTooLarge, load_submission, methods_from_form, parse_methods,
+                             store_submission, submission_max_bytes, submission_query)
+from src.job_queue import get_job_queue, job_events_enabled, should_queue
+from src.approval_bits import approval_result_from_masks
+from src.array_tally import STAR_report_from_result, STAR_result_from_arrays, array_tally_enabled
+from src.abif_source import abif_preview, restore_previewed_abif
+from src.ballot_patterns import aggregate_ballot_patterns
+from src.incremental_tally import parse_catalog_abif
+from src.request_profiling import (
+    admin_token_ok,
+    bypass_cache_for_profiling,
+    enable_request_profiling,
+    profile_reason,
+    save_request_profile,
+)
+from flask import Flask, g, render_template, request, redirect, send_from_directory, url_for, Response
 from flask_caching import Cache
-from html_util import generate_candidate_colors, escape_css_selector, add_html_hints_to_stardict, get_method_ordering, format_notice_paragraphs
+from html_util import generate_candidate_colors, escape_css_selector, add_html_hints_to_stardict, get_method_ordering, format_notice_paragraphs, install_template_helpers
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 import json
-try:
-    from src.linkpreview import compose_preview_svg, render_svg_to_png, render_frame_png, get_election_preview_metadata, render_generic_preview_png
-except ImportError:
-    # Graceful fallback if linkpreview module unavailable
-    compose_preview_svg = None
-    render_svg_to_png = None
-    render_frame_png = None
-    get_election_preview_metadata = None
-    render_generic_preview_png = None
 import logging
 
-from markupsafe import escape
 from pathlib import Path
 from pprint import pformat
 import os
@@ -65,8 +48,59 @@ import socket
 import sys
 import tempfile
 import threading
+import time
 import urllib
-import yaml
+
+# abiflib (and everything it drags in) is only imported once a route
+# actually tallies something.  Names that used to be imported eagerly here
+# are still importable from awt (e.g. `from awt import
+# convert_abif_to_jabmod`) via the module __getattr__ below.
+_LAZY_IMPORTS = {
+    'convert_abif_to_jabmod': ('abiflib', 'convert_abif_to_jabmod'),
+    'abiflib_htmltable_pairwise_and_winlosstie': ('abiflib', 'htmltable_pairwise_and_winlosstie'),
+    'get_Copeland_winners': ('abiflib', 'get_Copeland_winners'),
+    'abiflib_html_score_and_star': ('abiflib', 'html_score_and_star'),
+    'ABIFVotelineException': ('abiflib', 'ABIFVotelineException'),
+    'full_copecount_from_abifmodel': ('abiflib', 'full_copecount_from_abifmodel'),
+    'copecount_diagram': ('abiflib', 'copecount_diagram'),
+    'IRV_dict_from_jabmod': ('abiflib', 'IRV_dict_from_jabmod'),
+    'get_IRV_report': ('abiflib', 'get_IRV_report'),
+    'FPTP_result_from_abifmodel': ('abiflib', 'FPTP_result_from_abifmodel'),
+    'get_FPTP_report': ('abiflib', 'get_FPTP_report'),
+    'pairwise_count_dict': ('abiflib', 'pairwise_count_dict'),
+    'STAR_result_from_abifmodel': ('abiflib', 'STAR_result_from_abifmodel'),
+    'scaled_scores': ('abiflib', 'scaled_scores'),
+    'add_ratings_to_jabmod_votelines': ('abiflib', 'add_ratings_to_jabmod_votelines'),
+    'get_abiftool_dir': ('abiflib', 'get_abiftool_dir'),
+    'approval_result_from_abifmodel': ('abiflib.approval_tally', 'approval_result_from_abifmodel'),
+    'get_approval_report': ('abiflib.approval_tally', 'get_approval_report'),
+    'find_ballot_type': ('abiflib.util', 'find_ballot_type'),
+    'STAR_report': ('abiflib.score_star_tally', 'STAR_report'),
+    'winlosstie_dict_from_pairdict': ('abiflib.pairwise_tally', 'winlosstie_dict_from_pairdict'),
+    'conduits': ('conduits', None),
+}
+
+
+def __getattr__(name):
+    """Resolve deferred imports listed in _LAZY_IMPORTS on first access."""
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    modname, attr = _LAZY_IMPORTS[name]
+    module = importlib.import_module(modname)
+    value = getattr(module, attr) if attr else module
+    globals()[name] = value
+    return value
+
+
+def _linkpreview():
+    """Return the src.linkpreview module, or None if it can't be imported."""
+    try:
+        from src import linkpreview
+    except ImportError:
+        # Graceful fallback if linkpreview module unavailable
+        return None
+    return linkpreview
 
 
 def _template_loader():
@@ -78,33 +112,11 @@ def _template_loader():
     - `sys.prefix/awt-templates` (data-files in venv)
     - `<venv root>/awt-templates` (alt venv layout)
     - `site-packages/awt-templates` (data-files next to installed module)
+
+    The list is computed once at startup by load_awt_paths().
     """
-    paths = []
-    try:
-        if AWT_TEMPLATES:
-            paths.append(AWT_TEMPLATES)
-    except NameError:
-        pass
     here = os.path.dirname(__file__)
-    paths.append(os.path.join(here, 'templates'))
-    try:
-        paths.append(os.path.join(sys.prefix, 'awt-templates'))
-        exe_path = Path(sys.argv[0]).resolve()
-        if exe_path.name == 'python' or exe_path.name.startswith('python'):
-            exe_path = Path(sys.executable).resolve()
-        venv_root = exe_path.parent.parent
-        paths.append(str(venv_root / 'awt-templates'))
-    except Exception:
-        pass
-    try:
-        import importlib.util as _ilu
-        pkg_dir = Path(_ilu.find_spec('awt').origin).parent
-        paths.append(str(pkg_dir / 'awt-templates'))
-    except Exception:
-        pass
-    seen = set()
-    exists = [p for p in paths if p and os.path.isdir(p) and not (p in seen or seen.add(p))]
-    return FileSystemLoader(exists or [os.path.join(here, 'templates')])
+    return FileSystemLoader(AWT_TEMPLATE_DIRS or [os.path.join(here, 'templates')])
 
 
 def jinja_pairwise_snippet(abifmodel, pairdict, wltdict, colordict=None, add_desc=True, svg_text=None, is_copeland_tie=False, paircells=None):
@@ -136,7 +148,7 @@ def jinja_pairwise_snippet(abifmodel, pairdict, wltdict, colordict=None, add_des
         loader=_template_loader(),
         autoescape=select_autoescape(['html', 'xml'])
     )
-    env.filters['escape_css'] = escape_css_selector
+    install_template_helpers(env)
 
     # Generate enhanced pairwise summary using abiflib functions
     from abiflib.pairwise_tally import calculate_pairwise_victory_sizes
@@ -185,7 +197,7 @@ def jinja_pairwise_summary_only(abifmodel, pairdict, wltdict, colordict=None, is
         loader=_template_loader(),
         autoescape=select_autoescape(['html', 'xml'])
     )
-    env.filters['escape_css'] = escape_css_selector
+    install_template_helpers(env)
 
     # Generate enhanced pairwise summary using abiflib functions
     from abiflib.pairwise_tally import calculate_pairwise_victory_sizes
@@ -213,8 +225,9 @@ def jinja_pairwise_summary_only(abifmodel, pairdict, wltdict, colordict=None, is
 
 
 # Utility: Jinja2 rendering for STAR/score output
-def jinja_scorestar_snippet(jabmod, basicstar=None, scaled=None):
-    content = STAR_report(jabmod)
+def jinja_scorestar_snippet(jabmod, basicstar=None, scaled=None, report=None):
+    from abiflib.score_star_tally import STAR_report
+    content = STAR_report(jabmod) if report is None else report
     env = Environment(
         loader=_template_loader(),
         autoescape=select_autoescape(['html', 'xml'])
@@ -234,8 +247,9 @@ def jinja_scorestar_snippet(jabmod, basicstar=None, scaled=None):
 # as this file (project root)
 awt_py_dir = Path(__file__).parent.resolve()
 dotenv_path = awt_py_dir / '.env'
-load_dotenv(dotenv_path=dotenv_path)
 if dotenv_path.exists():
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=dotenv_path)
     print(f"[awt.py] Loaded .env from {dotenv_path}")
 else:
     print(
@@ -247,71 +261,13 @@ AWT_DEFAULT_CACHE_TIMEOUT = 90 * 24 * 3600
 # Allow overriding port via env or CLI
 DEFAULT_PORT = int(os.environ.get("PORT", 0))
 
-# Intelligent defaults for static/template directories
-AWT_STATIC = os.getenv("AWT_STATIC")
-AWT_TEMPLATES = os.getenv("AWT_TEMPLATES")
-
-# Only guess if not set by env
-if not AWT_STATIC or not AWT_TEMPLATES:
-    # 1. Try static/templates next to this file
-    static_candidate = awt_py_dir / 'static'
-    templates_candidate = awt_py_dir / 'templates'
-    if not AWT_STATIC and static_candidate.is_dir():
-        AWT_STATIC = str(static_candidate)
-    if not AWT_TEMPLATES and templates_candidate.is_dir():
-        AWT_TEMPLATES = str(templates_candidate)
-
-# 2. Try awt-static/awt-templates in package data dir (for venv installs)
-if not AWT_STATIC or not AWT_TEMPLATES:
-    try:
-        import importlib.util
-        pkg_dir = Path(importlib.util.find_spec('awt').origin).parent
-        awt_static_candidate = pkg_dir / 'awt-static'
-        awt_templates_candidate = pkg_dir / 'awt-templates'
-        if not AWT_STATIC and awt_static_candidate.is_dir():
-            AWT_STATIC = str(awt_static_candidate)
-        if not AWT_TEMPLATES and awt_templates_candidate.is_dir():
-            AWT_TEMPLATES = str(awt_templates_candidate)
-    except Exception:
-        pass
-
-# 2b. Try awt-static/awt-templates under sys.prefix (typical data-files target)
-if not AWT_STATIC or not AWT_TEMPLATES:
-    try:
-        prefix_dir = Path(sys.prefix)
-        awt_static_candidate = prefix_dir / 'awt-static'
-        awt_templates_candidate = prefix_dir / 'awt-templates'
-        if not AWT_STATIC and awt_static_candidate.is_dir():
-            AWT_STATIC = str(awt_static_candidate)
-        if not AWT_TEMPLATES and awt_templates_candidate.is_dir():
-            AWT_TEMPLATES = str(awt_templates_candidate)
-    except Exception:
-        pass
-
-# 3. Try static/templates in current working directory
-if not AWT_STATIC or not AWT_TEMPLATES:
-    cwd = Path.cwd()
-    static_candidate = cwd / 'static'
-    templates_candidate = cwd / 'templates'
-    if not AWT_STATIC and static_candidate.is_dir():
-        AWT_STATIC = str(static_candidate)
-    if not AWT_TEMPLATES and templates_candidate.is_dir():
-        AWT_TEMPLATES = str(templates_candidate)
-
-# 4. Try awt-static/awt-templates as siblings to the executable's bin directory
-if not AWT_STATIC or not AWT_TEMPLATES:
-    import sys
-    exe_path = Path(sys.argv[0]).resolve()
-    # If running as 'python -m awt', sys.argv[0] may be 'python', so also try sys.executable
-    if exe_path.name == 'python' or exe_path.name.startswith('python'):
-        exe_path = Path(sys.executable).resolve()
-    venv_root = exe_path.parent.parent  # bin/ -> venv/
-    awt_static_candidate = venv_root / 'awt-static'
-    awt_templates_candidate = venv_root / 'awt-templates'
-    if not AWT_STATIC and awt_static_candidate.is_dir():
-        AWT_STATIC = str(awt_static_candidate)
-    if not AWT_TEMPLATES and awt_templates_candidate.is_dir():
-        AWT_TEMPLATES = str(awt_templates_candidate)
+# Intelligent defaults for static/template directories (env first, then
+# guessed; see src.server_util.discover_awt_paths).  The result is cached
+# in AWT_PATHS_CACHE so that restarts skip the probing.
+_awt_paths = load_awt_paths(awt_py_dir)
+AWT_STATIC = _awt_paths['static']
+AWT_TEMPLATES = _awt_paths['templates']
+AWT_TEMPLATE_DIRS = _awt_paths['template_dirs']
 
 missing_static = not (AWT_STATIC and Path(AWT_STATIC).is_dir())
 missing_templates = not (AWT_TEMPLATES and Path(AWT_TEMPLATES).is_dir())
@@ -345,12 +301,35 @@ app = Flask(__name__, static_folder=static_folder,
             template_folder=AWT_TEMPLATES, static_url_path=static_url_path)
 # Accept both with and without trailing slashes on routes
 app.url_map.strict_slashes = False
-app.jinja_env.filters['escape_css'] = escape_css_selector
+install_template_helpers(app.jinja_env)
 
 # Add template globals for reusable functions
 app.jinja_env.globals['format_notice_paragraphs'] = format_notice_paragraphs
 
 
+def static_build_dir():
+    '''Directory of fingerprinted assets from `awt --build-static`
+    (see src/static_assets.py), or None without a static directory.'''
+    static_dir = AWT_STATIC or app.static_folder
+    return asset_build_dir(static_dir) if static_dir else None
+
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    # url_for('static', ...) links the fingerprinted copy once one is
+    # built, unless a static file changed since
+    if endpoint == 'static' and 'filename' in values and static_build_dir():
+        values['filename'] = fingerprinted_filename(static_build_dir(), values['filename'],
+                                                    AWT_STATIC or app.static_folder)
+
+
+@app.route('/static/dist/<path:filename>')
+def static_built(filename):
+    if not static_build_dir():
+        return ('', 404)
+    return send_built_asset(static_build_dir(), filename)
+
+
 @app.route('/favicon.ico')
 def favicon():
     """Serve favicon if present; otherwise, be non-fatal.
@@ -396,27 +375,45 @@ else:  # filesystem
     app.config['CACHE_TYPE'] = 'flask_caching.backends.FileSystemCache'
     # Default cache dir unless AWT_CACHE_DIR is set
     app.config['CACHE_DIR'] = os.environ.get("AWT_CACHE_DIR", DEFAULT_CACHE_DIR)
-    try:
-        os.makedirs(app.config['CACHE_DIR'], exist_ok=True)
-    except Exception:
-        pass
 
 app.config['CACHE_DEFAULT_TIMEOUT'] = int(
     os.environ.get("AWT_CACHE_TIMEOUT", AWT_DEFAULT_CACHE_TIMEOUT))
 
 cache.init_app(app)
 
+# Refuse huge POST bodies before parsing them; POST /awt checks the ABIF
+# itself against submission_max_bytes().  The slack covers form encoding.
+if submission_max_bytes() is not None:
+    app.config['MAX_CONTENT_LENGTH'] = 4 * submission_max_bytes()
+
+
+def skip_page_cache():
+    '''Keep this request's response out of the page cache, e.g. when it
+    shows a placeholder that a later request could do better than.'''
+    g.awt_skip_page_cache = True
+
+
+def page_cacheable(response):
+    '''`response_filter=` for cache.cached(): False after skip_page_cache().'''
+    return not g.get('awt_skip_page_cache', False)
+
+
+# Request, span and cache metrics for /metrics (set AWT_METRICS_DIR to
+# aggregate across worker processes)
+enable_metrics(app)
+instrument_cache(cache)
+enable_request_profiling(app)
+
+# Persistent per-span timings for `perf_awt.py report` (WSGI deployments
+# opt in with AWT_SPAN_DB; `python awt.py` records by default)
+if os.environ.get('AWT_SPAN_DB'):
+    enable_span_store()
+
 # Enable passive SQLite request logging by default when using FileSystemCache
 if app.config.get('CACHE_TYPE') == 'flask_caching.backends.FileSystemCache':
     try:
         # Default DB unless AWT_REQUEST_LOG_DB is set
         reqlog_db = os.environ.get('AWT_REQUEST_LOG_DB', DEFAULT_REQUEST_LOG_DB)
-        db_dir = os.path.dirname(reqlog_db)
-        if db_dir:
-            try:
-                os.makedirs(db_dir, exist_ok=True)
-            except Exception:
-                pass
         enable_sqlite_request_log(app, reqlog_db)
         # Enable sidecar cache indexing (can be toggled off with AWT_CACHE_INDEX=0)
         if os.environ.get('AWT_CACHE_INDEX', '1') not in ('0', 'false', 'False', 'no', 'NO'):
@@ -443,6 +440,51 @@ if AWT_STATIC and Path(AWT_STATIC).name == 'awt-static':
         return send_from_directory(AWT_STATIC, filename)
 
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of request, span and cache metrics.
+
+    Only for callers that metrics_request_allowed() accepts.
+    """
+    if not metrics_request_allowed():
+        return Response("forbidden\n", status=403, content_type='text/plain')
+    response = Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@app.route('/admin/profile/sample')
+def admin_profile_sample():
+    """Sample every thread's stack for ?seconds=N; return collapsed stacks.
+
+    Needs AWT_ADMIN_TOKEN in an X-AWT-Admin-Token header (not the URL,
+    which the request log and proxies record).  Optional: interval_ms (default 5), idle=1 to keep
+    waiting threads, threads=1 to prefix stacks with the thread name,
+    limit=N for the N most frequent stacks.
+    """
+    from src.sampling_profiler import MAX_DURATION, SamplerBusy, collapse_stacks, sample_stacks
+    if not admin_token_ok(request.headers.get('X-AWT-Admin-Token')):
+        return Response("forbidden\n", status=403, content_type='text/plain')
+    try:
+        seconds = float(request.args.get('seconds', 5))
+        interval = float(request.args.get('interval_ms', 5)) / 1000.0
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+    except ValueError:
+        return Response("bad seconds/interval_ms/limit\n", status=400, content_type='text/plain')
+    if not 0 < seconds <= MAX_DURATION:
+        return Response(f"seconds must be in (0, {MAX_DURATION:g}]\n", status=400, content_type='text/plain')
+    try:
+        counts = sample_stacks(seconds, interval,
+                               idle=request.args.get('idle') == '1',
+                               by_thread=request.args.get('threads') == '1')
+    except SamplerBusy as exc:
+        return Response(f"{exc}\n", status=409, content_type='text/plain')
+    response = Response(collapse_stacks(counts, limit), content_type='text/plain; charset=utf-8')
+    response.headers['X-AWT-Samples'] = str(sum(counts.values()))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
 # --- Preview image rendering (using src.linkpreview module) ---
 
 
@@ -453,10 +495,11 @@ def preview_svg_debug(identifier):
 
     Not referenced in templates; useful to verify dynamic injection.
     """
-    if compose_preview_svg is None:
+    linkpreview = _linkpreview()
+    if linkpreview is None:
         return ("preview module unavailable", 503)
     try:
-        svg_text = compose_preview_svg(identifier, max_names=4)
+        svg_text = linkpreview.compose_preview_svg(identifier, max_names=4)
         resp = Response(svg_text, mimetype='image/svg+xml')
         resp.headers['Cache-Control'] = f"public, max-age={app.config.get('CACHE_DEFAULT_TIMEOUT', AWT_DEFAULT_CACHE_TIMEOUT)}"
         return resp
@@ -479,7 +522,8 @@ def preview_image_for_id(identifier):
 
     Validates election exists and renders dynamic PNG, with graceful fallback.
     """
-    if render_svg_to_png is None or compose_preview_svg is None:
+    linkpreview = _linkpreview()
+    if linkpreview is None:
         return redirect('/static/img/awt-electorama-linkpreview-frame.svg', code=302)
 
     try:
@@ -490,8 +534,8 @@ def preview_image_for_id(identifier):
             return redirect('/preview-img/site/generic.png', code=302)
 
         # Compose and render
-        svg_text = compose_preview_svg(identifier, max_names=4)
-        png_bytes = render_svg_to_png(svg_text)
+        svg_text = linkpreview.compose_preview_svg(identifier, max_names=4)
+        png_bytes = linkpreview.render_svg_to_png(svg_text)
         resp = Response(png_bytes, mimetype='image/png')
         resp.headers['Cache-Control'] = f"public, max-age={app.config.get('CACHE_DEFAULT_TIMEOUT', AWT_DEFAULT_CACHE_TIMEOUT)}"
         return resp
@@ -507,11 +551,12 @@ def preview_image_generic():
 
     Renders the generic preview image; falls back to SVG if PNG rendering fails.
     """
-    if render_generic_preview_png is None:
+    linkpreview = _linkpreview()
+    if linkpreview is None:
         return redirect('/static/img/awt-generic-linkpreview.svg', code=302)
 
     try:
-        png_bytes = render_generic_preview_png()
+        png_bytes = linkpreview.render_generic_preview_png()
         resp = Response(png_bytes, mimetype='image/png')
         resp.headers['Cache-Control'] = f"public, max-age={app.config.get('CACHE_DEFAULT_TIMEOUT', AWT_DEFAULT_CACHE_TIMEOUT)}"
         return resp
@@ -519,31 +564,28 @@ def preview_image_generic():
         logging.getLogger('awt.preview').warning(f"Generic preview PNG render failed: {e}")
         # Prefer PNG/200 fallback for crawlers
         try:
-            if render_frame_png is not None:
-                png_bytes = render_frame_png()
-                resp = Response(png_bytes, mimetype='image/png')
-                resp.headers['Cache-Control'] = f"public, max-age={app.config.get('CACHE_DEFAULT_TIMEOUT', AWT_DEFAULT_CACHE_TIMEOUT)}"
-                return resp
+            png_bytes = linkpreview.render_frame_png()
+            resp = Response(png_bytes, mimetype='image/png')
+            resp.headers['Cache-Control'] = f"public, max-age={app.config.get('CACHE_DEFAULT_TIMEOUT', AWT_DEFAULT_CACHE_TIMEOUT)}"
+            return resp
         except Exception as e2:
             logging.getLogger('awt.preview').warning(f"Frame PNG fallback failed: {e2}")
         # Last resort: serve the static SVG
         return redirect('/static/img/awt-generic-linkpreview.svg', code=302)
 
 
-# Use abiflib.util.get_abiftool_dir to set ABIFTOOL_DIR and TESTFILEDIR
-ABIFTOOL_DIR = get_abiftool_dir()
+# ABIFTOOL_DIR and TESTFILEDIR come from abiflib.util.get_abiftool_dir via
+# the cached startup paths
+ABIFTOOL_DIR = _awt_paths['abiftool_dir']
 AWT_DIR = str(awt_py_dir)  # Directory containing this awt.py file
 if ABIFTOOL_DIR and ABIFTOOL_DIR not in sys.path:
     sys.path.append(ABIFTOOL_DIR)
-TESTFILEDIR = Path(ABIFTOOL_DIR) / 'testdata'
+TESTFILEDIR = Path(_awt_paths['testfiledir'])
 # Fallback for packaged installs where testdata is under the venv prefix
-if not TESTFILEDIR.is_dir():
-    prefix_testdata = Path(sys.prefix) / 'testdata'
-    if prefix_testdata.is_dir():
-        TESTFILEDIR = prefix_testdata
-        print(f"[awt.py] Using testdata from venv: {TESTFILEDIR}")
-    else:
-        print(f"[awt.py] WARNING: testdata not found at {TESTFILEDIR}")
+if TESTFILEDIR != Path(ABIFTOOL_DIR) / 'testdata':
+    print(f"[awt.py] Using testdata from venv: {TESTFILEDIR}")
+elif not TESTFILEDIR.is_dir():
+    print(f"[awt.py] WARNING: testdata not found at {TESTFILEDIR}")
 
 # Initialized in main()
 ABIF_CATALOG = None
@@ -607,6 +649,7 @@ def abif_catalog_init(extra_dirs=None,
 
 def build_election_list():
     '''Load the list of elections from abif_list.yml'''
+    import yaml
     yampath = abif_catalog_init()
 
     retval = []
@@ -675,8 +718,55 @@ def get_all_tags_in_election_list(election_list):
     return retval
 
 
+# Elections shown with their ABIF text in the /awt example tabs
+AWT_EXAMPLE_TABS = 5
+
+
+def catalog_index():
+    '''The SQLite index of abif_list.yml behind the listing pages
+    (see src/catalog_index.py).  Pages rendered while it is still
+    parsing files are kept out of the page cache.'''
+    from src.catalog_index import get_catalog_index
+    index = get_catalog_index(abif_catalog_init(), TESTFILEDIR)
+    if not index.sync():
+        skip_page_cache()
+    return index
+
+
+def catalog_listing(**fixed):
+    '''One page of the catalog for this request's filter, sort and page
+    arguments (overridden by fixed), with prev/next page URLs.'''
+    from src.catalog_index import listing_args
+    filters = dict(listing_args(request.args), **fixed)
+    listing = catalog_index().listing(**filters)
+    view_args = request.view_args or {}
+    query = {k: v for k, v in request.args.items() if k not in view_args}
+
+    def page_url(page):
+        return url_for(request.endpoint, **view_args, **dict(query, page=page))
+
+    page = listing['page']
+    listing['prev_url'] = page_url(page - 1) if page > 1 else None
+    listing['next_url'] = page_url(page + 1) if page < listing['pages'] else None
+    listing['filters'] = filters
+    listing['fixed'] = fixed
+    listing['facets'] = catalog_index().facets()
+    return listing
+
+
+def read_catalog_text(entry):
+    '''entry with the 'text' of its ABIF file, as build_election_list()
+    would have it.'''
+    apath = Path(TESTFILEDIR, entry['filename'])
+    try:
+        text = apath.read_text()
+    except FileNotFoundError:
+        text = f'NOT FOUND: {entry["filename"]}\n'
+    return dict(entry, text=text)
+
+
 @app.route('/')
-@cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True)
+@cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True, response_filter=page_cacheable)
 def homepage():
     """Homepage route using homepage-snippet.html"""
     msgs = {}
@@ -693,14 +783,13 @@ def homepage():
     msgs['pagetitle'] = f"{webenv['statusStr']}ABIF Web Tool (awt)"
     msgs['og_description'] = "The ABIF Web Tool (awt) is an online tool for analyzing elections using multiple voting methods including IRV/RCV, Approval, STAR, and Condorcet/Copeland. ABIF is the \"Aggregated Ballot Information Format\", which is a reasonably simple way to express election results, whether those elections were conducted with ranked (ordinal) ballots, rated (cardinal) ballots, or just a list of checkboxes next to the candidates (as done with plurality and approval elections)."
     webenv['toppage'] = 'homepage'
-    # Get election list for dynamic count
-    from src.bifhub import build_election_list
-    election_list = build_election_list()
+    # Catalog size for the intro text
+    election_count = catalog_index().listing(per_page=1)['catalog_total']
 
     return render_template('homepage-index.html',
                            msgs=msgs,
                            webenv=webenv,
-                           election_list=election_list), 200
+                           election_count=election_count), 200
 
 
 @app.route('/edit')
@@ -710,7 +799,7 @@ def edit_interface():
 
 
 @app.route('/tag', methods=['GET'])
-@cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True)
+@cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True, response_filter=page_cacheable)
 def list_all_tags():
     """Show an index of all tags, alphabetically, with counts"""
     # --- Cache purge support via ?action=purge ---
@@ -732,21 +821,9 @@ def list_all_tags():
     msgs['pagetitle'] = "All Tags"
     msgs['lede'] = "Browse all tags alphabetically."
 
-    # Use bifhub functions to build list and collect tags
-    from src.bifhub import build_election_list
-    election_list = build_election_list()
-
-    # Build counts per tag
-    from collections import Counter
-    counts = Counter()
-    for d in election_list:
-        for t in d.get('taglist', []) or []:
-            if t:
-                counts[t] += 1
-
     tag_items = [
         {"name": name, "count": count}
-        for name, count in counts.items()
+        for name, count in catalog_index().tag_counts().items()
     ]
     tag_items.sort(key=lambda x: x['name'].casefold())
 
@@ -757,7 +834,7 @@ def list_all_tags():
 
 
 @app.route('/tag/<tag>', methods=['GET'])
-@cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True)
+@cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True, response_filter=page_cacheable)
 def list_elections(tag=None):
     """Show list of elections filtered by tag"""
     # --- Cache purge support via ?action=purge ---
@@ -779,15 +856,13 @@ def list_elections(tag=None):
     msgs['pagetitle'] = f"Elections tagged '{tag}'"
     msgs['lede'] = f"Elections with the '{tag}' tag:"
 
-    # Use bifhub functions
-    from src.bifhub import build_election_list, get_fileentries_by_tag
-    election_list = build_election_list()
-    filtered_elections = get_fileentries_by_tag(tag, election_list)
+    listing = catalog_listing(tag=tag)
 
     return render_template('tag-index.html',
                            msgs=msgs,
                            webenv=webenv,
-                           election_list=filtered_elections,
+                           election_list=listing['entries'],
+                           listing=listing,
                            tag=tag), 200
 
 
@@ -802,7 +877,7 @@ def awt_get(toppage=None, tag=None):
         "Enter ABIF here, possibly using one of the examples below..."
     msgs['lede'] = "FIXME-flaskabif.py"
     msgs['og_description'] = "The ABIF Web Tool (awt) is an online tool for analyzing elections using multiple voting methods including IRV/RCV, Approval, STAR, and Condorcet/Copeland. ABIF is the \"Aggregated Ballot Information Format\", which is a reasonably simple way to express election results, whether those elections were conducted with ranked (ordinal) ballots, rated (cardinal) ballots, or just a list of checkboxes next to the candidates (as done with plurality and approval elections)."
-    election_list = build_election_list()
+    index = catalog_index()
     debug_flag = webenv['debugFlag']
     debug_output = webenv['debugIntro']
 
@@ -815,16 +890,25 @@ def awt_get(toppage=None, tag=None):
     else:
         webenv['toppage'] = toppage
 
-    mytagarray = sorted(get_all_tags_in_election_list(election_list),
-                        key=str.casefold)
+    mytagarray = sorted(index.tag_counts(), key=str.casefold)
+
+    def example_tabs(tag=None):
+        # Texts only for the five example tabs; the rest is one page of
+        # links, with /id (or /tag/<tag>) for everything else
+        listing = index.listing(tag=tag, per_page=AWT_EXAMPLE_TABS + index.page_size())
+        entries = listing['entries']
+        return ([read_catalog_text(e) for e in entries[:AWT_EXAMPLE_TABS]],
+                entries[AWT_EXAMPLE_TABS:], listing)
+
     match toppage:
         case "awt":
+            main_file_array, other_files, listing = example_tabs()
             retval = render_template('default-index.html',
                                      abifinput='',
                                      abiftool_output=None,
-                                     main_file_array=election_list[0:5],
-                                     other_files=election_list[5:],
-                                     example_list=election_list,
+                                     main_file_array=main_file_array,
+                                     other_files=other_files,
+                                     listing=listing,
                                      webenv=webenv,
                                      msgs=msgs,
                                      debug_output=debug_output,
@@ -835,14 +919,14 @@ def awt_get(toppage=None, tag=None):
             if tag:
                 msgs['pagetitle'] = \
                     f"{webenv['statusStr']}Tag: {tag}"
-                tag_file_array = get_fileentries_by_tag(tag, election_list)
+                main_file_array, other_files, listing = example_tabs(tag)
                 debug_output += f"{tag=}"
                 retval = render_template('default-index.html',
                                          abifinput='',
                                          abiftool_output=None,
-                                         main_file_array=tag_file_array[0:5],
-                                         other_files=tag_file_array[5:],
-                                         example_list=election_list,
+                                         main_file_array=main_file_array,
+                                         other_files=other_files,
+                                         listing=listing,
                                          webenv=webenv,
                                          msgs=msgs,
                                          debug_output=debug_output,
@@ -852,7 +936,6 @@ def awt_get(toppage=None, tag=None):
                                          )
             else:
                 retval = render_template('tag-index.html',
-                                         example_list=election_list,
                                          webenv=webenv,
                                          msgs=msgs,
                                          tag=tag,
@@ -877,7 +960,7 @@ def awt_get(toppage=None, tag=None):
 
 # Route for '/browse' - election discovery with tag browser
 @app.route('/browse', methods=['GET'])
-@cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True)
+@cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True, response_filter=page_cacheable)
 def browse_elections():
     # --- Cache purge support via ?action=purge ---
     if request.args.get('action') == 'purge':
@@ -901,19 +984,72 @@ def browse_elections():
     )
     webenv = WebEnv.wenvDict()
     WebEnv.sync_web_env()
-    election_list = build_election_list()
+    listing = catalog_listing()
     return render_template('browse-index.html',
                            msgs=msgs,
                            webenv=webenv,
-                           election_list=election_list
+                           election_list=listing['entries'],
+                           listing=listing
                            ), 200
 
 
+# Searches are cheap FTS5 queries with an endless variety of `q`, so they
+# stay out of the page cache (where each keystroke's prefix would push out
+# a results page) and are only kept briefly by browsers and proxies
+SEARCH_MAX_AGE = 300
+
+
+def search_cache_headers(response):
+    '''Short Cache-Control for a /search or /search/suggest response, unless
+    skip_page_cache() was called (e.g. before the catalog is parsed).'''
+    if response.status_code == 200 and page_cacheable(response):
+        response.headers['Cache-Control'] = f"public, max-age={SEARCH_MAX_AGE}"
+    return response
+
+
+@app.route('/search', methods=['GET'])
+def search_catalog():
+    '''Full-text search of the catalog (see src/catalog_index.py)'''
+    msgs = {}
+    webenv = WebEnv.wenvDict()
+    WebEnv.sync_web_env()
+    listing = catalog_listing()
+    search_query = listing['filters'].get('q')
+    msgs['pagetitle'] = f"Search: {search_query}" if search_query else "Search Elections"
+    msgs['lede'] = "Search the election catalog."
+    msgs['og_description'] = (
+        f"Search {listing['catalog_total']} elections by id, title, description, tag or candidate."
+    )
+    return search_cache_headers(Response(render_template('search-index.html',
+                                                         msgs=msgs,
+                                                         webenv=webenv,
+                                                         election_list=listing['entries'],
+                                                         listing=listing,
+                                                         search_query=search_query
+                                                         )))
+
+
+@app.route('/search/suggest', methods=['GET'])
+def suggest_catalog():
+    '''JSON search-as-you-type matches: {"q": ..., "results": [{"id",
+    "title", "url"}]}'''
+    q = request.args.get('q', '')
+    try:
+        limit = int(request.args.get('limit', 8))
+    except ValueError:
+        return Response(json.dumps({'error': 'limit must be an integer'}), status=400,
+                        mimetype='application/json')
+    results = [dict(hit, url=url_for('get_by_id', identifier=hit['id']))
+               for hit in catalog_index().suggest(q, limit=limit)]
+    return search_cache_headers(Response(json.dumps({'q': q, 'results': results}, separators=(',', ':')),
+                                         mimetype='application/json'))
+
+
 # Route for '/id' with no identifier
 
 
 @app.route('/id', methods=['GET'])
-@cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True)
+@cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True, response_filter=page_cacheable)
 def id_no_identifier():
     # --- Cache purge support via ?action=purge ---
     if request.args.get('action') == 'purge':
@@ -943,26 +1079,142 @@ def id_no_identifier():
     )
     webenv = WebEnv.wenvDict()
     WebEnv.sync_web_env()
-    election_list = build_election_list()
-    election_count = len(election_list)
+    listing = catalog_listing()
+    election_count = listing['catalog_total']
     hostname = webenv.get('hostname', 'abif.electorama.com')
     msgs['og_description'] = f"A list of {election_count} elections available on {hostname}."
     return render_template('id-index.html',
                            msgs=msgs,
                            webenv=webenv,
-                           election_list=election_list
+                           election_list=listing['entries'],
+                           listing=listing
                            ), 200
 
 
 @app.route('/id/<identifier>/dot/svg')
-@cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True)
+@cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True, response_filter=page_cacheable)
 def get_svg_dotdiagram(identifier):
-    '''FIXME FIXME July 2024'''
-    election_list = build_election_list()
-    fileentry = get_fileentry_from_election_list(identifier, election_list)
-    jabmod = convert_abif_to_jabmod(fileentry['text'], cleanws=True)
-    copecount = full_copecount_from_abifmodel(jabmod)
-    return copecount_diagram(copecount, outformat='svg')
+    '''The Copeland diagram of the results page, as SVG.
+
+    Tallied the way the page's pairwise stage does, so both look up the
+    same diagram in src/dot_render.py's cache.
+    '''
+    import conduits
+    fileentry = get_fileentry_from_election_list(identifier, build_election_list())
+    if fileentry is None:
+        return ('', 404)
+    jabmod, tallies = parse_catalog_abif(identifier, fileentry['text'])
+    jabmod, _ = aggregate_ballot_patterns(jabmod)
+    # Same default as get_by_id
+    _tb_val = request.args.get('transform_ballots')
+    transform_ballots = _tb_val is None or str(_tb_val).lower() in ('1', 'true', 'yes', 'on')
+    resblob = conduits.ResultConduit(jabmod=jabmod).update_pairwise_result(
+        jabmod, transform_ballots=transform_ballots, include_html=False,
+        pairwise_result=tallies.pairwise_result(transform_ballots) if tallies else None).resblob
+    if resblob['dotsvg_fallback']:
+        skip_page_cache()
+    return resblob['dotsvg_html']
+
+
+@app.route('/id/<identifier>.abif')
+def get_abif_source(identifier):
+    '''The catalog ABIF for identifier, as text/plain.
+
+    Served straight from the testdata file, so it supports ETag,
+    If-None-Match and Range requests.  Results pages embed only a
+    preview of the text and fetch this when the full text is wanted
+    (see src/abif_source.py).  The filename comes from the catalog
+    index, so requests don't parse abif_list.yml.
+    '''
+    filename = catalog_index().filename(identifier)
+    if filename is None or not Path(TESTFILEDIR, filename).is_file():
+        return Response(f"No ABIF with id {identifier}\n", status=404, mimetype='text/plain')
+    return send_from_directory(TESTFILEDIR, filename, mimetype='text/plain',
+                               max_age=AWT_DEFAULT_CACHE_TIMEOUT)
+
+
+IRV_ROUND_ARGS = ('transform_ballots', 'include_irv_extra')
+
+
+def _irv_details_key(scope, transform_ballots, include_irv_extra, digest):
+    return f"irv_rounds:{scope}:{int(bool(transform_ballots))}:{int(bool(include_irv_extra))}:{digest}"
+
+
+def remember_irv_round_details(scope, irv_dict, *, transform_ballots, include_irv_extra):
+    '''Cache every round's next-choice detail of irv_dict for
+    irv_round_response(), keyed by scope ('id/<id>' or 'sub/<hash>'), the
+    ballot options and the tally's digest.  Returns the details.
+
+    Pages with the same tally (e.g. /id/<id> and /id/<id>/IRV) share one
+    entry, which is only written when it is missing.'''
+    from src.irv_payload import irv_digest, irv_round_details
+    key = _irv_details_key(scope, transform_ballots, include_irv_extra, irv_digest(irv_dict))
+    details = cache.get(key)
+    if details is None:
+        details = irv_round_details(irv_dict)
+        cache.set(key, details, timeout=AWT_DEFAULT_CACHE_TIMEOUT)
+    return details
+
+
+def irv_round_response(scope, load_jabmod, *, transform_ballots, include_irv_extra):
+    '''JSON next-choice detail for IRV round ?round=N of the tally with
+    ?digest= (see src/irv_payload.py; the results page embeds the rest).
+
+    The results page leaves every round's detail in the cache as it
+    renders, so this normally slices it.  Otherwise load_jabmod() is
+    tallied once and its detail cached for the other rounds.  Responses
+    are not page-cached, so rounds don't take a cache entry each; a
+    round of a given digest never changes, so browsers may keep it.
+    Errors, including a recount that came out differently from the page
+    (a random tiebreak), are not kept.
+    '''
+    import conduits
+    from src.irv_payload import irv_round_detail
+
+    def error(status, message):
+        return Response(json.dumps({'error': message}), status=status, mimetype='application/json')
+
+    try:
+        round_index = int(request.args.get('round', ''))
+    except ValueError:
+        return error(400, 'round must be an integer')
+    digest = request.args.get('digest')
+    details = cache.get(_irv_details_key(scope, transform_ballots, include_irv_extra, digest)) if digest else None
+    if details is None:
+        jabmod = load_jabmod()
+        if jabmod is None:
+            return error(404, f'no election {scope}')
+        jabmod, _ = aggregate_ballot_patterns(jabmod)
+        resconduit = conduits.ResultConduit(jabmod=jabmod).update_IRV_result(
+            jabmod, include_irv_extra=include_irv_extra, transform_ballots=transform_ballots)
+        details = remember_irv_round_details(scope, resconduit.resblob['IRV_dict'],
+                                             transform_ballots=transform_ballots,
+                                             include_irv_extra=include_irv_extra)
+    if digest and details['digest'] != digest:
+        return error(409, 'IRV rounds differ from this page; reload it')
+    try:
+        detail = irv_round_detail(details, round_index)
+    except IndexError as exc:
+        return error(404, str(exc))
+    response = Response(json.dumps(detail, separators=(',', ':')), mimetype='application/json')
+    if digest:
+        response.headers['Cache-Control'] = f"public, max-age={AWT_DEFAULT_CACHE_TIMEOUT}"
+    return response
+
+
+@app.route('/id/<identifier>/IRV/rounds')
+def get_irv_rounds(identifier):
+    '''IRV round detail for a catalog election, fetched by irvDisplay.js.'''
+    def load_jabmod():
+        fileentry = get_fileentry_from_election_list(identifier, build_election_list())
+        return parse_catalog_abif(identifier, fileentry['text'])[0] if fileentry else None
+
+    # Same defaults as get_by_id
+    _tb_val = request.args.get('transform_ballots')
+    return irv_round_response(
+        f"id/{identifier}", load_jabmod,
+        transform_ballots=_tb_val is None or str(_tb_val).lower() in ('1', 'true', 'yes', 'on'),
+        include_irv_extra=bool(request.args.get('include_irv_extra', True)))
 
 
 @app.route('/id/<this_id>/dot')
@@ -975,6 +1227,221 @@ def handle_deprecated_dot_wlt(this_id):
     return redirect(f'/id/{this_id}/pairwise#{route_type}', code=302)
 
 
+# Voting-method pipeline shared by /id and /sub: stage -> stages it needs.
+# Candidate colors follow the FPTP ordering; canonical_order reuses the
+# FPTP stage's tally when that ran and tallies FPTP itself otherwise.
+METHOD_STAGE_DEPS = {
+    'FPTP': (),
+    'canonical_order': (),
+    'generate_colors': ('canonical_order',),
+    'IRV': (),
+    'pairwise': ('generate_colors',),
+    'STAR_prep': (),
+    'STAR': ('STAR_prep', 'generate_colors'),
+    'approval': (),
+}
+
+PIPELINE_METHODS = ('FPTP', 'IRV', 'pairwise', 'STAR', 'approval')
+
+
+# Spans compute_method_results() runs before any method's stages
+PIPELINE_SETUP_STAGES = ('ballot_patterns', 'result_conduit_init')
+
+
+def method_pipeline_stages(methods):
+    """Stages needed to compute methods (a subset of PIPELINE_METHODS),
+    in the order compute_method_results() runs them: the setup stages,
+    then each method's dependencies first, each stage once."""
+    ordered = list(PIPELINE_SETUP_STAGES)
+
+    def add(stage):
+        if stage in ordered:
+            return
+        for dependency in METHOD_STAGE_DEPS[stage]:
+            add(dependency)
+        ordered.append(stage)
+
+    for method in PIPELINE_METHODS:
+        if method in methods:
+            add(method)
+        if method == 'FPTP':
+            # Colors are generated after FPTP, whose tally they reuse
+            add('generate_colors')
+    return ordered
+
+
+def compute_method_results(jabmod, methods, profiler, *, transform_ballots=True, include_irv_extra=True,
+                           tallies=None):
+    """Run the stages for methods over jabmod, each under profiler.time_block.
+
+    tallies (a src.incremental_tally.CatalogTallies) supplies FPTP,
+    approval and pairwise results from running counts where it can.
+    Returns the resblob, with 'colordict' and 'candidate_order' set.
+    """
+    from abiflib import add_ratings_to_jabmod_votelines
+    from abiflib.util import find_ballot_type
+    from abiflib.pairwise_tally import winlosstie_dict_from_pairdict
+    import conduits
+
+    stages = method_pipeline_stages(methods)
+    # Every method tallies the model with identical vote lines merged;
+    # the pattern counts are filled in by the time the span is logged
+    pattern_fields = {'function': 'src.ballot_patterns.aggregate_ballot_patterns'}
+
+    def _aggregate():
+        reduced, stats = aggregate_ballot_patterns(jabmod)
+        pattern_fields.update(stats)
+        return reduced
+
+    jabmod, _ = profiler.time_block('ballot_patterns', _aggregate, log_fields=pattern_fields)
+    resconduit, _ = profiler.time_block(
+        'result_conduit_init',
+        lambda: conduits.ResultConduit(jabmod=jabmod),
+        log_fields={'function': 'conduits.ResultConduit.__init__'}
+    )
+    resblob = resconduit.resblob
+
+    if 'FPTP' in stages:
+        _, fptp_time = profiler.time_block(
+            'FPTP',
+            lambda: resconduit.update_FPTP_result(
+                jabmod, fptp_result=tallies.fptp_result() if tallies else None),
+            log_fields={'ballots': profiler.ballots, 'candidates': profiler.candidates, 'function': 'conduits.ResultConduit.update_FPTP_result'}
+        )
+        profiler.debug_checkpoint("00006", f"get_by_id() [FPTP: {fptp_time:.2f}s]")
+    else:
+        profiler.log_skip('FPTP', reason='resulttype filter')
+
+    canonical_order, _ = profiler.time_block(
+        'canonical_order',
+        lambda: conduits.get_canonical_candidate_order(jabmod, fptp_result=resblob.get('FPTP_result')),
+        log_fields={'function': 'conduits.get_canonical_candidate_order'}
+    )
+    colordict, _ = profiler.time_block(
+        'generate_colors',
+        lambda: generate_candidate_colors(canonical_order),
+        log_fields={'function': 'html_util.generate_candidate_colors'}
+    )
+
+    if 'IRV' in stages:
+        _, irv_time = profiler.time_block(
+            'IRV',
+            lambda: resconduit.update_IRV_result(
+                jabmod, include_irv_extra=include_irv_extra, transform_ballots=transform_ballots),
+            log_fields={'transform_ballots': transform_ballots, 'function': 'conduits.ResultConduit.update_IRV_result'}
+        )
+        profiler.debug_checkpoint("00007", f"get_by_id() [IRV: {irv_time:.2f}s]")
+    else:
+        profiler.log_skip('IRV', reason='resulttype filter')
+
+    if 'pairwise' in stages:
+        def _run_pairwise():
+            resconduit.update_pairwise_result(
+                jabmod, transform_ballots=transform_ballots, colordict=colordict, include_html=False,
+                pairwise_result=tallies.pairwise_result(transform_ballots) if tallies else None)
+            pairwise_dict = resblob.get('pairwise_dict', {})
+            wltdict = winlosstie_dict_from_pairdict(jabmod['candidates'], pairwise_dict)
+            resblob.setdefault('notices', {}).setdefault('pairwise', [])
+            resblob['pairwise_html'] = jinja_pairwise_snippet(
+                jabmod,
+                pairwise_dict,
+                wltdict,
+                colordict=colordict,
+                add_desc=True,
+                svg_text=None,
+                is_copeland_tie=resblob.get('is_copeland_tie', False),
+                paircells=resblob.get('paircells')
+            )
+            resblob['pairwise_summary_html'] = jinja_pairwise_summary_only(
+                jabmod,
+                pairwise_dict,
+                wltdict,
+                colordict=colordict,
+                is_copeland_tie=resblob.get('is_copeland_tie', False),
+                copewinnerstring=resblob.get('copewinnerstring', ''),
+                copewinners=resblob.get('copewinners', [])
+            )
+
+        _, pairwise_time = profiler.time_block(
+            'pairwise',
+            _run_pairwise,
+            log_fields={'transform_ballots': transform_ballots, 'function': 'conduits.ResultConduit.update_pairwise_result'}
+        )
+        profiler.debug_checkpoint("00008", f"get_by_id() [Pairwise: {pairwise_time:.2f}s]")
+    else:
+        profiler.log_skip('pairwise', reason='resulttype filter')
+
+    if 'STAR' in stages:
+        def _prep_star():
+            # The array engine tallies straight from jabmod; abiflib
+            # needs a copy with ratings added to every vote line
+            star_result = STAR_result_from_arrays(jabmod)
+            if star_result is not None:
+                return jabmod, star_result
+            return add_ratings_to_jabmod_votelines(jabmod), None
+
+        (ratedjabmod, star_result), starprep_time = profiler.time_block(
+            'STAR_prep',
+            _prep_star,
+            log_fields={'function': ('src.array_tally.STAR_result_from_arrays' if array_tally_enabled()
+                                     else 'abiflib.add_ratings_to_jabmod_votelines')}
+        )
+        profiler.debug_checkpoint("00009", f"get_by_id() [STAR prep: {starprep_time:.2f}s]")
+
+        def _run_star():
+            # Report first: update_STAR_result() adds tie notices to star_result
+            report = STAR_report_from_result(star_result) if star_result else None
+            resconduit.update_STAR_result(ratedjabmod, colordict, include_html=False, star_result=star_result)
+            resblob['STAR_html'] = jinja_scorestar_snippet(ratedjabmod, report=report)
+
+        _, star_time = profiler.time_block(
+            'STAR',
+            _run_star,
+            log_fields={'function': 'conduits.ResultConduit.update_STAR_result'}
+        )
+        profiler.debug_checkpoint("00010", f"get_by_id() [STAR: {star_time:.2f}s]")
+    else:
+        profiler.log_skip('STAR', reason='resulttype filter')
+
+    if 'approval' in stages:
+        def _run_approval():
+            tally_jabmod = tallies.approval_jabmod(transform_ballots) if tallies else None
+            if tally_jabmod is not None:
+                resconduit.update_approval_result(tally_jabmod, transform_ballots=transform_ballots)
+                return
+            approval_input = jabmod
+            try:
+                ballot_type = find_ballot_type(jabmod)
+            except Exception:
+                ballot_type = None
+            # Without transforms, approve every ranked candidate
+            if (not transform_ballots) and ballot_type and ballot_type != 'choose_many':
+                approval_result = approval_result_from_masks(jabmod, all_ranked_approved=True)
+                if approval_result is not None:
+                    resconduit.update_approval_result(jabmod, transform_ballots=transform_ballots,
+                                                      approval_result=approval_result)
+                    return
+                try:
+                    from abiflib.transform_core import ranked_to_choose_many_all_ranked_approved
+                    approval_input = ranked_to_choose_many_all_ranked_approved(jabmod)
+                except Exception:
+                    approval_input = jabmod
+            resconduit.update_approval_result(approval_input, transform_ballots=transform_ballots)
+
+        _, approval_time = profiler.time_block(
+            'approval',
+            _run_approval,
+            log_fields={'transform_ballots': transform_ballots, 'function': 'conduits.ResultConduit.update_approval_result'}
+        )
+        profiler.debug_checkpoint("00011", f"get_by_id() [Approval: {approval_time:.2f}s]")
+    else:
+        profiler.log_skip('approval', reason='resulttype filter')
+
+    resblob['colordict'] = colordict
+    resblob['candidate_order'] = canonical_order
+    return resblob
+
+
 @app.route('/id/<identifier>', methods=['GET'])
 @app.route('/id/<identifier>/<resulttype>', methods=['GET'])
 def get_by_id(identifier, resulttype=None):
@@ -983,6 +1450,11 @@ def get_by_id(identifier, resulttype=None):
     import io
     import os
     import datetime
+    from abiflib import (
+        convert_abif_to_jabmod,
+        ABIFVotelineException,
+    )
+    from abiflib.util import find_ballot_type
     # --- Cache purge support via ?action=purge ---
     if request.args.get('action') == 'purge':
         # Purge all cache entries for this path
@@ -998,7 +1470,10 @@ def get_by_id(identifier, resulttype=None):
         return redirect(url_for(request.endpoint, identifier=identifier, resulttype=resulttype, **args))
     # Only cache normal GET requests
 
-    @cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True)
+    # Requests picked for profiling (signed header, admin token or
+    # sampling; see src/request_profiling.py) skip the cache
+    @cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True,
+                  unless=bypass_cache_for_profiling, response_filter=page_cacheable)
     def cached_get_by_id(identifier, resulttype=None):
         webenv = WebEnv.wenvDict()
         debug_intro = webenv.get('debugIntro') or ""
@@ -1010,7 +1485,14 @@ def get_by_id(identifier, resulttype=None):
         except Exception:
             query_string = ''
         profiler = RouteProfiler(identifier, resulttype, request_path=request.path, query_string=query_string)
+        prof = None
+        cprof_path = os.environ.get('AWT_PROFILE_OUTPUT')
+        on_demand_reason = profile_reason()
         try:
+            if cprof_path or on_demand_reason:
+                prof = cProfile.Profile()
+                prof.enable()
+                profiler.log("cprofile enabled", output=cprof_path, reason=on_demand_reason)
             full_path = getattr(request, 'full_path', request.path)
             cache_type = app.config.get('CACHE_TYPE')
             profiler.log_request_start(path=full_path, cache_type=cache_type, args_count=len(request.args))
@@ -1062,21 +1544,17 @@ def get_by_id(identifier, resulttype=None):
             convert_exc = None
             ballot_count = None
             candidate_count = 0
-            prof = None
-            cprof_path = os.environ.get('AWT_PROFILE_OUTPUT')
-            if cprof_path:
-                prof = cProfile.Profile()
-                prof.enable()
-                profiler.log("cprofile enabled", output=cprof_path)
 
             def _convert():
-                return convert_abif_to_jabmod(fileentry['text'])
+                # Reuses the last parse when the file only grew by vote lines
+                return parse_catalog_abif(identifier, fileentry['text'])
 
+            tallies = None
             try:
-                jabmod, parse_elapsed = profiler.time_block(
+                (jabmod, tallies), parse_elapsed = profiler.time_block(
                     'convert_abif_to_jabmod',
                     _convert,
-                    log_fields={'text_len': len(fileentry['text']), 'function': 'abiflib.convert_abif_to_jabmod'}
+                    log_fields={'text_len': len(fileentry['text']), 'function': 'src.incremental_tally.parse_catalog_abif'}
                 )
             except ABIFVotelineException as exc:
                 convert_exc = exc
@@ -1091,80 +1569,25 @@ def get_by_id(identifier, resulttype=None):
                 error_html = None
                 ballot_count = jabmod.get('metadata', {}).get('ballotcount')
                 candidate_count = len(jabmod.get('candidates', {}) or {})
-                profiler.log("abif parsed", ballots=ballot_count, candidates=candidate_count, elapsed_s=f"{parse_elapsed:.3f}")
+                profiler.ballots, profiler.candidates = ballot_count, candidate_count
+                profiler.log("abif parsed", ballots=ballot_count, candidates=candidate_count, elapsed_s=f"{parse_elapsed:.3f}",
+                             incremental=tallies is not None, appended_votelines=tallies.appended if tallies else 0)
                 profiler.debug_checkpoint("00004", f"Result conduit setup (parse {parse_elapsed:.2f}s)")
 
             if jabmod is None:
                 raise convert_exc or RuntimeError("convert_abif_to_jabmod returned no data")
 
-            def _init_result_conduit():
-                return conduits.ResultConduit(jabmod=jabmod)
-
-            resconduit, rc_elapsed = profiler.time_block(
-                'result_conduit_init',
-                _init_result_conduit,
-                log_fields={'function': 'conduits.ResultConduit.__init__'}
-            )
             try:
                 msgs['ballot_type'] = find_ballot_type(jabmod) if jabmod else None
             except Exception:
                 msgs['ballot_type'] = None
 
-            compute_all = (not resulttype) or (resulttype == 'all')
-            do_FPTP = compute_all or (resulttype == 'FPTP')
-            do_IRV = compute_all or (resulttype == 'IRV')
-            do_pairwise = compute_all or (resulttype in ('pairwise', 'dot', 'wlt'))
-            do_STAR = compute_all or (resulttype == 'STAR')
-            do_approval = compute_all or (resulttype == 'approval')
-
-            candidate_order = []
-            if do_FPTP:
-                def _run_fptp():
-                    nonlocal resconduit, candidate_order
-                    resconduit = resconduit.update_FPTP_result(jabmod)
-                    resblob_local = resconduit.resblob
-                    if jabmod and 'FPTP_result' in resblob_local:
-                        fptp_toppicks = resblob_local['FPTP_result'].get('toppicks', {})
-                        if fptp_toppicks:
-                            def get_vote_count(item):
-                                cand, votes = item
-                                if isinstance(votes, (int, float)):
-                                    return votes
-                                if isinstance(votes, list) and len(votes) > 0 and isinstance(votes[0], (int, float)):
-                                    return votes[0]
-                                return 0
-                            ordered = sorted(fptp_toppicks.items(), key=get_vote_count, reverse=True)
-                            candidate_order = [cand for cand, votes in ordered if cand is not None]
-                    return resconduit
-
-                _, fptp_time = profiler.time_block(
-                    'FPTP',
-                    _run_fptp,
-                    log_fields={'ballots': ballot_count, 'candidates': candidate_count, 'function': 'conduits.ResultConduit.update_FPTP_result'}
-                )
-                profiler.debug_checkpoint("00006", f"get_by_id() [FPTP: {fptp_time:.2f}s]")
+            if (not resulttype) or (resulttype == 'all'):
+                methods = PIPELINE_METHODS
+            elif resulttype in ('dot', 'wlt'):
+                methods = ('pairwise',)
             else:
-                profiler.log_skip('FPTP', reason='resulttype filter')
-
-            if not candidate_order:
-                if jabmod and 'candidates' in jabmod:
-                    candidate_order = sorted(jabmod['candidates'].keys())
-                else:
-                    candidate_order = []
-
-            from conduits import get_canonical_candidate_order
-
-            canonical_order, canonical_elapsed = profiler.time_block(
-                'canonical_order',
-                lambda: get_canonical_candidate_order(jabmod),
-                log_fields={'function': 'conduits.get_canonical_candidate_order'}
-            )
-
-            consistent_colordict, color_elapsed = profiler.time_block(
-                'generate_colors',
-                lambda: generate_candidate_colors(canonical_order),
-                log_fields={'function': 'html_util.generate_candidate_colors'}
-            )
+                methods = (resulttype,)
 
             _tb_val = request.args.get('transform_ballots')
             if _tb_val is None:
@@ -1172,130 +1595,12 @@ def get_by_id(identifier, resulttype=None):
             else:
                 transform_ballots = str(_tb_val).lower() in ('1', 'true', 'yes', 'on')
 
-            if do_IRV:
-                def _run_irv():
-                    nonlocal resconduit
-                    include_irv_extra = bool(request.args.get('include_irv_extra', True))
-                    resconduit = resconduit.update_IRV_result(
-                        jabmod,
-                        include_irv_extra=include_irv_extra,
-                        transform_ballots=transform_ballots
-                    )
-                    return resconduit
-
-                _, irv_time = profiler.time_block(
-                    'IRV',
-                    _run_irv,
-                    log_fields={'transform_ballots': transform_ballots, 'function': 'conduits.ResultConduit.update_IRV_result'}
-                )
-                profiler.debug_checkpoint("00007", f"get_by_id() [IRV: {irv_time:.2f}s]")
-            else:
-                profiler.log_skip('IRV', reason='resulttype filter')
-
-            if do_pairwise:
-                def _run_pairwise():
-                    nonlocal resconduit
-                    resconduit = resconduit.update_pairwise_result(jabmod, transform_ballots=transform_ballots)
-                    resblob_local = resconduit.resblob
-                    pairwise_dict_local = resblob_local.get('pairwise_dict', {})
-                    wltdict_local = winlosstie_dict_from_pairdict(
-                        jabmod['candidates'], pairwise_dict_local)
-                    if 'notices' not in resblob_local:
-                        resblob_local['notices'] = {}
-                    resblob_local['notices'].setdefault('pairwise', [])
-                    copecount_local = full_copecount_from_abifmodel(jabmod, pairdict=pairwise_dict_local)
-                    copewinners_local = get_Copeland_winners(copecount_local)
-                    resblob_local['copewinners'] = copewinners_local
-                    resblob_local['copewinnerstring'] = ", ".join(copewinners_local)
-                    resblob_local['is_copeland_tie'] = len(copewinners_local) > 1
-
-                    resblob_local['dotsvg_html'] = copecount_diagram(copecount_local, outformat='svg')
-                    resblob_local['pairwise_dict'] = pairwise_dict_local
-                    resblob_local['pairwise_html'] = jinja_pairwise_snippet(
-                        jabmod,
-                        pairwise_dict_local,
-                        wltdict_local,
-                        colordict=consistent_colordict,
-                        add_desc=True,
-                        svg_text=None,
-                        is_copeland_tie=resblob_local.get('is_copeland_tie', False),
-                        paircells=resblob_local.get('paircells')
-                    )
-                    resblob_local['pairwise_summary_html'] = jinja_pairwise_summary_only(
-                        jabmod,
-                        pairwise_dict_local,
-                        wltdict_local,
-                        colordict=consistent_colordict,
-                        is_copeland_tie=resblob_local.get('is_copeland_tie', False),
-                        copewinnerstring=resblob_local.get('copewinnerstring', ''),
-                        copewinners=resblob_local.get('copewinners', [])
-                    )
-                    return resconduit
-
-                _, pairwise_time = profiler.time_block(
-                    'pairwise',
-                    _run_pairwise,
-                    log_fields={'transform_ballots': transform_ballots, 'function': 'conduits.ResultConduit.update_pairwise_result'}
-                )
-                profiler.debug_checkpoint("00008", f"get_by_id() [Pairwise: {pairwise_time:.2f}s]")
-            else:
-                profiler.log_skip('pairwise', reason='resulttype filter')
-
-            ratedjabmod = None
-            if do_STAR:
-                ratedjabmod, starprep_time = profiler.time_block(
-                    'STAR_prep',
-                    lambda: add_ratings_to_jabmod_votelines(jabmod),
-                    log_fields={'function': 'abiflib.add_ratings_to_jabmod_votelines'}
-                )
-                profiler.debug_checkpoint("00009", f"get_by_id() [STAR prep: {starprep_time:.2f}s]")
-
-                def _run_star():
-                    nonlocal resconduit
-                    resconduit = resconduit.update_STAR_result(
-                        ratedjabmod, consistent_colordict)
-                    resconduit.resblob['STAR_html'] = jinja_scorestar_snippet(ratedjabmod)
-                    return resconduit
-
-                _, star_time = profiler.time_block(
-                    'STAR',
-                    _run_star,
-                    log_fields={'function': 'conduits.ResultConduit.update_STAR_result'}
-                )
-                profiler.debug_checkpoint("00010", f"get_by_id() [STAR: {star_time:.2f}s]")
-            else:
-                profiler.log_skip('STAR', reason='resulttype filter')
-
-            if do_approval:
-                def _run_approval():
-                    nonlocal resconduit
-                    approval_input_local = jabmod
-                    try:
-                        ballot_type = find_ballot_type(jabmod)
-                    except Exception:
-                        ballot_type = None
-                    if (not transform_ballots) and ballot_type and ballot_type != 'choose_many':
-                        try:
-                            from abiflib.transform_core import ranked_to_choose_many_all_ranked_approved
-                            approval_input_local = ranked_to_choose_many_all_ranked_approved(jabmod)
-                        except Exception:
-                            approval_input_local = jabmod
-                    resconduit_local = resconduit.update_approval_result(
-                        approval_input_local, transform_ballots=transform_ballots)
-                    return resconduit_local
-
-                _, approval_time = profiler.time_block(
-                    'approval',
-                    _run_approval,
-                    log_fields={'transform_ballots': transform_ballots, 'function': 'conduits.ResultConduit.update_approval_result'}
-                )
-                profiler.debug_checkpoint("00011", f"get_by_id() [Approval: {approval_time:.2f}s]")
-            else:
-                profiler.log_skip('approval', reason='resulttype filter')
-
-            resblob = resconduit.resblob
-            resblob['colordict'] = consistent_colordict
-            resblob['candidate_order'] = candidate_order
+            resblob = compute_method_results(
+                jabmod, methods, profiler,
+                transform_ballots=transform_ballots,
+                include_irv_extra=bool(request.args.get('include_irv_extra', True)),
+                tallies=tallies,
+            )
 
             if not resulttype or resulttype == 'all':
                 base_methods = ['FPTP', 'IRV', 'STAR', 'approval', 'wlt']
@@ -1314,15 +1619,19 @@ def get_by_id(identifier, resulttype=None):
                     rtypelist = [resulttype]
 
             profiler.debug_checkpoint("00012", f"get_by_id() methods ready ({rtypelist})")
+            if resblob.get('dotsvg_fallback') and 'dot' in rtypelist:
+                # Graphviz was slow or failed; a later view gets the diagram
+                skip_page_cache()
 
             nav_base = ['FPTP', 'IRV', 'approval', 'STAR', 'wlt']
             nav_order = get_method_ordering(jabmod, nav_base)
             nav_methods = ['pairwise' if m == 'wlt' else m for m in nav_order]
 
-            if get_election_preview_metadata is not None:
+            linkpreview = _linkpreview()
+            if linkpreview is not None:
                 try:
                     def _preview_metadata():
-                        return get_election_preview_metadata(
+                        return linkpreview.get_election_preview_metadata(
                             identifier,
                             fileentry=fileentry,
                             jabmod=jabmod,
@@ -1340,29 +1649,34 @@ def get_by_id(identifier, resulttype=None):
                 except Exception:
                     pass
 
-            if prof:
-                prof.disable()
-                prof.dump_stats(cprof_path)
-                profiler.log("cprofile saved", output=cprof_path)
-
             debug_output = profiler.render_debug_output(debug_intro)
 
+            abifinput, abif_truncated = abif_preview(fileentry['text'])
+
+            irv_rounds_url = url_for('get_irv_rounds', identifier=identifier,
+                                     **{k: request.args[k] for k in IRV_ROUND_ARGS if k in request.args})
+            if resblob.get('IRV_dict'):
+                remember_irv_round_details(f"id/{identifier}", resblob['IRV_dict'],
+                                           transform_ballots=transform_ballots,
+                                           include_irv_extra=bool(request.args.get('include_irv_extra', True)))
+
             def _render_results():
                 return render_template('results-index.html',
-                                       abifinput=fileentry['text'],
+                                       abifinput=abifinput,
+                                       irv_rounds_url=irv_rounds_url,
+                                       abif_truncated=abif_truncated,
+                                       abif_length=len(fileentry['text']),
                                        abif_id=identifier,
                                        election_list=election_list,
                                        transform_ballots=transform_ballots,
                                        copewinnerstring=resblob.get('copewinnerstring', ''),
-                                       copewinners=resblob.get('copewinners', []),
+                                       copewinners=resblob.get('copewinners', []) if 'dot' in methods else [],
                                        dotsvg_html=resblob.get('dotsvg_html', ''),
                                        error_html=resblob.get('error_html'),
                                        IRV_dict=resblob.get('IRV_dict', {}),
                                        IRV_text=resblob.get('IRV_text', ''),
                                        IRV_candnames=jabmod.get('candidates', {}) if jabmod else {},
                                        FPTP_candnames=jabmod.get('candidates', {}) if jabmod else {},
-                                       lower_abif_caption="Input",
-                                       lower_abif_text=fileentry['text'],
                                        msgs=msgs,
                                        pairwise_dict=resblob.get('pairwise_dict', {}),
                                        pairwise_html=resblob.get('pairwise_html', ''),
@@ -1391,7 +1705,14 @@ def get_by_id(identifier, resulttype=None):
             )
             return rendered_response, 200
         finally:
-            profiler.finalize()
+            total = profiler.finalize()
+            if prof:
+                prof.disable()
+                if cprof_path:
+                    prof.dump_stats(cprof_path)
+                    profiler.log("cprofile saved", output=cprof_path)
+                if on_demand_reason:
+                    save_request_profile(prof, profiler, on_demand_reason, total=total)
 
     # Debug JSON mode
     if request.args.get('debug') == 'json':
@@ -1435,171 +1756,234 @@ def get_by_id(identifier, resulttype=None):
 
 @app.route('/awt', methods=['POST'])
 def awt_post():
+    """Store the submitted ABIF by content hash and redirect to its permalink.
+
+    The results are rendered by GET /sub/<hash>, which is cached, so
+    resubmissions and shared links don't recompute anything.
+    """
     abifinput = request.form['abifinput']
-    copewinners = None
-    copewinnerstring = None
+    if request.form.get('abifpreview_id'):
+        # Resubmitted from a results page that showed only a preview
+        fileentry = get_fileentry_from_election_list(request.form['abifpreview_id'],
+                                                     build_election_list())
+        abifinput = restore_previewed_abif(abifinput, fileentry and fileentry['text'])
+    transform_ballots = bool(request.form.get('transform_ballots'))
+    include_irv_extra = bool(request.form.get('include_irv_extra'))
+    methods = methods_from_form(request.form)
+    try:
+        abif_hash = store_submission(abifinput)
+    except SubmissionTooLarge as exc:
+        return Response(f"ABIF not accepted: {exc}\n", status=413, mimetype='text/plain')
+    except OSError as exc:
+        # No writable submission store: render directly, uncached
+        logging.getLogger('awt').warning("could not store submission: %s", exc)
+        return render_submission(abifinput, methods, transform_ballots=transform_ballots,
+                                 include_irv_extra=include_irv_extra)
+    query = submission_query(methods, transform_ballots=transform_ballots,
+                             include_irv_extra=include_irv_extra)
+    if should_queue(abifinput):
+        # Too big to tally in a web worker: see src/job_queue.py
+        job_id = get_job_queue().submit(abif_hash, query, submission_stages(methods))
+        return redirect(url_for('job_page', job_id=job_id), code=303)
+    return redirect(url_for('get_submission', abif_hash=abif_hash, **query), code=303)
+
+
+@app.route('/sub/<abif_hash>', methods=['GET'])
+def get_submission(abif_hash):
+    abifinput = load_submission(abif_hash)
+    if abifinput is None:
+        # Checked before the cache: the hash may be stored later
+        webenv = WebEnv.wenvDict()
+        msgs = {
+            'pagetitle': "NOT FOUND",
+            'lede': "No ABIF has been submitted with this hash.",
+        }
+        return render_template('not-found.html', identifier=abif_hash, msgs=msgs, webenv=webenv), 404
+
+    @cache.cached(timeout=AWT_DEFAULT_CACHE_TIMEOUT, query_string=True, response_filter=page_cacheable)
+    def cached_get_submission(abif_hash):
+        return render_submission(
+            abifinput,
+            parse_methods(request.args.get('methods')),
+            transform_ballots=request.args.get('transform_ballots') == '1',
+            include_irv_extra=request.args.get('include_irv_extra') == '1',
+            identifier=abif_hash,
+            irv_rounds_url=url_for('get_submission_irv_rounds', abif_hash=abif_hash,
+                                   **{k: request.args[k] for k in IRV_ROUND_ARGS if k in request.args}),
+        )
+
+    return cached_get_submission(abif_hash)
+
+
+@app.route('/sub/<abif_hash>/IRV/rounds', methods=['GET'])
+def get_submission_irv_rounds(abif_hash):
+    '''IRV round detail for a submission, fetched by irvDisplay.js.'''
+    from abiflib import convert_abif_to_jabmod
+
+    def load_jabmod():
+        abifinput = load_submission(abif_hash)
+        return convert_abif_to_jabmod(abifinput, cleanws=True) if abifinput is not None else None
+
+    return irv_round_response(
+        f"sub/{abif_hash}", load_jabmod,
+        transform_ballots=request.args.get('transform_ballots') == '1',
+        include_irv_extra=request.args.get('include_irv_extra') == '1')
+
+
+def submission_pipeline_methods(methods):
+    """Pipeline methods (see PIPELINE_METHODS) behind submission method tokens."""
+    return {'pairwise' if method in ('wlt', 'dot') else method for method in methods}
+
+
+def submission_stages(methods):
+    """RouteProfiler spans render_submission() runs for methods, in order."""
+    return ['convert_abif_to_jabmod'] + method_pipeline_stages(submission_pipeline_methods(methods))
+
+
+def _job_payload(job):
+    payload = {
+        'id': job['id'],
+        'status': job['status'],
+        'expected': job['expected'],
+        'steps': [name for name, elapsed in job['steps']],
+        'error': job['error'],
+        'elapsed_s': round((job['finished'] or time.time()) - (job['started'] or job['created']), 3),
+    }
+    if job['status'] == 'done':
+        payload['result_url'] = url_for('job_result', job_id=job['id'])
+    return payload
+
+
+@app.route('/job/<job_id>', methods=['GET'])
+def job_page(job_id):
+    """Progress page of a queued submission; redirects once it is done."""
+    job = get_job_queue().get(job_id)
     webenv = WebEnv.wenvDict()
     WebEnv.sync_web_env()
-    pairwise_dict = None
-    pairwise_html = None
-    dotsvg_html = None
-    STAR_html = None
-    scorestardict = None
-    IRV_dict = None
-    IRV_text = None
-    debug_dict = {}
-    debug_output = ""
-    rtypelist = []
-    resblob = {}  # Initialize resblob early
-    consistent_colordict = {}  # Initialize colordict early
-    candidate_order = []  # Initialize candidate_order early
-    try:
-        abifmodel = convert_abif_to_jabmod(abifinput,
-                                           cleanws=True)
-        error_html = None
-    except ABIFVotelineException as e:
-        abifmodel = None
-        error_html = e.message
-    if abifmodel:
-        if request.form.get('include_dotsvg'):
-            rtypelist.append('dot')
-            copecount = full_copecount_from_abifmodel(abifmodel)
-            copewinners = get_Copeland_winners(copecount)
-            copewinnerstring = ", ".join(copewinners)
-            debug_output += "\ncopecount:\n"
-            debug_output += pformat(copecount)
-            debug_output += "\ncopewinnerstring\n"
-            debug_output += copewinnerstring
-            debug_output += "\n"
-            dotsvg_html = copecount_diagram(copecount, outformat='svg')
-        else:
-            copewinnerstring = None
-
-        resconduit = conduits.ResultConduit(jabmod=abifmodel)
-        resconduit = resconduit.update_FPTP_result(abifmodel)
-
-        if request.form.get('include_pairtable'):
-            rtypelist.append('wlt')
-            resconduit = resconduit.update_pairwise_result(abifmodel)
-            pairwise_dict = resconduit.resblob['pairwise_dict']
-            wltdict = winlosstie_dict_from_pairdict(
-                abifmodel['candidates'], pairwise_dict)
-            pairwise_html = jinja_pairwise_snippet(
-                abifmodel,
-                pairwise_dict,
-                wltdict,
-                colordict=resconduit.resblob.get('colordict', {}),
-                add_desc=True,
-                svg_text=None,
-                is_copeland_tie=resconduit.resblob.get('is_copeland_tie', False),
-                paircells=resconduit.resblob.get('paircells')
-            )
-            # Generate separate summary for proper positioning
-            pairwise_summary_html = jinja_pairwise_summary_only(
-                abifmodel,
-                pairwise_dict,
-                wltdict,
-                colordict=resconduit.resblob.get('colordict', {}),
-                is_copeland_tie=resconduit.resblob.get('is_copeland_tie', False),
-                copewinnerstring=resconduit.resblob.get('copewinnerstring', ''),
-                copewinners=resconduit.resblob.get('copewinners', [])
-            )
-        if request.form.get('include_FPTP'):
-            rtypelist.append('FPTP')
-            if True:
-                FPTP_result = FPTP_result_from_abifmodel(abifmodel)
-                FPTP_text = get_FPTP_report(abifmodel)
-            # debug_output += "\nFPTP_result:\n"
-            # debug_output += pformat(FPTP_result)
-            # debug_output += "\n"
-            # debug_output += pformat(FPTP_text)
-            # debug_output += "\n"
-
-        # Compute transform_ballots once for POST (applies to all methods)
-        transform_ballots = bool(request.form.get('transform_ballots'))
-
-        if request.form.get('include_IRV'):
-            rtypelist.append('IRV')
-            include_irv_extra = bool(request.form.get('include_irv_extra'))
-            resconduit = resconduit.update_IRV_result(
-                abifmodel, include_irv_extra=include_irv_extra, transform_ballots=transform_ballots)
-            IRV_dict = resconduit.resblob['IRV_dict']
-            IRV_text = resconduit.resblob['IRV_text']
-            # Add candidate full names for template use
-            IRV_candnames = abifmodel.get('candidates', {})
-        # Create consistent candidate ordering based on FPTP results for colors (do this early)
-        resblob = resconduit.resblob
-        if abifmodel and 'FPTP_result' in resblob:
-            # Sort candidates by FPTP vote count (descending)
-            # The actual vote counts are in resblob['FPTP_result']['toppicks']
-            fptp_toppicks = resblob['FPTP_result'].get('toppicks', {})
-            if fptp_toppicks:
-                # Handle cases where vote counts might be lists or other types
-                def get_vote_count(item):
-                    cand, votes = item
-                    if isinstance(votes, (int, float)):
-                        return votes
-                    elif isinstance(votes, list) and len(votes) > 0:
-                        return votes[0] if isinstance(votes[0], (int, float)) else 0
-                    else:
-                        return 0
-
-                fptp_ordered_candidates = sorted(fptp_toppicks.items(),
-                                                 key=get_vote_count, reverse=True)
-                candidate_order = [
-                    cand for cand, votes in fptp_ordered_candidates if cand is not None]
-            else:
-                # Fallback to alphabetical if no toppicks
-                candidate_order = sorted(abifmodel['candidates'].keys())
-        elif abifmodel:
-            # Fallback to alphabetical if no FPTP results
-            candidate_order = sorted(abifmodel['candidates'].keys())
-        else:
-            candidate_order = []
-
-        # Generate single color dictionary for all voting systems
-        # Use the same canonical ordering logic as conduits.py
-        from conduits import get_canonical_candidate_order
-        canonical_order = get_canonical_candidate_order(abifmodel)
-        consistent_colordict = generate_candidate_colors(canonical_order)
-
-        if request.form.get('include_STAR'):
-            rtypelist.append('STAR')
-            ratedjabmod = add_ratings_to_jabmod_votelines(abifmodel)
-            resconduit = resconduit.update_STAR_result(ratedjabmod, consistent_colordict)
-            STAR_html = jinja_scorestar_snippet(ratedjabmod)
-            scorestardict = resconduit.resblob['scorestardict']
-        # Pairwise in POST: honor transform_ballots consistently
-        if request.form.get('include_pairtable') or request.form.get('include_dotsvg'):
-            resconduit = resconduit.update_pairwise_result(abifmodel, transform_ballots=transform_ballots)
-        if request.form.get('include_approval'):
-            # Always show Approval. If transforms are disabled and source isn't choose_many,
-            # pre-transform ranked→choose_many using "all ranked are approved" rule.
-            try:
-                _bt_post = find_ballot_type(abifmodel)
-            except Exception:
-                _bt_post = None
-            approval_input = abifmodel
-            if (not transform_ballots) and _bt_post and _bt_post != 'choose_many':
-                try:
-                    from abiflib.transform_core import ranked_to_choose_many_all_ranked_approved
-                    approval_input = ranked_to_choose_many_all_ranked_approved(abifmodel)
-                except Exception:
-                    approval_input = abifmodel
-            rtypelist.append('approval')
-            resconduit = resconduit.update_approval_result(approval_input, transform_ballots=transform_ballots)
+    if job is None:
+        msgs = {'pagetitle': "NOT FOUND", 'lede': "There is no such job."}
+        return render_template('not-found.html', identifier=job_id, msgs=msgs, webenv=webenv), 404
+    if job['status'] == 'done':
+        return redirect(url_for('job_result', job_id=job_id), code=303)
+    msgs = {
+        'pagetitle': f"{webenv['statusStr']}Tallying submitted election",
+        'lede': "This election is large, so it is being tallied in the background. "
+                "The results will appear here when they are ready.",
+    }
+    response = Response(render_template('job-status.html', job=job, msgs=msgs, webenv=webenv,
+                                        job_events=job_events_enabled()))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@app.route('/job/<job_id>/status', methods=['GET'])
+def job_status(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return {"error": f"Job not found: {job_id}"}, 404
+    response = Response(json.dumps(_job_payload(job)), mimetype='application/json')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+# Longest a /job/<id>/events stream holds a web worker; clients then poll
+JOB_EVENTS_MAX_SECONDS = 20
+
+
+@app.route('/job/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-Sent Events: the job status payload whenever it changes.
+
+    Off unless AWT_JOB_EVENTS is set (see src/job_queue.py); the progress
+    page polls /job/<id>/status instead."""
+    from flask import stream_with_context
+    if not job_events_enabled():
+        return {"error": "Job events are disabled; poll the job status"}, 404
+    job_queue = get_job_queue()
+    if job_queue.get(job_id) is None:
+        return {"error": f"Job not found: {job_id}"}, 404
+
+    def stream():
+        last = None
+        last_sent = deadline = time.monotonic()
+        deadline += JOB_EVENTS_MAX_SECONDS
+        while time.monotonic() < deadline:
+            job = job_queue.get(job_id)
+            payload = json.dumps(_job_payload(job))
+            if payload != last:
+                last, last_sent = payload, time.monotonic()
+                yield f"data: {payload}\n\n"
+            elif time.monotonic() - last_sent > 15:
+                # Comment line: keeps proxies from closing an idle stream
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+            if job['status'] in ('done', 'failed'):
+                return
+            time.sleep(0.5)
+
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@app.route('/job/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job_queue = get_job_queue()
+    html = job_queue.result_html(job_id)
+    if html is None:
+        if job_queue.get(job_id) is not None:
+            return redirect(url_for('job_page', job_id=job_id))
+        webenv = WebEnv.wenvDict()
+        msgs = {'pagetitle': "NOT FOUND", 'lede': "There is no such job."}
+        return render_template('not-found.html', identifier=job_id, msgs=msgs, webenv=webenv), 404
+    return html
 
-        resblob = resconduit.resblob
 
-        # Store the consistent colordict and candidate order
-        resblob['colordict'] = consistent_colordict
-        resblob['candidate_order'] = candidate_order
+def render_submission(abifinput, methods, transform_ballots=False, include_irv_extra=False,
+                      identifier='submission', irv_rounds_url=None):
+    """Results page for pasted ABIF, showing the given method tokens
+    (see src.submissions.SUBMISSION_METHODS).
 
-        # Apply dynamic method ordering to rtypelist
-        if abifmodel and rtypelist:
-            # Get optimal ordering for the selected methods
-            ordered_methods = get_method_ordering(abifmodel, rtypelist)
-            rtypelist = ordered_methods
+    Without irv_rounds_url (see get_submission_irv_rounds), the IRV
+    next-choice detail is embedded in the page; with it, the detail is
+    left in the cache for that endpoint under identifier.
+
+    Uses the same method pipeline as /id, so every method is tallied at
+    most once however many of its views ('wlt', 'dot') are requested.
+    """
+    from abiflib import convert_abif_to_jabmod, ABIFVotelineException
+    from abiflib.util import find_ballot_type
+    webenv = WebEnv.wenvDict()
+    WebEnv.sync_web_env()
+    query_string = request.query_string.decode('utf-8', errors='ignore')
+    profiler = RouteProfiler(identifier, ','.join(methods) or 'none',
+                             request_path=request.path, query_string=query_string)
+    rtypelist = []
+    resblob = {}
+    try:
+        try:
+            abifmodel, _ = profiler.time_block(
+                'convert_abif_to_jabmod',
+                lambda: convert_abif_to_jabmod(abifinput, cleanws=True),
+                log_fields={'text_len': len(abifinput), 'function': 'abiflib.convert_abif_to_jabmod'}
+            )
+            error_html = None
+        except ABIFVotelineException as e:
+            abifmodel = None
+            error_html = e.message
+        if abifmodel:
+            profiler.ballots = abifmodel.get('metadata', {}).get('ballotcount')
+            profiler.candidates = len(abifmodel.get('candidates', {}) or {})
+            resblob = compute_method_results(abifmodel, submission_pipeline_methods(methods), profiler,
+                                             transform_ballots=transform_ballots,
+                                             include_irv_extra=include_irv_extra)
+            # Apply dynamic method ordering to rtypelist
+            if methods:
+                rtypelist = get_method_ordering(abifmodel, list(methods))
+        debug_output = profiler.render_debug_output(webenv.get('debugIntro') or "")
+    finally:
+        profiler.finalize()
 
     msgs = {}
     msgs['pagetitle'] = \
@@ -1607,38 +1991,44 @@ def awt_post():
     msgs['placeholder'] = \
         "Try other ABIF, or try tweaking your input (see below)...."
     webenv = WebEnv.wenvDict()
-    # Record detected ballot type for display on POST route
+    # Record detected ballot type for display
     try:
-        msgs['ballot_type'] = bt if 'bt' in locals() else find_ballot_type(abifmodel) if abifmodel else None
+        msgs['ballot_type'] = find_ballot_type(abifmodel) if abifmodel else None
     except Exception:
         msgs['ballot_type'] = None
 
+    show_pairtable = 'wlt' in methods
+    if resblob.get('dotsvg_fallback') and 'dot' in methods:
+        skip_page_cache()
+    if irv_rounds_url and resblob.get('IRV_dict'):
+        remember_irv_round_details(f"sub/{identifier}", resblob['IRV_dict'],
+                                   transform_ballots=transform_ballots,
+                                   include_irv_extra=include_irv_extra)
     return render_template('results-index.html',
                            abifinput=abifinput,
+                           irv_rounds_url=irv_rounds_url,
                            transform_ballots=transform_ballots,
                            resblob=resblob,
-                           copewinnerstring=copewinnerstring,
-                           copewinners=copewinners if 'copewinners' in locals() else [],
-                           pairwise_html=pairwise_html,
-                           pairwise_summary_html=pairwise_summary_html if 'pairwise_summary_html' in locals() else '',
-                           dotsvg_html=dotsvg_html,
+                           copewinnerstring=resblob.get('copewinnerstring') if 'dot' in methods else None,
+                           copewinners=resblob.get('copewinners', []) if 'dot' in methods else [],
+                           pairwise_html=resblob.get('pairwise_html') if show_pairtable else None,
+                           pairwise_summary_html=resblob.get('pairwise_summary_html', '') if show_pairtable else '',
+                           dotsvg_html=resblob.get('dotsvg_html') if 'dot' in methods else None,
                            result_types=rtypelist,
-                           STAR_html=STAR_html,
+                           STAR_html=resblob.get('STAR_html'),
                            approval_result=resblob.get('approval_result', {}),
                            approval_text=resblob.get('approval_text', ''),
-                           IRV_dict=IRV_dict,
-                           IRV_text=IRV_text,
+                           IRV_dict=resblob.get('IRV_dict'),
+                           IRV_text=resblob.get('IRV_text'),
                            IRV_candnames=abifmodel.get(
                                'candidates', {}) if abifmodel else {},
                            FPTP_candnames=abifmodel.get(
                                'candidates', {}) if abifmodel else {},
-                           scorestardict=scorestardict,
+                           scorestardict=resblob.get('scorestardict'),
                            colordict=resblob.get('colordict', {}),
                            candidate_order=resblob.get('candidate_order', []),
                            webenv=webenv,
                            error_html=error_html,
-                           lower_abif_caption="Input",
-                           lower_abif_text=escape(abifinput),
                            msgs=msgs,
                            debug_output=debug_output,
                            debug_flag=webenv['debugFlag'],
@@ -1669,9 +2059,36 @@ def main():
                         help=f"Cache timeout in seconds (default: {AWT_DEFAULT_CACHE_TIMEOUT} seconds)")
     parser.add_argument("--cache-purge", action="store_true",
                         help="Purge all cache entries on startup")
+    parser.add_argument("--metrics-dir", type=str, default=None,
+                        help="Directory shared by worker processes for /metrics aggregation (default: $AWT_METRICS_DIR)")
+    parser.add_argument("--span-db", type=str, default=None,
+                        help="SQLite file recording per-request spans for `perf_awt.py report`; 'none' disables (default: $AWT_SPAN_DB or ~/src/awt/local/db/awt-spans.sqlite)")
+    parser.add_argument("--build-static", action="store_true",
+                        help="Fingerprint and precompress static assets into $AWT_STATIC_BUILD (default: <static>/dist), then exit")
+    parser.add_argument("--build-catalog-index", action="store_true",
+                        help="Bring the catalog index in $AWT_CATALOG_DB up to date, parsing every new or changed ABIF file, then exit")
     args = parser.parse_args()
 
-    abif_catalog_init()
+    if args.build_static:
+        manifest = build_static_assets(AWT_STATIC or app.static_folder, static_build_dir())
+        print(f"[awt.py] Built {len(manifest)} static assets in {static_build_dir()}")
+        return
+
+    from src.catalog_index import get_catalog_index
+    index = get_catalog_index(abif_catalog_init(), TESTFILEDIR)
+    if args.build_catalog_index:
+        complete = index.build()
+        print(f"[awt.py] Catalog index {index.db_path} is {'up to date' if complete else 'still incomplete'}")
+        return
+    # Parses new or changed catalog files in the background, before the
+    # first listing page asks
+    try:
+        index.sync()
+    except Exception as e:
+        print(f"[awt.py] WARNING: catalog index sync failed: {e}")
+    if static_build_dir():
+        # Warns now, not on the first page, if the static build is stale
+        asset_manifest(static_build_dir(), AWT_STATIC or app.static_folder)
 
     # Set AWT_PROFILE_OUTPUT env var if --profile-output is given
     if args.profile_output:
@@ -1688,6 +2105,10 @@ def main():
     app.config['CACHE_DEFAULT_TIMEOUT'] = args.cache_timeout
 
     cache.init_app(app)
+    instrument_cache(cache)
+    if args.metrics_dir:
+        enable_metrics(app, metrics_dir=args.metrics_dir)
+    enable_span_store(args.span_db)
 
     # Optional: purge cache at startup
     if args.cache_purge:
@@ -1707,12 +2128,6 @@ def main():
         # Enable passive SQLite request logging by default
         try:
             reqlog_db = os.environ.get('AWT_REQUEST_LOG_DB', DEFAULT_REQUEST_LOG_DB)
-            db_dir = os.path.dirname(reqlog_db)
-            if db_dir:
-                try:
-                    os.makedirs(db_dir, exist_ok=True)
-                except Exception:
-                    pass
             enable_sqlite_request_log(app, reqlog_db)
             # Also enable cache filename sidecar indexing (same DB)
             if os.environ.get('AWT_CACHE_INDEX', '1') not in ('0', 'false', 'False', 'no', 'NO'):
@@ -188,6 +188,16 @@ def monkeypatch_cache_get(app, cache):
 
 # --- SQLite request logging (default when FileSystemCache is used) ---
 
+def _ensure_parent_dir(db_path: str):
+    """Create the directory holding db_path (on first connect, not at import)."""
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        try:
+            os.makedirs(db_dir, exist_ok=True)
+        except Exception:
+            pass
+
+
 class _SQLiteRequestLogger:
     def __init__(self, db_path: str):
         self.db_path = db_path
@@ -196,6 +206,7 @@ class _SQLiteRequestLogger:
 
     def _connect(self):
         if self._conn is None:
+            _ensure_parent_dir(self.db_path)
             conn = sqlite3.connect(self.db_path, check_same_thread=False)
             conn.execute('PRAGMA journal_mode=WAL')
             conn.execute('PRAGMA synchronous=NORMAL')
@@ -246,9 +257,14 @@ def enable_sqlite_request_log(app, db_path: str):
 
     - Logs request.full_path (same as cache key) and its MD5 hash.
     - Only logs 2xx responses for GET requests.
+    - Safe to call more than once (e.g. at import and again from main());
+      only the first call registers the hook.
     """
+    if 'awt_request_log' in app.extensions:
+        return
     logger.info(f"Enabling SQLite request log at {db_path}")
     req_logger = _SQLiteRequestLogger(db_path)
+    app.extensions['awt_request_log'] = req_logger
 
     @app.after_request
     def _log_request(response):
@@ -282,6 +298,7 @@ class _SQLiteCacheIndexer:
 
     def _connect(self):
         if self._conn is None:
+            _ensure_parent_dir(self.db_path)
             conn = sqlite3.connect(self.db_path, check_same_thread=False)
             conn.execute('PRAGMA journal_mode=WAL')
             conn.execute('PRAGMA synchronous=NORMAL')
@@ -5,7 +5,6 @@ from abiflib import (
     html_score_and_star,
     ABIFVotelineException,
     full_copecount_from_abifmodel,
-    copecount_diagram,
     IRV_dict_from_jabmod,
     get_IRV_report,
     FPTP_result_from_abifmodel,
@@ -26,12 +25,13 @@ from dataclasses import dataclass, field
 from typing import Dict, Any
 
 
-def get_canonical_candidate_order(jabmod):
+def get_canonical_candidate_order(jabmod, fptp_result=None):
     """
     Get consistent candidate ordering based on FPTP vote totals.
 
     Args:
         jabmod: The ABIF model
+        fptp_result: FPTP result for jabmod, if already tallied
 
     Returns:
         list: Candidates ordered by FPTP vote count (highest first),
@@ -41,7 +41,8 @@ def get_canonical_candidate_order(jabmod):
     from abiflib.fptp_tally import FPTP_result_from_abifmodel
 
     try:
-        fptp_result = FPTP_result_from_abifmodel(jabmod)
+        if fptp_result is None:
+            fptp_result = FPTP_result_from_abifmodel(jabmod)
         fptp_toppicks = fptp_result.get('toppicks', {})
 
         if fptp_toppicks:
@@ -234,9 +235,10 @@ class ResultConduit:
 
         return result
 
-    def update_FPTP_result(self, jabmod) -> "ResultConduit":
-        """Add FPTP result to resblob"""
-        fptp_result = FPTP_result_from_abifmodel(jabmod)
+    def update_FPTP_result(self, jabmod, fptp_result=None) -> "ResultConduit":
+        """Add FPTP result to resblob (fptp_result: if already tallied)"""
+        if fptp_result is None:
+            fptp_result = FPTP_result_from_abifmodel(jabmod)
         self.resblob['FPTP_result'] = fptp_result
         self._extract_notices('fptp', fptp_result)
         # self.resblob['FPTP_text'] = get_FPTP_report(jabmod)
@@ -245,11 +247,15 @@ class ResultConduit:
     def update_IRV_result(self, jabmod, include_irv_extra=False, transform_ballots=True) -> "ResultConduit":
         """Add IRV result to resblob, delegating transforms/notices to abiflib."""
 
+        from src.array_tally import IRV_result_from_arrays
+        irv_result = IRV_result_from_arrays(jabmod, transform_ballots=transform_ballots,
+                                            include_irv_extra=include_irv_extra)
         # Backwards compatibility with abiflib v0.32.0
         try:
             # TODO: rename to "IRV_result"
             # Build IRV result (handles optional transform + notices)
-            irv_result = IRV_result_from_abifmodel(jabmod, transform_ballots=transform_ballots, include_irv_extra=include_irv_extra)
+            if irv_result is None:
+                irv_result = IRV_result_from_abifmodel(jabmod, transform_ballots=transform_ballots, include_irv_extra=include_irv_extra)
             self.resblob['IRV_result'] = irv_result
             self.resblob['IRV_dict'] = irv_result['irv_dict']
         except TypeError as e:
@@ -286,15 +292,31 @@ class ResultConduit:
             if bt == 'choose_many':
                 try:
                     from abiflib.approval_tally import build_ranked_from_choose_many
-                    ranked_for_irv = build_ranked_from_choose_many(jabmod)
+                    from src.approval_bits import choose_many_to_ranked
+                    ranked_for_irv = choose_many_to_ranked(jabmod, aggregate=False) or \
+                        build_ranked_from_choose_many(jabmod)
                     self._record_transformed_abif(method_tag='IRV', transformed_jabmod=ranked_for_irv, target_type='ranked')
                 except Exception:
                     pass
         return self
 
-    def update_pairwise_result(self, jabmod, transform_ballots: bool = False) -> "ResultConduit":
+    def update_pairwise_result(self, jabmod, transform_ballots: bool = False,
+                               colordict=None, include_html: bool = True,
+                               pairwise_result=None) -> "ResultConduit":
+        """Add pairwise/Copeland results to resblob.
+
+        Callers that already have the candidate colors pass colordict;
+        callers that render their own pairwise table pass
+        include_html=False to skip the default HTML table.  Callers that
+        keep a running pairwise matrix pass its pairwise_result.
+        """
         # Get pairwise result with notices first
-        pairwise_result = pairwise_result_from_abifmodel(jabmod, transform_ballots=transform_ballots)
+        if pairwise_result is None:
+            # NumPy engine for the matrix and paircells when installed
+            from src.array_tally import pairwise_result_from_arrays
+            pairwise_result = pairwise_result_from_arrays(jabmod, transform_ballots=transform_ballots)
+        if pairwise_result is None:
+            pairwise_result = pairwise_result_from_abifmodel(jabmod, transform_ballots=transform_ballots)
         pairwise_matrix = pairwise_result['pairwise_matrix']
 
         # Use the same pairwise matrix for copecount to ensure consistency
@@ -304,19 +326,24 @@ class ResultConduit:
         self.resblob['copewinners'] = copewinners
         self.resblob['copewinnerstring'] = cwstring
         self.resblob['is_copeland_tie'] = len(copewinners) > 1
-        self.resblob['dotsvg_html'] = copecount_diagram(
-            copecount, outformat='svg')
+        # Cached by graph, bounded and with a placeholder if Graphviz fails
+        from src.dot_render import copecount_svg
+        self.resblob['dotsvg_html'], rendered = copecount_svg(copecount)
+        self.resblob['dotsvg_fallback'] = not rendered
         self.resblob['pairwise_dict'] = pairwise_matrix
 
         # Extract notices from original pairwise result (for cycles/ties)
         self._extract_notices('pairwise', pairwise_result)
 
         # Pairwise tie notice now generated by abiflib (pairwise_tally)
-        self.resblob['pairwise_html'] = htmltable_pairwise_and_winlosstie(jabmod,
-                                                                          snippet=True,
-                                                                          validate=True,
-                                                                          modlimit=2500)
-        if jabmod and 'candidates' in jabmod:
+        if include_html:
+            self.resblob['pairwise_html'] = htmltable_pairwise_and_winlosstie(jabmod,
+                                                                              snippet=True,
+                                                                              validate=True,
+                                                                              modlimit=2500)
+        if colordict is not None:
+            self.resblob['colordict'] = colordict
+        elif jabmod and 'candidates' in jabmod:
             # Use canonical FPTP-based candidate ordering for consistent colors
             canonical_order = get_canonical_candidate_order(jabmod)
             self.resblob['colordict'] = generate_candidate_colors(canonical_order)
@@ -332,31 +359,33 @@ class ResultConduit:
 
         # Build paircells: per matchup counts and percentages (denominator = total_ballots)
         candtoks = list(pairwise_matrix.keys())
-        paircells = {}
-        for rk in candtoks:
-            paircells[rk] = {}
-            for ck in candtoks:
-                if rk == ck:
-                    paircells[rk][ck] = None
-                    continue
-                ck_score = int((pairwise_matrix.get(ck, {}) or {}).get(rk, 0) or 0)
-                rk_score = int((pairwise_matrix.get(rk, {}) or {}).get(ck, 0) or 0)
-                if total_ballots > 0:
-                    no_pref = max(total_ballots - (ck_score + rk_score), 0)
-                    ck_pct = (ck_score / total_ballots) * 100.0
-                    rk_pct = (rk_score / total_ballots) * 100.0
-                    no_pref_pct = (no_pref / total_ballots) * 100.0
-                else:
-                    no_pref = 0
-                    ck_pct = rk_pct = no_pref_pct = 0.0
-                paircells[rk][ck] = {
-                    'ck_score': ck_score,
-                    'rk_score': rk_score,
-                    'no_pref': no_pref,
-                    'ck_pct': ck_pct,
-                    'rk_pct': rk_pct,
-                    'no_pref_pct': no_pref_pct,
-                }
+        paircells = pairwise_result.get('paircells')
+        if paircells is None:
+            paircells = {}
+            for rk in candtoks:
+                paircells[rk] = {}
+                for ck in candtoks:
+                    if rk == ck:
+                        paircells[rk][ck] = None
+                        continue
+                    ck_score = int((pairwise_matrix.get(ck, {}) or {}).get(rk, 0) or 0)
+                    rk_score = int((pairwise_matrix.get(rk, {}) or {}).get(ck, 0) or 0)
+                    if total_ballots > 0:
+                        no_pref = max(total_ballots - (ck_score + rk_score), 0)
+                        ck_pct = (ck_score / total_ballots) * 100.0
+                        rk_pct = (rk_score / total_ballots) * 100.0
+                        no_pref_pct = (no_pref / total_ballots) * 100.0
+                    else:
+                        no_pref = 0
+                        ck_pct = rk_pct = no_pref_pct = 0.0
+                    paircells[rk][ck] = {
+                        'ck_score': ck_score,
+                        'rk_score': rk_score,
+                        'no_pref': no_pref,
+                        'ck_pct': ck_pct,
+                        'rk_pct': rk_pct,
+                        'no_pref_pct': no_pref_pct,
+                    }
         self.resblob['paircells'] = paircells
 
         # Expose transformed ABIF if a transformation applies for pairwise
@@ -369,18 +398,33 @@ class ResultConduit:
             if bt == 'choose_many':
                 try:
                     from abiflib.approval_tally import build_ranked_from_choose_many
-                    ranked_for_pairwise = build_ranked_from_choose_many(jabmod)
+                    from src.approval_bits import choose_many_to_ranked
+                    ranked_for_pairwise = choose_many_to_ranked(jabmod, aggregate=False) or \
+                        build_ranked_from_choose_many(jabmod)
                     self._record_transformed_abif(method_tag='pairwise', transformed_jabmod=ranked_for_pairwise, target_type='ranked')
                 except Exception:
                     pass
         return self
 
-    def update_STAR_result(self, jabmod, colordict=None) -> "ResultConduit":
+    def update_STAR_result(self, jabmod, colordict=None, include_html: bool = True,
+                           star_result=None) -> "ResultConduit":
+        """Add STAR/score result to resblob (star_result: if already tallied)"""
         scorestar = {}
-        self.resblob['STAR_html'] = html_score_and_star(jabmod)
-        scoremodel = STAR_result_from_abifmodel(jabmod)
+        if star_result is None:
+            from src.array_tally import STAR_result_from_arrays
+            star_result = STAR_result_from_arrays(jabmod)
+        if star_result is not None:
+            from src.array_tally import html_score_and_star_from_result, scaled_scores_from_result
+            scoremodel = star_result
+            stardict = scaled_scores_from_result(jabmod, star_result, target_scale=50)
+            if include_html:
+                self.resblob['STAR_html'] = html_score_and_star_from_result(star_result, stardict)
+        else:
+            if include_html:
+                self.resblob['STAR_html'] = html_score_and_star(jabmod)
+            scoremodel = STAR_result_from_abifmodel(jabmod)
+            stardict = scaled_scores(jabmod, target_scale=50)
         scorestar['scoremodel'] = scoremodel
-        stardict = scaled_scores(jabmod, target_scale=50)
         from awt import add_html_hints_to_stardict
         scorestar['starscale'] = \
             add_html_hints_to_stardict(
@@ -401,15 +445,24 @@ class ResultConduit:
         self.resblob['scorestardict'] = scorestar
         return self
 
-    def update_approval_result(self, jabmod, transform_ballots: bool = False) -> "ResultConduit":
+    def update_approval_result(self, jabmod, transform_ballots: bool = False,
+                               approval_result=None) -> "ResultConduit":
         """Add approval voting result to resblob.
 
         When transform_ballots is True and source is not choose_many, also
         record a transformed ABIF for the Approval method accordion.
+        approval_result: if already tallied (e.g. from approval bitmasks).
         """
-        approval_result = approval_result_from_abifmodel(jabmod)
+        from src.approval_bits import approval_report_from_result, approval_result_from_masks
+        if approval_result is None:
+            approval_result = approval_result_from_masks(jabmod)
+        if approval_result is not None:
+            approval_text = approval_report_from_result(approval_result, jabmod['candidates'])
+        else:
+            approval_result = approval_result_from_abifmodel(jabmod)
+            approval_text = get_approval_report(jabmod)
         self.resblob['approval_result'] = approval_result
-        self.resblob['approval_text'] = get_approval_report(jabmod)
+        self.resblob['approval_text'] = approval_text
         # Extract notices using consistent method
         self._extract_notices('approval', approval_result)
         # Keep backward compatibility
@@ -2,10 +2,13 @@
 """
 Utilities for generating HTML or preparing data for HTML templates.
 """
-from abiflib.util import find_ballot_type
 import colorsys
+import functools
+import os
 import re
 
+from markupsafe import Markup
+
 
 def format_notice_paragraphs(text):
     """Convert paragraph breaks in notice text to HTML paragraphs.
@@ -137,6 +140,80 @@ def escape_css_selector(s):
     return re.sub(r'[^a-zA-Z0-9_-]', '_', s)
 
 
+def compact_markup_enabled():
+    """
+    True unless AWT_COMPACT_MARKUP is 'off' (or 0/no/false).
+
+    In compact mode, results pages get one stylesheet of candidate colors
+    (see candidate_stylesheet()) and the markup references classes
+    instead of repeating inline style attributes on every cell.
+    """
+    value = os.environ.get('AWT_COMPACT_MARKUP', '').strip().lower()
+    return value not in ('off', '0', 'no', 'false')
+
+
+@functools.lru_cache(maxsize=128)
+def _palette_stylesheet(palette):
+    rules = []
+    for cand, color in palette:
+        sel = escape_css_selector(cand)
+        rules.append(f".color-{sel},.irv-color-{sel}{{background-color:{color}}}")
+    return '\n'.join(rules)
+
+
+def candidate_stylesheet(colordict):
+    """
+    CSS rules giving each candidate's `color-<tok>` and `irv-color-<tok>`
+    classes its color from colordict.
+
+    One stylesheet serves every method on a results page; it is cached
+    per palette, so pages for the same candidates share the string.
+    Returns '' when compact markup is off or there are no colors.
+    """
+    if not colordict or not compact_markup_enabled():
+        return ''
+    return _palette_stylesheet(tuple(colordict.items()))
+
+
+def candidate_swatch(colordict, cand, cls='color-box'):
+    """
+    A color box span for cand, e.g. `<span class="color-box"
+    style="background-color: #d0ffce;"></span>`.
+
+    In compact mode the color comes from candidate_stylesheet() through
+    the `color-<tok>` class; candidates without a color keep the inline
+    grey.
+    """
+    if compact_markup_enabled() and colordict and cand in colordict:
+        return Markup(f'<span class="{cls} color-{escape_css_selector(cand)}"></span>')
+    color = colordict.get(cand, '#ccc') if colordict else '#ccc'
+    return Markup('<span class="{}" style="background-color: {};"></span>').format(cls, color)
+
+
+def inline_style(style):
+    """
+    ` style="..."` for markup whose class carries the same rules in
+    electostyle.css, or '' in compact mode.
+    """
+    if compact_markup_enabled():
+        return ''
+    return Markup(' style="{}"').format(style)
+
+
+def install_template_helpers(env):
+    """
+    Register the filters and globals results templates use on a Jinja
+    environment.
+    """
+    env.filters['escape_css'] = escape_css_selector
+    env.globals['compact_markup'] = compact_markup_enabled
+    env.globals['candidate_stylesheet'] = candidate_stylesheet
+    env.globals['candidate_swatch'] = candidate_swatch
+    env.globals['inline_style'] = inline_style
+    from src.irv_payload import irv_payload
+    env.globals['irv_payload'] = irv_payload
+
+
 def add_html_hints_to_stardict(scores, stardict, colordict=None):
     """
     Add HTML presentation hints to a STAR voting results dictionary.
@@ -228,6 +305,7 @@ def get_method_ordering(abifmodel, default_methods=None):
             return ordered_methods
 
     # No valid declared method - order based on detected ballot type
+    from abiflib.util import find_ballot_type
     ballot_type = find_ballot_type(abifmodel)
 
     if ballot_type == 'ranked':
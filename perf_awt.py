@@ -4,14 +4,19 @@
 import argparse
 import cProfile
 import datetime
+import json
+import math
 import os
 import pstats
 from pstats import SortKey
 import re
 import requests
 import signal
+import statistics
 import string
 import subprocess
+import sys
+import tempfile
 import time
 from urllib.parse import quote
 
@@ -42,7 +47,7 @@ def get_b1060_timestamp_from_datetime(dt):
 # Start awt.py in a subprocess and detect the port
 
 
-def start_awt_server(log_path, profile_output_path=None):
+def start_awt_server(log_path, profile_output_path=None, caching='none'):
     env = os.environ.copy()
     env['AWT_DIR'] = AWT_DIR
     abiftool_dir = get_abiftool_dir()
@@ -52,7 +57,7 @@ def start_awt_server(log_path, profile_output_path=None):
 
     print(f"[perf] Logging awt.py output to {log_path}")
 
-    cmd = ['python3', os.path.join(AWT_DIR, 'awt.py'), '--caching=none']
+    cmd = ['python3', os.path.join(AWT_DIR, 'awt.py'), f'--caching={caching}']
     if profile_output_path:
         cmd.append(f'--profile-output={profile_output_path}')
 
@@ -66,8 +71,8 @@ def start_awt_server(log_path, profile_output_path=None):
 
     port = None
     try:
-        for _ in range(30):  # Try for 6 seconds
-            time.sleep(0.2)
+        for _ in range(120):  # Try for 6 seconds
+            time.sleep(0.05)
             with open(log_path) as f:
                 output = f.read()
             # More flexible regex: allow whitespace, any host, and extra output
@@ -125,6 +130,670 @@ def run_perf_test(proc, port, path, cprof_path):
     return cprof_path
 
 
+def run_startup_benchmark(runs=10, module='awt', cold=False, importtime=False):
+    """Time `import <module>` in fresh interpreters, the way a worker boots.
+
+    Each run is a new subprocess with the filesystem cache configured like
+    fetch_awt_url.py (AWT_CACHE_TYPE=none unless already set).  With
+    cold=True every run gets an empty AWT_PATHS_CACHE, so path discovery is
+    measured too.  With importtime=True one extra run is made under
+    `python -X importtime` and the slowest cumulative imports are listed.
+    """
+    env = os.environ.copy()
+    env.setdefault('AWT_CACHE_TYPE', 'none')
+    cmd = [sys.executable, '-c', f'import {module}']
+    timings = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for i in range(runs):
+            if cold:
+                env['AWT_PATHS_CACHE'] = os.path.join(tmpdir, f'paths-{i}.json')
+            start = time.perf_counter()
+            proc = subprocess.run(cmd, cwd=AWT_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            elapsed = time.perf_counter() - start
+            if proc.returncode != 0:
+                print(proc.stderr.decode('utf-8', errors='replace'))
+                raise RuntimeError(f"import {module} failed (exit {proc.returncode})")
+            timings.append(elapsed)
+
+    mode = 'cold' if cold else 'warm'
+    print(f"[perf] import {module} ({mode} path cache), {runs} runs:")
+    print(f"  min={min(timings):.3f}s median={statistics.median(timings):.3f}s max={max(timings):.3f}s")
+
+    if importtime:
+        proc = subprocess.run([sys.executable, '-X', 'importtime'] + cmd[1:],
+                              cwd=AWT_DIR, env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.PIPE)
+        rows = []
+        for line in proc.stderr.decode('utf-8', errors='replace').splitlines():
+            match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)', line)
+            if match:
+                rows.append((int(match.group(2)), len(match.group(3)), match.group(4)))
+        print(f"[perf] Slowest cumulative imports (top-level packages):")
+        toplevel = [r for r in rows if r[1] <= 2]
+        for cumulative_us, _, name in sorted(toplevel, reverse=True)[:15]:
+            print(f"  {cumulative_us / 1000.0:9.1f} ms  {name}")
+    return timings
+
+
+def run_span_report(db_path=None, election=None, span='total', resulttype=None,
+                    threshold=1.25, min_samples=3, metric='elapsed'):
+    """Print per-election span timings by revision, then regressions.
+
+    Reads the span store written by awt.py (see src/span_store.py).  A
+    revision is a (git rev, abiflib version) pair; a regression is a
+    revision whose median is at least `threshold` times the previous one.
+    """
+    from src.span_store import DEFAULT_SPAN_DB, find_regressions, summarize_spans
+    db_path = db_path or os.environ.get('AWT_SPAN_DB') or DEFAULT_SPAN_DB
+    if not os.path.isfile(db_path):
+        print(f"[perf] No span store at {db_path} (run awt.py, or set AWT_SPAN_DB)")
+        return []
+    summaries = summarize_spans(db_path, election=election, span=span, resulttype=resulttype, metric=metric)
+
+    def fmt(value):
+        if metric == 'elapsed':
+            return f"{value:>8.3f}s"
+        return f"{value / 1048576.0:>6.2f}MiB"
+
+    if not summaries:
+        print(f"[perf] No matching spans in {db_path}")
+        return []
+
+    print(f"[perf] Span {metric} from {db_path}")
+    current = None
+    for row in summaries:
+        key = (row['election_id'], row['resulttype'], row['span'])
+        if key != current:
+            current = key
+            size = f"{row['ballots']} ballots, {row['candidates']} candidates" if row['ballots'] is not None else "size unknown"
+            print(f"\n{row['election_id']} [{row['resulttype']}] {row['span']} ({size})")
+            print(f"  {'git rev':<12} {'abiflib':<16} {'n':>5} {'median':>9} {'p95':>9}  first seen")
+        first_seen = datetime.datetime.fromtimestamp(row['first_seen']).strftime('%Y-%m-%d %H:%M')
+        print(f"  {row['git_rev'] or '?':<12} {row['abiflib_version'] or '?':<16} {row['n']:>5} "
+              f"{fmt(row['median'])} {fmt(row['p95'])}  {first_seen}")
+
+    regressions = find_regressions(summaries, threshold=threshold, min_samples=min_samples)
+    print(f"\n[perf] Regressions (median >= {threshold:.2f}x previous revision, n >= {min_samples}): {len(regressions)}")
+    for reg in regressions:
+        before, after = reg['before'], reg['after']
+        print(f"  {after['election_id']} [{after['resulttype']}] {after['span']}: "
+              f"{fmt(before['median']).strip()} ({before['git_rev']}, abiflib {before['abiflib_version']}) -> "
+              f"{fmt(after['median']).strip()} ({after['git_rev']}, abiflib {after['abiflib_version']}) "
+              f"x{reg['ratio']:.2f}")
+    return regressions
+
+
+def _p95(values):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(0.95 * len(ordered))) - 1))]
+
+
+def _timing_stats(values):
+    return {
+        'n': len(values),
+        'median': statistics.median(values),
+        'p95': _p95(values),
+        'min': min(values),
+        'max': max(values),
+    }
+
+
+def load_catalog_ids():
+    """Return the ids listed in abif_list.yml, in catalog order."""
+    import yaml
+    with open(os.path.join(AWT_DIR, 'abif_list.yml'), 'r') as f:
+        abif_list = yaml.safe_load(f) or []
+    return [entry['id'] for entry in abif_list if entry.get('id')]
+
+
+def run_catalog_benchmark(ids=None, resulttypes=('all',), reps=5, modes=('cold', 'warm'),
+                          output_path=None, quiet=True):
+    """Time /id routes in-process through the Flask test client.
+
+    For every election id and resulttype, `cold` clears the page cache
+    before each of `reps` requests (so the full tally/render pipeline
+    runs), and `warm` primes the cache once and then times `reps` cache
+    hits.  Per-span timings for cold runs come from RouteProfiler (via a
+    span observer).  Results are written as JSON to output_path (default
+    timing/bench-<b1060time>-<git rev>.json) and returned.
+    """
+    import contextlib
+    import io
+    import logging
+    import platform
+    from urllib.parse import quote
+
+    # Like fetch_awt_url.py: no filesystem cache or request log side effects
+    os.environ.setdefault('AWT_CACHE_TYPE', 'none')
+    import awt
+    from src.server_util import add_span_observer, remove_span_observer
+
+    if quiet:
+        for name in ('awt', 'awt.cache', 'awt.routes.id'):
+            logging.getLogger(name).setLevel(logging.WARNING)
+    awt.app.config['CACHE_TYPE'] = 'flask_caching.backends.SimpleCache'
+    awt.app.config['CACHE_DEFAULT_TIMEOUT'] = 0
+    awt.cache.init_app(awt.app)
+    client = awt.app.test_client()
+
+    finished = []
+
+    def collect_profiler(profiler, total):
+        finished.append(profiler)
+
+    ids = list(ids or load_catalog_ids())
+    git_rev = get_git_rev(AWT_DIR)
+    try:
+        from importlib.metadata import version
+        abiflib_version = version('abiftool')
+    except Exception:
+        abiflib_version = 'unknown'
+    b1060time = get_b1060_timestamp_from_datetime(datetime.datetime.now(datetime.UTC))
+    report = {
+        'meta': {
+            'b1060time': b1060time,
+            'git_rev': git_rev,
+            'abiflib_version': abiflib_version,
+            'python': platform.python_version(),
+            'reps': reps,
+            'modes': list(modes),
+        },
+        'results': {},
+    }
+
+    def timed_get(path):
+        sink = io.StringIO()
+        with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext():
+            start = time.perf_counter()
+            response = client.get(path)
+            elapsed = time.perf_counter() - start
+        return response.status_code, elapsed
+
+    add_span_observer(collect_profiler)
+    try:
+        for election_id in ids:
+            for resulttype in resulttypes:
+                path = f"/id/{quote(election_id, safe='')}"
+                if resulttype and resulttype != 'all':
+                    path += f"/{resulttype}"
+                key = f"{election_id}/{resulttype or 'all'}"
+                entry = {'path': path, 'status': None}
+                for mode in modes:
+                    timings = []
+                    spans = {}
+                    if mode == 'warm':
+                        awt.cache.clear()
+                        entry['status'], _ = timed_get(path)
+                    for _ in range(reps):
+                        if mode == 'cold':
+                            awt.cache.clear()
+                        del finished[:]
+                        status, elapsed = timed_get(path)
+                        entry['status'] = status
+                        timings.append(elapsed)
+                        for profiler in finished:
+                            for name, values in profiler.spans.items():
+                                spans.setdefault(name, []).append(sum(values))
+                    stats = _timing_stats(timings)
+                    stats['spans'] = {name: _timing_stats(values) for name, values in sorted(spans.items())}
+                    entry[mode] = stats
+                report['results'][key] = entry
+                summary = ' '.join(f"{mode}={entry[mode]['median']:.3f}s/p95={entry[mode]['p95']:.3f}s" for mode in modes)
+                print(f"[bench] {key} [{entry['status']}] {summary}", file=sys.stderr)
+    finally:
+        remove_span_observer(collect_profiler)
+
+    if output_path is None:
+        output_path = os.path.join(AWT_DIR, 'timing', f"bench-{b1060time}-{git_rev}.json")
+    if output_path != '-':
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        with open(output_path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"[bench] Wrote {output_path}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+    return report
+
+
+def run_markup_benchmark(ids=None, resulttypes=('all',), output_path=None, quiet=True):
+    """Page sizes of /id routes with AWT_COMPACT_MARKUP off and on.
+
+    Each page is rendered in-process in both modes and measured in
+    bytes, gzipped bytes and inline style attributes.  Returns the
+    report (also written as JSON to output_path when given).
+    """
+    import contextlib
+    import gzip
+    import io
+    import logging
+
+    os.environ.setdefault('AWT_CACHE_TYPE', 'none')
+    import awt
+
+    if quiet:
+        for name in ('awt', 'awt.cache', 'awt.routes.id'):
+            logging.getLogger(name).setLevel(logging.WARNING)
+    awt.app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    awt.cache.init_app(awt.app)
+    client = awt.app.test_client()
+    modes = ('inline', 'compact')
+    saved_mode = os.environ.get('AWT_COMPACT_MARKUP')
+    report = {'meta': {'git_rev': get_git_rev(AWT_DIR)}, 'results': {}}
+    totals = {mode: {'bytes': 0, 'gzip_bytes': 0} for mode in modes}
+
+    print(f"  {'election/resulttype':<40} {'inline':>10} {'compact':>10} {'saved':>7} {'gz inline':>10} {'gz compact':>10}")
+    try:
+        for election_id in list(ids or load_catalog_ids()):
+            for resulttype in resulttypes:
+                path = f"/id/{quote(election_id, safe='')}"
+                if resulttype and resulttype != 'all':
+                    path += f"/{resulttype}"
+                key = f"{election_id}/{resulttype or 'all'}"
+                entry = {'path': path}
+                for mode in modes:
+                    os.environ['AWT_COMPACT_MARKUP'] = 'on' if mode == 'compact' else 'off'
+                    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+                        response = client.get(path)
+                    body = response.get_data()
+                    entry['status'] = response.status_code
+                    entry[mode] = {'bytes': len(body), 'gzip_bytes': len(gzip.compress(body)),
+                                   'style_attrs': body.count(b' style="')}
+                report['results'][key] = entry
+                if entry['status'] != 200:
+                    print(f"  {key:<40} [{entry['status']}]")
+                    continue
+                for mode in modes:
+                    for field in ('bytes', 'gzip_bytes'):
+                        totals[mode][field] += entry[mode][field]
+                before, after = entry['inline']['bytes'], entry['compact']['bytes']
+                print(f"  {key:<40} {before:>10,} {after:>10,} {1 - after / before:>6.1%} "
+                      f"{entry['inline']['gzip_bytes']:>10,} {entry['compact']['gzip_bytes']:>10,}")
+    finally:
+        if saved_mode is None:
+            os.environ.pop('AWT_COMPACT_MARKUP', None)
+        else:
+            os.environ['AWT_COMPACT_MARKUP'] = saved_mode
+
+    report['totals'] = totals
+    before, after = totals['inline']['bytes'], totals['compact']['bytes']
+    if before:
+        print(f"[markup] Total {before:,} -> {after:,} bytes ({1 - after / before:.1%} smaller); "
+              f"gzip {totals['inline']['gzip_bytes']:,} -> {totals['compact']['gzip_bytes']:,}")
+    if output_path:
+        with open(output_path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"[markup] Wrote {output_path}", file=sys.stderr)
+    return report
+
+
+DEFAULT_SEARCH_QUERIES = ('burlington', 'nyc mayor', 'alaska special', 'debian 2021', 'ma')
+
+
+def run_search_benchmark(entries=20000, queries=DEFAULT_SEARCH_QUERIES, reps=20, output_path=None):
+    """Time catalog index builds, searches and suggestions at catalog size entries.
+
+    The synthetic catalog repeats abif_list.yml's entries under new ids
+    until it has entries rows; their files don't exist, so only metadata
+    is indexed.  Returns the report (also written as JSON to output_path
+    when given).
+    """
+    import yaml
+    from src.catalog_index import CatalogIndex
+
+    with open(os.path.join(AWT_DIR, 'abif_list.yml'), 'r') as f:
+        base = [e for e in yaml.safe_load(f) or [] if e.get('id')]
+    catalog = [dict(e, id=f"{e['id']}-{i // len(base)}", filename=f"synthetic/{i}.abif")
+               for i, e in zip(range(entries), (base[i % len(base)] for i in range(entries)))]
+    report = {'meta': {'git_rev': get_git_rev(AWT_DIR), 'entries': entries, 'reps': reps}, 'results': {}}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        catalog_path = os.path.join(tmpdir, 'abif_list.yml')
+        with open(catalog_path, 'w') as f:
+            yaml.safe_dump(catalog, f)
+        index = CatalogIndex(os.path.join(tmpdir, 'catalog.sqlite'), catalog_path, tmpdir)
+        start = time.perf_counter()
+        index.build()
+        report['sync_s'] = time.perf_counter() - start
+        print(f"[search] Indexed {entries:,} entries in {report['sync_s']:.2f}s")
+        print(f"  {'query':<20} {'matches':>8} {'search ms':>10} {'p95':>7} {'suggest ms':>11} {'p95':>7}")
+        for q in queries:
+            timings = {'search': [], 'suggest': []}
+            for _ in range(reps):
+                start = time.perf_counter()
+                total = index.listing(q=q)['total']
+                timings['search'].append((time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                index.suggest(q)
+                timings['suggest'].append((time.perf_counter() - start) * 1000)
+            result = {kind: _timing_stats(values) for kind, values in timings.items()}
+            result['matches'] = total
+            report['results'][q] = result
+            print(f"  {q:<20} {total:>8,} {result['search']['median']:>10.2f} {result['search']['p95']:>7.2f} "
+                  f"{result['suggest']['median']:>11.2f} {result['suggest']['p95']:>7.2f}")
+    if output_path:
+        with open(output_path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"[search] Wrote {output_path}", file=sys.stderr)
+    return report
+
+
+def compare_benchmarks(base, new, threshold=1.2, min_delta=0.005, spans=False):
+    """Diff two run_catalog_benchmark() reports (dicts or JSON paths).
+
+    A median that grew by at least `threshold` (ratio) and `min_delta`
+    seconds counts as a regression.  With spans=True, per-span medians of
+    cold runs are compared too.  Returns the list of regressions.
+    """
+    if isinstance(base, str):
+        with open(base) as f:
+            base = json.load(f)
+    if isinstance(new, str):
+        with open(new) as f:
+            new = json.load(f)
+
+    def rows_for(entry_base, entry_new, key):
+        for mode in ('cold', 'warm'):
+            if mode not in entry_base or mode not in entry_new:
+                continue
+            yield key, mode, None, entry_base[mode]['median'], entry_new[mode]['median']
+            if spans:
+                base_spans = entry_base[mode].get('spans', {})
+                for name, stats in sorted(entry_new[mode].get('spans', {}).items()):
+                    if name in base_spans:
+                        yield key, mode, name, base_spans[name]['median'], stats['median']
+
+    print(f"[compare] base {base['meta'].get('git_rev')} ({base['meta'].get('b1060time')}) "
+          f"vs new {new['meta'].get('git_rev')} ({new['meta'].get('b1060time')})")
+    print(f"  {'election/resulttype':<40} {'mode':<5} {'span':<20} {'base':>9} {'new':>9} {'ratio':>7}")
+    regressions = []
+    for key in sorted(set(base['results']) & set(new['results'])):
+        for key, mode, span, before, after in rows_for(base['results'][key], new['results'][key], key):
+            ratio = after / before if before > 0 else float('inf')
+            flag = ''
+            if ratio >= threshold and (after - before) >= min_delta:
+                flag = '  REGRESSION'
+                regressions.append({'key': key, 'mode': mode, 'span': span,
+                                    'base': before, 'new': after, 'ratio': ratio})
+            print(f"  {key:<40} {mode:<5} {span or '-':<20} {before:>8.3f}s {after:>8.3f}s {ratio:>6.2f}x{flag}")
+    missing = sorted(set(base['results']) ^ set(new['results']))
+    if missing:
+        print(f"[compare] Only in one report (skipped): {', '.join(missing)}")
+    print(f"[compare] {len(regressions)} regression(s) at >= {threshold:.2f}x and >= {min_delta * 1000:.0f}ms")
+    return regressions
+
+
+def load_replay_urls(db_path=None, min_count=1, since_days=None):
+    """Return [(url, count)] from the request log's `urls` table.
+
+    The table is written by cache_awt's SQLite request logger and holds
+    the cache key (path + query string) of every successful GET.
+    """
+    import sqlite3
+    from cache_awt import DEFAULT_REQUEST_LOG_DB
+    db_path = db_path or os.environ.get('AWT_REQUEST_LOG_DB', DEFAULT_REQUEST_LOG_DB)
+    query = "SELECT url, count FROM urls WHERE count >= ?"
+    params = [min_count]
+    if since_days is not None:
+        query += " AND last_seen >= ?"
+        params.append(int(time.time() - since_days * 86400))
+    with sqlite3.connect(db_path) as conn:
+        rows = list(conn.execute(query + " ORDER BY count DESC", params))
+    # Flask's full_path keeps a trailing '?' when there is no query string
+    return [(url[:-1] if url.endswith('?') else url, count) for url, count in rows]
+
+
+def _scrape_cache_counts(session, base_url):
+    """Sum awt_cache_requests_total by result from /metrics, or None."""
+    try:
+        # /metrics needs the admin token unless the server is on this host
+        token = os.environ.get('AWT_ADMIN_TOKEN')
+        headers = {'X-AWT-Admin-Token': token} if token else {}
+        response = session.get(f"{base_url}/metrics", headers=headers, timeout=10)
+        if response.status_code != 200:
+            return None
+    except requests.RequestException:
+        return None
+    counts = {'hit': 0.0, 'miss': 0.0}
+    for line in response.text.splitlines():
+        match = re.match(r'awt_cache_requests_total\{.*result="(hit|miss)".*\}\s+(\S+)', line)
+        if match:
+            counts[match.group(1)] += float(match.group(2))
+    return counts
+
+
+def run_replay(base_url, urls, total=200, concurrency=4, rate=None, seed=None, timeout=60):
+    """Replay request-log URLs against a running awt server.
+
+    `total` URLs are sampled with replacement, weighted by their request
+    count, and fetched by `concurrency` threads.  With `rate` (requests
+    per second, across all threads) request starts are paced on a fixed
+    schedule; otherwise each thread sends as fast as it can.  The cache
+    hit ratio comes from the server's /metrics counters before and after
+    the run.  Returns a summary dict.
+    """
+    import random
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    rng = random.Random(seed)
+    sample = rng.choices([url for url, _ in urls], weights=[count for _, count in urls], k=total)
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    def fetch(index, url):
+        if rate:
+            delay = started + index / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        start = time.perf_counter()
+        try:
+            response = session().get(f"{base_url}{url}", timeout=timeout)
+            status, nbytes = response.status_code, len(response.content)
+        except requests.RequestException as exc:
+            status, nbytes = type(exc).__name__, 0
+        return status, time.perf_counter() - start, nbytes
+
+    before = _scrape_cache_counts(requests.Session(), base_url)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, range(total), sample))
+    wall = time.perf_counter() - started
+    after = _scrape_cache_counts(requests.Session(), base_url)
+
+    latencies = sorted(elapsed for _, elapsed, _ in results)
+    statuses = {}
+    for status, _, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(1 for status, _, _ in results if not (isinstance(status, int) and status < 400))
+    summary = {
+        'requests': total,
+        'distinct_urls': len(set(sample)),
+        'concurrency': concurrency,
+        'rate': rate,
+        'wall_s': wall,
+        'throughput_rps': total / wall if wall > 0 else None,
+        'bytes': sum(nbytes for _, _, nbytes in results),
+        'latency_s': {
+            'p50': statistics.median(latencies),
+            'p90': latencies[min(len(latencies) - 1, int(0.90 * len(latencies)))],
+            'p95': _p95(latencies),
+            'p99': latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+            'max': latencies[-1],
+            'mean': statistics.fmean(latencies),
+        },
+        'error_rate': errors / total,
+        'statuses': statuses,
+        'cache_hit_ratio': None,
+    }
+    if before is not None and after is not None:
+        hits = after['hit'] - before['hit']
+        lookups = hits + after['miss'] - before['miss']
+        if lookups > 0:
+            summary['cache_hit_ratio'] = hits / lookups
+
+    lat = summary['latency_s']
+    print(f"[replay] {total} requests ({summary['distinct_urls']} distinct URLs) to {base_url}, "
+          f"concurrency={concurrency} rate={rate or 'unlimited'}")
+    print(f"  throughput: {summary['throughput_rps']:.1f} req/s over {wall:.2f}s")
+    print(f"  latency: p50={lat['p50'] * 1000:.1f}ms p90={lat['p90'] * 1000:.1f}ms "
+          f"p95={lat['p95'] * 1000:.1f}ms p99={lat['p99'] * 1000:.1f}ms max={lat['max'] * 1000:.1f}ms")
+    print(f"  errors: {errors} ({summary['error_rate']:.1%})  statuses: {statuses}")
+    if summary['cache_hit_ratio'] is None:
+        print("  cache hit ratio: unknown (no /metrics cache counters)")
+    else:
+        print(f"  cache hit ratio: {summary['cache_hit_ratio']:.1%}")
+    return summary
+
+
+def run_profiles_list(profile_dir=None, election=None, limit=20):
+    """List on-demand request profiles (see src/request_profiling.py), newest first."""
+    from src.request_profiling import list_request_profiles
+    entries = [e for e in list_request_profiles(profile_dir)
+               if not election or e.get('election_id') == election]
+    if not entries:
+        print("[perf] No request profiles found")
+        return []
+    print(f"  {'req_id':<9} {'when (b1060)':<14} {'reason':<7} {'total':>8}  {'slowest spans':<40} path")
+    for entry in entries[:limit]:
+        stamp = os.path.basename(entry['cprof']).split('-', 2)
+        stamp = '-'.join(stamp[:2]) if len(stamp) > 2 else '?'
+        spans = sorted(entry.get('spans', {}).items(), key=lambda item: item[1], reverse=True)[:3]
+        span_text = ', '.join(f"{name}:{elapsed:.2f}s" for name, elapsed in spans)
+        total = entry.get('total_s')
+        total_text = f"{total:.3f}s" if total is not None else '?'
+        path = entry.get('path', '')
+        if entry.get('query') and '?' not in path:
+            path += f"?{entry['query']}"
+        print(f"  {entry.get('req_id', '?'):<9} {stamp:<14} {entry.get('reason', '?'):<7} {total_text:>8}  {span_text:<40} {path}")
+    if len(entries) > limit:
+        print(f"  ... {len(entries) - limit} more (use --limit)")
+    return entries
+
+
+def run_profiles_show(which, profile_dir=None):
+    """Summarize one stored profile, given its req_id or .cprof path."""
+    from src.request_profiling import list_request_profiles
+    if os.path.isfile(which):
+        cprof_path = which
+    else:
+        matches = [e['cprof'] for e in list_request_profiles(profile_dir) if e.get('req_id') == which]
+        if not matches:
+            print(f"[perf] No profile with req_id {which}")
+            return None
+        cprof_path = matches[0]
+    summary = analyze_profile(cprof_path)
+    print(summary)
+    return summary
+
+
+SCALE_SPANS = ('parse', 'ballot_patterns', 'result_conduit_init', 'FPTP', 'IRV', 'pairwise', 'STAR_prep', 'STAR', 'approval')
+
+
+def run_conduit_pipeline(abif_text, profiler):
+    """Parse abif_text and run the /id method pipeline under profiler.
+
+    This is awt.compute_method_results(), so spans match those of
+    /id and /sub and scaling runs, bench reports and the span store can
+    be read side by side.
+    """
+    from abiflib import convert_abif_to_jabmod
+    import awt
+
+    jabmod, _ = profiler.time_block('parse', lambda: convert_abif_to_jabmod(abif_text))
+    profiler.ballots = jabmod.get('metadata', {}).get('ballotcount')
+    profiler.candidates = len(jabmod.get('candidates', {}))
+    return awt.compute_method_results(jabmod, awt.PIPELINE_METHODS, profiler)
+
+
+def _scaling_exponents(points, span, axis, other):
+    """log-log slopes of span time along axis, for each fixed value of other."""
+    slopes = []
+    by_other = {}
+    for point in points:
+        by_other.setdefault(point[other], []).append(point)
+    for series in by_other.values():
+        series.sort(key=lambda p: p[axis])
+        for before, after in zip(series, series[1:]):
+            t0, t1 = before['spans'].get(span), after['spans'].get(span)
+            if t0 and t1 and t0 > 1e-4 and after[axis] > before[axis]:
+                slopes.append(math.log(t1 / t0) / math.log(after[axis] / before[axis]))
+    return slopes
+
+
+def run_scaling_benchmark(ballot_grid=(1000, 10000), candidate_grid=(5, 10, 20), ballot_type='ranked',
+                          depth=None, dup_ratio=0.0, reps=1, seed=0, output_path=None):
+    """Time the conduit pipeline on synthetic elections over a size grid.
+
+    Prints a span x size table and, per span, the log-log scaling
+    exponent in ballots and in candidates (1.0 = linear, 2.0 =
+    quadratic).  The maximum over the grid is shown, since that is where
+    complexity blows up.  Returns (and optionally writes) a JSON-ready dict.
+    """
+    import logging
+    # Like fetch_awt_url.py: no filesystem cache or request log side effects
+    os.environ.setdefault('AWT_CACHE_TYPE', 'none')
+    import awt  # noqa: F401
+    from src.server_util import RouteProfiler
+    from src.synth_abif import generate_abif
+    for name in ('awt', 'awt.cache', 'awt.routes.id'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    # Warm-up run: first-call costs (imports, template compiles) would
+    # otherwise land on the smallest grid point and flatten the exponents
+    run_conduit_pipeline(generate_abif(min(ballot_grid), min(candidate_grid), ballot_type=ballot_type, seed=seed),
+                         RouteProfiler('synthetic-warmup', 'all'))
+    points = []
+    for ballots in ballot_grid:
+        for candidates in candidate_grid:
+            abif_text = generate_abif(ballots, candidates, depth=depth, ballot_type=ballot_type,
+                                      dup_ratio=dup_ratio, seed=seed)
+            timings = {}
+            for _ in range(reps):
+                profiler = RouteProfiler(f"synthetic-{ballots}x{candidates}", 'all')
+                run_conduit_pipeline(abif_text, profiler)
+                for name, values in profiler.spans.items():
+                    timings.setdefault(name, []).append(sum(values))
+            point = {'ballots': ballots, 'candidates': candidates,
+                     'spans': {name: statistics.median(values) for name, values in timings.items()}}
+            points.append(point)
+            print(f"[scale] {ballots} ballots x {candidates} candidates: "
+                  f"{sum(point['spans'].values()):.3f}s", file=sys.stderr)
+
+    print(f"[scale] {ballot_type} ballots, depth={depth or 'all'}, dup_ratio={dup_ratio}, median of {reps} rep(s)")
+    header = f"  {'ballots':>8} {'cands':>5} " + ' '.join(f"{name:>10}" for name in SCALE_SPANS)
+    print(header)
+    for point in points:
+        cells = ' '.join(f"{point['spans'].get(name, float('nan')):>9.3f}s" for name in SCALE_SPANS)
+        print(f"  {point['ballots']:>8} {point['candidates']:>5} {cells}")
+
+    exponents = {}
+    print("[scale] Scaling exponents (max log-log slope over the grid):")
+    for name in SCALE_SPANS:
+        by_ballots = _scaling_exponents(points, name, 'ballots', 'candidates')
+        by_candidates = _scaling_exponents(points, name, 'candidates', 'ballots')
+        exponents[name] = {'ballots': max(by_ballots) if by_ballots else None,
+                           'candidates': max(by_candidates) if by_candidates else None}
+        fmt = lambda v: f"{v:5.2f}" if v is not None else '    -'
+        print(f"  {name:<20} ballots^{fmt(exponents[name]['ballots'])}  candidates^{fmt(exponents[name]['candidates'])}")
+
+    report = {
+        'params': {'ballot_type': ballot_type, 'depth': depth, 'dup_ratio': dup_ratio,
+                   'reps': reps, 'seed': seed, 'git_rev': get_git_rev(AWT_DIR)},
+        'points': points,
+        'exponents': exponents,
+    }
+    if output_path:
+        with open(output_path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"[scale] Wrote {output_path}", file=sys.stderr)
+    return report
+
+
 def list_ids():
     """Print all ids and their .abif filenames from abif_list.yml, one per line."""
     try:
@@ -146,8 +815,189 @@ def list_ids():
         if id_ and filename:
             print(f"{id_}: {filename}")
 
+def build_subcommand_parser():
+    parser = argparse.ArgumentParser(prog='perf_awt.py',
+                                     description='AWT performance subcommands.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    startup_parser = subparsers.add_parser('startup', help='Benchmark interpreter startup + import awt')
+    startup_parser.add_argument('--runs', type=int, default=10, help='Number of fresh interpreters to time (default: 10)')
+    startup_parser.add_argument('--module', default='awt', help='Module to import (default: awt)')
+    startup_parser.add_argument('--cold', action='store_true', help='Use an empty path cache for every run')
+    startup_parser.add_argument('--importtime', action='store_true', help='Also list the slowest imports')
+
+    report_parser = subparsers.add_parser('report', help='Per-election span trends and regressions across revisions')
+    report_parser.add_argument('--db', help='Span store (default: $AWT_SPAN_DB or ~/src/awt/local/db/awt-spans.sqlite)')
+    report_parser.add_argument('--id', dest='election', help='Only this election id')
+    report_parser.add_argument('--span', default='total', help="Span name, e.g. IRV or pairwise (default: total); 'all' for every span")
+    report_parser.add_argument('--resulttype', help='Only this resulttype (e.g. all, IRV, wrv)')
+    report_parser.add_argument('--threshold', type=float, default=1.25, help='Median ratio counted as a regression (default: 1.25)')
+    report_parser.add_argument('--min-samples', type=int, default=3, help='Ignore revisions with fewer samples (default: 3)')
+    report_parser.add_argument('--metric', choices=['elapsed', 'mem_peak_bytes', 'mem_net_bytes'], default='elapsed',
+                               help='Value to report; memory needs AWT_PROFILE_MEMORY=1 on the server (default: elapsed)')
+
+    bench_parser = subparsers.add_parser('bench', help='Benchmark catalog elections in-process (cold and warm), write JSON')
+    bench_parser.add_argument('--id', dest='ids', action='append', help='Election id to benchmark (repeatable; default: whole catalog)')
+    bench_parser.add_argument('--resulttype', dest='resulttypes', action='append',
+                              help='Resulttype to request, e.g. all, IRV, pairwise, STAR (repeatable; default: all)')
+    bench_parser.add_argument('--reps', type=int, default=5, help='Repetitions per election and mode (default: 5)')
+    bench_parser.add_argument('--mode', choices=['cold', 'warm', 'both'], default='both', help='Page cache state (default: both)')
+    bench_parser.add_argument('-o', '--output', help="JSON output path; '-' for stdout (default: timing/bench-<b1060time>-<git rev>.json)")
+    bench_parser.add_argument('--verbose', action='store_true', help='Keep awt request logging and prints')
+
+    markup_parser = subparsers.add_parser('markup', help='Compare /id page sizes with inline and compact (class-based) markup')
+    markup_parser.add_argument('--id', dest='ids', action='append', help='Election id to measure (repeatable; default: whole catalog)')
+    markup_parser.add_argument('--resulttype', dest='resulttypes', action='append',
+                               help='Resulttype suffix (repeatable; default: all)')
+    markup_parser.add_argument('-o', '--output', help='Also write the results as JSON')
+
+    search_parser = subparsers.add_parser('search', help='Time catalog search and suggestions on a synthetic catalog')
+    search_parser.add_argument('--entries', type=int, default=20000, help='Synthetic catalog size (default: 20000)')
+    search_parser.add_argument('-q', '--query', dest='queries', action='append',
+                               help='Query to time (repeatable; default: a fixed mix)')
+    search_parser.add_argument('--reps', type=int, default=20, help='Repetitions per query (default: 20)')
+    search_parser.add_argument('-o', '--output', help='Also write the results as JSON')
+
+    compare_parser = subparsers.add_parser('compare', help='Diff two bench JSON files and flag regressions')
+    compare_parser.add_argument('base', help='Baseline bench JSON')
+    compare_parser.add_argument('new', help='New bench JSON')
+    compare_parser.add_argument('--threshold', type=float, default=1.2, help='Median ratio counted as a regression (default: 1.2)')
+    compare_parser.add_argument('--min-delta', type=float, default=0.005, help='Ignore slowdowns smaller than this many seconds (default: 0.005)')
+    compare_parser.add_argument('--spans', action='store_true', help='Also compare per-span medians')
+
+    replay_parser = subparsers.add_parser('replay', help='Replay request-log URLs (weighted by count) against a server')
+    replay_parser.add_argument('--db', help='Request log DB (default: $AWT_REQUEST_LOG_DB or ~/src/awt/local/db/awt-requests.sqlite)')
+    replay_parser.add_argument('--url', help='Base URL of a running server (default: start awt.py locally)')
+    replay_parser.add_argument('--caching', choices=['none', 'simple', 'filesystem'], default='simple',
+                               help='Caching backend for the locally started server (default: simple)')
+    replay_parser.add_argument('-n', '--requests', type=int, default=200, help='Number of requests to send (default: 200)')
+    replay_parser.add_argument('-c', '--concurrency', type=int, default=4, help='Concurrent client threads (default: 4)')
+    replay_parser.add_argument('--rate', type=float, help='Target requests/second across all threads (default: unlimited)')
+    replay_parser.add_argument('--min-count', type=int, default=1, help='Only URLs requested at least this often (default: 1)')
+    replay_parser.add_argument('--since-days', type=float, help='Only URLs seen in the last N days')
+    replay_parser.add_argument('--seed', type=int, help='Random seed for reproducible URL samples')
+    replay_parser.add_argument('--json', dest='json_output', help='Also write the summary as JSON to this path')
+
+    profiles_parser = subparsers.add_parser('profiles', help='List, summarize or request on-demand request profiles')
+    profiles_sub = profiles_parser.add_subparsers(dest='profiles_command', required=True)
+    list_parser = profiles_sub.add_parser('list', help='List stored profiles, newest first')
+    list_parser.add_argument('--id', dest='election', help='Only profiles of this election id')
+    list_parser.add_argument('--limit', type=int, default=20, help='Number of profiles to show (default: 20)')
+    show_parser = profiles_sub.add_parser('show', help='Summarize one profile (top functions by cumulative time)')
+    show_parser.add_argument('profile', help='req_id (see `profiles list`) or .cprof path')
+    sign_parser = profiles_sub.add_parser('sign', help='Print an X-AWT-Profile header value for a path (needs AWT_PROFILE_SECRET)')
+    sign_parser.add_argument('path', help='Request path, e.g. /id/sf2024-mayor')
+    sign_parser.add_argument('--ttl', type=int, default=300, help='Seconds the signature stays valid (default: 300)')
+    for sub in (list_parser, show_parser):
+        sub.add_argument('--dir', help='Profile directory (default: $AWT_PROFILE_DIR or ~/src/awt/local/profiles)')
+
+    synth_parser = subparsers.add_parser('synth', help='Write a synthetic ABIF election')
+    scale_parser = subparsers.add_parser('scale', help='Time the conduit pipeline over a grid of synthetic election sizes')
+    for sub in (synth_parser, scale_parser):
+        sub.add_argument('--type', dest='ballot_type', choices=['ranked', 'rated', 'choose_many'], default='ranked',
+                         help='Ballot type (default: ranked)')
+        sub.add_argument('--depth', type=int, help='Candidates ranked/rated per ballot (default: all)')
+        sub.add_argument('--dup-ratio', type=float, default=0.0, help='Share of ballots repeating an earlier pattern (default: 0.0)')
+        sub.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    synth_parser.add_argument('--ballots', type=int, default=1000, help='Number of ballots (default: 1000)')
+    synth_parser.add_argument('--candidates', type=int, default=5, help='Number of candidates (default: 5)')
+    synth_parser.add_argument('--aggregate', action='store_true', help='One qty:pattern line per distinct ballot')
+    synth_parser.add_argument('-o', '--output', help='Output file (default: stdout)')
+    scale_parser.add_argument('--ballots', default='1000,10000', help='Comma-separated ballot counts (default: 1000,10000)')
+    scale_parser.add_argument('--candidates', default='5,10,20', help='Comma-separated candidate counts (default: 5,10,20)')
+    scale_parser.add_argument('--reps', type=int, default=1, help='Repetitions per grid point (default: 1)')
+    scale_parser.add_argument('-o', '--output', help='Also write the results as JSON')
+    return parser
+
+
+SUBCOMMANDS = ('startup', 'report', 'bench', 'markup', 'search', 'compare', 'replay', 'profiles', 'synth', 'scale')
+
+
+def subcommand_main(argv):
+    args = build_subcommand_parser().parse_args(argv)
+    if args.command == 'startup':
+        run_startup_benchmark(runs=args.runs, module=args.module,
+                              cold=args.cold, importtime=args.importtime)
+    elif args.command == 'report':
+        run_span_report(db_path=args.db, election=args.election,
+                        span=None if args.span == 'all' else args.span,
+                        resulttype=args.resulttype, threshold=args.threshold,
+                        min_samples=args.min_samples, metric=args.metric)
+    elif args.command == 'bench':
+        modes = ('cold', 'warm') if args.mode == 'both' else (args.mode,)
+        run_catalog_benchmark(ids=args.ids, resulttypes=tuple(args.resulttypes or ('all',)),
+                              reps=args.reps, modes=modes, output_path=args.output,
+                              quiet=not args.verbose)
+    elif args.command == 'markup':
+        run_markup_benchmark(ids=args.ids, resulttypes=tuple(args.resulttypes or ('all',)),
+                             output_path=args.output)
+    elif args.command == 'search':
+        run_search_benchmark(entries=args.entries, queries=tuple(args.queries or DEFAULT_SEARCH_QUERIES),
+                             reps=args.reps, output_path=args.output)
+    elif args.command == 'compare':
+        regressions = compare_benchmarks(args.base, args.new, threshold=args.threshold,
+                                         min_delta=args.min_delta, spans=args.spans)
+        return 1 if regressions else 0
+    elif args.command == 'replay':
+        return replay_main(args)
+    elif args.command == 'synth':
+        from src.synth_abif import generate_abif
+        text = generate_abif(args.ballots, args.candidates, depth=args.depth, ballot_type=args.ballot_type,
+                             dup_ratio=args.dup_ratio, seed=args.seed, aggregate=args.aggregate)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text)
+        else:
+            sys.stdout.write(text)
+    elif args.command == 'scale':
+        run_scaling_benchmark(ballot_grid=[int(v) for v in args.ballots.split(',')],
+                              candidate_grid=[int(v) for v in args.candidates.split(',')],
+                              ballot_type=args.ballot_type, depth=args.depth, dup_ratio=args.dup_ratio,
+                              reps=args.reps, seed=args.seed, output_path=args.output)
+    elif args.command == 'profiles':
+        if args.profiles_command == 'list':
+            run_profiles_list(args.dir, election=args.election, limit=args.limit)
+        elif args.profiles_command == 'show':
+            return 0 if run_profiles_show(args.profile, args.dir) else 1
+        elif args.profiles_command == 'sign':
+            from src.request_profiling import PROFILE_HEADER, sign_profile_header
+            print(f"{PROFILE_HEADER}: {sign_profile_header(args.path, ttl=args.ttl)}")
+
+
+def replay_main(args):
+    urls = load_replay_urls(args.db, min_count=args.min_count, since_days=args.since_days)
+    if not urls:
+        print("[replay] No URLs in the request log (run awt.py with the filesystem cache to record some)")
+        return 1
+    proc = None
+    base_url = args.url.rstrip('/') if args.url else None
+    if base_url is None:
+        b1060time = get_b1060_timestamp_from_datetime(datetime.datetime.now(datetime.UTC))
+        os.makedirs(os.path.join(AWT_DIR, 'timing'), exist_ok=True)
+        log_path = os.path.join(AWT_DIR, 'timing', f"replay-{b1060time}-{get_git_rev(AWT_DIR)}.out")
+        proc, port = start_awt_server(log_path, caching=args.caching)
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        summary = run_replay(base_url, urls, total=args.requests, concurrency=args.concurrency,
+                             rate=args.rate, seed=args.seed)
+    finally:
+        if proc is not None:
+            os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
+            proc.wait()
+    if args.json_output:
+        with open(args.json_output, 'w') as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+    return 0
+
+
 def main():
-    parser = argparse.ArgumentParser(description='Profile or analyze AWT performance.')
+    # Subcommands are dispatched separately so that the legacy
+    # `perf_awt.py FILE.cprof` form keeps working.
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        return subcommand_main(sys.argv[1:])
+
+    parser = argparse.ArgumentParser(description='Profile or analyze AWT performance.',
+                                     epilog=f"Subcommands: {', '.join(SUBCOMMANDS)} (see `perf_awt.py <subcommand> --help`)")
     parser.add_argument('cprof_file', nargs='?', help='Analyze an existing .cprof file instead of running a new test.')
     parser.add_argument('--path', help='Endpoint path to test (e.g. /id/sf2024-mayor)')
     parser.add_argument('--id', help='ID to test (sets --path to /id/<id> unless --path is given)')
@@ -224,4 +1074,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Truncated ABIF previews for results pages.
+
+A results page shows the election's ABIF in the abifbox so it can be
+edited and resubmitted.  For large elections that text is most of the
+page (and of every cached variant of it), so /id pages embed only the
+first AWT_ABIF_PREVIEW_CHARS characters (default 32,768; 'none'
+disables truncation), cut at a line boundary.  The full text is served
+by /id/<id>.abif (with ETag and Range support) and loaded into the
+abifbox on demand by static/js/abifwebtool.js.
+
+A form submitted with the preview still in the abifbox carries the
+election id in the `abifpreview_id` field; restore_previewed_abif()
+swaps the full text back in, so resubmitting without JavaScript still
+tallies the whole election.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Optional, Tuple
+
+__all__ = [
+    'DEFAULT_PREVIEW_CHARS',
+    'abif_preview',
+    'preview_limit',
+    'restore_previewed_abif',
+]
+
+DEFAULT_PREVIEW_CHARS = 32_768
+
+
+def preview_limit() -> Optional[int]:
+    """Characters of ABIF embedded in a results page, or None for all."""
+    value = os.environ.get('AWT_ABIF_PREVIEW_CHARS', '')
+    if value.lower() in ('none', 'off', '0'):
+        return None
+    try:
+        return int(value) if value else DEFAULT_PREVIEW_CHARS
+    except ValueError:
+        return DEFAULT_PREVIEW_CHARS
+
+
+def abif_preview(text: str, limit: Optional[int] = None) -> Tuple[str, bool]:
+    """(start of text ending on a whole line, whether it was cut).
+
+    limit defaults to preview_limit().
+    """
+    if limit is None:
+        limit = preview_limit()
+    if limit is None or len(text) <= limit:
+        return text, False
+    cut = text.rfind('\n', 0, limit) + 1
+    return text[:cut or limit], True
+
+
+def _normalized(text: str) -> str:
+    # Browsers submit textarea lines with CRLF and drop one leading newline
+    return text.replace('\r\n', '\n').replace('\r', '\n').strip()
+
+
+def restore_previewed_abif(submitted: str, full_text: Optional[str]) -> str:
+    """full_text if submitted is its unedited preview, else submitted."""
+    if full_text is None:
+        return submitted
+    preview, truncated = abif_preview(full_text)
+    if truncated and _normalized(submitted) == _normalized(preview):
+        return full_text
+    return submitted
@@ -0,0 +1,343 @@
+"""Approval tallies over ballot bitmasks.
+
+abiflib tallies approval ballots one vote line dict at a time, and its
+transforms (ranked ballots to approvals, approvals to ranked ballots)
+deep-copy the whole model before converting every vote line.  Here each
+ballot's approvals are an integer bitmask (bit i set: candidate i of the
+model's candidate list approved), and identical ballots are merged into
+a pattern -> count table in order of first appearance.  Approval counts
+are then a per-candidate bit test over the table, and the transforms map
+table entries to new bitmasks (or rankings) rather than copying ballots.
+
+Results are the same as abiflib's.  The functions return None for the
+odd cases they don't mirror (preferences for undeclared candidates, a
+metadata ballot_type that abiflib would apply to its own converted
+copy), and callers fall back to abiflib.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+__all__ = [
+    'approval_counts',
+    'approval_patterns',
+    'approval_report_from_result',
+    'approval_result_from_masks',
+    'choose_many_to_ranked',
+    'least_approval_first_order',
+]
+
+
+def _approved(prefs) -> bool:
+    # abiflib's rule: rating 1, or rank 1 (ties allowed)
+    return ('rating' in prefs and prefs['rating'] == 1) or ('rank' in prefs and prefs['rank'] == 1)
+
+
+def approval_patterns(jabmod) -> Optional[Tuple[List[str], Dict[int, int]]]:
+    """(candtoks, {bitmask: ballots}) for jabmod's approvals, or None if a
+    ballot approves a candidate that isn't declared."""
+    candtoks = list(jabmod['candidates'].keys())
+    bit = {cand: 1 << index for index, cand in enumerate(candtoks)}
+    patterns: Dict[int, int] = {}
+    for vline in jabmod['votelines']:
+        mask = 0
+        for cand, prefs in vline['prefs'].items():
+            if _approved(prefs):
+                if cand not in bit:
+                    return None
+                mask |= bit[cand]
+        patterns[mask] = patterns.get(mask, 0) + vline['qty']
+    return candtoks, patterns
+
+
+def approval_counts(candtoks: List[str], patterns: Dict[int, int]) -> Dict[str, int]:
+    """{candidate: approvals}, summing each candidate's bit over the table."""
+    return {cand: sum(qty for mask, qty in patterns.items() if mask >> index & 1)
+            for index, cand in enumerate(candtoks)}
+
+
+def _ranking_patterns(jabmod):
+    """{((cand, rank), ...): ballots}, for the ranked preferences of each
+    ballot in preference order, or None for undeclared candidates."""
+    candidates = jabmod['candidates']
+    patterns: Dict[tuple, int] = {}
+    for vline in jabmod['votelines']:
+        key = tuple((cand, prefs['rank']) for cand, prefs in vline['prefs'].items() if 'rank' in prefs)
+        for cand, _rank in key:
+            if cand not in candidates:
+                return None
+        patterns[key] = patterns.get(key, 0) + vline['qty']
+    return patterns
+
+
+def _favorite_viable_half(jabmod, ballot_type):
+    """(patterns, conversion meta) as from abiflib's
+    ranked_to_choose_many_favorite_viable_half(), or None."""
+    rankings = _ranking_patterns(jabmod)
+    if rankings is None:
+        return None
+    candtoks = list(jabmod['candidates'].keys())
+    bit = {cand: 1 << index for index, cand in enumerate(candtoks)}
+
+    # First preferences (FPTP toppicks), from the same table
+    toppicks = {cand: 0 for cand in candtoks}
+    for key, qty in rankings.items():
+        first = [cand for cand, rank in key if rank == 1]
+        if len(first) == 1:
+            toppicks[first[0]] += qty
+    total_valid_votes = sum(toppicks.values())
+    sorted_candidates = sorted(toppicks.items(), key=lambda x: x[1], reverse=True)
+    if not sorted_candidates:
+        return None
+
+    frontrunner_votes = sorted_candidates[0][1]
+    number_of_viable_candidates = 2
+    for seats in range(2, len(sorted_candidates) + 2):
+        if frontrunner_votes > total_valid_votes // seats:
+            number_of_viable_candidates = seats
+            break
+    if number_of_viable_candidates == 2 and frontrunner_votes <= (total_valid_votes // 2):
+        number_of_viable_candidates = min(len(sorted_candidates), 10)
+    viable_candidates = [sorted_candidates[i][0]
+                         for i in range(min(number_of_viable_candidates, len(sorted_candidates)))]
+    viable_candidate_maximum = (len(viable_candidates) + 1) // 2
+    viable = set(viable_candidates)
+
+    patterns: Dict[int, int] = {}
+    for key, qty in rankings.items():
+        ranked_prefs = sorted(key, key=lambda x: x[1])
+        if not ranked_prefs:
+            continue
+        top_rank = ranked_prefs[0][1]
+        if sum(1 for _cand, rank in ranked_prefs if rank == top_rank) > 1:
+            continue  # overvoted at the top rank
+        viable_on_ballot = [cand for cand, _rank in ranked_prefs if cand in viable][:viable_candidate_maximum]
+        if not viable_on_ballot:
+            continue
+        mask = 0
+        for cand, _rank in ranked_prefs:
+            mask |= bit[cand]
+            if cand == viable_on_ballot[-1]:
+                break
+        patterns[mask] = patterns.get(mask, 0) + qty
+
+    meta = {
+        'method': 'favorite_viable_half',
+        'original_ballot_type': ballot_type,
+        'viable_candidates': viable_candidates,
+        'viable_candidate_maximum': viable_candidate_maximum,
+        'total_ballots': sum(vline.get('qty', 0) for vline in jabmod.get('votelines', [])),
+        'candidate_names': jabmod.get('candidates', {}),
+    }
+    return patterns, meta
+
+
+def _all_ranked_approved(jabmod, ballot_type):
+    """(patterns, conversion meta) as from abiflib's
+    ranked_to_choose_many_all_ranked_approved(), or None."""
+    rankings = _ranking_patterns(jabmod)
+    if rankings is None:
+        return None
+    candtoks = list(jabmod['candidates'].keys())
+    bit = {cand: 1 << index for index, cand in enumerate(candtoks)}
+    patterns: Dict[int, int] = {}
+    for key, qty in rankings.items():
+        mask = 0
+        for cand, _rank in key:
+            mask |= bit[cand]
+        patterns[mask] = patterns.get(mask, 0) + qty
+    meta = {
+        'method': 'all_ranked_approved',
+        'original_ballot_type': ballot_type,
+        'total_ballots': sum(v.get('qty', 0) for v in jabmod.get('votelines', [])),
+        'candidate_names': jabmod.get('candidates', {}),
+    }
+    return patterns, meta
+
+
+def _approval_result(jabmod, candtoks, patterns, ballot_type, conversion_meta) -> Dict[str, Any]:
+    # abiflib's _calculate_approval_from_jabmod(), over the pattern table
+    from abiflib.approval_tally import _generate_conversion_notices
+    counts: Dict[Any, int] = approval_counts(candtoks, patterns)
+    total_ballots_processed = jabmod['metadata']['ballotcount']
+    if conversion_meta:
+        ballot_type = conversion_meta.get('original_ballot_type', ballot_type)
+
+    max_approvals = 0
+    winners: List[str] = []
+    for cand, approvals in counts.items():
+        if approvals > max_approvals:
+            max_approvals = approvals
+            winners = [cand]
+        elif approvals == max_approvals:
+            winners.append(cand)
+    total_valid_approvals = sum(counts.values())
+    win_pct = (max_approvals / total_ballots_processed) * 100 if total_ballots_processed > 0 else 0
+    counts[None] = 0
+    return {
+        'approval_counts': counts,
+        'winners': winners,
+        'top_qty': max_approvals,
+        'top_pct': win_pct,
+        'total_approvals': total_valid_approvals,
+        'total_votes': total_ballots_processed,
+        'invalid_ballots': 0,
+        'ballot_type': ballot_type,
+        'notices': _generate_conversion_notices(conversion_meta) if conversion_meta else [],
+    }
+
+
+def approval_result_from_masks(jabmod, all_ranked_approved: bool = False) -> Optional[Dict[str, Any]]:
+    """Same as abiflib's approval_result_from_abifmodel(jabmod), or None.
+
+    With all_ranked_approved, the same as approval_result_from_abifmodel(
+    ranked_to_choose_many_all_ranked_approved(jabmod)), without the copy.
+    """
+    from abiflib.util import find_ballot_type
+    ballot_type = find_ballot_type(jabmod)
+
+    if all_ranked_approved and ballot_type != 'choose_many':
+        if 'ballot_type' in jabmod.get('metadata', {}):
+            # abiflib would read that override again on its converted copy
+            return None
+        converted = _all_ranked_approved(jabmod, ballot_type)
+        if converted is None or not any(converted[0]):
+            return None
+        patterns, meta = converted
+        return _approval_result(jabmod, list(jabmod['candidates'].keys()), patterns, 'choose_many', meta)
+
+    if ballot_type in ('choose_many', 'choose_one'):
+        found = approval_patterns(jabmod)
+        if found is None:
+            return None
+        candtoks, patterns = found
+        result = _approval_result(jabmod, candtoks, patterns, ballot_type, jabmod.get('_conversion_meta', {}))
+        if ballot_type == 'choose_one':
+            result['notices'] = list(result.get('notices', [])) + [{
+                'notice_type': 'note',
+                'short': 'Approvals inferred from choose_one ballots',
+                'long': (
+                    'Approval results are derived by treating each voter\'s single top choice '
+                    'as their only approval. Lower preferences are not available on choose_one ballots.'
+                )
+            }]
+        return result
+
+    converted = _favorite_viable_half(jabmod, ballot_type)
+    if converted is None:
+        return None
+    patterns, meta = converted
+    return _approval_result(jabmod, list(jabmod['candidates'].keys()), patterns, 'choose_many', meta)
+
+
+def approval_report_from_result(result, candidates) -> str:
+    """abiflib's get_approval_report() text, from an approval result."""
+    from abiflib.text_output import format_notices_for_text_output
+
+    def display(cand):
+        full_name = candidates.get(cand, cand)
+        return f"{full_name} ({cand})" if full_name != cand else cand
+
+    ballot_type = result['ballot_type']
+    if ballot_type == 'choose_many':
+        report = "Approval Voting Results (Native Approval/Choose-Many Ballots):\n"
+    else:
+        report = f"Approval Voting Results (Converted from {ballot_type} ballots using favorite_viable_half method):\n"
+        report += "\n"
+    report += "  Approval counts:\n"
+    sorted_candidates = sorted(
+        [(cand, count) for cand, count in result['approval_counts'].items() if cand is not None],
+        key=lambda x: x[1], reverse=True)
+    total_votes = result['total_votes']
+    for cand, count in sorted_candidates:
+        pct = (count / total_votes) * 100 if total_votes > 0 else 0
+        report += f"   * {display(cand)}: {count:,} ({pct:.2f}%)\n"
+    if result['approval_counts'].get(None, 0) > 0:
+        report += f"   * Invalid ballots: {result['approval_counts'][None]:,}\n"
+
+    pctreport = f"{result['top_qty']:,} approvals of " + \
+        f"{result['total_votes']:,} total votes ({result['top_pct']:.2f}%)"
+    if len(result['winners']) == 1:
+        report += f"\n  Winner with {pctreport}:\n"
+        report += f"   * {display(result['winners'][0])}\n"
+    elif len(result['winners']) > 1:
+        report += f"\n  Tied winners each with {pctreport}:\n"
+        for winner in result['winners']:
+            report += f"   * {display(winner)}\n"
+    else:
+        report += "\n  No winner determined\n"
+    if result.get('notices'):
+        report += format_notices_for_text_output(result['notices'])
+    return report
+
+
+def least_approval_first_order(jabmod, patterns=None) -> Optional[List[str]]:
+    """Candidates by ascending approvals, then token: the global order of
+    abiflib's least_approval_first transform for choose_many ballots."""
+    if patterns is None:
+        found = approval_patterns(jabmod)
+        if found is None:
+            return None
+        candtoks, patterns = found
+    else:
+        candtoks = list(jabmod['candidates'].keys())
+    counts = approval_counts(candtoks, patterns)
+    return [tok for tok, _ in sorted(counts.items(), key=lambda x: (x[1], x[0]))]
+
+
+def choose_many_to_ranked(jabmod, aggregate: bool = True) -> Optional[Dict[str, Any]]:
+    """Ranked ballots as from abiflib's choose_many_to_ranked_least_approval_first(),
+    or None.
+
+    Each approval pattern ranks its candidates in the global order, so
+    ballots with the same pattern become the same ranking.  With
+    aggregate (for tallies), there is one vote line per distinct pattern;
+    IRV rounds and pairwise counts match the per-ballot conversion.
+    Without it, there is one vote line per original vote line, as abiflib
+    converts them (for showing the transformed ballots), but vote lines
+    with the same pattern share one prefs dict instead of a deep copy.
+    """
+    from abiflib.util import find_ballot_type
+    ballot_type = find_ballot_type(jabmod)
+    if ballot_type not in ('choose_many', 'choose_one'):
+        return None
+    found = approval_patterns(jabmod)
+    if found is None:
+        return None
+    candtoks, patterns = found
+    order = least_approval_first_order(jabmod, patterns)
+    bit = {cand: 1 << index for index, cand in enumerate(candtoks)}
+    rankings = {}
+    for mask in patterns:
+        ordered = [tok for tok in order if mask & bit[tok]]
+        rankings[mask] = ({tok: {'rank': i} for i, tok in enumerate(ordered, start=1)}, '>'.join(ordered))
+
+    def voteline(mask, qty):
+        prefs, prefstr = rankings[mask]
+        vline = {'qty': qty, 'prefs': prefs}
+        if prefstr:
+            vline['prefstr'] = prefstr
+        return vline
+
+    if aggregate:
+        votelines = [voteline(mask, qty) for mask, qty in patterns.items()]
+    else:
+        votelines = []
+        for vline in jabmod['votelines']:
+            mask = 0
+            for cand, prefs in vline['prefs'].items():
+                if _approved(prefs):
+                    mask |= bit[cand]
+            votelines.append(voteline(mask, vline.get('qty', 0)))
+    ranked = dict(jabmod)
+    ranked['votelines'] = votelines
+    ranked['_conversion_meta'] = {
+        'method': 'least_approval_first',
+        'original_ballot_type': ballot_type,
+        'parameters': {
+            'basis': 'ascending_total_approvals',
+            'tie_breaker': 'token',
+        }
+    }
+    return ranked
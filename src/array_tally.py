@@ -0,0 +1,766 @@
+"""Array-based tallies for large elections (optional NumPy engine).
+
+abiflib tallies a pairwise matrix with nested Python loops over vote
+lines and candidate pairs.  Here the vote lines are first turned into a
+rank array (one row per vote line, one column per candidate, unranked
+candidates at UNRANKED) and a vector of vote line quantities; the matrix
+is then a weighted sum of "row ranks a above b" comparisons, done in
+batched array operations.  The per-matchup counts and percentages shown
+in the pairwise table (paircells) come from the same arrays.
+
+IRV uses the same rank array.  Each ballot keeps a pointer to its
+current choice; a round is a weighted bincount of the pointers, and only
+ballots whose choice was eliminated have their pointer moved on.  The
+round metadata (transfers, next choices, ties) is built as abiflib
+builds it, so IRV_dict is the same.
+
+Score and STAR totals are weighted sums over a ratings array.  For
+ranked ballots without ratings, the Borda-like ratings abiflib would add
+to a copy of every vote line are derived from the rank array instead.
+The runoff between the top two compares their two rank columns.  The
+text report, scaled scores and HTML are then formatted from that one
+STAR result rather than each re-tallying the ballots.
+
+NumPy is optional (`pip install awt[fast]`).  Without it, or with
+AWT_ARRAY_TALLY=off, the functions here return None and callers tally
+with abiflib as before.  Results are identical to abiflib's.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+__all__ = [
+    'IRV_dict_from_arrays',
+    'IRV_result_from_arrays',
+    'STAR_report_from_result',
+    'STAR_result_from_arrays',
+    'UNRANKED',
+    'array_tally_enabled',
+    'html_score_and_star_from_result',
+    'pairwise_count_dict',
+    'pairwise_paircells',
+    'pairwise_result_from_arrays',
+    'rank_array',
+    'scaled_scores_from_result',
+]
+
+# Rank of a candidate missing from a ballot (abiflib uses sys.maxsize too)
+UNRANKED = sys.maxsize
+
+# Comparisons (vote lines x candidates x candidates) per batch, to bound
+# the memory of the temporary arrays
+PAIRWISE_BATCH_CELLS = 4_000_000
+
+np = None
+_NUMPY_RESOLVED = False
+
+
+def _numpy():
+    """Return the numpy module, or None if it isn't installed."""
+    global np, _NUMPY_RESOLVED
+    if not _NUMPY_RESOLVED:
+        _NUMPY_RESOLVED = True
+        try:
+            import numpy as _numpy_mod  # type: ignore
+        except ImportError:
+            _numpy_mod = None
+        np = _numpy_mod
+    return np
+
+
+def array_tally_enabled() -> bool:
+    """True if NumPy is available and AWT_ARRAY_TALLY isn't 'off'."""
+    if os.environ.get('AWT_ARRAY_TALLY', '').lower() in ('off', 'none', '0', 'python'):
+        return False
+    return _numpy() is not None
+
+
+def rank_array(jabmod, candtoks: Optional[List[str]] = None) -> Tuple[Any, Any]:
+    """(ranks, qty) arrays for jabmod's vote lines.
+
+    ranks[v, c] is the rank vote line v gives candtoks[c] (UNRANKED if
+    none); qty[v] is the vote line's quantity.
+    """
+    numpy = _numpy()
+    if candtoks is None:
+        candtoks = list(jabmod['candidates'].keys())
+    column = {cand: index for index, cand in enumerate(candtoks)}
+    votelines = jabmod['votelines']
+    ranks = numpy.full((len(votelines), len(candtoks)), UNRANKED, dtype=numpy.int64)
+    qty = numpy.fromiter((vline['qty'] for vline in votelines), dtype=numpy.int64, count=len(votelines))
+    for row, vline in enumerate(votelines):
+        for cand, prefs in vline['prefs'].items():
+            rank = prefs.get('rank')
+            if rank is not None and cand in column:
+                ranks[row, column[cand]] = rank
+    return ranks, qty
+
+
+def _pairwise_array(ranks, qty):
+    numpy = _numpy()
+    votes, ncands = ranks.shape
+    matrix = numpy.zeros((ncands, ncands), dtype=numpy.int64)
+    batch = max(1, PAIRWISE_BATCH_CELLS // max(1, ncands * ncands))
+    for start in range(0, votes, batch):
+        block = ranks[start:start + batch]
+        # prefers[v, a, b]: vote line v ranks a above b
+        prefers = block[:, :, None] < block[:, None, :]
+        matrix += numpy.tensordot(qty[start:start + batch], prefers, axes=1)
+    return matrix
+
+
+def _matrix_dict(candtoks, matrix) -> Dict[str, Dict[str, Optional[int]]]:
+    rows = matrix.tolist()
+    return {atok: {btok: (None if a == b else rows[a][b]) for b, btok in enumerate(candtoks)}
+            for a, atok in enumerate(candtoks)}
+
+
+def pairwise_count_dict(jabmod) -> Optional[Dict[str, Dict[str, Optional[int]]]]:
+    """Same as abiflib.pairwise_count_dict(jabmod), or None without NumPy."""
+    if not array_tally_enabled():
+        return None
+    candtoks = list(jabmod['candidates'].keys())
+    ranks, qty = rank_array(jabmod, candtoks)
+    return _matrix_dict(candtoks, _pairwise_array(ranks, qty))
+
+
+def pairwise_paircells(candtoks, matrix, total_ballots: int) -> Dict[str, Dict[str, Any]]:
+    """Per-matchup counts and percentages for the pairwise table.
+
+    Same values as the loop in ResultConduit.update_pairwise_result():
+    cell [rk][ck] holds both directions of the matchup and the ballots
+    that rank neither above the other.
+    """
+    numpy = _numpy()
+    wins = numpy.asarray(matrix, dtype=numpy.int64)
+    no_pref = numpy.maximum(total_ballots - (wins + wins.T), 0)
+    if total_ballots > 0:
+        pct = (wins / total_ballots) * 100.0
+        no_pref_pct = (no_pref / total_ballots) * 100.0
+    else:
+        no_pref = numpy.zeros_like(wins)
+        pct = no_pref_pct = numpy.zeros(wins.shape)
+    wins_l, no_pref_l = wins.tolist(), no_pref.tolist()
+    pct_l, no_pref_pct_l = pct.tolist(), no_pref_pct.tolist()
+    paircells = {}
+    for r, rk in enumerate(candtoks):
+        paircells[rk] = {}
+        for c, ck in enumerate(candtoks):
+            if r == c:
+                paircells[rk][ck] = None
+                continue
+            paircells[rk][ck] = {
+                'ck_score': wins_l[c][r],
+                'rk_score': wins_l[r][c],
+                'no_pref': no_pref_l[r][c],
+                'ck_pct': pct_l[c][r],
+                'rk_pct': pct_l[r][c],
+                'no_pref_pct': no_pref_pct_l[r][c],
+            }
+    return paircells
+
+
+def pairwise_result_from_arrays(jabmod, transform_ballots: bool = False) -> Optional[Dict[str, Any]]:
+    """pairwise_result_from_abifmodel() from the array engine, plus paircells.
+
+    None without NumPy.  Choose_many ballots with transform_ballots are
+    ranked by approval pattern first (src.approval_bits), as abiflib
+    ranks each ballot.
+    """
+    if not array_tally_enabled():
+        return None
+    from abiflib.util import find_ballot_type
+    from src.approval_bits import choose_many_to_ranked
+    from src.incremental_tally import pairwise_result_from_matrix
+    try:
+        ballot_type = find_ballot_type(jabmod)
+    except Exception:
+        ballot_type = None
+    model = jabmod
+    transformed = transform_ballots and ballot_type == 'choose_many'
+    if transformed:
+        model = choose_many_to_ranked(jabmod)
+        if model is None:
+            return None
+    candtoks = list(model['candidates'].keys())
+    ranks, qty = rank_array(model, candtoks)
+    matrix = _pairwise_array(ranks, qty)
+    try:
+        total_ballots = int(jabmod.get('metadata', {}).get('ballotcount', 0) or 0)
+    except Exception:
+        total_ballots = 0
+    result = pairwise_result_from_matrix(model, _matrix_dict(candtoks, matrix),
+                                         None if transformed else ballot_type)
+    if transformed:
+        result['notices'].insert(0, {
+            "notice_type": "note",
+            "short": "Ranked ballots inferred from choose-many ballots and approval results",
+            "long": 'Condorcet/Copeland was not used in this election. The ranked ballots shown here were inferred from choose-many ballots using approval results to create a deterministic global order within each voter\'s approved set. These results are hypothetical and provided for what-if analysis.'
+        })
+    result['paircells'] = pairwise_paircells(candtoks, matrix, total_ballots)
+    return result
+
+
+# --- IRV ---------------------------------------------------------------------
+
+def _irv_rank_array(jabmod, candtoks):
+    # abiflib's IRV needs a declared candidate and a rank on every
+    # preference; anything else is left to abiflib
+    known = set(candtoks)
+    for vline in jabmod['votelines']:
+        for cand, prefs in vline['prefs'].items():
+            if cand not in known or prefs.get('rank') is None:
+                return None, None
+    return rank_array(jabmod, candtoks)
+
+
+def _top_choices(block):
+    """(top column or -1, overvoted) for each row of a masked rank block."""
+    numpy = _numpy()
+    minrank = block.min(axis=1)
+    at_min = (block == minrank[:, None]).sum(axis=1)
+    exhausted = minrank == UNRANKED
+    top = numpy.where(exhausted, -1, block.argmin(axis=1))
+    return top, ~exhausted & (at_min > 1)
+
+
+def _next_choices(block):
+    """Column of each row's next choice, skipping tied ranks, or -1.
+
+    Like abiflib's _get_valid_topcand_qty(): candidates tied at the
+    lowest rank are dropped until one rank has a single candidate, so the
+    answer is the lowest rank that occurs exactly once in the row.
+    """
+    numpy = _numpy()
+    rows, ncands = block.shape
+    choices = numpy.full(rows, -1, dtype=numpy.int64)
+    batch = max(1, PAIRWISE_BATCH_CELLS // max(1, ncands * ncands))
+    for start in range(0, rows, batch):
+        part = block[start:start + batch]
+        occurs = (part[:, :, None] == part[:, None, :]).sum(axis=2)
+        single = numpy.where((occurs == 1) & (part != UNRANKED), part, UNRANKED)
+        found = single.min(axis=1) != UNRANKED
+        choices[start:start + batch] = numpy.where(found, single.argmin(axis=1), -1)
+    return choices
+
+
+def _tally_in_order(keys, qty, names) -> Dict[str, int]:
+    """{name: total qty} in order of first occurrence; key -1 is 'exhausted'."""
+    numpy = _numpy()
+    tally: Dict[str, int] = {}
+    if not len(keys):
+        return tally
+    values, first = numpy.unique(keys, return_index=True)
+    sums = numpy.bincount(keys + 1, weights=qty, minlength=len(names) + 1)
+    for key in values[numpy.argsort(first, kind='stable')].tolist():
+        tally[names[key] if key >= 0 else 'exhausted'] = int(sums[key + 1])
+    return tally
+
+
+def _masked(ranks, rows, removed):
+    block = ranks[rows]
+    block[:, removed] = UNRANKED
+    return block
+
+
+def _irv_count_arrays(candlist, ranks, qty, column, canddict=None):
+    """abiflib's _irv_count_internal() over rank arrays.
+
+    The round structure (dict construction order, set arithmetic and the
+    random tiebreak) follows abiflib line for line, so the result is the
+    same IRV_dict; only the per-ballot work is done on arrays.  Each
+    ballot keeps a pointer to its current choice, which is only
+    recomputed when that choice is eliminated.
+    """
+    import random
+    numpy = _numpy()
+    names = list(column)
+    removed = numpy.zeros(len(names), dtype=bool)
+    active = numpy.ones(len(qty), dtype=bool)
+    top = numpy.full(len(qty), -1, dtype=numpy.int64)
+    stale = numpy.ones(len(qty), dtype=bool)
+    rounds, roundmeta = [], []
+    roundnum = 1
+
+    while True:
+        roundcount = {cand: 0 for cand in candlist}
+        mymeta = {}
+        mymeta['roundnum'] = roundnum
+        mymeta['startingqty'] = int(qty[active].sum())
+        mymeta['exhaustedqty'] = 0
+        mymeta['overvoteqty'] = 0
+        mymeta['ballotcount'] = 0
+
+        # Ballots whose choice was eliminated move to their next choice;
+        # ties at the top of what is left make them overvotes
+        rows = numpy.flatnonzero(active & stale)
+        new_top, overvoted = _top_choices(_masked(ranks, rows, removed))
+        top[rows] = new_top
+        active[rows[overvoted]] = False
+        stale[:] = False
+        mymeta['overvoteqty'] += int(qty[rows[overvoted]].sum())
+
+        counted = active & (top >= 0)
+        sums = numpy.bincount(top[counted], weights=qty[counted], minlength=len(names))
+        for cand in candlist:
+            roundcount[cand] = int(sums[column[cand]])
+        mymeta['exhaustedqty'] += int(qty[active & (top < 0)].sum())
+        total_votes = sum(roundcount.values())
+        mymeta['countedqty'] = total_votes
+
+        if len(roundcount.values()) > 0:
+            min_votes = mymeta['bottom_votes_percand'] = min(roundcount.values())
+            max_votes = mymeta['leading_votes_percand'] = max(roundcount.values())
+        else:
+            min_votes = mymeta['bottom_votes_percand'] = 0
+            max_votes = mymeta['leading_votes_percand'] = 0
+        if min_votes == max_votes:
+            mymeta['penultimate_votes_percand'] = penultvotesper = max_votes
+        else:
+            mymeta['penultimate_votes_percand'] = penultvotesper = \
+                min(votes for cand, votes in roundcount.items() if votes > min_votes)
+        mymeta['starting_cands'] = candlist
+        if len(roundcount.values()) > 0:
+            mymeta['top_voteqty'] = min(roundcount.values())
+            mymeta['bottom_voteqty'] = max(roundcount.values())
+        else:
+            mymeta['top_voteqty'] = 0
+            mymeta['bottom_voteqty'] = 0
+
+        rounds.append(roundcount)
+        roundmeta.append(mymeta)
+        bottomcands = [c for c, v in roundcount.items() if v <= min_votes]
+        bottomvotestot = sum(roundcount[c] for c in bottomcands)
+
+        if len(bottomcands) > 1:
+            roundmeta[-1]['bottomtie'] = bottomcands
+            roundmeta[-1]['tiecandlist'] = bottomcands
+            if bottomvotestot <= penultvotesper:
+                roundmeta[-1]['batch_elim'] = True
+                roundmeta[-1]['eliminated'] = bottomcands
+                unluckycand = None
+                nextcands = list(set(candlist) - set(bottomcands))
+                eliminated_now = bottomcands
+            else:
+                roundmeta[-1]['random_elim'] = True
+                unluckycand = random.choice(bottomcands)
+                roundmeta[-1]['eliminated'] = [unluckycand]
+                nextcands = list(set(candlist) - set([unluckycand]))
+                eliminated_now = [unluckycand]
+            thisroundloserlist = [unluckycand]
+        else:
+            roundmeta[-1]['eliminated'] = bottomcands
+            nextcands = list(set(candlist) - set(bottomcands))
+            eliminated_now = bottomcands
+            thisroundloserlist = bottomcands
+        if "all_eliminated" not in roundmeta[-1]:
+            roundmeta[-1]['all_eliminated'] = set()
+        if len(roundmeta) > 1:
+            roundmeta[-1]['all_eliminated'].update(roundmeta[-2]['all_eliminated'])
+        if (len(roundmeta) > 1):
+            for cand in roundmeta[-1]['eliminated']:
+                roundmeta[-1]['all_eliminated'].add(cand)
+        if thisroundloserlist != [None]:
+            roundmeta[-1]['all_eliminated'].update(thisroundloserlist)
+
+        def next_choice_tally(cand):
+            # Where cand's ballots go if cand alone is dropped from them
+            rows = numpy.flatnonzero(counted & (top == column[cand]))
+            if not len(rows):
+                return None
+            dropped = removed.copy()
+            dropped[column[cand]] = True
+            return _tally_in_order(_next_choices(_masked(ranks, rows, dropped)), qty[rows], names)
+
+        transfers = {}
+        for elim_cand in bottomcands:
+            transfers[elim_cand] = next_choice_tally(elim_cand) or {}
+        roundmeta[-1]['transfers'] = transfers
+
+        if canddict:
+            bottom_cols = [column[c] for c in bottomcands]
+            elim_rows = numpy.flatnonzero(counted & numpy.isin(top, bottom_cols))
+            if len(elim_rows):
+                next_cand_dict = {c: canddict[c] for c in nextcands if c in canddict}
+                cols = [column[c] for c in next_cand_dict]
+                roundmeta[-1]['elimcand_supporter_pairwise_results'] = _matrix_dict(
+                    list(next_cand_dict), _pairwise_array(ranks[numpy.ix_(elim_rows, cols)], qty[elim_rows]))
+            else:
+                roundmeta[-1]['elimcand_supporter_pairwise_results'] = {}
+            next_choices = {}
+            for remaining_cand in candlist:
+                if remaining_cand not in bottomcands:
+                    tally = next_choice_tally(remaining_cand)
+                    if tally is not None:
+                        next_choices[remaining_cand] = tally
+            roundmeta[-1]['next_choices'] = next_choices
+
+        if min_votes == max_votes or max_votes > total_votes / 2:
+            winner = [c for c, v in roundcount.items() if v == max_votes]
+            roundmeta[-1]['winner'] = winner
+            roundmeta[-1]['eliminated'] = set(mymeta['starting_cands']) - set(winner)
+            return winner, rounds, roundmeta
+
+        eliminated_cols = [column[c] for c in eliminated_now]
+        removed[eliminated_cols] = True
+        stale = active & numpy.isin(top, eliminated_cols)
+        candlist = nextcands
+        roundnum += 1
+
+
+def IRV_dict_from_arrays(jabmod, include_irv_extra: bool = False) -> Optional[Dict[str, Any]]:
+    """Same as abiflib's IRV_dict_from_jabmod(), or None without NumPy
+    (or for ballots abiflib's IRV can't take as they are)."""
+    if not array_tally_enabled() or not jabmod.get('candidates'):
+        return None
+    retval = {}
+    canddict = retval['canddict'] = jabmod['candidates']
+    candlist = list(jabmod['candidates'].keys())
+    ranks, qty = _irv_rank_array(jabmod, candlist)
+    if ranks is None:
+        return None
+    column = {cand: index for index, cand in enumerate(candlist)}
+    canddict_arg = canddict if include_irv_extra else None
+    (retval['winner'], retval['rounds'], retval['roundmeta']) = \
+        _irv_count_arrays(candlist, ranks, qty, column, canddict=canddict_arg)
+
+    for idx, round_dict in enumerate(retval['rounds']):
+        sorted_items = sorted(round_dict.items(), key=lambda item: item[1], reverse=True)
+        retval['rounds'][idx] = {k: v for k, v in sorted_items}
+
+    winner = retval['winner']
+    if len(winner) > 1:
+        winnerstr = " and ".join(canddict[w] for w in sorted(winner))
+    elif len(winner) == 1:
+        winnerstr = canddict[winner[0]]
+    else:
+        winnerstr = None
+    retval['winnerstr'] = winnerstr
+    retval['has_tie'] = any("bottomtie" in rm for rm in retval.get("roundmeta", []))
+    return retval
+
+
+def IRV_result_from_arrays(jabmod, transform_ballots: bool = False,
+                           include_irv_extra: bool = False) -> Optional[Dict[str, Any]]:
+    """Same as abiflib's IRV_result_from_abifmodel(), with the rounds
+    counted by IRV_dict_from_arrays(); None if that returns None."""
+    from abiflib.util import find_ballot_type
+    if not array_tally_enabled():
+        return None
+    try:
+        ballot_type = find_ballot_type(jabmod)
+    except Exception:
+        ballot_type = None
+    transformed = False
+    if transform_ballots and ballot_type == 'choose_many':
+        from abiflib.transform_core import choose_many_to_ranked_least_approval_first
+        from src.approval_bits import choose_many_to_ranked
+        jabmod = choose_many_to_ranked(jabmod) or choose_many_to_ranked_least_approval_first(jabmod)
+        transformed = True
+
+    irv_dict = IRV_dict_from_arrays(jabmod, include_irv_extra=include_irv_extra)
+    if irv_dict is None:
+        return None
+
+    # Notices and summary fields as in IRV_result_from_abifmodel()
+    if transformed and ballot_type == 'choose_many':
+        notices = list(irv_dict.get('notices', []))
+        notices.append({
+            'notice_type': 'note',
+            'short': 'Ranked ballots inferred from choose-many ballots and approval results',
+            'long': (
+                'IRV/RCV was not used in this election. The ranked ballots shown here were inferred '
+                'from choose-many ballots using approval results to create a deterministic global order '
+                'within each voter’s approved set. These results are hypothetical and provided for what-if analysis.'
+            )
+        })
+        irv_dict['notices'] = notices
+    elif (not transformed) and ballot_type == 'choose_many':
+        notices = list(irv_dict.get('notices', []))
+        total_overvotes = sum(rm.get('overvoteqty', 0) for rm in irv_dict.get('roundmeta', []) if isinstance(rm, dict))
+        startingqty = (irv_dict.get('roundmeta') or [{}])[0].get('startingqty', 0)
+        short = 'IRV/RCV run on choose-many ballots; many overvotes discarded'
+        long = (
+            'These ballots are choose-many (approval-style), where voters may select multiple candidates at once. '
+            'Under IRV/RCV, a ballot must indicate a single top-ranked candidate in each round. '
+            'Ballots with multiple candidates at the top are treated as overvotes and are discarded for that round. '
+            f'This can lead to a large number of overvotes (observed total: {total_overvotes:,} of {startingqty:,} starting votes across rounds). '
+            'Enable “Transform ballots” to infer ranked ballots prior to IRV/RCV if you want a what‑if ranked analysis.'
+        )
+        notices.append({'notice_type': 'note', 'short': short, 'long': long})
+        irv_dict['notices'] = notices
+    elif ballot_type == 'choose_one':
+        notices = list(irv_dict.get('notices', []))
+        notices.append({
+            'notice_type': 'note',
+            'short': 'IRV/RCV applied to choose_one ballots (no transfers)',
+            'long': (
+                'These ballots indicate only a single top choice per voter. '
+                'IRV/RCV on choose_one ballots cannot transfer votes or use lower preferences, '
+                'so the result is equivalent to plurality on first choices.'
+            )
+        })
+        irv_dict['notices'] = notices
+
+    result = {}
+    result['irv_dict'] = irv_dict
+    result['winner'] = irv_dict['winner']
+    result['winner_name'] = irv_dict['winnerstr']
+    if irv_dict['rounds'] and irv_dict['roundmeta']:
+        final_candidates = sorted(irv_dict['rounds'][-1].items(), key=lambda x: x[1], reverse=True)
+        final_meta = irv_dict['roundmeta'][-1]
+        result['final_round_candidates'] = final_candidates
+        result['winner_votes'] = final_candidates[0][1] if final_candidates else 0
+        result['runner_up'] = final_candidates[1][0] if len(final_candidates) > 1 else None
+        result['runner_up_votes'] = final_candidates[1][1] if len(final_candidates) > 1 else 0
+
+        total_ballots = irv_dict['roundmeta'][0]['startingqty']
+        result['total_ballots'] = total_ballots
+        result['final_round_counted'] = final_meta['countedqty']
+        result['final_round_exhausted'] = total_ballots - final_meta['countedqty']
+        result['majority_threshold'] = total_ballots // 2 + 1
+        result['num_rounds'] = len(irv_dict['rounds'])
+        if total_ballots > 0:
+            result['winner_percentage'] = (result['winner_votes'] / total_ballots) * 100
+            result['runner_up_percentage'] = (result['runner_up_votes'] / total_ballots) * 100 if result['runner_up_votes'] else 0
+            result['final_round_counted_percentage'] = (result['final_round_counted'] / total_ballots) * 100
+            result['final_round_exhausted_percentage'] = (result['final_round_exhausted'] / total_ballots) * 100
+            result['majority_threshold_percentage'] = (result['majority_threshold'] / total_ballots) * 100
+        else:
+            result['winner_percentage'] = 0
+            result['runner_up_percentage'] = 0
+            result['final_round_counted_percentage'] = 0
+            result['final_round_exhausted_percentage'] = 0
+            result['majority_threshold_percentage'] = 0
+    return result
+
+
+# --- Score and STAR ----------------------------------------------------------
+
+def _star_arrays(jabmod, candtoks):
+    """(ranks, ratings, qty) with ratings as add_ratings_to_jabmod_votelines()
+    would give them, or None where that can't be matched without the copy.
+
+    Ballots with no ratings anywhere get Borda-like ratings (candidates
+    minus rank), which are derived from the rank array directly instead
+    of from a rated copy of every vote line.
+    """
+    numpy = _numpy()
+    metadata = jabmod.get('metadata')
+    votelines = jabmod['votelines']
+    if not isinstance(metadata, dict):
+        return None
+    if 'ballot_type' not in metadata:
+        # find_ballot_type() reads prefstr when there is one; without it
+        # the added ratings would change what it detects
+        for vline in votelines:
+            if vline['prefs'] and not vline.get('prefstr', '').strip():
+                return None
+    has_rating = any('rating' in prefs for vline in votelines for prefs in vline['prefs'].values())
+    ranks, qty = rank_array(jabmod, candtoks)
+    if has_rating:
+        column = {cand: index for index, cand in enumerate(candtoks)}
+        ratings = numpy.zeros(ranks.shape, dtype=numpy.int64)
+        for row, vline in enumerate(votelines):
+            for cand, prefs in vline['prefs'].items():
+                rating = prefs.get('rating')
+                if rating and cand in column:
+                    ratings[row, column[cand]] = int(rating)
+        return ranks, ratings, qty
+    if any(prefs.get('rank') is None for vline in votelines for prefs in vline['prefs'].values()):
+        return None
+    numcands = len(jabmod['candidates'])
+    borda = 1 if numcands == 1 else numcands - ranks
+    ratings = numpy.where(ranks == UNRANKED, 0, borda)
+    if any(vline['prefs'] for vline in votelines):
+        # add_ratings_to_jabmod_votelines() flags this on the shared metadata
+        metadata['is_ranking_to_rating'] = True
+    return ranks, ratings, qty
+
+
+def STAR_result_from_arrays(jabmod) -> Optional[Dict[str, Any]]:
+    """Same as abiflib's STAR_result_from_abifmodel() on the rated copy
+    of jabmod, or None without NumPy.
+
+    jabmod may be the plain model or the rated copy; scores, voter counts
+    and the runoff between the top two come from one set of arrays.
+    """
+    from abiflib.util import find_ballot_type
+    if not array_tally_enabled():
+        return None
+    numpy = _numpy()
+    candidates = jabmod['candidates']
+    candtoks = list(candidates.keys())
+    arrays = _star_arrays(jabmod, candtoks)
+    if arrays is None:
+        return None
+    ranks, ratings, qty = arrays
+    score_l = numpy.tensordot(qty, ratings, axes=1).tolist()
+    voters_l = numpy.tensordot(qty, (ratings > 0).astype(numpy.int64), axes=1).tolist()
+
+    newscores = {cand: {'candname': candidates[cand], 'score': score_l[i], 'votercount': voters_l[i]}
+                 for i, cand in enumerate(candtoks)}
+    ranklist = sorted(candtoks, key=lambda cand: newscores[cand]['score'], reverse=True)
+    retval = {'scores': newscores}
+    rank = 0
+    prev_score = None
+    for cand in ranklist:
+        tscore = newscores[cand]['score']
+        if prev_score is None:
+            prev_score = tscore
+        elif prev_score > tscore:
+            rank += 1
+            prev_score = tscore
+        newscores[cand]['rank'] = rank
+    retval['ranklist'] = ranklist
+    retval['total_all_scores'] = sum(score_l)
+    retval['totalvoters'] = bc = jabmod['metadata']['ballotcount']
+    retval['round1winners'] = ranklist[0:2]
+
+    # Notices as in STAR_result_from_abifmodel()
+    candcount = len(candidates)
+    bt = find_ballot_type(jabmod)
+    if jabmod['metadata'].get('is_ranking_to_rating') and bt == 'ranked':
+        retval['notices'] = [{
+            "notice_type": "note",
+            "short": ("STAR ratings estimated from ranked ballots "
+                      "using Borda scoring method"),
+            "long": ("The ranked ballots have been converted to STAR ratings "
+                     "using Borda scoring: each candidate receives points "
+                     "equal to (number_of_candidates - their_rank). In this "
+                     f"election, we have {candcount} candidates, so the 1st "
+                     f"choice gets {candcount - 1} points, the 2nd choice "
+                     f"gets {candcount - 2} points, etc. These Borda scores "
+                     "are then used as STAR ratings for tabulation by STAR.")
+        }]
+    elif bt == 'choose_one':
+        retval['notices'] = list(retval.get('notices', [])) + [{
+            "notice_type": "note",
+            "short": "STAR interpretation from choose_one ballots",
+            "long": (
+                "Choose_one ballots provide only each voter\'s top choice and no ratings. "
+                "STAR results shown here are computed without true ratings and should be interpreted cautiously."
+            )
+        }]
+
+    if len(ranklist) == 0:
+        retval['fin1'] = retval['fin2'] = retval['fin1n'] = retval['fin2n'] = None
+        retval['fin1votes'] = 0
+        retval['fin2votes'] = 0
+        retval['final_abstentions'] = bc
+        retval['winner'] = None
+        retval['winner_names'] = []
+        retval['winner_tokens'] = []
+    elif len(ranklist) == 1:
+        fin1 = retval['fin1'] = ranklist[0]
+        retval['fin2'] = None
+        fin1n = retval['fin1n'] = newscores[fin1]['candname']
+        retval['fin2n'] = None
+        fin1votes = newscores[fin1]['votercount']
+        retval['fin1votes'] = fin1votes
+        retval['fin2votes'] = 0
+        retval['final_abstentions'] = bc - fin1votes
+        retval['winner'] = fin1n
+        retval['winner_names'] = [fin1n]
+        retval['winner_tokens'] = [fin1]
+    else:
+        # Automatic runoff: ballots ranking one finalist above the other
+        fin1 = retval['fin1'] = ranklist[0]
+        fin2 = retval['fin2'] = ranklist[1]
+        fin1n = retval['fin1n'] = newscores[fin1]['candname']
+        fin2n = retval['fin2n'] = newscores[fin2]['candname']
+        arank = ranks[:, candtoks.index(fin1)]
+        brank = ranks[:, candtoks.index(fin2)]
+        f1v = retval['fin1votes'] = int(qty[arank < brank].sum())
+        f2v = retval['fin2votes'] = int(qty[brank < arank].sum())
+        retval['final_abstentions'] = bc - f1v - f2v
+        if f1v > f2v:
+            retval['winner'] = fin1n
+            retval['winner_names'] = [fin1n]
+            retval['winner_tokens'] = [fin1]
+        elif f2v > f1v:
+            retval['winner'] = fin2n
+            retval['winner_names'] = [fin2n]
+            retval['winner_tokens'] = [fin2]
+        else:
+            retval['winner'] = f"tie {fin1n} and {fin2n}"
+            retval['winner_names'] = [fin1n, fin2n]
+            retval['winner_tokens'] = [fin1, fin2]
+
+    tvot = retval.get('totalvoters', 0)
+    total_stars = retval.get('total_all_scores', 0)
+    for candtok in ranklist:
+        candinfo = newscores[candtok]
+        candinfo['score_pct_str'] = f"{candinfo['score']/total_stars:.1%}" if total_stars else "0.0%"
+        candinfo['voter_pct_str'] = f"{candinfo['votercount']/tvot:.1%}" if tvot else "0.0%"
+    retval['fin1votes_pct_str'] = f"{retval.get('fin1votes', 0)/tvot:.1%}" if tvot else "0.0%"
+    retval['fin2votes_pct_str'] = f"{retval.get('fin2votes', 0)/tvot:.1%}" if tvot else "0.0%"
+    retval['final_abstentions_pct_str'] = f"{retval['final_abstentions']/tvot:.1%}" if tvot else "0.0%"
+    return retval
+
+
+def scaled_scores_from_result(jabmod, star_result, target_scale: int = 100) -> Dict[str, Any]:
+    """abiflib's scaled_scores(), from a STAR result already tallied."""
+    retval = {}
+    retval['max_rating'] = jabmod['metadata'].get('max_rating')
+    retval['total_all_scores'] = star_result['total_all_scores']
+    try:
+        scale = target_scale / retval['total_all_scores']
+    except ZeroDivisionError:
+        scale = 0
+    retval['scale_factor'] = scale
+    scaled_total = 0
+    retval['canddict'] = {}
+    for candtoken, candname in jabmod['candidates'].items():
+        candscore = star_result['scores'][candtoken]['score']
+        scaled_score = candscore * scale
+        retval['canddict'][candtoken] = {
+            'candname': candname,
+            'scaled_score': scaled_score,
+            'score': candscore
+        }
+        scaled_total += scaled_score
+    retval['scaled_total'] = scaled_total
+    return retval
+
+
+def STAR_report_from_result(star_result) -> str:
+    """abiflib's STAR_report() text, from a STAR result already tallied."""
+    from abiflib.text_output import format_notices_for_text_output
+    sr = star_result
+    tvot = sr['totalvoters']
+    retval = f"Total voters: {tvot:,}\n"
+    retval += "Scores:\n"
+    for candtok in sr['ranklist']:
+        candinfo = sr['scores'][candtok]
+        retval += f"- {candinfo['score']:,} stars ({candinfo['score_pct_str']})"
+        retval += f" from {candinfo['votercount']:,} voters ({candinfo['voter_pct_str']})"
+        retval += f" -- {candinfo['candname']}\n"
+    retval += "Finalists: \n"
+    fin1n = sr.get('fin1n')
+    fin2n = sr.get('fin2n')
+    retval += f"- {fin1n} preferred by {sr.get('fin1votes', 0):,} of {tvot:,} voters ({sr.get('fin1votes_pct_str', '0.0%')})\n"
+    if fin2n:
+        retval += f"- {fin2n} preferred by {sr.get('fin2votes', 0):,} of {tvot:,} voters ({sr.get('fin2votes_pct_str', '0.0%')})\n"
+    retval += f"- {sr['final_abstentions']:,} abstentions ({sr['final_abstentions_pct_str']})\n"
+    retval += f"STAR Winner: {sr['winner']}\n"
+    if sr.get('notices'):
+        retval += format_notices_for_text_output(sr['notices'])
+    return retval
+
+
+def html_score_and_star_from_result(star_result, scaled) -> str:
+    """abiflib's html_score_and_star(), from a STAR result already tallied."""
+    import html
+    import json
+    from bs4 import BeautifulSoup
+    content = html.escape(STAR_report_from_result(star_result))
+    content += json.dumps(star_result, indent=4) + json.dumps(scaled, indent=4)
+    soup = BeautifulSoup('', 'html.parser')
+    pre_tag = soup.new_tag('pre')
+    pre_tag.string = content
+    soup.append(pre_tag)
+    return str(soup)
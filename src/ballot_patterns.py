@@ -0,0 +1,59 @@
+"""Collapse identical ballots before tallying.
+
+Real elections often repeat the same ranking on many vote lines (one per
+precinct, or one per ballot in cast-vote-record conversions).  Every
+tally walks every vote line, so merging identical lines into one line
+carrying their total qty makes the per-method work scale with distinct
+ballot patterns rather than raw lines.
+
+Lines are grouped on their full preference structure (candidate order,
+ranks, ratings, delimiters) plus prefstr, so the merged model has the
+same ballot type and gives the same results.  Each pattern keeps the
+position of its first line: every tally (including IRV's transfer and
+next-choice dicts, which are ordered by first appearance) sees the
+patterns in the same order as before.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Tuple
+
+__all__ = ['aggregate_ballot_patterns']
+
+
+def _pattern_key(vline) -> tuple:
+    return (vline.get('prefstr'),
+            tuple((cand, tuple(prefs.items())) for cand, prefs in vline['prefs'].items()))
+
+
+def aggregate_ballot_patterns(jabmod) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(model with identical vote lines merged, stats for the profiler).
+
+    The merged model shares candidates and metadata with jabmod; when no
+    two lines match (or a line can't be keyed), jabmod itself is returned.
+    """
+    votelines = jabmod.get('votelines') or []
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    try:
+        for vline in votelines:
+            key = _pattern_key(vline)
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = dict(vline)
+            else:
+                entry['qty'] += vline['qty']
+    except (TypeError, KeyError, AttributeError):
+        merged = None
+
+    lines = len(votelines)
+    patterns = lines if merged is None else len(merged)
+    stats = {
+        'votelines': lines,
+        'patterns': patterns,
+        'reduction': f"{lines / patterns:.2f}x" if patterns else "1.00x",
+    }
+    if merged is None or patterns == lines:
+        return jabmod, stats
+    reduced = dict(jabmod)
+    reduced['votelines'] = list(merged.values())
+    return reduced, stats
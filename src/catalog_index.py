@@ -0,0 +1,608 @@
+"""SQLite index of the election catalog for the listing pages.
+
+/id, /browse, /tag/<tag> and /awt used to load abif_list.yml and read
+every election's ABIF on each request, then render the whole catalog.
+CatalogIndex keeps one row per catalog entry in AWT_CATALOG_DB (default
+~/src/awt/local/db/awt-catalog.sqlite).  Each row holds the fields that
+listings filter and sort on: tags, year, ballot type, and ballot and
+candidate counts.  A listing page is then one indexed query for one
+page of rows (listing()).
+
+The same file holds an FTS5 full-text index over each election's id,
+title, description, tags and candidate names.  listing(q=...) ranks
+matches with bm25 and highlights them, and suggest() returns the best
+few ids and titles for search-as-you-type.
+
+sync() keeps the index current.  Entry metadata is reloaded when
+abif_list.yml changes.  An election's ABIF is parsed for its ballot
+statistics and candidate names only when its file is new or its size or
+mtime changed.  Only the changed entries' search rows are rewritten.
+Files are checked at most every AWT_CATALOG_RECHECK seconds (default
+60), so most requests cost a single stat of the catalog file.
+
+Parsing is left to a background thread, so no request waits on it (or
+on another process's parsing), and `awt.py` starts it at startup.
+Until it is done, complete is False and listings lack the new files'
+statistics; awt.py keeps such pages out of its page cache.  build()
+syncs and waits for the parsing, for `awt.py --build-catalog-index`.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+__all__ = [
+    'CatalogIndex',
+    'DEFAULT_CATALOG_DB',
+    'LISTING_SORTS',
+    'get_catalog_index',
+    'listing_args',
+]
+
+DEFAULT_CATALOG_DB = os.path.join(os.path.expanduser('~'), 'src', 'awt', 'local', 'db', 'awt-catalog.sqlite')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+DEFAULT_RECHECK_SECONDS = 60.0
+BUSY_TIMEOUT_SECONDS = 30
+SYNC_BUSY_TIMEOUT_MS = 1000
+MAX_SUGGESTIONS = 20
+# Search terms beyond this many are ignored
+MAX_QUERY_TERMS = 16
+
+# Bumped whenever the tables change; an index with another version is rebuilt
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS elections (
+  id TEXT PRIMARY KEY,
+  position INTEGER NOT NULL,
+  title TEXT,
+  desc TEXT,
+  taglist TEXT NOT NULL,
+  filename TEXT,
+  year INTEGER,
+  ballot_type TEXT,
+  ballot_count INTEGER,
+  candidate_count INTEGER,
+  candidates TEXT,
+  file_mtime INTEGER,
+  file_size INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_elections_position ON elections(position);
+CREATE INDEX IF NOT EXISTS idx_elections_id_nocase ON elections(id COLLATE NOCASE, position);
+CREATE INDEX IF NOT EXISTS idx_elections_title ON elections(title COLLATE NOCASE, position);
+CREATE INDEX IF NOT EXISTS idx_elections_year ON elections(year, position);
+CREATE INDEX IF NOT EXISTS idx_elections_ballot_type ON elections(ballot_type, position);
+CREATE INDEX IF NOT EXISTS idx_elections_ballot_count ON elections(ballot_count, position);
+CREATE INDEX IF NOT EXISTS idx_elections_candidate_count ON elections(candidate_count, position);
+CREATE TABLE IF NOT EXISTS election_tags (
+  tag TEXT NOT NULL,
+  position INTEGER NOT NULL,
+  PRIMARY KEY (tag, position)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS election_search USING fts5(
+  id, title, desc, tags, candidates,
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3'
+);
+-- Relevance weights for id, title, desc, tags and candidates
+INSERT INTO election_search(election_search, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0, 3.0, 2.0)');
+CREATE TABLE IF NOT EXISTS meta (
+  key TEXT PRIMARY KEY,
+  value TEXT
+);
+"""
+
+# sort parameter -> ORDER BY column; a leading '-' reverses it.  Each
+# has an index, so a page of a large catalog needn't sort all of it.
+LISTING_SORTS = {
+    'catalog': 'position',
+    'id': 'elections.id COLLATE NOCASE',
+    'title': 'elections.title COLLATE NOCASE',
+    'year': 'year',
+    'ballots': 'ballot_count',
+    'candidates': 'candidate_count',
+    # Only with a search query; best match first
+    'relevance': 'rank',
+}
+
+# Sort columns that are never NULL
+_NOT_NULL_SORTS = ('position', 'elections.id COLLATE NOCASE', 'rank')
+_ENTRY_COLUMNS = 'id, title, desc, taglist, filename, year, ballot_type, ballot_count, candidate_count'
+_SEARCH_TERM = re.compile(r'\w+')
+# Highlight markers for snippet(), replaced by <mark> after escaping
+_MARK_START, _MARK_END = '\x02', '\x03'
+_YEAR = re.compile(r'(?<!\d)((?:19|20)\d\d)(?!\d)')
+
+logger = logging.getLogger('awt.catalog')
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _taglist(tags: Any) -> List[str]:
+    # Same splitting as awt.build_election_list()
+    if isinstance(tags, str):
+        return re.split('[ ,]+', tags)
+    return ['UNTAGGED']
+
+
+def _year(entry: Mapping[str, Any], taglist: List[str]) -> Optional[int]:
+    for tag in taglist:
+        if _YEAR.fullmatch(tag):
+            return int(tag)
+    for text in (entry.get('id'), entry.get('title')):
+        match = _YEAR.search(str(text or ''))
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def _file_stat(path: str) -> Tuple[Optional[int], Optional[int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None, None
+    return st.st_mtime_ns, st.st_size
+
+
+_NO_STATS = {'ballot_type': None, 'ballot_count': None, 'candidate_count': None, 'candidates': None}
+
+
+def _ballot_stats(path: str) -> Dict[str, Any]:
+    """ballot_type, ballot_count, candidate_count and candidates (tokens
+    and display names, '; '-separated) of one ABIF file."""
+    from abiflib import convert_abif_to_jabmod
+    from abiflib.util import find_ballot_type
+    try:
+        with open(path, encoding='utf-8') as f:
+            jabmod = convert_abif_to_jabmod(f.read(), cleanws=True)
+        candidates = jabmod.get('candidates') or {}
+        return {
+            'ballot_type': find_ballot_type(jabmod),
+            'ballot_count': jabmod.get('metadata', {}).get('ballotcount'),
+            'candidate_count': len(candidates),
+            'candidates': '; '.join(f"{token} {name}" if name != token else str(token)
+                                    for token, name in candidates.items()),
+        }
+    except Exception as exc:
+        logger.warning("could not index %s: %s", path, exc)
+        return dict(_NO_STATS)
+
+
+def _match_query(q: str) -> Optional[str]:
+    """FTS5 MATCH expression for free text q, or None without terms.
+
+    Every word must match; the last may be a prefix, for search as you
+    type.  Words are quoted, so FTS5 operators in q are plain text.
+    """
+    terms = _SEARCH_TERM.findall(q or '')[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+
+def _highlighted(snippet: Optional[str]):
+    from markupsafe import Markup, escape
+    return Markup(str(escape(snippet or '')).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def listing_args(args: Mapping[str, str]) -> Dict[str, Any]:
+    """Keyword arguments for CatalogIndex.listing() from request args.
+
+    Values that don't parse are dropped rather than rejected, so a
+    hand-edited URL still gets a listing.
+    """
+    def _int(name, minimum=0):
+        try:
+            value = int(args.get(name, ''))
+        except ValueError:
+            return None
+        return value if value >= minimum else None
+
+    sort = args.get('sort')
+    kwargs = {
+        'q': (args.get('q') or '').strip() or None,
+        'tag': args.get('tag') or None,
+        'year': _int('year'),
+        'ballot_type': args.get('ballot_type') or None,
+        'min_ballots': _int('min_ballots'),
+        'max_ballots': _int('max_ballots'),
+        'sort': sort if sort and sort.lstrip('-') in LISTING_SORTS else None,
+        'page': _int('page', 1) or 1,
+        'per_page': _int('per_page', 1),
+    }
+    return {k: v for k, v in kwargs.items() if v is not None}
+
+
+class CatalogIndex:
+    """The catalog rows in one SQLite file, synced from abif_list.yml."""
+
+    def __init__(self, db_path: str, catalog_path: str, testfiledir: str) -> None:
+        self.db_path = db_path
+        self.catalog_path = catalog_path
+        self.testfiledir = str(testfiledir)
+        self._lock = threading.Lock()
+        self._catalog_key: Optional[str] = None
+        self._checked = 0.0
+        self._schema_checked = False
+        # The thread parsing files, and whether every file is parsed
+        self._indexer_lock = threading.Lock()
+        self._indexer: Optional[threading.Thread] = None
+        self.complete = False
+
+    def _connect(self) -> sqlite3.Connection:
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if self._schema_checked:
+            return conn
+        conn.execute('PRAGMA journal_mode=WAL')
+        if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            conn.execute('BEGIN IMMEDIATE')
+            if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                # Virtual tables first: dropping one drops its shadow tables
+                for (table,) in conn.execute(
+                        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+                        "ORDER BY sql LIKE 'CREATE VIRTUAL TABLE%' DESC").fetchall():
+                    conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+                # Not executescript(), which would commit the transaction first
+                for statement in _SCHEMA.split(';'):
+                    if statement.strip():
+                        conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            conn.execute('COMMIT')
+        self._schema_checked = True
+        return conn
+
+    @contextlib.contextmanager
+    def _session(self) -> Iterator[sqlite3.Connection]:
+        """One connection for a sync and the query after it."""
+        conn = self._connect()
+        try:
+            self.sync(conn=conn)
+            yield conn
+        finally:
+            conn.close()
+
+    def sync(self, force: bool = False, conn: Optional[sqlite3.Connection] = None) -> bool:
+        """Bring the index's entries up to date with the catalog, and start
+        parsing new or changed files in the background.
+
+        Returns complete: False while files are being parsed, or when
+        another process held up the sync.
+        """
+        st = os.stat(self.catalog_path)
+        catalog_key = f"{os.path.abspath(self.catalog_path)}:{st.st_mtime_ns}:{st.st_size}"
+        recheck = _env_float('AWT_CATALOG_RECHECK', DEFAULT_RECHECK_SECONDS)
+        if not force and catalog_key == self._catalog_key and time.monotonic() - self._checked < recheck:
+            return self.complete
+        with self._lock:
+            own_conn = conn is None
+            if own_conn:
+                conn = self._connect()
+            try:
+                # One process syncs at a time; the others keep serving the
+                # index as it is and check again on a later request
+                conn.execute(f'PRAGMA busy_timeout = {SYNC_BUSY_TIMEOUT_MS}')
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                except sqlite3.OperationalError as exc:
+                    logger.info("catalog index: sync skipped (%s)", exc)
+                    return False
+                row = conn.execute("SELECT value FROM meta WHERE key = 'catalog_key'").fetchone()
+                if row is None or row['value'] != catalog_key:
+                    self._load_catalog(conn)
+                    conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('catalog_key', ?)",
+                                 (catalog_key,))
+                conn.execute('COMMIT')
+                stale = self._stale_files(conn)
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+            finally:
+                if own_conn:
+                    conn.close()
+                else:
+                    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_SECONDS * 1000}')
+            self._catalog_key, self._checked = catalog_key, time.monotonic()
+        if stale:
+            self._start_indexer()
+        else:
+            self.complete = True
+        return self.complete
+
+    def build(self) -> bool:
+        """sync(), then wait for its files to be parsed.  Returns complete."""
+        self.sync(force=True)
+        indexer = self._indexer
+        if indexer is not None:
+            indexer.join()
+        return self.complete
+
+    def _load_catalog(self, conn: sqlite3.Connection) -> None:
+        import yaml
+        # libyaml's loader, when there is one, is many times faster
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        with open(self.catalog_path) as fp:
+            entries = yaml.load(fp, Loader=loader) or []
+        old_rows = {row['id']: row for row in conn.execute(
+            'SELECT id, title, desc, taglist, filename FROM elections').fetchall()}
+        seen = set()
+        changed = []
+        conn.execute('DELETE FROM election_tags')
+        for position, entry in enumerate(entries):
+            eid = entry.get('id')
+            if eid is None or eid in seen:
+                continue  # get_fileentry_from_election_list() rejects duplicates anyway
+            seen.add(eid)
+            taglist = _taglist(entry.get('tags'))
+            conn.execute(
+                """INSERT INTO elections(id, position, title, desc, taglist, filename, year)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET position = excluded.position, title = excluded.title,
+                     desc = excluded.desc, taglist = excluded.taglist, filename = excluded.filename,
+                     year = excluded.year""",
+                (eid, position, entry.get('title'), entry.get('desc'), json.dumps(taglist),
+                 entry.get('filename'), _year(entry, taglist)))
+            old = old_rows.get(eid)
+            if old is not None and old['filename'] != entry.get('filename'):
+                # Another file: its statistics are stale whatever its stat says
+                conn.execute('UPDATE elections SET file_mtime = -1 WHERE id = ?', (eid,))
+            if old is None or (old['title'], old['desc'], old['taglist']) != (
+                    entry.get('title'), entry.get('desc'), json.dumps(taglist)):
+                changed.append(eid)
+            conn.executemany('INSERT OR IGNORE INTO election_tags(tag, position) VALUES (?, ?)',
+                             [(tag, position) for tag in taglist if tag])
+        removed = [(eid,) for eid in set(old_rows) - seen]
+        conn.executemany('DELETE FROM election_search WHERE rowid = (SELECT rowid FROM elections WHERE id = ?)',
+                         removed)
+        conn.executemany('DELETE FROM elections WHERE id = ?', removed)
+        self._index_text(conn, changed)
+        logger.info("catalog index: loaded %d entries from %s (%d new or changed)",
+                    len(seen), self.catalog_path, len(changed))
+
+    def _stale_files(self, conn: sqlite3.Connection) -> List[Tuple[sqlite3.Row, Optional[int], Optional[int]]]:
+        """(row, mtime, size) of each entry whose file is new or changed."""
+        stale = []
+        for row in conn.execute('SELECT id, filename, candidates, file_mtime, file_size FROM elections'):
+            mtime, size = _file_stat(os.path.join(self.testfiledir, row['filename'] or ''))
+            if (mtime, size) != (row['file_mtime'], row['file_size']):
+                stale.append((row, mtime, size))
+        return stale
+
+    def _start_indexer(self) -> None:
+        with self._indexer_lock:
+            self.complete = False
+            if self._indexer is None:
+                self._indexer = threading.Thread(target=self._index_files, name='awt-catalog-index', daemon=True)
+                self._indexer.start()
+
+    def _index_files(self) -> None:
+        """Parse stale files for their statistics until none are left."""
+        parsed = 0
+        conn = self._connect()
+        try:
+            while True:
+                with self._indexer_lock:
+                    stale = self._stale_files(conn)
+                    if not stale:
+                        self._indexer = None
+                        self.complete = True
+                        break
+                for row, mtime, size in stale:
+                    path = os.path.join(self.testfiledir, row['filename'] or '')
+                    stats = _ballot_stats(path) if mtime is not None else _NO_STATS
+                    parsed += mtime is not None
+                    # Parsed outside any transaction; each file's write is
+                    # short, and skipped if the entry moved to another file
+                    conn.execute('BEGIN IMMEDIATE')
+                    try:
+                        updated = conn.execute(
+                            """UPDATE elections SET ballot_type = ?, ballot_count = ?, candidate_count = ?,
+                               candidates = ?, file_mtime = ?, file_size = ? WHERE id = ? AND filename IS ?""",
+                            (stats['ballot_type'], stats['ballot_count'], stats['candidate_count'],
+                             stats['candidates'], mtime, size, row['id'], row['filename'])).rowcount
+                        if updated and stats['candidates'] != row['candidates']:
+                            self._index_text(conn, [row['id']])
+                        conn.execute('COMMIT')
+                    except BaseException:
+                        conn.execute('ROLLBACK')
+                        raise
+        except Exception:
+            logger.exception("catalog index: parsing files failed")
+            with self._indexer_lock:
+                self._indexer = None
+        finally:
+            conn.close()
+        if parsed:
+            logger.info("catalog index: indexed ballot statistics of %d files", parsed)
+
+    @staticmethod
+    def _index_text(conn: sqlite3.Connection, ids: Iterable[str]) -> None:
+        """Rewrite the election_search rows of ids from elections."""
+        for eid in ids:
+            row = conn.execute('SELECT rowid, id, title, desc, taglist, candidates FROM elections WHERE id = ?',
+                               (eid,)).fetchone()
+            conn.execute('DELETE FROM election_search WHERE rowid = ?', (row['rowid'],))
+            conn.execute(
+                'INSERT INTO election_search(rowid, id, title, desc, tags, candidates) VALUES (?, ?, ?, ?, ?, ?)',
+                (row['rowid'], row['id'], row['title'], row['desc'], ' '.join(json.loads(row['taglist'])),
+                 row['candidates']))
+
+    @staticmethod
+    def page_size() -> int:
+        """Entries per listing page: AWT_CATALOG_PAGE_SIZE, default 50."""
+        return max(1, int(_env_float('AWT_CATALOG_PAGE_SIZE', DEFAULT_PAGE_SIZE)))
+
+    @staticmethod
+    def _entry(row: sqlite3.Row) -> Dict[str, Any]:
+        entry = dict(row)
+        entry.pop('rowid', None)
+        entry['taglist'] = json.loads(entry['taglist'])
+        if 'snippet' in entry:
+            entry['snippet'] = _highlighted(entry['snippet'])
+        return entry
+
+    def listing(self, *, q: Optional[str] = None, tag: Optional[str] = None, year: Optional[int] = None,
+                ballot_type: Optional[str] = None, min_ballots: Optional[int] = None,
+                max_ballots: Optional[int] = None, sort: Optional[str] = None, page: int = 1,
+                per_page: Optional[int] = None) -> Dict[str, Any]:
+        """One page of catalog entries matching the filters.
+
+        Entries are dicts like awt.build_election_list()'s, without
+        'text'.  With a search query q, only matching entries are listed,
+        best match first unless sort says otherwise, and each has a
+        highlighted 'snippet' (Markup).  Also returns the match and
+        catalog totals and the page numbers for a pager.
+        """
+        per_page = max(1, min(per_page or self.page_size(), MAX_PAGE_SIZE))
+        match = _match_query(q) if q else None
+        if not sort or (sort.lstrip('-') == 'relevance' and match is None):
+            sort = 'relevance' if match else 'catalog'
+        from_sql, position = 'elections', 'elections.position'
+        snippet_sql, where, params = '', [], []
+        if match:
+            from_sql = 'election_search JOIN elections ON elections.rowid = election_search.rowid'
+            snippet_sql = ", snippet(election_search, -1, ?, ?, '…', 12) AS snippet"
+            where.append('election_search MATCH ?')
+            params.append(match)
+        if tag:
+            # Driven by the tag's rows, which are in catalog order already
+            from_sql += ' JOIN election_tags ON election_tags.position = elections.position'
+            position = 'election_tags.position'
+            where.append('election_tags.tag = ?')
+            params.append(tag)
+        if year is not None:
+            where.append('year = ?')
+            params.append(year)
+        if ballot_type:
+            where.append('ballot_type = ?')
+            params.append(ballot_type)
+        if min_ballots is not None:
+            where.append('ballot_count >= ?')
+            params.append(min_ballots)
+        if max_ballots is not None:
+            where.append('ballot_count <= ?')
+            params.append(max_ballots)
+        sort_key = LISTING_SORTS.get(sort.lstrip('-'), 'position')
+        column = position if sort_key == 'position' else sort_key
+        direction = 'DESC' if sort.startswith('-') else 'ASC'
+
+        def count(extra=()):
+            if tag and len(where) == 1 and not extra:
+                return conn.execute('SELECT COUNT(*) FROM election_tags WHERE tag = ?', (tag,)).fetchone()[0]
+            clauses = where + list(extra)
+            where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+            return conn.execute(f'SELECT COUNT(*) FROM {from_sql} {where_sql}', params).fetchone()[0]
+
+        def select(extra, order_sql, limit, offset):
+            clauses = where + list(extra)
+            where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+            # Order and skip rowids alone, which the indexes cover, then
+            # read the page's rows.  Snippets need the match, so they come
+            # with the rowids.
+            found = conn.execute(
+                f'SELECT elections.rowid{snippet_sql} FROM {from_sql} {where_sql} {order_sql} LIMIT ? OFFSET ?',
+                ([_MARK_START, _MARK_END] if snippet_sql else []) + params + [limit, offset]).fetchall()
+            rows = {row['rowid']: dict(row) for row in conn.execute(
+                f"SELECT rowid, {_ENTRY_COLUMNS} FROM elections WHERE rowid IN ({','.join('?' * len(found))})",
+                [r[0] for r in found])}
+            if snippet_sql:
+                for r in found:
+                    rows[r[0]]['snippet'] = r['snippet']
+            return [rows[r[0]] for r in found]
+
+        with self._session() as conn:
+            total = count()
+            pages = max(1, -(-total // per_page))
+            page = max(1, min(page, pages))
+            offset = (page - 1) * per_page
+            # Left to FTS5 for relevance, which then makes snippets for
+            # this page only
+            order_sql = f'ORDER BY {column} {direction}' if column in (position, 'rank') \
+                else f'ORDER BY {column} {direction}, {position} {direction}'
+            if sort_key in _NOT_NULL_SORTS:
+                rows = select((), order_sql, per_page, offset)
+            else:
+                # Entries without the sort value go last either way.  Two
+                # queries, as no index serves ORDER BY (column IS NULL).
+                key = column.split()[0]
+                valued = count([f'{key} IS NOT NULL'])
+                rows = select([f'{key} IS NOT NULL'], order_sql, per_page, offset) if offset < valued else []
+                if len(rows) < per_page:
+                    rows += select([f'{key} IS NULL'], f'ORDER BY {position}',
+                                   per_page - len(rows), max(0, offset - valued))
+            catalog_total = conn.execute('SELECT COUNT(*) FROM elections').fetchone()[0] if where else total
+        return {
+            'entries': [self._entry(row) for row in rows],
+            'total': total,
+            'catalog_total': catalog_total,
+            'page': page,
+            'pages': pages,
+            'per_page': per_page,
+            'offset': offset,
+            'sort': sort,
+        }
+
+    def suggest(self, q: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """The best few matches for q as {'id', 'title'} dicts."""
+        match = _match_query(q)
+        if match is None:
+            return []
+        with self._session() as conn:
+            rows = conn.execute(
+                """SELECT elections.id AS id, elections.title AS title FROM election_search
+                   JOIN elections ON elections.rowid = election_search.rowid
+                   WHERE election_search MATCH ? ORDER BY rank LIMIT ?""",
+                (match, max(1, min(limit, MAX_SUGGESTIONS)))).fetchall()
+        return [dict(row) for row in rows]
+
+    def filename(self, election_id: str) -> Optional[str]:
+        """The catalog filename of election_id, or None if it isn't listed."""
+        with self._session() as conn:
+            row = conn.execute('SELECT filename FROM elections WHERE id = ?', (election_id,)).fetchone()
+        return row['filename'] if row else None
+
+    def tag_counts(self) -> Dict[str, int]:
+        """Number of elections per tag."""
+        with self._session() as conn:
+            return dict(conn.execute('SELECT tag, COUNT(*) FROM election_tags GROUP BY tag').fetchall())
+
+    def facets(self) -> Dict[str, List[Any]]:
+        """Years and ballot types present, for the listing filter form."""
+        with self._session() as conn:
+            return {
+                'years': [r[0] for r in conn.execute(
+                    'SELECT DISTINCT year FROM elections WHERE year IS NOT NULL ORDER BY year DESC')],
+                'ballot_types': [r[0] for r in conn.execute(
+                    'SELECT DISTINCT ballot_type FROM elections WHERE ballot_type IS NOT NULL ORDER BY ballot_type')],
+            }
+
+
+_INDEXES: Dict[Tuple[str, str, str], CatalogIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_catalog_index(catalog_path: str, testfiledir: str) -> CatalogIndex:
+    """The process-wide CatalogIndex for this catalog and AWT_CATALOG_DB."""
+    key = (os.environ.get('AWT_CATALOG_DB') or DEFAULT_CATALOG_DB, str(catalog_path), str(testfiledir))
+    with _INDEXES_LOCK:
+        if key not in _INDEXES:
+            _INDEXES[key] = CatalogIndex(*key)
+        return _INDEXES[key]
@@ -0,0 +1,143 @@
+"""Cached, bounded Graphviz rendering of Copeland tournament diagrams.
+
+abiflib's copecount_diagram() runs the Graphviz `dot` program on every
+call.  A results page renders the diagram for its pairwise section, and
+the diagram link (/id/<id>/dot/svg) renders the same graph again.  Here
+SVGs are kept in an in-process LRU keyed by a hash of the copecount
+structure, and renders go through a small thread pool (each worker waits
+on one `dot` subprocess), so at most AWT_DOT_WORKERS run at once.
+Concurrent requests for the same graph share one in-flight render.
+
+A render that takes longer than AWT_DOT_TIMEOUT seconds, or fails (no
+Graphviz installed, `dot` error), gives a small placeholder SVG instead
+of failing the page.  copecount_svg() says when it did, so callers keep
+such pages out of their page cache.  A render that times out keeps
+running and its SVG is cached when it finishes, so a later request gets
+the real diagram.
+
+Settings:
+- AWT_DOT_WORKERS: concurrent Graphviz renders (default 2)
+- AWT_DOT_TIMEOUT: seconds to wait for a render (default 30)
+- AWT_DOT_CACHE_SIZE: diagrams kept in memory (default 256)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import html
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Optional, Tuple
+
+__all__ = [
+    'DEFAULT_DOT_CACHE_SIZE',
+    'DEFAULT_DOT_TIMEOUT',
+    'DEFAULT_DOT_WORKERS',
+    'clear_diagram_cache',
+    'copecount_key',
+    'copecount_svg',
+    'fallback_svg',
+]
+
+DEFAULT_DOT_WORKERS = 2
+DEFAULT_DOT_TIMEOUT = 30.0
+DEFAULT_DOT_CACHE_SIZE = 256
+
+logger = logging.getLogger('awt.dot')
+
+_CACHE: "OrderedDict[str, str]" = OrderedDict()
+_INFLIGHT: Dict[str, Future] = {}
+# Reentrant: a future that is already done runs its callback at once
+_LOCK = threading.RLock()
+_POOL: Optional[ThreadPoolExecutor] = None
+
+
+def _env_number(name: str, default, cast):
+    try:
+        value = cast(os.environ.get(name, default))
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+
+def copecount_key(copecount) -> str:
+    """Hash of a copecount structure; equal graphs give equal keys.
+
+    Key order is kept (not sorted): copecount_diagram() lays nodes out in
+    the order of the winlosstie dict.
+    """
+    blob = json.dumps(copecount, default=str, separators=(',', ':'))
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def fallback_svg(message: str = 'Diagram unavailable') -> str:
+    """Placeholder SVG shown when Graphviz can't render the diagram."""
+    return ('<svg xmlns="http://www.w3.org/2000/svg" width="320" height="40" class="dot-fallback">'
+            f'<text x="10" y="25" font-family="sans-serif" font-size="14">{html.escape(message)}</text>'
+            '</svg>')
+
+
+def clear_diagram_cache() -> None:
+    """Forget cached diagrams (renders in flight are left alone)."""
+    with _LOCK:
+        _CACHE.clear()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        workers = _env_number('AWT_DOT_WORKERS', DEFAULT_DOT_WORKERS, int)
+        _POOL = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='awt-dot')
+    return _POOL
+
+
+def _render(copecount) -> str:
+    from abiflib import copecount_diagram
+    return copecount_diagram(copecount, outformat='svg')
+
+
+def _finished(key: str, future: Future) -> None:
+    with _LOCK:
+        _INFLIGHT.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        _CACHE[key] = future.result()
+        _CACHE.move_to_end(key)
+        limit = _env_number('AWT_DOT_CACHE_SIZE', DEFAULT_DOT_CACHE_SIZE, int)
+        while len(_CACHE) > limit:
+            _CACHE.popitem(last=False)
+
+
+def copecount_svg(copecount, timeout: Optional[float] = None) -> Tuple[str, bool]:
+    """(svg, rendered): SVG of copecount_diagram(copecount, outformat='svg'),
+    from the cache when the same graph was rendered before.
+
+    Waits at most timeout seconds (default AWT_DOT_TIMEOUT) for Graphviz;
+    on timeout or error, svg is fallback_svg() and rendered is False.
+    """
+    key = copecount_key(copecount)
+    with _LOCK:
+        svg = _CACHE.get(key)
+        if svg is not None:
+            _CACHE.move_to_end(key)
+            return svg, True
+        future = _INFLIGHT.get(key)
+        if future is None:
+            future = _pool().submit(_render, copecount)
+            _INFLIGHT[key] = future
+            future.add_done_callback(lambda done: _finished(key, done))
+    if timeout is None:
+        timeout = _env_number('AWT_DOT_TIMEOUT', DEFAULT_DOT_TIMEOUT, float)
+    try:
+        return future.result(timeout=timeout), True
+    except FutureTimeoutError:
+        logger.warning(f"Graphviz render {key[:12]} still running after {timeout}s; showing placeholder")
+        return fallback_svg('Diagram unavailable (Graphviz timed out)'), False
+    except Exception as exc:
+        logger.warning(f"Graphviz render {key[:12]} failed: {type(exc).__name__}: {exc}")
+        return fallback_svg(), False
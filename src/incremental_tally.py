@@ -0,0 +1,398 @@
+"""Incremental tallies for catalog elections that grow by appended ballots.
+
+On count nights an election's .abif file is updated by appending new
+batches of vote lines.  parse_catalog_abif() keeps the last parse of each
+recently requested (large) catalog election.  When the file's new text is
+the old text plus nothing but vote lines (and comments or blank lines),
+only the appended lines are parsed and merged into the cached ballot
+store, and the running FPTP counts, approval counts and pairwise matrix
+are updated from that batch.  The cost of a refresh for those methods
+then depends on the batch size, not on the size of the election.  IRV
+and STAR still rerun in full, over the updated ballot store.
+
+Any other change to the file (edited lines, new candidates, metadata)
+falls back to a full parse, which becomes the new cached state.
+
+Settings:
+- AWT_INCREMENTAL_ELECTIONS: elections kept per process (default 4; 0
+  turns incremental tallies off)
+- AWT_INCREMENTAL_MIN_BALLOTS: smallest election (ballots) worth keeping
+  (default 10000)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+__all__ = [
+    'CatalogTallies',
+    'DEFAULT_INCREMENTAL_ELECTIONS',
+    'DEFAULT_INCREMENTAL_MIN_BALLOTS',
+    'pairwise_result_from_matrix',
+    'parse_catalog_abif',
+    'reset_incremental_state',
+]
+
+DEFAULT_INCREMENTAL_ELECTIONS = 4
+DEFAULT_INCREMENTAL_MIN_BALLOTS = 10_000
+
+logger = logging.getLogger('awt.incremental')
+
+_STATES: "OrderedDict[str, _ElectionState]" = OrderedDict()
+_STATES_LOCK = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _copy_jabmod(jabmod: Dict[str, Any]) -> Dict[str, Any]:
+    # Callers may add keys (title, desc) or replace lists; the voteline
+    # dicts themselves are shared, as abiflib's tallies don't modify them
+    copied = dict(jabmod)
+    copied['candidates'] = dict(jabmod['candidates'])
+    copied['metadata'] = dict(jabmod['metadata'])
+    copied['votelines'] = list(jabmod['votelines'])
+    return copied
+
+
+# --- Additive counts -------------------------------------------------------
+
+def _fptp_counts(jabmod, candidates) -> Dict[str, Any]:
+    from abiflib.fptp_tally import FPTP_result_from_abifmodel
+    result = FPTP_result_from_abifmodel(jabmod)
+    toppicks = {cand: 0 for cand in candidates}
+    for cand, votes in result['toppicks'].items():
+        if cand is not None:
+            toppicks[cand] += votes
+    return {'toppicks': toppicks, 'overvotes': result['overvote_ballots']}
+
+
+def _approval_counts(jabmod, candidates) -> Dict[str, int]:
+    # Same rule as abiflib's approval tally: rating 1 or rank 1 approves
+    counts = {cand: 0 for cand in candidates}
+    for vline in jabmod['votelines']:
+        for cand, prefs in vline['prefs'].items():
+            if prefs.get('rating') == 1 or prefs.get('rank') == 1:
+                counts[cand] += vline['qty']
+    return counts
+
+
+def _pairwise_counts(jabmod, candidates) -> Dict[str, Dict[str, Optional[int]]]:
+    from abiflib.pairwise_tally import pairwise_count_dict
+    from src import array_tally
+    matrix = array_tally.pairwise_count_dict(jabmod)
+    return matrix if matrix is not None else pairwise_count_dict(jabmod)
+
+
+_COUNTERS = {
+    'fptp': _fptp_counts,
+    'approval': _approval_counts,
+    'pairwise': _pairwise_counts,
+}
+
+
+def _add_counts(kind: str, total, delta) -> None:
+    if kind == 'fptp':
+        for cand, votes in delta['toppicks'].items():
+            total['toppicks'][cand] += votes
+        total['overvotes'] += delta['overvotes']
+    elif kind == 'approval':
+        for cand, votes in delta.items():
+            total[cand] += votes
+    else:
+        for atok, row in delta.items():
+            for btok, votes in row.items():
+                if votes is not None:
+                    total[atok][btok] += votes
+
+
+def _copy_counts(kind: str, counts):
+    if kind == 'fptp':
+        return {'toppicks': dict(counts['toppicks']), 'overvotes': counts['overvotes']}
+    if kind == 'approval':
+        return dict(counts)
+    return {atok: dict(row) for atok, row in counts.items()}
+
+
+# --- Results from counts ---------------------------------------------------
+
+def _tally_model(jabmod, ballot_type: str, counts: Dict[str, int], extra=()) -> Dict[str, Any]:
+    """A stand-in jabmod with one first-choice vote line per candidate.
+
+    abiflib's FPTP and approval tallies only sum first choices (or
+    approvals) per candidate, so running them over this gives exactly the
+    result for the full election, in O(candidates).
+    """
+    votelines = [{'qty': qty, 'prefs': {cand: {'rank': 1}}} for cand, qty in counts.items() if qty]
+    votelines.extend(extra)
+    return {
+        'candidates': jabmod['candidates'],
+        'metadata': {'ballotcount': jabmod['metadata']['ballotcount'], 'ballot_type': ballot_type},
+        'votelines': votelines,
+    }
+
+
+def pairwise_result_from_matrix(abifmodel, pairwise_matrix, ballot_type: Optional[str]) -> Dict[str, Any]:
+    """pairwise_result_from_abifmodel() for an already counted matrix.
+
+    Follows abiflib.pairwise_tally.pairwise_result_from_abifmodel (without
+    ballot transforms) from the point where it has counted the matrix:
+    tie/cycle detection and the same notices.
+    """
+    from abiflib.pairwise_tally import (
+        full_copecount_from_abifmodel,
+        get_Copeland_winners,
+        winlosstie_dict_from_pairdict,
+    )
+    candidates = abifmodel['candidates']
+    candtoks = list(candidates.keys())
+
+    has_ties_or_cycles = any(
+        pairwise_matrix.get(cand1, {}).get(cand2, 0) == pairwise_matrix.get(cand2, {}).get(cand1, 0)
+        for cand1 in candtoks for cand2 in candtoks if cand1 != cand2)
+    if not has_ties_or_cycles:
+        wltdict = winlosstie_dict_from_pairdict(candidates, pairwise_matrix)
+        sorted_candidates = sorted(candtoks, key=lambda x: wltdict[x]['wins'], reverse=True)
+        has_ties_or_cycles = any(
+            pairwise_matrix.get(cand1, {}).get(cand2, 0) > pairwise_matrix.get(cand2, {}).get(cand1, 0)
+            for i, cand1 in enumerate(sorted_candidates)
+            for cand2 in sorted_candidates[:i])
+
+    notices = []
+    if ballot_type == 'choose_one':
+        notices.append({
+            "notice_type": "note",
+            "short": "Pairwise comparisons derived from top-choice-only ballots",
+            "long": (
+                "Pairwise/Condorcet comparisons use only each voter\'s top choice from choose_one ballots. "
+                "No lower preferences are available, so many matchups will show a large 'No preference' count."
+            )
+        })
+    if has_ties_or_cycles:
+        copecount = full_copecount_from_abifmodel(abifmodel, pairdict=pairwise_matrix)
+        copewinners = get_Copeland_winners(copecount)
+        if len(copewinners) >= 2:
+            tied_list = " and ".join(candidates.get(tok, tok) for tok in copewinners)
+            notices.append({
+                "notice_type": "note",
+                "short": "Condorcet cycle or Copeland tie",
+                "long": (
+                    f"This election has no Condorcet winner. {tied_list} are tied for the most pairwise victories (Copeland tie). "
+                    "Each of these candidates beats the same number of opponents in head-to-head comparisons, creating a cycle in the tournament. "
+                    "The Copeland/pairwise table below shows the detailed win-loss-tie records that result in this tie."
+                )
+            })
+        else:
+            notices.append({
+                "notice_type": "note",
+                "short": "Condorcet cycle or Copeland tie",
+                "long": '"Victories" and "losses" sometimes aren\'t displayed in the expected location when there are ties and/or cycles in the results, but the numbers provided should be accurate.'
+            })
+
+    return {
+        'pairwise_matrix': pairwise_matrix,
+        'has_ties_or_cycles': has_ties_or_cycles,
+        'notices': notices,
+    }
+
+
+# --- Cached state ----------------------------------------------------------
+
+class _ElectionState:
+    """Last parse of one catalog election and the counts kept for it."""
+
+    def __init__(self, text: str, jabmod: Dict[str, Any]) -> None:
+        self.lock = threading.Lock()
+        self.text_len = len(text)
+        self.digest = _digest(text)
+        self.jabmod = jabmod
+        self.generation = 0
+        self.counts: Dict[str, Any] = {}
+        self.ballot_type: Optional[str] = None
+
+    def append(self, text: str, delta: Dict[str, Any]) -> None:
+        jabmod = self.jabmod
+        # Same order as a full parse: by qty, then file order
+        jabmod['votelines'] = sorted(jabmod['votelines'] + delta['votelines'],
+                                     key=lambda vline: vline['qty'], reverse=True)
+        jabmod['metadata']['ballotcount'] += delta['metadata']['ballotcount']
+        for kind, counts in self.counts.items():
+            _add_counts(kind, counts, _COUNTERS[kind](delta, jabmod['candidates']))
+        self.text_len = len(text)
+        self.digest = _digest(text)
+        self.generation += 1
+        self.ballot_type = None
+
+    def ballot_type_for(self, generation: int) -> Optional[str]:
+        # Detection looks at every vote line, so it is done once per update
+        from abiflib.util import find_ballot_type
+        with self.lock:
+            if generation != self.generation:
+                return None
+            if self.ballot_type is None:
+                self.ballot_type = find_ballot_type(self.jabmod)
+            return self.ballot_type
+
+    def counts_for(self, kind: str, generation: int):
+        """Copy of the kind counts, or None if the state has moved on."""
+        with self.lock:
+            if generation != self.generation:
+                return None
+            if kind not in self.counts:
+                self.counts[kind] = _COUNTERS[kind](self.jabmod, self.jabmod['candidates'])
+            return _copy_counts(kind, self.counts[kind])
+
+
+def _appended_votelines(state: _ElectionState, text: str) -> Optional[Dict[str, Any]]:
+    """Parse of the text added since state, if it is only vote lines."""
+    from abiflib import convert_abif_to_jabmod, ABIFVotelineException
+    if len(text) <= state.text_len:
+        return None
+    old_text = text[:state.text_len]
+    if not old_text.endswith('\n') or _digest(old_text) != state.digest:
+        return None
+    added = text[state.text_len:]
+    try:
+        delta = convert_abif_to_jabmod(added)
+    except ABIFVotelineException:
+        return None  # The full parse reports it with the right line number
+    substantive = [line for line in added.splitlines() if line.strip() and not line.lstrip().startswith('#')]
+    candidates = state.jabmod['candidates']
+    if (len(substantive) != len(delta['votelines'])
+            or set(delta['metadata']) != {'ballotcount'}
+            or not set(delta['candidates']) <= set(candidates)):
+        return None
+    # Count candidates missing from the batch as unranked, as a full parse would
+    delta['candidates'] = dict(candidates)
+    return delta
+
+
+def parse_catalog_abif(identifier: str, text: str) -> Tuple[Dict[str, Any], Optional["CatalogTallies"]]:
+    """Parse a catalog election, reusing the cached parse where possible.
+
+    Returns (jabmod, tallies).  tallies is None when the election is not
+    cached (too small, or incremental tallies are off); the caller then
+    tallies jabmod as usual.
+    """
+    from abiflib import convert_abif_to_jabmod
+    max_states = _env_int('AWT_INCREMENTAL_ELECTIONS', DEFAULT_INCREMENTAL_ELECTIONS)
+    if max_states <= 0:
+        return convert_abif_to_jabmod(text), None
+
+    with _STATES_LOCK:
+        state = _STATES.get(identifier)
+        if state is not None:
+            _STATES.move_to_end(identifier)
+
+    if state is not None:
+        with state.lock:
+            if state.text_len == len(text) and state.digest == _digest(text):
+                jabmod = _copy_jabmod(state.jabmod)
+                return jabmod, CatalogTallies(state, state.generation, jabmod)
+            delta = _appended_votelines(state, text)
+            if delta is not None:
+                state.append(text, delta)
+                appended = len(delta['votelines'])
+                logger.info("%s: applied %d appended vote lines (%d ballots)",
+                            identifier, appended, delta['metadata']['ballotcount'])
+                jabmod = _copy_jabmod(state.jabmod)
+                return jabmod, CatalogTallies(state, state.generation, jabmod, appended)
+
+    jabmod = convert_abif_to_jabmod(text)
+    if jabmod['metadata']['ballotcount'] < _env_int('AWT_INCREMENTAL_MIN_BALLOTS', DEFAULT_INCREMENTAL_MIN_BALLOTS):
+        with _STATES_LOCK:
+            _STATES.pop(identifier, None)
+        return jabmod, None
+    state = _ElectionState(text, jabmod)
+    with _STATES_LOCK:
+        _STATES[identifier] = state
+        _STATES.move_to_end(identifier)
+        while len(_STATES) > max_states:
+            _STATES.popitem(last=False)
+    jabmod = _copy_jabmod(jabmod)
+    return jabmod, CatalogTallies(state, state.generation, jabmod)
+
+
+def reset_incremental_state() -> None:
+    """Forget all cached parses (tests)."""
+    with _STATES_LOCK:
+        _STATES.clear()
+
+
+class CatalogTallies:
+    """FPTP, approval and pairwise results for one parse of an election.
+
+    Each method returns None when the result can't be built from the
+    running counts (a ballot transform applies, or the election has been
+    updated since), and the caller tallies the jabmod as usual.
+    """
+
+    def __init__(self, state: _ElectionState, generation: int, jabmod: Dict[str, Any],
+                 appended: int = 0) -> None:
+        self._state = state
+        self._generation = generation
+        self._ballot_type = None
+        self.jabmod = jabmod
+        self.appended = appended
+
+    def ballot_type(self) -> Optional[str]:
+        if self._ballot_type is None:
+            from abiflib.util import find_ballot_type
+            try:
+                self._ballot_type = (self._state.ballot_type_for(self._generation)
+                                     or find_ballot_type(self.jabmod))
+            except Exception:
+                return None
+        return self._ballot_type
+
+    def _counts(self, kind: str):
+        return self._state.counts_for(kind, self._generation)
+
+    def fptp_result(self) -> Optional[Dict[str, Any]]:
+        from abiflib.fptp_tally import FPTP_result_from_abifmodel
+        ballot_type = self.ballot_type()
+        counts = self._counts('fptp') if ballot_type else None
+        if counts is None:
+            return None
+        overvotes = []
+        if counts['overvotes']:
+            # Any two first choices make an overvote
+            overvotes.append({'qty': counts['overvotes'],
+                              'prefs': {cand: {'rank': 1} for cand in list(self.jabmod['candidates'])[:2]}})
+        return FPTP_result_from_abifmodel(_tally_model(self.jabmod, ballot_type, counts['toppicks'], overvotes))
+
+    def approval_jabmod(self, transform_ballots: bool) -> Optional[Dict[str, Any]]:
+        """Stand-in jabmod for ResultConduit.update_approval_result().
+
+        Only for ballots that abiflib tallies for approval as they are
+        (choose_many, and choose_one when ballots may be transformed).
+        """
+        ballot_type = self.ballot_type()
+        if not (ballot_type == 'choose_many' or (ballot_type == 'choose_one' and transform_ballots)):
+            return None
+        counts = self._counts('approval')
+        if counts is None:
+            return None
+        return _tally_model(self.jabmod, ballot_type, counts)
+
+    def pairwise_result(self, transform_ballots: bool) -> Optional[Dict[str, Any]]:
+        ballot_type = self.ballot_type()
+        if transform_ballots and ballot_type == 'choose_many':
+            return None
+        matrix = self._counts('pairwise')
+        if matrix is None:
+            return None
+        return pairwise_result_from_matrix(self.jabmod, matrix, ballot_type)
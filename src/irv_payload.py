@@ -0,0 +1,124 @@
+"""Compact round data for the IRV table's transfer bars and popovers.
+
+irvDisplay.js used to parse IRV_dict['roundmeta'] whole from the
+page: every round's transfers, the pairwise results among the
+eliminated candidates' supporters, and the next-choice tallies of every
+remaining candidate.  The next choices alone grow with candidates
+squared times rounds, so that JSON was most of a large IRV page.
+
+irv_payload() keeps only what the script draws, in columns:
+
+    cands        candidate tokens; everything else refers to these by index
+    startingqty  ballots in round 1
+    counts       per round, votes per candidate index (null when out)
+    transfers    per round, sparse [from, to, votes] triples
+    detail       per round, whether next-choice detail exists
+    digest       fingerprint of counts, to match detail to this tally
+
+The next-choice detail for round i is irv_round_detail() of
+irv_round_details(), served as JSON by /id/<id>/IRV/rounds?round=i (and
+the /sub equivalent) when the reader first opens a popover in that
+round.  The results page keeps irv_round_details() in the cache as it
+renders (one entry per tally, written only if missing), so those
+requests slice its tally rather than recount.  Without
+a detail URL, pass lazy=False to embed the detail as 'next_choices'
+instead.
+
+Destinations that aren't candidates (e.g. 'exhausted') are appended to
+cands as they are met.  The table is built from the whole IRV_dict, so
+the page and the detail endpoint agree on it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, List
+
+__all__ = [
+    'irv_digest',
+    'irv_payload',
+    'irv_round_detail',
+    'irv_round_details',
+]
+
+
+def _candidate_index(irv_dict: Dict[str, Any]) -> List[str]:
+    cands = list(irv_dict['rounds'][0]) if irv_dict.get('rounds') else []
+    cands += [c for c in irv_dict.get('canddict', {}) if c not in cands]
+    seen = set(cands)
+    for meta in irv_dict.get('roundmeta', []):
+        for key in ('transfers', 'next_choices'):
+            for src, tally in (meta.get(key) or {}).items():
+                for tok in [src, *(tally or {})]:
+                    if tok not in seen:
+                        seen.add(tok)
+                        cands.append(tok)
+    return cands
+
+
+def _votes(amount: Any) -> Any:
+    return amount['votes'] if isinstance(amount, dict) and 'votes' in amount else amount
+
+
+def _sparse(tallies: Dict[str, Dict[str, Any]], index: Dict[str, int]) -> List[List[Any]]:
+    return [[index[src], index[dest], _votes(amount)]
+            for src, tally in (tallies or {}).items()
+            for dest, amount in (tally or {}).items()]
+
+
+def _digest(counts: List[List[Any]]) -> str:
+    return hashlib.sha256(json.dumps(counts).encode('utf-8')).hexdigest()[:16]
+
+
+def _columns(irv_dict: Dict[str, Any]):
+    cands = _candidate_index(irv_dict)
+    counts = [[rnd.get(c) for c in cands] for rnd in irv_dict.get('rounds', [])]
+    return cands, {c: i for i, c in enumerate(cands)}, counts
+
+
+def irv_digest(irv_dict: Dict[str, Any]) -> str:
+    """irv_payload(irv_dict)['digest'], without building the payload."""
+    return _digest(_columns(irv_dict)[2])
+
+
+def irv_payload(irv_dict: Dict[str, Any], lazy: bool = True) -> Dict[str, Any]:
+    """The columnar round data for irvDisplay.js (see module docstring)."""
+    cands, index, counts = _columns(irv_dict)
+    roundmeta = irv_dict.get('roundmeta', [])
+    payload = {
+        'cands': cands,
+        'startingqty': roundmeta[0].get('startingqty', 0) if roundmeta else 0,
+        'counts': counts,
+        'transfers': [_sparse(meta.get('transfers'), index) for meta in roundmeta],
+        'detail': [bool(meta.get('next_choices')) for meta in roundmeta],
+        'digest': _digest(counts),
+    }
+    if not lazy:
+        payload['next_choices'] = [_sparse(meta.get('next_choices'), index) for meta in roundmeta]
+    return payload
+
+
+def irv_round_details(irv_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Every round's next-choice tallies as sparse [from, to, votes]
+    triples, indexed like irv_payload(irv_dict)['cands'], with the
+    payload's digest."""
+    _, index, counts = _columns(irv_dict)
+    return {
+        'digest': _digest(counts),
+        'next_choices': [_sparse(meta.get('next_choices'), index) for meta in irv_dict.get('roundmeta', [])],
+    }
+
+
+def irv_round_detail(details: Dict[str, Any], round_index: int) -> Dict[str, Any]:
+    """Round round_index of irv_round_details().
+
+    Raises IndexError for a round the tally doesn't have.
+    """
+    if not 0 <= round_index < len(details['next_choices']):
+        raise IndexError(f"no IRV round {round_index}")
+    return {
+        'round': round_index,
+        'digest': details['digest'],
+        'next_choices': details['next_choices'][round_index],
+    }
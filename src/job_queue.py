@@ -0,0 +1,265 @@
+"""Background jobs for large POST /awt submissions.
+
+A paste larger than AWT_JOB_THRESHOLD bytes (default 1,000,000; 'none'
+disables queuing) is not tallied in the web worker.  POST /awt stores it
+(see src/submissions.py), records a job in a SQLite table and hands the
+job to a small process pool.  The client is redirected to /job/<id>, a
+progress page that polls /job/<id>/status, a single-row read.  Web
+workers stay free for cached traffic in the meantime.
+
+Progress is reported per RouteProfiler span: the worker registers a step
+observer (src.server_util.add_step_observer) and writes each completed
+span to the job row, so the page can show "IRV done, pairwise running".
+
+Settings:
+- AWT_JOB_DB: job table (default ~/src/awt/local/db/awt-jobs.sqlite)
+- AWT_JOB_DIR: rendered results (default ~/src/awt/local/jobs)
+- AWT_JOB_WORKERS: pool size (default 1)
+- AWT_JOB_EVENTS: '1' to follow jobs over Server-Sent Events
+  (/job/<id>/events) instead of polling.  Each open stream holds a web
+  worker, so streams end after JOB_EVENTS_MAX_SECONDS (default off)
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+__all__ = [
+    'DEFAULT_JOB_DB',
+    'DEFAULT_JOB_DIR',
+    'DEFAULT_JOB_THRESHOLD',
+    'JobQueue',
+    'get_job_queue',
+    'job_events_enabled',
+    'job_threshold',
+    'run_job',
+    'should_queue',
+]
+
+DEFAULT_JOB_DB = os.path.join(os.path.expanduser('~'), 'src', 'awt', 'local', 'db', 'awt-jobs.sqlite')
+DEFAULT_JOB_DIR = os.path.join(os.path.expanduser('~'), 'src', 'awt', 'local', 'jobs')
+DEFAULT_JOB_THRESHOLD = 1_000_000
+
+# Jobs left 'running' longer than this by a server that went away are run again
+STALE_RUNNING_SECONDS = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+  id TEXT PRIMARY KEY,
+  abif_hash TEXT NOT NULL,
+  query TEXT NOT NULL,
+  status TEXT NOT NULL,
+  created REAL NOT NULL,
+  started REAL,
+  finished REAL,
+  expected TEXT,
+  steps TEXT,
+  error TEXT
+)
+"""
+
+logger = logging.getLogger('awt.jobs')
+
+
+def job_threshold() -> Optional[int]:
+    """Submission size (bytes) from which POST /awt queues a job, or None."""
+    value = os.environ.get('AWT_JOB_THRESHOLD', '')
+    if value.lower() in ('none', 'off', '0'):
+        return None
+    try:
+        return int(value) if value else DEFAULT_JOB_THRESHOLD
+    except ValueError:
+        return DEFAULT_JOB_THRESHOLD
+
+
+def job_events_enabled() -> bool:
+    """Whether /job/<id>/events streams are served (AWT_JOB_EVENTS)."""
+    return os.environ.get('AWT_JOB_EVENTS', '').lower() in ('1', 'on', 'true', 'yes')
+
+
+def should_queue(abif_text: str) -> bool:
+    threshold = job_threshold()
+    return threshold is not None and len(abif_text.encode('utf-8')) >= threshold
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(_SCHEMA)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_submission ON jobs(abif_hash, query)")
+    return conn
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job['query'] = json.loads(job['query'])
+    job['expected'] = json.loads(job['expected'] or '[]')
+    job['steps'] = json.loads(job['steps'] or '[]')
+    return job
+
+
+def _result_path(result_dir: str, job_id: str) -> str:
+    return os.path.join(result_dir, f"{job_id}.html")
+
+
+class JobQueue:
+    """SQLite job table plus the process pool that runs the jobs."""
+
+    def __init__(self, db_path: str, result_dir: str, max_workers: int = 1) -> None:
+        self.db_path = db_path
+        self.result_dir = result_dir
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # One pool per process (the pool's threads do not survive fork()),
+        # started lazily; the first one also picks up jobs left behind by
+        # a previous server.
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    import multiprocessing
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+                    self._pid = pid
+                    self._resume()
+        return self._executor
+
+    def _resume(self) -> None:
+        stale = time.time() - STALE_RUNNING_SECONDS
+        with _connect(self.db_path) as conn:
+            conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running' AND started < ?", (stale,))
+            pending = [row['id'] for row in conn.execute("SELECT id FROM jobs WHERE status = 'queued'")]
+        for job_id in pending:
+            self._executor.submit(run_job, job_id, self.db_path, self.result_dir)
+
+    def submit(self, abif_hash: str, query: Dict[str, str], expected: List[str]) -> str:
+        """Queue a job for a stored submission; return its id.
+
+        A queued, running or finished job for the same submission and
+        query is reused instead of tallying the election again.
+        """
+        query_json = json.dumps(query, sort_keys=True)
+        with _connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT id, status FROM jobs WHERE abif_hash = ? AND query = ? AND status != 'failed' "
+                "ORDER BY created DESC LIMIT 1", (abif_hash, query_json)).fetchone()
+            if row is not None and (row['status'] != 'done'
+                                    or os.path.exists(_result_path(self.result_dir, row['id']))):
+                return row['id']
+            job_id = uuid.uuid4().hex[:12]
+            conn.execute(
+                "INSERT INTO jobs(id, abif_hash, query, status, created, expected, steps) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, '[]')",
+                (job_id, abif_hash, query_json, time.time(), json.dumps(expected)))
+        logger.info("queued job %s for submission %s", job_id, abif_hash[:12])
+        self._pool().submit(run_job, job_id, self.db_path, self.result_dir)
+        return job_id
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop this process's pool; unfinished jobs stay queued."""
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+        self._executor = None
+        self._pid = None
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with _connect(self.db_path) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def result_html(self, job_id: str) -> Optional[str]:
+        try:
+            with open(_result_path(self.result_dir, job_id), encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+
+_QUEUE: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """The process-wide JobQueue, configured from the environment."""
+    global _QUEUE
+    if _QUEUE is None:
+        try:
+            workers = max(1, int(os.environ.get('AWT_JOB_WORKERS', '1')))
+        except ValueError:
+            workers = 1
+        _QUEUE = JobQueue(os.environ.get('AWT_JOB_DB') or DEFAULT_JOB_DB,
+                          os.environ.get('AWT_JOB_DIR') or DEFAULT_JOB_DIR,
+                          max_workers=workers)
+    return _QUEUE
+
+
+def _update(db_path: str, job_id: str, **fields: Any) -> None:
+    assignments = ', '.join(f"{name} = ?" for name in fields)
+    with _connect(db_path) as conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def run_job(job_id: str, db_path: str, result_dir: str) -> None:
+    """Pool worker: render the submission's results page and store it."""
+    with _connect(db_path) as conn:
+        claimed = conn.execute(
+            "UPDATE jobs SET status = 'running', started = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id)).rowcount
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if not claimed or row is None:
+        return  # Another server process got to it first
+    job = _row_to_job(row)
+
+    from src.server_util import add_step_observer, remove_step_observer
+    from src.submissions import load_submission, parse_methods
+    steps: List[List[Any]] = []
+
+    def record_step(profiler, name, elapsed):
+        steps.append([name, round(elapsed, 4)])
+        _update(db_path, job_id, steps=json.dumps(steps))
+
+    add_step_observer(record_step)
+    try:
+        abif_text = load_submission(job['abif_hash'])
+        if abif_text is None:
+            raise LookupError(f"submission {job['abif_hash']} not found")
+        import awt
+        from flask import url_for
+        query = job['query']
+        with awt.app.test_request_context(f"/sub/{job['abif_hash']}", query_string=query):
+            html = awt.render_submission(
+                abif_text,
+                parse_methods(query.get('methods')),
+                transform_ballots=query.get('transform_ballots') == '1',
+                include_irv_extra=query.get('include_irv_extra') == '1',
+                identifier=job['abif_hash'],
+                irv_rounds_url=url_for('get_submission_irv_rounds', abif_hash=job['abif_hash'],
+                                       **{k: query[k] for k in awt.IRV_ROUND_ARGS if k in query}),
+            )
+        os.makedirs(result_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=result_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(tmp_path, _result_path(result_dir, job_id))
+        _update(db_path, job_id, status='done', finished=time.time())
+    except Exception as exc:
+        logger.exception("job %s failed", job_id)
+        _update(db_path, job_id, status='failed', finished=time.time(), error=f"{type(exc).__name__}: {exc}")
+    finally:
+        remove_step_observer(record_step)
@@ -10,11 +10,23 @@ from pathlib import Path
 from html import escape
 from typing import Optional, Dict, List, Tuple, Any
 
-# Optional dependency - check availability at module level
-try:
-    import cairosvg  # type: ignore
-except ImportError:
-    cairosvg = None
+# Optional dependency - imported on first PNG render (see _cairosvg), since
+# loading cairo is slow and most requests never rasterize anything
+cairosvg = None
+_CAIROSVG_RESOLVED = False
+
+
+def _cairosvg():
+    """Return the cairosvg module, or None if it isn't installed."""
+    global cairosvg, _CAIROSVG_RESOLVED
+    if not _CAIROSVG_RESOLVED:
+        _CAIROSVG_RESOLVED = True
+        try:
+            import cairosvg as _cairosvg_mod  # type: ignore
+        except ImportError:
+            _cairosvg_mod = None
+        cairosvg = _cairosvg_mod
+    return cairosvg
 
 
 # Constants
@@ -422,7 +434,7 @@ def render_svg_to_png(svg_text: str, width: int = PREVIEW_WIDTH,
     Raises:
         RuntimeError: If CairoSVG not available
     """
-    if cairosvg is None:
+    if _cairosvg() is None:
         raise RuntimeError("CairoSVG not available for PNG rendering")
 
     return cairosvg.svg2png(
@@ -451,7 +463,7 @@ def render_svg_file_to_png(svg_path: Path, width: int = PREVIEW_WIDTH,
         RuntimeError: If CairoSVG not available
         FileNotFoundError: If file does not exist
     """
-    if cairosvg is None:
+    if _cairosvg() is None:
         raise RuntimeError("CairoSVG not available for PNG rendering")
     svg_path = Path(svg_path)
     if not svg_path.exists():
@@ -474,7 +486,7 @@ def render_svg_file_to_png(svg_path: str, width: int = PREVIEW_WIDTH, height: in
         RuntimeError: If CairoSVG not available
         FileNotFoundError: If SVG file not found
     """
-    if cairosvg is None:
+    if _cairosvg() is None:
         raise RuntimeError("CairoSVG not available for PNG rendering")
 
     return cairosvg.svg2png(url=svg_path, output_width=width, output_height=height)
@@ -494,7 +506,7 @@ def render_frame_png(width: int = PREVIEW_WIDTH, height: int = PREVIEW_HEIGHT) -
         RuntimeError: If CairoSVG not available
         FileNotFoundError: If frame SVG not found
     """
-    if cairosvg is None:
+    if _cairosvg() is None:
         raise RuntimeError("CairoSVG not available for PNG rendering")
 
     frame_path = get_frame_svg_path()
@@ -514,7 +526,7 @@ def render_generic_preview_png() -> bytes:
         RuntimeError: If CairoSVG not available
         FileNotFoundError: If generic SVG not found
     """
-    if cairosvg is None:
+    if _cairosvg() is None:
         raise RuntimeError("CairoSVG not available for PNG rendering")
 
     # Import here to avoid circular imports
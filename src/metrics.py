@@ -0,0 +1,495 @@
+"""In-process metrics for awt, exposed in Prometheus text format.
+
+A MetricsRegistry in each process records:
+- awt_span_duration_seconds: RouteProfiler spans (FPTP, IRV, pairwise, ...)
+- awt_request_duration_seconds / awt_requests_total: per-route latency and
+  status counts for every request
+- awt_cache_requests_total: page cache hits and misses per route
+- awt_requests_in_flight: requests currently being handled
+
+With several worker processes (gunicorn, uwsgi, ...), set AWT_METRICS_DIR
+to a directory shared by the workers.  Each process then writes a snapshot
+of its registry to `<dir>/metrics-<pid>.json` (at most once per flush
+interval, and at exit), and /metrics merges every snapshot so a scrape
+gives the same totals whichever worker answers it.  Counters and
+histograms are summed across all snapshots, including workers that have
+exited, so totals never go backwards; gauges only count live processes.
+The snapshots of exited workers are folded into `<dir>/metrics-dead.json`
+and deleted, so the directory holds one file per live worker, and a new
+process that reuses an old pid folds the old file before writing its own.
+Clear the directory when deploying a new release.
+
+/metrics answers only requests that metrics_request_allowed() accepts:
+AWT_METRICS_PUBLIC=1, the AWT_ADMIN_TOKEN, or a direct request from the
+same host.
+"""
+
+from __future__ import annotations
+
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.request_profiling import admin_token_ok
+from src.server_util import add_span_observer
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None
+
+__all__ = [
+    'CONTENT_TYPE',
+    'DEFAULT_BUCKETS',
+    'MetricsRegistry',
+    'REGISTRY',
+    'enable_metrics',
+    'instrument_cache',
+    'merge_snapshots',
+    'metrics_request_allowed',
+    'render_metrics',
+    'render_prometheus',
+]
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; the tail is long because cold /id renders of big elections are slow
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_INFO = {
+    'awt_span_duration_seconds': ('histogram', 'Time spent in RouteProfiler spans.'),
+    'awt_request_duration_seconds': ('histogram', 'Request latency by route.'),
+    'awt_requests_total': ('counter', 'Requests handled, by route, method and status.'),
+    'awt_cache_requests_total': ('counter', 'Page cache lookups, by route and result (hit/miss).'),
+    'awt_requests_in_flight': ('gauge', 'Requests currently being handled.'),
+}
+
+logger = logging.getLogger('awt.metrics')
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, Any]]) -> LabelKey:
+    return tuple(sorted((str(k), str(v)) for k, v in (labels or {}).items()))
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms for one process."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.pid = os.getpid()
+        # Tells this process's snapshot apart from an exited one with the same pid
+        self.instance = uuid.uuid4().hex
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._gauges: Dict[Tuple[str, LabelKey], float] = {}
+        # value: [per-bucket counts (last one is +Inf), sum, count]
+        self._histograms: Dict[Tuple[str, LabelKey], list] = {}
+
+    def _check_fork(self) -> None:
+        # A worker forked from a preloaded parent must not re-report the
+        # parent's numbers under its own pid.
+        if self.pid != os.getpid():
+            self._reset()
+
+    def inc(self, name: str, labels: Optional[Dict[str, Any]] = None, amount: float = 1.0) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._check_fork()
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    def add_gauge(self, name: str, labels: Optional[Dict[str, Any]] = None, amount: float = 1.0) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._check_fork()
+            self._gauges[key] = self._gauges.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None) -> None:
+        key = (name, _label_key(labels))
+        idx = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                idx = i
+                break
+        with self._lock:
+            self._check_fork()
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._histograms[key] = hist
+            hist[0][idx] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a JSON-serializable copy of this registry."""
+        with self._lock:
+            self._check_fork()
+            return {
+                'pid': self.pid,
+                'instance': self.instance,
+                'time': time.time(),
+                'buckets': list(self.buckets),
+                'counters': [[n, [list(p) for p in lk], v] for (n, lk), v in self._counters.items()],
+                'gauges': [[n, [list(p) for p in lk], v] for (n, lk), v in self._gauges.items()],
+                'histograms': [[n, [list(p) for p in lk], list(h[0]), h[1], h[2]]
+                               for (n, lk), h in self._histograms.items()],
+            }
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def merge_snapshots(snapshots: List[Dict[str, Any]], buckets: Iterable[float] = DEFAULT_BUCKETS) -> Dict[str, Any]:
+    """Combine per-process snapshots into one set of series.
+
+    Counters and histograms are summed over every snapshot; gauges only
+    over snapshots whose process is still alive.  Histograms recorded with
+    different bucket bounds (an older release) are skipped.
+    """
+    buckets = list(buckets)
+    counters: Dict[Tuple[str, LabelKey], float] = {}
+    gauges: Dict[Tuple[str, LabelKey], float] = {}
+    histograms: Dict[Tuple[str, LabelKey], list] = {}
+    for snap in snapshots:
+        for name, labels, value in snap.get('counters', []):
+            key = (name, _label_key(dict(labels)))
+            counters[key] = counters.get(key, 0.0) + value
+        if _pid_alive(int(snap.get('pid', 0) or 0)):
+            for name, labels, value in snap.get('gauges', []):
+                key = (name, _label_key(dict(labels)))
+                gauges[key] = gauges.get(key, 0.0) + value
+        if list(snap.get('buckets', [])) != buckets:
+            continue
+        for name, labels, counts, total, count in snap.get('histograms', []):
+            key = (name, _label_key(dict(labels)))
+            hist = histograms.setdefault(key, [[0] * (len(buckets) + 1), 0.0, 0])
+            hist[0] = [a + b for a, b in zip(hist[0], counts)]
+            hist[1] += total
+            hist[2] += count
+    return {'buckets': buckets, 'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape_label_value(v)}"' for k, v in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def render_prometheus(merged: Dict[str, Any]) -> str:
+    """Render merge_snapshots() output in the Prometheus text format."""
+    lines: List[str] = []
+    series_by_name: Dict[str, list] = {}
+    for kind in ('counters', 'gauges', 'histograms'):
+        for (name, labels), value in merged[kind].items():
+            series_by_name.setdefault(name, []).append((labels, value))
+    for name in sorted(series_by_name):
+        mtype, helptext = METRIC_INFO.get(name, ('untyped', name))
+        lines.append(f"# HELP {name} {helptext}")
+        lines.append(f"# TYPE {name} {mtype}")
+        for labels, value in sorted(series_by_name[name]):
+            if mtype != 'histogram':
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(merged['buckets'], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', repr(float(bound))))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+DEAD_SNAPSHOT = 'metrics-dead.json'
+
+
+def _fold_snapshot(total: Dict[str, Any], snap: Dict[str, Any]) -> None:
+    """Add snap's counters and histograms to total (a snapshot dict)."""
+    merged = merge_snapshots([total, snap], total['buckets'])
+    total['counters'] = [[n, [list(p) for p in lk], v] for (n, lk), v in merged['counters'].items()]
+    total['histograms'] = [[n, [list(p) for p in lk], list(h[0]), h[1], h[2]]
+                           for (n, lk), h in merged['histograms'].items()]
+
+
+class _SnapshotWriter:
+    """Write REGISTRY to <metrics_dir>/metrics-<pid>.json now and then."""
+
+    def __init__(self, registry: MetricsRegistry, metrics_dir: Optional[str] = None,
+                 interval: float = 1.0) -> None:
+        self.registry = registry
+        self.metrics_dir = metrics_dir
+        self.interval = interval
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+        # Registry instance whose first write has been made (after folding
+        # any older file under the same pid)
+        self._written_instance: Optional[str] = None
+
+    def snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.metrics_dir, f"metrics-{pid}.json")
+
+    def _dir_lock(self):
+        """Open and exclusively lock <metrics_dir>/metrics.lock (None without fcntl)."""
+        if fcntl is None:
+            return None
+        lock_file = open(os.path.join(self.metrics_dir, 'metrics.lock'), 'a')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def fold_stale(self, own: Dict[str, Any]) -> None:
+        """Move snapshots of exited processes, and an older snapshot under
+        our own pid, into DEAD_SNAPSHOT and delete them.  Call with the
+        directory lock held."""
+        dead_path = os.path.join(self.metrics_dir, DEAD_SNAPSHOT)
+        try:
+            with open(dead_path, 'r', encoding='utf-8') as f:
+                dead = json.load(f)
+        except (OSError, ValueError):
+            dead = None
+        if not dead or list(dead.get('buckets', [])) != list(self.registry.buckets):
+            dead = {'pid': 0, 'buckets': list(self.registry.buckets),
+                    'counters': [], 'gauges': [], 'histograms': []}
+        stale = []
+        for path in glob.glob(os.path.join(self.metrics_dir, 'metrics-[0-9]*.json')):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    snap = json.load(f)
+            except (OSError, ValueError):
+                continue
+            pid = int(snap.get('pid', 0) or 0)
+            if pid == own['pid']:
+                if snap.get('instance') == own['instance']:
+                    continue
+            elif _pid_alive(pid):
+                continue
+            _fold_snapshot(dead, snap)
+            stale.append(path)
+        if not stale:
+            return
+        dead['time'] = time.time()
+        tmp_path = f"{dead_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dead, f)
+        os.replace(tmp_path, dead_path)
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def flush(self, force: bool = False) -> None:
+        if not self.metrics_dir:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.interval:
+            return
+        if not self._lock.acquire(blocking=force):
+            return  # another thread is already writing
+        try:
+            self._last_flush = now
+            snap = self.registry.snapshot()
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            path = self.snapshot_path(snap['pid'])
+            tmp_path = f"{path}.tmp"
+            # First write: fold a file left by an exited process that had our
+            # pid, rather than overwriting its counters
+            first = self._written_instance != snap['instance']
+            lock_file = self._dir_lock() if first else None
+            try:
+                if first:
+                    self.fold_stale(snap)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(snap, f)
+                os.replace(tmp_path, path)
+                self._written_instance = snap['instance']
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+        except OSError as exc:
+            logger.warning(f"could not write metrics snapshot: {exc}")
+        finally:
+            self._lock.release()
+
+    def collect(self) -> List[Dict[str, Any]]:
+        """Own live snapshot plus the latest file from every other process."""
+        own = self.registry.snapshot()
+        snapshots = [own]
+        if not self.metrics_dir:
+            return snapshots
+        try:
+            lock_file = self._dir_lock()
+            try:
+                self.fold_stale(own)
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+        except OSError as exc:
+            logger.warning(f"could not fold exited workers' metrics: {exc}")
+        for path in glob.glob(os.path.join(self.metrics_dir, 'metrics-*.json')):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    snap = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if snap.get('pid') != own['pid']:
+                snapshots.append(snap)
+        return snapshots
+
+
+_WRITER = _SnapshotWriter(REGISTRY)
+
+
+def render_metrics() -> str:
+    """Prometheus text for all workers sharing AWT_METRICS_DIR."""
+    _WRITER.flush(force=True)
+    return render_prometheus(merge_snapshots(_WRITER.collect(), REGISTRY.buckets))
+
+
+def metrics_request_allowed() -> bool:
+    """Whether the current request may read /metrics.
+
+    Allowed with AWT_METRICS_PUBLIC=1, with the AWT_ADMIN_TOKEN (an
+    X-AWT-Admin-Token header or `Authorization: Bearer <token>`), or for
+    a request from the loopback address that did not come through a
+    proxy (no X-Forwarded-For), e.g. `python3 awt.py` on a workstation.
+    """
+    from flask import request
+    if os.environ.get('AWT_METRICS_PUBLIC', '').lower() in ('1', 'on', 'true', 'yes'):
+        return True
+    auth = request.headers.get('Authorization', '')
+    token = request.headers.get('X-AWT-Admin-Token') or (auth[7:] if auth.startswith('Bearer ') else None)
+    if admin_token_ok(token):
+        return True
+    proxied = 'X-Forwarded-For' in request.headers
+    return request.remote_addr in ('127.0.0.1', '::1') and not proxied
+
+
+def _current_route() -> str:
+    try:
+        from flask import request
+        rule = request.url_rule
+    except Exception:
+        return '<none>'
+    # Unmatched URLs share one label so random 404s can't explode cardinality
+    return rule.rule if rule is not None else '<unmatched>'
+
+
+def observe_route_profiler(profiler, total: float) -> None:
+    """Span observer: feed RouteProfiler spans into the span histogram."""
+    for name, values in profiler.spans.items():
+        for elapsed in values:
+            REGISTRY.observe('awt_span_duration_seconds', elapsed,
+                             {'span': name, 'resulttype': profiler.resulttype})
+
+
+def instrument_cache(cache) -> None:
+    """Count hits and misses on the Flask-Caching backend's get().
+
+    Call again after every cache.init_app(), which replaces the backend.
+    """
+    try:
+        backend = cache.cache
+    except (AttributeError, KeyError, RuntimeError):
+        # Not initialised for the current app (e.g. awt re-imported as a
+        # module while awt.py runs as __main__ and handles a request)
+        return
+    if backend is None or getattr(backend, '_awt_metrics_instrumented', False):
+        return
+    orig_get = backend.get
+
+    def counted_get(key):
+        result = orig_get(key)
+        REGISTRY.inc('awt_cache_requests_total',
+                      {'route': _current_route(), 'result': 'miss' if result is None else 'hit'})
+        return result
+
+    backend.get = counted_get
+    backend._awt_metrics_instrumented = True
+
+
+def enable_metrics(app, metrics_dir: Optional[str] = None, flush_interval: Optional[float] = None) -> None:
+    """Record request metrics for app and feed RouteProfiler spans in.
+
+    metrics_dir (default: AWT_METRICS_DIR) turns on multi-process
+    aggregation; calling again later only updates the directory/interval.
+    """
+    if metrics_dir is None:
+        metrics_dir = os.environ.get('AWT_METRICS_DIR') or None
+    if flush_interval is None:
+        flush_interval = float(os.environ.get('AWT_METRICS_FLUSH_INTERVAL', '1.0'))
+    if metrics_dir:
+        _WRITER.metrics_dir = metrics_dir
+    _WRITER.interval = flush_interval
+    if 'awt_metrics' in app.extensions:
+        return
+    app.extensions['awt_metrics'] = REGISTRY
+    add_span_observer(observe_route_profiler)
+    atexit.register(_WRITER.flush, True)
+
+    from flask import g, request
+
+    @app.before_request
+    def _metrics_request_start():
+        g._awt_metrics_start = time.perf_counter()
+        g._awt_metrics_route = _current_route()
+        REGISTRY.add_gauge('awt_requests_in_flight', {'route': g._awt_metrics_route}, 1)
+
+    @app.after_request
+    def _metrics_request_status(response):
+        g._awt_metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _metrics_request_end(exc):
+        start = g.pop('_awt_metrics_start', None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        route = g.pop('_awt_metrics_route', '<none>')
+        status = g.pop('_awt_metrics_status', 500 if exc is not None else 200)
+        REGISTRY.add_gauge('awt_requests_in_flight', {'route': route}, -1)
+        REGISTRY.observe('awt_request_duration_seconds', elapsed,
+                         {'route': route, 'method': request.method})
+        REGISTRY.inc('awt_requests_total',
+                     {'route': route, 'method': request.method, 'status': status})
+        _WRITER.flush()
@@ -0,0 +1,220 @@
+"""On-demand cProfile capture for individual /id requests.
+
+A request is profiled when any of these is true:
+- it carries a valid signed `X-AWT-Profile` header (see
+  sign_profile_header(); the secret is AWT_PROFILE_SECRET),
+- its `profile` query parameter equals AWT_ADMIN_TOKEN,
+- it is picked by random sampling at AWT_PROFILE_SAMPLE_RATE (0.0-1.0).
+
+Profiled requests bypass the page cache, so the whole pipeline runs.  Each
+profile is written to AWT_PROFILE_DIR (default ~/src/awt/local/profiles)
+as `<b1060time>-<election id>-<req_id>.cprof`, with a `.json` sidecar
+holding the RouteProfiler spans.  Only the newest AWT_PROFILE_KEEP
+profiles (default 200) are kept.  The response carries the req_id in an
+`X-AWT-Profile-Id` header.
+
+`perf_awt.py profiles` lists, summarizes and signs requests for these.
+The older process-wide AWT_PROFILE_OUTPUT (`awt.py --profile-output`)
+still profiles every request into a single file.
+"""
+
+from __future__ import annotations
+
+import glob
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from src.server_util import b1060time_from_epoch
+
+__all__ = [
+    'DEFAULT_PROFILE_DIR',
+    'PROFILE_HEADER',
+    'PROFILE_ID_HEADER',
+    'admin_token_ok',
+    'bypass_cache_for_profiling',
+    'enable_request_profiling',
+    'list_request_profiles',
+    'profile_reason',
+    'save_request_profile',
+    'sign_profile_header',
+    'verify_profile_header',
+]
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.expanduser('~'), 'src', 'awt', 'local', 'profiles')
+DEFAULT_PROFILE_KEEP = 200
+
+PROFILE_HEADER = 'X-AWT-Profile'
+PROFILE_ID_HEADER = 'X-AWT-Profile-Id'
+
+
+def _profile_signature(secret: str, expires: int, path: str) -> str:
+    message = f"{expires}:{path}".encode('utf-8')
+    return hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+
+def sign_profile_header(path: str, secret: Optional[str] = None, ttl: int = 300) -> str:
+    """Return an X-AWT-Profile value that is valid for `path` for ttl seconds."""
+    secret = secret or os.environ.get('AWT_PROFILE_SECRET')
+    if not secret:
+        raise ValueError("AWT_PROFILE_SECRET is not set")
+    expires = int(time.time()) + ttl
+    return f"{expires}.{_profile_signature(secret, expires, path)}"
+
+
+def verify_profile_header(value: Optional[str], path: str, secret: Optional[str] = None) -> bool:
+    secret = secret or os.environ.get('AWT_PROFILE_SECRET')
+    if not value or not secret:
+        return False
+    expires_str, _, signature = value.strip().partition('.')
+    try:
+        expires = int(expires_str)
+    except ValueError:
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(signature, _profile_signature(secret, expires, path))
+
+
+def admin_token_ok(value: Optional[str]) -> bool:
+    """True if value matches AWT_ADMIN_TOKEN (never true when it is unset)."""
+    token = os.environ.get('AWT_ADMIN_TOKEN')
+    if not token or not value:
+        return False
+    return hmac.compare_digest(value, token)
+
+
+def _sample_rate() -> float:
+    try:
+        return float(os.environ.get('AWT_PROFILE_SAMPLE_RATE', '0') or 0)
+    except ValueError:
+        return 0.0
+
+
+def profile_reason() -> Optional[str]:
+    """Why the current request should be profiled ('header', 'admin',
+    'sample'), or None.  Decided once per request."""
+    from flask import g, request
+    if 'awt_profile_reason' in g:
+        return g.awt_profile_reason
+    reason = None
+    if verify_profile_header(request.headers.get(PROFILE_HEADER), request.path):
+        reason = 'header'
+    elif admin_token_ok(request.args.get('profile')):
+        reason = 'admin'
+    else:
+        rate = _sample_rate()
+        if rate > 0 and random.random() < rate:
+            reason = 'sample'
+    g.awt_profile_reason = reason
+    return reason
+
+
+def bypass_cache_for_profiling() -> bool:
+    """`unless=` callback for cache.cached(): profiled requests skip the cache."""
+    return profile_reason() is not None
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', value)[:80] or 'unknown'
+
+
+def _profile_dir() -> str:
+    return os.environ.get('AWT_PROFILE_DIR') or DEFAULT_PROFILE_DIR
+
+
+def _profile_keep() -> int:
+    try:
+        return int(os.environ.get('AWT_PROFILE_KEEP', DEFAULT_PROFILE_KEEP))
+    except ValueError:
+        return DEFAULT_PROFILE_KEEP
+
+
+def _scrub(text: str) -> str:
+    # Keep the admin token out of profile metadata
+    return re.sub(r'(^|[?&])profile=[^&]*', r'\1profile=***', text or '')
+
+
+def save_request_profile(prof, profiler, reason: str, total: Optional[float] = None,
+                         profile_dir: Optional[str] = None) -> str:
+    """Write prof (a disabled cProfile.Profile) and a JSON sidecar; rotate."""
+    from flask import g
+    profile_dir = profile_dir or _profile_dir()
+    os.makedirs(profile_dir, exist_ok=True)
+    now = time.time()
+    base = f"{b1060time_from_epoch(now)}-{_safe_name(profiler.identifier)}-{profiler.req_id}"
+    cprof_path = os.path.join(profile_dir, f"{base}.cprof")
+    prof.dump_stats(cprof_path)
+    meta = {
+        'req_id': profiler.req_id,
+        'election_id': profiler.identifier,
+        'resulttype': profiler.resulttype,
+        'path': _scrub(profiler.path),
+        'query': _scrub(profiler.query_string),
+        'reason': reason,
+        'time': now,
+        'total_s': total,
+        'ballots': profiler.ballots,
+        'candidates': profiler.candidates,
+        'spans': {name: sum(values) for name, values in profiler.spans.items()},
+    }
+    with open(os.path.join(profile_dir, f"{base}.json"), 'w') as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
+    g.awt_profile_id = profiler.req_id
+    profiler.log("cprofile saved", output=cprof_path, reason=reason)
+    _rotate(profile_dir, _profile_keep())
+    return cprof_path
+
+
+def _mtime_key(path: str):
+    try:
+        return (os.stat(path).st_mtime_ns, path)
+    except OSError:
+        return (0, path)
+
+
+def _rotate(profile_dir: str, keep: int) -> None:
+    # b1060 names only resolve to the second, so order by mtime
+    profiles = sorted(glob.glob(os.path.join(profile_dir, '*.cprof')), key=_mtime_key)
+    for old in profiles[:max(len(profiles) - keep, 0)]:
+        for path in (old, old[:-len('.cprof')] + '.json'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def list_request_profiles(profile_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Sidecar metadata of stored profiles, newest first, with 'cprof' paths."""
+    profile_dir = profile_dir or _profile_dir()
+    entries = []
+    for cprof_path in sorted(glob.glob(os.path.join(profile_dir, '*.cprof')), key=_mtime_key, reverse=True):
+        meta: Dict[str, Any] = {}
+        try:
+            with open(cprof_path[:-len('.cprof')] + '.json') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            pass
+        meta['cprof'] = cprof_path
+        entries.append(meta)
+    return entries
+
+
+def enable_request_profiling(app) -> None:
+    """Add the X-AWT-Profile-Id response header for profiled requests."""
+    if 'awt_request_profiling' in app.extensions:
+        return
+    app.extensions['awt_request_profiling'] = True
+
+    @app.after_request
+    def _profile_id_header(response):
+        from flask import g
+        profile_id = g.get('awt_profile_id')
+        if profile_id:
+            response.headers[PROFILE_ID_HEADER] = profile_id
+        return response
@@ -0,0 +1,104 @@
+"""Low-overhead statistical profiler for a live awt worker.
+
+sample_stacks() starts a timer thread that, every `interval` seconds for
+`duration` seconds, reads the current frame of every other thread with
+sys._current_frames() and counts each distinct call stack.  Nothing is
+hooked into the interpreter, so the code being sampled (abiflib tallies,
+template rendering, ...) runs at full speed apart from the GIL hand-offs
+of the sampler itself.
+
+The result is in "collapsed stack" form, one `frame;frame;frame count`
+line per stack, root first, which flamegraph.pl, speedscope and similar
+tools read directly.  awt.py exposes it at /admin/profile/sample.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Iterable, Optional
+
+__all__ = [
+    'MAX_DURATION',
+    'SamplerBusy',
+    'collapse_stacks',
+    'sample_stacks',
+]
+
+MAX_DURATION = 60.0
+MIN_INTERVAL = 0.001
+
+# Leaf functions of threads that are waiting rather than working (server
+# accept loops, idle pool workers, ...); dropped unless idle=True
+IDLE_LEAVES = frozenset({
+    'wait', 'select', 'poll', 'accept', 'sleep', 'get', 'acquire',
+    '_recv_into', 'readinto', 'recv', 'recv_into', 'serve_forever', 'epoll',
+})
+
+_SAMPLING_LOCK = threading.Lock()
+
+
+class SamplerBusy(RuntimeError):
+    """Another sampling session is already running in this process."""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack_of(frame) -> list[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def sample_stacks(duration: float, interval: float = 0.005, *, idle: bool = False,
+                  by_thread: bool = False, exclude: Iterable[int] = ()) -> Counter:
+    """Sample all other threads' stacks; return Counter of collapsed stacks.
+
+    exclude lists thread idents to skip (the caller's own thread is always
+    skipped).  With by_thread=True each stack is prefixed with the thread
+    name.  Raises SamplerBusy if a session is already running.
+    """
+    duration = min(max(float(duration), 0.0), MAX_DURATION)
+    interval = max(float(interval), MIN_INTERVAL)
+    if not _SAMPLING_LOCK.acquire(blocking=False):
+        raise SamplerBusy("a sampling session is already running")
+    counts: Counter = Counter()
+    skip = set(exclude) | {threading.get_ident()}
+    try:
+        def run():
+            skip.add(threading.get_ident())
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()} if by_thread else {}
+                for ident, frame in sys._current_frames().items():
+                    if ident in skip:
+                        continue
+                    if not idle and frame.f_code.co_name in IDLE_LEAVES:
+                        continue
+                    stack = _stack_of(frame)
+                    if by_thread:
+                        stack.insert(0, f"thread:{names.get(ident, ident)}")
+                    counts[';'.join(stack)] += 1
+                time.sleep(interval)
+
+        sampler = threading.Thread(target=run, name='awt-stack-sampler', daemon=True)
+        sampler.start()
+        sampler.join()
+    finally:
+        _SAMPLING_LOCK.release()
+    return counts
+
+
+def collapse_stacks(counts: Counter, limit: Optional[int] = None) -> str:
+    """Render counts as collapsed-stack text, most frequent first."""
+    lines = [f"{stack} {count}" for stack, count in counts.most_common(limit)]
+    return '\n'.join(lines) + ('\n' if lines else '')
@@ -7,7 +7,12 @@ but are not Flask route handlers or presentation logic.
 Currently includes:
 - b1060time formatting helpers (UTC, fixed width) per the spec below.
 - RouteProfiler, which records per-request timings and mirrors them to
-  both the console logger and the optional ABIF log.
+  both the console logger and the optional ABIF log.  With
+  AWT_PROFILE_MEMORY=1 it also records tracemalloc net/peak bytes and the
+  top allocation sites for every span.
+- Startup path discovery (static/templates/testdata), cached in a small
+  JSON file so worker boot doesn't have to probe the filesystem or
+  import abiflib.
 
 Spec and rationale for b1060time:
 https://github.com/robla/base10x60timestamp
@@ -16,23 +21,38 @@ https://github.com/robla/base10x60timestamp
 from __future__ import annotations
 
 import datetime as _dt
+import json
 import logging
+import os
+import sys
 import time
+import tracemalloc
 import uuid
 from collections import defaultdict
-from typing import Any, Dict, Optional
+from pathlib import Path
+from typing import Any, Dict, List, Optional
 
-try:
-    from abiflib.devtools import abiflib_test_log
-except Exception:  # pragma: no cover - dev helper may be absent in tests
-    abiflib_test_log = None
+# abiflib.devtools is resolved on first use (see _abiflib_logger) because
+# importing anything from abiflib pulls in its whole tally surface.
+ABIFLIB_LOGGER = None
+_ABIFLIB_LOGGER_RESOLVED = False
 
-ABIFLIB_LOGGER = abiflib_test_log if callable(abiflib_test_log) else None
+# Small JSON file remembering where static/templates/testdata were found
+DEFAULT_PATHS_CACHE = os.path.join(os.path.expanduser('~'), 'src', 'awt', 'local', 'awt-paths.json')
+_PATHS_CACHE_VERSION = 2
+# Most installs an awt-paths.json remembers; the least recently probed go first
+MAX_PATHS_CACHE_ENTRIES = 8
 
 __all__ = [
     'RouteProfiler',
+    'add_span_observer',
+    'add_step_observer',
     'b1060time_from_datetime',
     'b1060time_from_epoch',
+    'discover_awt_paths',
+    'load_awt_paths',
+    'remove_span_observer',
+    'remove_step_observer',
 ]
 
 # Alphabet for base-60 time digits (HH, MM, SS)
@@ -68,12 +88,287 @@ def _now_b1060() -> str:
     return b1060time_from_datetime(_dt.datetime.now(_dt.timezone.utc))
 
 
+def _abiflib_logger():
+    global ABIFLIB_LOGGER, _ABIFLIB_LOGGER_RESOLVED
+    if not _ABIFLIB_LOGGER_RESOLVED:
+        _ABIFLIB_LOGGER_RESOLVED = True
+        try:
+            from abiflib.devtools import abiflib_test_log
+        except Exception:  # pragma: no cover - dev helper may be absent in tests
+            abiflib_test_log = None
+        ABIFLIB_LOGGER = abiflib_test_log if callable(abiflib_test_log) else None
+    return ABIFLIB_LOGGER
+
+
+# --- Startup path discovery ---
+
+def _venv_root() -> Path:
+    exe_path = Path(sys.argv[0]).resolve()
+    # If running as 'python -m awt', sys.argv[0] may be 'python', so also try sys.executable
+    if exe_path.name == 'python' or exe_path.name.startswith('python'):
+        exe_path = Path(sys.executable).resolve()
+    return exe_path.parent.parent  # bin/ -> venv/
+
+
+def _find_awt_pkg_dir() -> Optional[Path]:
+    try:
+        import importlib.util
+        return Path(importlib.util.find_spec('awt').origin).parent
+    except Exception:
+        return None
+
+
+def discover_awt_paths(awt_py_dir) -> Dict[str, Any]:
+    """Probe the filesystem for awt's static, template and testdata dirs.
+
+    This is the slow path behind load_awt_paths().  Static/template
+    directories honor AWT_STATIC/AWT_TEMPLATES, then are searched for, in
+    order: next to awt.py, in the installed package data dir, under
+    sys.prefix, in the current working directory, and next to the
+    executable's bin directory.  Finding the abiftool testdata requires
+    importing abiflib.
+    """
+    awt_py_dir = Path(awt_py_dir)
+    static = os.getenv("AWT_STATIC")
+    templates = os.getenv("AWT_TEMPLATES")
+    pkg_dir = _find_awt_pkg_dir()
+
+    candidates = [(awt_py_dir / 'static', awt_py_dir / 'templates')]
+    if pkg_dir:
+        candidates.append((pkg_dir / 'awt-static', pkg_dir / 'awt-templates'))
+    candidates.append((Path(sys.prefix) / 'awt-static', Path(sys.prefix) / 'awt-templates'))
+    candidates.append((Path.cwd() / 'static', Path.cwd() / 'templates'))
+    try:
+        venv_root = _venv_root()
+        candidates.append((venv_root / 'awt-static', venv_root / 'awt-templates'))
+    except Exception:
+        venv_root = None
+    for static_candidate, templates_candidate in candidates:
+        if static and templates:
+            break
+        if not static and static_candidate.is_dir():
+            static = str(static_candidate)
+        if not templates and templates_candidate.is_dir():
+            templates = str(templates_candidate)
+
+    # Search path for the standalone Jinja2 environments in awt.py
+    template_search = [templates, str(awt_py_dir / 'templates'),
+                       os.path.join(sys.prefix, 'awt-templates')]
+    if venv_root:
+        template_search.append(str(venv_root / 'awt-templates'))
+    if pkg_dir:
+        template_search.append(str(pkg_dir / 'awt-templates'))
+    template_dirs = []
+    for tdir in template_search:
+        if tdir and os.path.isdir(tdir) and tdir not in template_dirs:
+            template_dirs.append(tdir)
+
+    from abiflib.util import get_abiftool_dir
+    abiftool_dir = get_abiftool_dir()
+    testfiledir = Path(abiftool_dir) / 'testdata'
+    # Fallback for packaged installs where testdata is under the venv prefix
+    if not testfiledir.is_dir():
+        prefix_testdata = Path(sys.prefix) / 'testdata'
+        if prefix_testdata.is_dir():
+            testfiledir = prefix_testdata
+
+    return {
+        'static': static,
+        'templates': templates,
+        'template_dirs': template_dirs,
+        'abiftool_dir': abiftool_dir,
+        'testfiledir': str(testfiledir),
+    }
+
+
+def _paths_cache_key(awt_py_dir) -> str:
+    parts = [str(awt_py_dir), sys.prefix, sys.executable,
+             os.getenv('AWT_STATIC') or '', os.getenv('AWT_TEMPLATES') or '']
+    return '|'.join(parts)
+
+
+def _found_outside_key(awt_py_dir, paths: Dict[str, Any]) -> bool:
+    """Whether discovery fell back to the working directory or the
+    launcher's venv, which the cache key leaves out: every launcher and
+    directory would otherwise get an entry of its own."""
+    keyed = {str(Path(awt_py_dir) / 'static'), str(Path(awt_py_dir) / 'templates'),
+             os.path.join(sys.prefix, 'awt-static'), os.path.join(sys.prefix, 'awt-templates')}
+    pkg_dir = _find_awt_pkg_dir()
+    if pkg_dir:
+        keyed |= {str(pkg_dir / 'awt-static'), str(pkg_dir / 'awt-templates')}
+    fallbacks = {str(Path.cwd() / 'static'), str(Path.cwd() / 'templates')}
+    try:
+        fallbacks |= {str(_venv_root() / 'awt-static'), str(_venv_root() / 'awt-templates')}
+    except Exception:
+        pass
+    found = {paths.get('static'), paths.get('templates'), *paths.get('template_dirs', [])}
+    return bool(found & (fallbacks - keyed))
+
+
+def _mtime_ns(path: Optional[str]) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns if path else None
+    except OSError:
+        return None
+
+
+def _paths_stamps(paths: Dict[str, Any]) -> Dict[str, Any]:
+    """Modification times of the files that identify the discovered
+    directories.  Upgrading or moving abiflib/abiftool or the templates
+    changes them, so the paths are probed again.  abiflib is located
+    without importing it."""
+    import importlib.util
+    try:
+        spec = importlib.util.find_spec('abiflib')
+        abiflib_init = spec.origin if spec else None
+    except (ImportError, ValueError):
+        abiflib_init = None
+    files = [abiflib_init]
+    if paths.get('abiftool_dir'):
+        files.append(os.path.join(paths['abiftool_dir'], 'abiftool.py'))
+    if paths.get('templates'):
+        files.append(os.path.join(paths['templates'], 'base.html'))
+    return {str(f): _mtime_ns(f) for f in files}
+
+
+def _cached_paths_valid(entry: Dict[str, Any]) -> bool:
+    try:
+        paths = entry['paths']
+        for key in ('static', 'templates', 'abiftool_dir', 'testfiledir'):
+            if paths.get(key) and not os.path.isdir(paths[key]):
+                return False
+        if not all(os.path.isdir(tdir) for tdir in paths['template_dirs']):
+            return False
+        return entry['stamps'] == _paths_stamps(paths)
+    except (KeyError, TypeError):
+        return False
+
+
+def load_awt_paths(awt_py_dir, cache_path: Optional[str] = None) -> Dict[str, Any]:
+    """Return discover_awt_paths() results, cached across process starts.
+
+    The cache lives at AWT_PATHS_CACHE (default: DEFAULT_PATHS_CACHE) and is
+    keyed by what the probe depends on (awt dir, interpreter,
+    AWT_STATIC/AWT_TEMPLATES), one entry per key and at most
+    MAX_PATHS_CACHE_ENTRIES.  Entries whose directories have disappeared,
+    or whose abiflib, abiftool or templates have changed (see
+    _paths_stamps), are probed again.  Paths found only in the working
+    directory or next to the launcher aren't cached.  Set AWT_PATHS_CACHE=none to always probe.
+    """
+    if cache_path is None:
+        cache_path = os.environ.get('AWT_PATHS_CACHE', DEFAULT_PATHS_CACHE)
+    if not cache_path or cache_path.lower() in ('none', '0', 'off'):
+        return discover_awt_paths(awt_py_dir)
+
+    key = _paths_cache_key(awt_py_dir)
+    entries = {}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            blob = json.load(f)
+        if blob.get('version') == _PATHS_CACHE_VERSION:
+            entries = blob.get('entries', {})
+    except (OSError, ValueError, AttributeError):
+        entries = {}
+
+    cached = entries.get(key)
+    if cached and _cached_paths_valid(cached):
+        return cached['paths']
+
+    paths = discover_awt_paths(awt_py_dir)
+    if _found_outside_key(awt_py_dir, paths):
+        return paths
+    entries.pop(key, None)
+    entries[key] = {'paths': paths, 'stamps': _paths_stamps(paths)}
+    for stale_key in list(entries)[:-MAX_PATHS_CACHE_ENTRIES]:
+        del entries[stale_key]
+    try:
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': _PATHS_CACHE_VERSION, 'entries': entries}, f, indent=1)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # A read-only home directory just means we probe on every start
+        pass
+    return paths
+
+
+# Callables notified with (profiler, total_seconds) when a RouteProfiler
+# finalizes; used to feed metrics and other span consumers.
+_SPAN_OBSERVERS: list = []
+# Callbacks notified as each span completes, before finalize()
+_STEP_OBSERVERS: list = []
+
+# Memory mode (AWT_PROFILE_MEMORY=1): tracemalloc frames kept per allocation,
+# allocation sites kept per span, and spans reported at finalize()
+MEMORY_TOP_SITES = 5
+MEMORY_TOP_SPANS = 3
+
+
+# tracemalloc.reset_peak() is new in Python 3.9.  Without it a span's peak is
+# only the larger of its starting and ending traced memory.
+_HAS_RESET_PEAK = hasattr(tracemalloc, 'reset_peak')
+
+
+def _traced_peak() -> tuple:
+    """(current, peak) traced memory; peak is since the last reset_peak()."""
+    current, peak = tracemalloc.get_traced_memory()
+    return (current, peak) if _HAS_RESET_PEAK else (current, current)
+
+
+def _memory_profiling_requested() -> bool:
+    return os.environ.get('AWT_PROFILE_MEMORY', '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _format_bytes(nbytes: int) -> str:
+    sign = '-' if nbytes < 0 else '+'
+    value = abs(nbytes)
+    for unit in ('B', 'KiB', 'MiB'):
+        if value < 1024 or unit == 'MiB':
+            return f"{sign}{value:.0f}{unit}" if unit == 'B' else f"{sign}{value:.1f}{unit}"
+        value /= 1024.0
+    return f"{sign}{value}B"  # pragma: no cover
+
+
+def _site_name(filename: str, lineno: int) -> str:
+    parts = Path(filename).parts
+    return f"{'/'.join(parts[-2:])}:{lineno}"
+
+
+def add_span_observer(callback) -> None:
+    """Register callback(profiler, total) to run at RouteProfiler.finalize()."""
+    if callback not in _SPAN_OBSERVERS:
+        _SPAN_OBSERVERS.append(callback)
+
+
+def remove_span_observer(callback) -> None:
+    """Unregister a callback added with add_span_observer()."""
+    if callback in _SPAN_OBSERVERS:
+        _SPAN_OBSERVERS.remove(callback)
+
+
+def add_step_observer(callback) -> None:
+    """Register callback(profiler, name, elapsed) to run after each
+    successful RouteProfiler.time_block() (e.g. for job progress)."""
+    if callback not in _STEP_OBSERVERS:
+        _STEP_OBSERVERS.append(callback)
+
+
+def remove_step_observer(callback) -> None:
+    """Unregister a callback added with add_step_observer()."""
+    if callback in _STEP_OBSERVERS:
+        _STEP_OBSERVERS.remove(callback)
+
+
 class RouteProfiler:
     """Track per-request timings and structured logs for slow /id routes."""
 
     def __init__(self, identifier: str, resulttype: Optional[str], *,
                  request_path: Optional[str] = None,
-                 query_string: Optional[str] = None) -> None:
+                 query_string: Optional[str] = None,
+                 memory: Optional[bool] = None) -> None:
         self._logger = logging.getLogger('awt.routes.id')
         self.identifier = identifier
         self.resulttype = resulttype or 'all'
@@ -83,13 +378,24 @@ class RouteProfiler:
         self.debug_lines: list[str] = []
         self.path = request_path or ''
         self.query_string = query_string or ''
+        # Election size, filled in by the route once the ABIF is parsed
+        self.ballots: Optional[int] = None
+        self.candidates: Optional[int] = None
+        # span -> {'net': bytes, 'peak': bytes, 'sites': [(site, bytes, count)]}
+        self.memory = _memory_profiling_requested() if memory is None else memory
+        self.memory_spans: Dict[str, Dict[str, Any]] = {}
+        # Highest traced memory seen so far by each open time_block, outermost
+        # first; a nested block resets tracemalloc's peak, so it hands its
+        # own peak back to the enclosing block when it ends
+        self._memory_peaks: List[int] = []
 
     @staticmethod
     def _format_fields(fields: Dict[str, Any]) -> str:
         return ' '.join(f"{key}={value}" for key, value in fields.items() if value is not None)
 
     def _log_to_abiflib(self, message: str, **fields: Any) -> None:
-        if not ABIFLIB_LOGGER:
+        abiflib_logger = _abiflib_logger()
+        if not abiflib_logger:
             return
         try:
             payload = dict(fields or {})
@@ -112,7 +418,7 @@ class RouteProfiler:
             if extras:
                 parts.append(extras)
             line = ' '.join(part for part in parts if part).strip()
-            ABIFLIB_LOGGER(line, showframeinfo=False)
+            abiflib_logger(line, showframeinfo=False)
         except Exception:  # pragma: no cover - logging should not raise
             pass
 
@@ -138,7 +444,65 @@ class RouteProfiler:
         payload.setdefault('checkpoint', code)
         self._log_to_abiflib(f"checkpoint {code}", detail=message, **payload)
 
+    def _memory_start(self):
+        if not self.memory:
+            return None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        current = _traced_peak()
+        if self._memory_peaks:
+            self._memory_peaks[-1] = max(self._memory_peaks[-1], current[1])
+        # Peak is process-wide: concurrent requests in other threads are
+        # counted too, so measure memory on a quiet worker.
+        if _HAS_RESET_PEAK:
+            tracemalloc.reset_peak()
+        self._memory_peaks.append(current[0])
+        return current[0], tracemalloc.take_snapshot()
+
+    def _memory_stop(self, name: str, state, fields: Dict[str, Any]) -> None:
+        if state is None:
+            return
+        base, before = state
+        current, peak = _traced_peak()
+        peak = max(peak, self._memory_peaks.pop())
+        if self._memory_peaks:
+            self._memory_peaks[-1] = max(self._memory_peaks[-1], peak)
+        after = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)))
+        sites = []
+        for stat in after.compare_to(before, 'lineno'):
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            sites.append((_site_name(frame.filename, frame.lineno), stat.size_diff, stat.count_diff))
+            if len(sites) >= MEMORY_TOP_SITES:
+                break
+        net = current - base
+        peak_delta = max(peak - base, 0)
+        entry = self.memory_spans.setdefault(name, {'net': 0, 'peak': 0, 'sites': []})
+        entry['net'] += net
+        if peak_delta >= entry['peak']:
+            entry['peak'] = peak_delta
+            entry['sites'] = sites
+        fields['mem_net'] = _format_bytes(net)
+        fields['mem_peak'] = _format_bytes(peak_delta).lstrip('+')
+        if sites:
+            site, size, _ = sites[0]
+            fields['mem_top'] = f"{site}({_format_bytes(size)})"
+
+    def memory_report_lines(self, limit: int = MEMORY_TOP_SPANS) -> list[str]:
+        """Summaries of the spans with the largest peaks, with allocation sites."""
+        ranked = sorted(self.memory_spans.items(), key=lambda item: item[1]['peak'], reverse=True)
+        lines = []
+        for name, entry in ranked[:limit]:
+            lines.append(f"memory {name}: net={_format_bytes(entry['net'])} "
+                         f"peak={_format_bytes(entry['peak']).lstrip('+')}")
+            for site, size, count in entry['sites']:
+                lines.append(f"    {_format_bytes(size):>10} {count:+d} blocks  {site}")
+        return lines
+
     def time_block(self, name: str, func, *, log_fields: Optional[Dict[str, Any]] = None):
+        memory_state = self._memory_start()
         start = time.perf_counter()
         try:
             result = func()
@@ -148,6 +512,7 @@ class RouteProfiler:
             fields = dict(log_fields or {})
             fields['step'] = name
             fields['elapsed_s'] = f"{elapsed:.3f}"
+            self._memory_stop(name, memory_state, fields)
             fields['error'] = type(exc).__name__
             self.log(f"{name} failed", **fields)
             self._log_to_abiflib(f"{name} failed", **fields)
@@ -158,8 +523,14 @@ class RouteProfiler:
             fields = dict(log_fields or {})
             fields['step'] = name
             fields['elapsed_s'] = f"{elapsed:.3f}"
+            self._memory_stop(name, memory_state, fields)
             self.log(f"{name} completed", **fields)
             self._log_to_abiflib(f"{name} completed", **fields)
+            for observer in list(_STEP_OBSERVERS):
+                try:
+                    observer(self, name, elapsed)
+                except Exception:  # pragma: no cover - observers must not break requests
+                    self._logger.exception("step observer %r failed", observer)
             return result, elapsed
 
     def log_skip(self, name: str, **fields: Any) -> None:
@@ -169,7 +540,7 @@ class RouteProfiler:
         self._log_to_abiflib(f"{name} skipped", **payload)
 
     def render_debug_output(self, intro: str = '') -> str:
-        body = '\n'.join(self.debug_lines)
+        body = '\n'.join(self.debug_lines + self.memory_report_lines())
         if intro and body:
             separator = '' if intro.endswith('\n') else '\n'
             return f"{intro}{separator}{body}"
@@ -195,4 +566,11 @@ class RouteProfiler:
         }
         self.log('request complete', **fields)
         self._log_to_abiflib('request complete', **fields)
+        for line in self.memory_report_lines():
+            self.log(line.strip())
+        for observer in list(_SPAN_OBSERVERS):
+            try:
+                observer(self, total)
+            except Exception:  # pragma: no cover - observers must not break requests
+                self._logger.exception("span observer %r failed", observer)
         return total
@@ -0,0 +1,369 @@
+"""Persistent SQLite store of RouteProfiler spans.
+
+Every finalized RouteProfiler becomes one row per span (plus a `total`
+row) in the `spans` table, tagged with the election id, resulttype,
+ballot/candidate counts, the awt git revision and the abiflib version.
+That makes questions like "which elections got slower after the abiflib
+upgrade" a query instead of a grep through log files.
+
+Writes never happen on the request path: RouteProfiler.finalize() only
+puts rows on a bounded in-memory queue (dropping them if the writer has
+fallen far behind), and a daemon thread inserts them in batches.
+
+The writer also prunes the table: rows older than max_age_days and all but
+the newest max_rows rows are deleted at most once per prune_interval
+seconds, so the file stops growing once it reaches the cap (SQLite reuses
+the freed pages).
+
+`perf_awt.py report` reads the table back through summarize_spans() and
+find_regressions().
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import statistics
+import subprocess
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.server_util import add_span_observer
+
+__all__ = [
+    'DEFAULT_SPAN_DB',
+    'DEFAULT_SPAN_MAX_AGE_DAYS',
+    'DEFAULT_SPAN_MAX_ROWS',
+    'SpanStore',
+    'enable_span_store',
+    'find_regressions',
+    'summarize_spans',
+]
+
+DEFAULT_SPAN_DB = os.path.join(os.path.expanduser('~'), 'src', 'awt', 'local', 'db', 'awt-spans.sqlite')
+
+# Retention defaults; AWT_SPAN_MAX_ROWS / AWT_SPAN_MAX_AGE_DAYS override
+# them and 0 turns that limit off.
+DEFAULT_SPAN_MAX_ROWS = 500000
+DEFAULT_SPAN_MAX_AGE_DAYS = 90
+
+# Name of the per-request row holding RouteProfiler's total elapsed time
+TOTAL_SPAN = 'total'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spans (
+  id INTEGER PRIMARY KEY,
+  ts REAL NOT NULL,
+  req_id TEXT NOT NULL,
+  route TEXT,
+  election_id TEXT,
+  resulttype TEXT,
+  span TEXT NOT NULL,
+  elapsed REAL NOT NULL,
+  calls INTEGER NOT NULL DEFAULT 1,
+  ballots INTEGER,
+  candidates INTEGER,
+  git_rev TEXT,
+  abiflib_version TEXT,
+  mem_net_bytes INTEGER,
+  mem_peak_bytes INTEGER
+)
+"""
+
+# Columns added after the first release of the table: name -> type
+_ADDED_COLUMNS = {'mem_net_bytes': 'INTEGER', 'mem_peak_bytes': 'INTEGER'}
+
+_INSERT = """
+INSERT INTO spans(ts, req_id, route, election_id, resulttype, span, elapsed,
+                  calls, ballots, candidates, mem_net_bytes, mem_peak_bytes,
+                  git_rev, abiflib_version)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+logger = logging.getLogger('awt.spans')
+
+
+def _git_rev() -> str:
+    """Short git revision of the awt checkout (AWT_GIT_REV overrides)."""
+    env_rev = os.environ.get('AWT_GIT_REV')
+    if env_rev:
+        return env_rev
+    awt_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=awt_dir,
+                                       stderr=subprocess.DEVNULL, timeout=5).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def _abiflib_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version('abiftool')
+    except Exception:
+        return 'unknown'
+
+
+class SpanStore:
+    """Batching, background writer of RouteProfiler spans to SQLite."""
+
+    def __init__(self, db_path: str, *, batch_size: int = 200,
+                 flush_interval: float = 2.0, max_queue: int = 10000,
+                 max_rows: int = DEFAULT_SPAN_MAX_ROWS,
+                 max_age_days: float = DEFAULT_SPAN_MAX_AGE_DAYS,
+                 prune_interval: float = 300.0) -> None:
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_rows = max_rows
+        self.max_age_days = max_age_days
+        self.prune_interval = prune_interval
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_writer(self) -> queue.Queue:
+        # (Re)start the writer lazily so that forked workers get their own
+        # thread; threads do not survive fork().
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._queue = queue.Queue(maxsize=self.max_queue)
+                    self._thread = threading.Thread(target=self._run, name='awt-span-store', daemon=True)
+                    self._thread.start()
+                    self._pid = pid
+        return self._queue
+
+    def record(self, profiler, total: float) -> None:
+        """Span observer: queue one row per span of a finalized profiler."""
+        now = time.time()
+        route = profiler.path or ''
+        if profiler.query_string:
+            route = f"{route}?{profiler.query_string}"
+        base = (now, profiler.req_id, route, profiler.identifier, profiler.resulttype)
+        size = (getattr(profiler, 'ballots', None), getattr(profiler, 'candidates', None))
+        memory = getattr(profiler, 'memory_spans', {})
+        rows = []
+        for name, values in profiler.spans.items():
+            mem = memory.get(name)
+            mem_fields = (mem['net'], mem['peak']) if mem else (None, None)
+            rows.append(base + (name, sum(values), len(values)) + size + mem_fields)
+        total_mem = (None, None)
+        if memory:
+            total_mem = (sum(m['net'] for m in memory.values()), max(m['peak'] for m in memory.values()))
+        rows.append(base + (TOTAL_SPAN, total, 1) + size + total_mem)
+        try:
+            self._ensure_writer().put_nowait(rows)
+        except queue.Full:
+            self.dropped += len(rows)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything queued so far has been written."""
+        if self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _connect(self) -> sqlite3.Connection:
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        conn.execute(_SCHEMA)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(spans)")}
+        for column, column_type in _ADDED_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE spans ADD COLUMN {column} {column_type}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_election ON spans(election_id, span, ts)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_ts ON spans(ts)")
+        conn.commit()
+        return conn
+
+    def _prune(self, conn: sqlite3.Connection) -> int:
+        """Delete rows past the age and row caps; returns the number deleted."""
+        deleted = 0
+        with conn:
+            if self.max_age_days:
+                cutoff = time.time() - self.max_age_days * 86400
+                deleted += conn.execute("DELETE FROM spans WHERE ts < ?", (cutoff,)).rowcount
+            if self.max_rows:
+                deleted += conn.execute(
+                    "DELETE FROM spans WHERE id <= "
+                    "(SELECT id FROM spans ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (self.max_rows,)).rowcount
+        if deleted:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return deleted
+
+    def _run(self) -> None:
+        q = self._queue
+        conn = None
+        # Computed here rather than per request: both may shell out/scan
+        # package metadata.
+        version_tags = (_git_rev(), _abiflib_version())
+        pending: List[tuple] = []
+        waiters: List[threading.Event] = []
+        last_prune = 0.0
+        while True:
+            try:
+                item = q.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not None:
+                pending.extend(row + version_tags for row in item)
+            if pending and (item is None or waiters or len(pending) >= self.batch_size):
+                try:
+                    if conn is None:
+                        conn = self._connect()
+                    with conn:
+                        conn.executemany(_INSERT, pending)
+                    if time.monotonic() - last_prune >= self.prune_interval:
+                        last_prune = time.monotonic()
+                        self._prune(conn)
+                except Exception:
+                    logger.exception("failed to write %d spans to %s", len(pending), self.db_path)
+                    if conn is not None:
+                        conn.close()
+                    conn = None
+                pending = []
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+
+
+_STORE: Optional[SpanStore] = None
+
+
+def enable_span_store(db_path: Optional[str] = None) -> Optional[SpanStore]:
+    """Start recording RouteProfiler spans to SQLite.
+
+    db_path defaults to $AWT_SPAN_DB, then DEFAULT_SPAN_DB; 'none' disables
+    the store.  $AWT_SPAN_MAX_ROWS and $AWT_SPAN_MAX_AGE_DAYS set the
+    retention caps (0 for no cap).  Safe to call more than once; the first
+    call wins.
+    """
+    global _STORE
+    if _STORE is not None:
+        return _STORE
+    db_path = db_path or os.environ.get('AWT_SPAN_DB') or DEFAULT_SPAN_DB
+    if db_path.lower() == 'none':
+        return None
+    logger.info("Recording RouteProfiler spans to %s", db_path)
+    _STORE = SpanStore(
+        db_path,
+        max_rows=int(os.environ.get('AWT_SPAN_MAX_ROWS', DEFAULT_SPAN_MAX_ROWS)),
+        max_age_days=float(os.environ.get('AWT_SPAN_MAX_AGE_DAYS', DEFAULT_SPAN_MAX_AGE_DAYS)))
+    add_span_observer(_STORE.record)
+    atexit.register(_STORE.flush, 2.0)
+    return _STORE
+
+
+# --- Reporting (used by perf_awt.py report) ---
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+# Columns summarize_spans() can aggregate
+METRICS = ('elapsed', 'mem_peak_bytes', 'mem_net_bytes')
+
+
+def summarize_spans(db_path: str, *, election: Optional[str] = None, span: Optional[str] = TOTAL_SPAN,
+                    resulttype: Optional[str] = None, metric: str = 'elapsed') -> List[Dict[str, Any]]:
+    """Per (election, resulttype, span, revision) summaries of `metric`.
+
+    A revision is the (git_rev, abiflib_version) pair.  Rows come back
+    grouped by election/resulttype/span, with revisions in the order they
+    were first seen.  Memory metrics only exist for requests profiled
+    with AWT_PROFILE_MEMORY=1; other rows are skipped.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"unknown metric {metric!r} (expected one of {', '.join(METRICS)})")
+    # tracemalloc slows requests down a lot, so memory-profiled requests
+    # are left out of timing summaries
+    clauses = ["mem_peak_bytes IS NULL" if metric == 'elapsed' else f"{metric} IS NOT NULL"]
+    params = []
+    for column, value in (('election_id', election), ('span', span), ('resulttype', resulttype)):
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    groups: Dict[tuple, Dict[str, Any]] = {}
+    with sqlite3.connect(db_path) as conn:
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(spans)")}
+        if 'mem_peak_bytes' not in existing:
+            # Table written before memory columns existed
+            if metric != 'elapsed':
+                return []
+            clauses = clauses[1:]
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        cursor = conn.execute(
+            f"SELECT election_id, resulttype, span, git_rev, abiflib_version, ts, {metric}, ballots, candidates "
+            f"FROM spans {where} ORDER BY ts", params)
+        for election_id, rtype, span_name, git_rev, abiflib_version, ts, value, ballots, candidates in cursor:
+            key = (election_id, rtype, span_name, git_rev, abiflib_version)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {
+                    'election_id': election_id, 'resulttype': rtype, 'span': span_name,
+                    'git_rev': git_rev, 'abiflib_version': abiflib_version,
+                    'first_seen': ts, 'last_seen': ts, 'values': [],
+                    'ballots': ballots, 'candidates': candidates,
+                }
+            group['last_seen'] = ts
+            group['values'].append(value)
+            if ballots is not None:
+                group['ballots'] = ballots
+            if candidates is not None:
+                group['candidates'] = candidates
+    summaries = []
+    for group in groups.values():
+        values = group.pop('values')
+        group['n'] = len(values)
+        group['median'] = statistics.median(values)
+        group['p95'] = _percentile(values, 95)
+        summaries.append(group)
+    summaries.sort(key=lambda g: (g['election_id'] or '', g['resulttype'] or '', g['span'], g['first_seen']))
+    return summaries
+
+
+def find_regressions(summaries: List[Dict[str, Any]], *, threshold: float = 1.25,
+                     min_samples: int = 3) -> List[Dict[str, Any]]:
+    """Compare consecutive revisions of each election/resulttype/span.
+
+    Returns one entry per step whose median grew by at least `threshold`
+    (ratio), considering only revisions with at least `min_samples` rows.
+    """
+    regressions = []
+    previous: Dict[tuple, Dict[str, Any]] = {}
+    for summary in summaries:
+        if summary['n'] < min_samples:
+            continue
+        key = (summary['election_id'], summary['resulttype'], summary['span'])
+        before = previous.get(key)
+        previous[key] = summary
+        if before is None or before['median'] <= 0:
+            continue
+        ratio = summary['median'] / before['median']
+        if ratio >= threshold:
+            regressions.append({'before': before, 'after': summary, 'ratio': ratio})
+    regressions.sort(key=lambda r: r['ratio'], reverse=True)
+    return regressions
@@ -0,0 +1,268 @@
+"""Fingerprinted, precompressed static assets.
+
+`awt --build-static` copies every file in the static directory to the
+build directory (AWT_STATIC_BUILD, default <static>/dist) under a
+content-hashed name such as js/popover.3f2a1b9c0d4e.js.  Text assets
+get a .gz copy beside them, and a .br copy when the brotli module is
+installed.  manifest.json maps each original path to its fingerprinted
+one.  Relative ES module imports (`from './popover.js'`) are rewritten
+to fingerprinted names before hashing, so a change to popover.js gives
+irvDisplay.js and main.js new names too.
+
+Once a manifest exists, url_for('static', filename=...) points at the
+fingerprinted copy (fingerprinted_filename()), and send_built_asset()
+serves it with a one-year immutable Cache-Control and the smallest
+pre-encoded body the client accepts.  A changed file is a new URL, so
+repeat views never revalidate.  Without a build, /static serves the
+originals as before.  Old fingerprinted copies are left in place for
+pages still cached with their URLs.
+
+The build also records each source file's size, mtime and hash in
+sources.json.  asset_manifest() compares them with the static directory
+when it loads the manifest and then every AWT_STATIC_RECHECK seconds
+(default 60).  If a source was edited without rebuilding, it logs a
+warning and links the unfingerprinted originals until the next build,
+rather than serving the stale copies.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import time
+from typing import Dict, List, Optional
+
+__all__ = [
+    'BUILD_URL_PREFIX',
+    'IMMUTABLE_CACHE_CONTROL',
+    'MANIFEST_NAME',
+    'asset_build_dir',
+    'asset_manifest',
+    'build_static_assets',
+    'fingerprinted_filename',
+    'send_built_asset',
+    'stale_sources',
+]
+
+logger = logging.getLogger('awt.static')
+
+MANIFEST_NAME = 'manifest.json'
+SOURCES_NAME = 'sources.json'
+DEFAULT_RECHECK_SECONDS = 60.0
+# Built files are served under /static/<BUILD_URL_PREFIX>
+BUILD_URL_PREFIX = 'dist/'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+COMPRESSIBLE_SUFFIXES = ('.css', '.js', '.json', '.svg', '.txt', '.html', '.ico')
+HASH_CHARS = 12
+
+_JS_IMPORT = re.compile(r'''(\bfrom\s*|\bimport\s*\(?\s*)(['"])(\.\.?/[^'"]+)\2''')
+
+_brotli_mod = None
+_BROTLI_RESOLVED = False
+_manifest_cache: Dict[str, object] = {'key': None, 'entries': {}, 'checked': 0.0, 'stale': []}
+
+
+def _brotli():
+    """Return the brotli module, or None if it isn't installed."""
+    global _brotli_mod, _BROTLI_RESOLVED
+    if not _BROTLI_RESOLVED:
+        _BROTLI_RESOLVED = True
+        try:
+            import brotli  # type: ignore
+        except ImportError:
+            brotli = None
+        _brotli_mod = brotli
+    return _brotli_mod
+
+
+def asset_build_dir(static_dir: str) -> str:
+    """Where built assets live: AWT_STATIC_BUILD, or <static_dir>/dist."""
+    return os.environ.get('AWT_STATIC_BUILD') or os.path.join(static_dir, BUILD_URL_PREFIX.rstrip('/'))
+
+
+def _fingerprinted(relpath: str, body: bytes) -> str:
+    stem, suffix = posixpath.splitext(relpath)
+    return f"{stem}.{hashlib.sha256(body).hexdigest()[:HASH_CHARS]}{suffix}"
+
+
+def _source_record(path: str, body: bytes) -> Dict[str, object]:
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': hashlib.sha256(body).hexdigest()}
+
+
+def _write(path: str, body: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(body)
+    os.replace(tmp, path)
+
+
+def build_static_assets(static_dir: str, build_dir: Optional[str] = None) -> Dict[str, str]:
+    """Fingerprint and precompress everything under static_dir.
+
+    Returns the manifest ({original path: fingerprinted path}, both
+    relative and '/'-separated), which is also written to
+    build_dir/manifest.json.
+    """
+    static_dir = os.path.abspath(static_dir)
+    build_dir = os.path.abspath(build_dir or asset_build_dir(static_dir))
+    sources = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and
+                   os.path.abspath(os.path.join(root, d)) != build_dir]
+        for name in files:
+            if not name.startswith('.'):
+                path = os.path.join(root, name)
+                sources[os.path.relpath(path, static_dir).replace(os.sep, '/')] = path
+
+    manifest: Dict[str, str] = {}
+    recorded: Dict[str, Dict[str, object]] = {}
+    in_progress = set()
+
+    def build(relpath: str) -> str:
+        if relpath in manifest:
+            return manifest[relpath]
+        in_progress.add(relpath)
+        with open(sources[relpath], 'rb') as f:
+            body = f.read()
+        recorded[relpath] = _source_record(sources[relpath], body)
+        if relpath.endswith('.js'):
+            body = _rewrite_imports(relpath, body)
+        manifest[relpath] = _fingerprinted(relpath, body)
+        in_progress.discard(relpath)
+        target = os.path.join(build_dir, manifest[relpath])
+        _write(target, body)
+        if relpath.endswith(COMPRESSIBLE_SUFFIXES):
+            encoded = {'.gz': gzip.compress(body, compresslevel=9, mtime=0)}
+            if _brotli() is not None:
+                encoded['.br'] = _brotli().compress(body)
+            for ext, data in encoded.items():
+                if len(data) < len(body):
+                    _write(target + ext, data)
+        return manifest[relpath]
+
+    def _rewrite_imports(relpath: str, body: bytes) -> bytes:
+        def replace(match):
+            dep = posixpath.normpath(posixpath.join(posixpath.dirname(relpath), match.group(3)))
+            if dep not in sources or dep in in_progress:
+                return match.group(0)  # Not ours, or an import cycle: leave it
+            built = posixpath.relpath(build(dep), posixpath.dirname(relpath) or '.')
+            return f"{match.group(1)}{match.group(2)}./{built}{match.group(2)}"
+        return _JS_IMPORT.sub(replace, body.decode('utf-8')).encode('utf-8')
+
+    for relpath in sorted(sources):
+        build(relpath)
+    _write(os.path.join(build_dir, SOURCES_NAME),
+           json.dumps(recorded, indent=1, sort_keys=True).encode('utf-8'))
+    _write(os.path.join(build_dir, MANIFEST_NAME),
+           json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+    logger.info("built %d static assets in %s", len(manifest), build_dir)
+    return manifest
+
+
+def _read_manifest(build_dir: str) -> Dict[str, str]:
+    """manifest.json in build_dir as written, or {} when there is none."""
+    try:
+        with open(os.path.join(build_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except OSError:
+        return {}
+    except ValueError as exc:
+        logger.warning("ignoring static manifest in %s: %s", build_dir, exc)
+        return {}
+
+
+def stale_sources(static_dir: str, build_dir: str) -> List[str]:
+    """Source files in static_dir that changed since the build in build_dir.
+
+    A file whose size and mtime still match is taken as unchanged;
+    otherwise its hash decides.  Without sources.json, every built file
+    counts as stale.
+    """
+    try:
+        with open(os.path.join(build_dir, SOURCES_NAME), encoding='utf-8') as f:
+            recorded = json.load(f)
+    except (OSError, ValueError):
+        return sorted(_read_manifest(build_dir))
+    stale = []
+    for relpath, record in sorted(recorded.items()):
+        path = os.path.join(static_dir, *relpath.split('/'))
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue  # Removed: its built copy is simply never linked
+        if (st.st_size, st.st_mtime_ns) == (record.get('size'), record.get('mtime_ns')):
+            continue
+        with open(path, 'rb') as f:
+            if hashlib.sha256(f.read()).hexdigest() != record.get('sha256'):
+                stale.append(relpath)
+    return stale
+
+
+def asset_manifest(build_dir: str, static_dir: Optional[str] = None) -> Dict[str, str]:
+    """The manifest in build_dir, or {} when there is no build.
+
+    Reloaded when manifest.json changes, so a rebuild takes effect
+    without a restart.  Given static_dir, also {} while any source there
+    is newer than its build (see stale_sources()).
+    """
+    path = os.path.join(build_dir, MANIFEST_NAME)
+    try:
+        key = (path, os.stat(path).st_mtime_ns, static_dir)
+    except OSError:
+        return {}
+    try:
+        recheck = float(os.environ.get('AWT_STATIC_RECHECK', DEFAULT_RECHECK_SECONDS))
+    except ValueError:
+        recheck = DEFAULT_RECHECK_SECONDS
+    reloaded = _manifest_cache['key'] != key
+    if reloaded:
+        _manifest_cache.update(key=key, entries=_read_manifest(build_dir), stale=[])
+    if static_dir and (reloaded or time.monotonic() - _manifest_cache['checked'] >= recheck):
+        stale = stale_sources(static_dir, build_dir)
+        if stale and stale != _manifest_cache['stale']:
+            logger.warning("static build in %s is out of date (%s changed); linking unfingerprinted "
+                           "assets until `awt --build-static` is rerun", build_dir, ', '.join(stale))
+        _manifest_cache.update(checked=time.monotonic(), stale=stale)
+    return {} if _manifest_cache['stale'] else _manifest_cache['entries']
+
+
+def fingerprinted_filename(build_dir: str, filename: str, static_dir: Optional[str] = None) -> str:
+    """The /static filename to link for filename: its built copy under
+    BUILD_URL_PREFIX if there is one, else filename unchanged.
+
+    Flattened installs (one static directory) are looked up by basename.
+    """
+    manifest = asset_manifest(build_dir, static_dir)
+    built = manifest.get(filename) or manifest.get(posixpath.basename(filename))
+    return BUILD_URL_PREFIX + built if built else filename
+
+
+def send_built_asset(build_dir: str, filename: str):
+    """Response for a fingerprinted file, pre-encoded per Accept-Encoding."""
+    from flask import abort, request, send_from_directory
+    from werkzeug.security import safe_join
+
+    path = safe_join(build_dir, filename)
+    if path is None or filename in (MANIFEST_NAME, SOURCES_NAME) or filename.endswith(('.gz', '.br')) \
+            or not os.path.isfile(path):
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encodings = [('br', '.br'), ('gzip', '.gz')]
+    chosen = next(((coding, ext) for coding, ext in encodings
+                   if request.accept_encodings[coding] and os.path.isfile(path + ext)), None)
+    if chosen:
+        response = send_from_directory(build_dir, filename + chosen[1], mimetype=mimetype)
+        response.headers['Content-Encoding'] = chosen[0]
+    else:
+        response = send_from_directory(build_dir, filename, mimetype=mimetype)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,232 @@
+"""Content-addressed storage of ABIF submitted through POST /awt.
+
+POST /awt stores the pasted ABIF under the SHA-256 of its text and
+redirects to a GET permalink, `/sub/<hash>?methods=...`, which goes
+through the page cache like /id.  Resubmitting the same ABIF (with the
+same checkboxes) and following shared links are then cache hits instead
+of full recomputations.
+
+Submissions live in AWT_SUBMISSION_DIR (default
+~/src/awt/local/submissions) as `<hash[:2]>/<hash>.abif`.  Files are
+never rewritten: a given hash always names the same text.
+
+The store is bounded: submissions over AWT_SUBMISSION_MAX_BYTES are
+refused, and prune_submissions() (run by store_submission() at most once
+per PRUNE_INTERVAL seconds) deletes files not used for
+AWT_SUBMISSION_MAX_AGE_DAYS and the least recently used ones beyond
+AWT_SUBMISSION_MAX_FILES.  Loading a submission counts as a use.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import tempfile
+import time
+from typing import Dict, Iterable, List, Optional
+
+__all__ = [
+    'DEFAULT_SUBMISSION_DIR',
+    'DEFAULT_SUBMISSION_MAX_AGE_DAYS',
+    'DEFAULT_SUBMISSION_MAX_BYTES',
+    'DEFAULT_SUBMISSION_MAX_FILES',
+    'SUBMISSION_METHODS',
+    'SubmissionTooLarge',
+    'load_submission',
+    'methods_from_form',
+    'normalize_submission',
+    'parse_methods',
+    'prune_submissions',
+    'store_submission',
+    'submission_hash',
+    'submission_max_bytes',
+    'submission_query',
+]
+
+DEFAULT_SUBMISSION_DIR = os.path.join(os.path.expanduser('~'), 'src', 'awt', 'local', 'submissions')
+DEFAULT_SUBMISSION_MAX_BYTES = 16_000_000
+DEFAULT_SUBMISSION_MAX_FILES = 10000
+DEFAULT_SUBMISSION_MAX_AGE_DAYS = 90
+
+# store_submission() prunes a directory at most this often (seconds)
+PRUNE_INTERVAL = 300.0
+
+# A load refreshes a file's mtime (its "last used" time) at most this often
+_TOUCH_INTERVAL = 86400
+
+# Method tokens of the `methods` query parameter, in canonical order, and
+# the POST /awt checkbox that selects each one
+SUBMISSION_METHODS = {
+    'FPTP': 'include_FPTP',
+    'IRV': 'include_IRV',
+    'approval': 'include_approval',
+    'STAR': 'include_STAR',
+    'wlt': 'include_pairtable',
+    'dot': 'include_dotsvg',
+}
+
+_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# submission dir -> time.monotonic() of its last prune, for this process
+_last_prune: Dict[str, float] = {}
+
+
+class SubmissionTooLarge(ValueError):
+    """The submitted ABIF is over submission_max_bytes()."""
+
+
+def _submission_dir() -> str:
+    return os.environ.get('AWT_SUBMISSION_DIR') or DEFAULT_SUBMISSION_DIR
+
+
+def _env_limit(name: str, default):
+    """Numeric limit from the environment; 'none', 'off' or '0' disable it."""
+    value = os.environ.get(name, '')
+    if value.lower() in ('none', 'off', '0'):
+        return None
+    try:
+        return type(default)(value) if value else default
+    except ValueError:
+        return default
+
+
+def submission_max_bytes() -> Optional[int]:
+    """Largest submission (UTF-8 bytes) that is stored, or None for no limit."""
+    return _env_limit('AWT_SUBMISSION_MAX_BYTES', DEFAULT_SUBMISSION_MAX_BYTES)
+
+
+def normalize_submission(text: str) -> str:
+    """Line endings and trailing whitespace don't change the election."""
+    return text.replace('\r\n', '\n').replace('\r', '\n').rstrip() + '\n'
+
+
+def submission_hash(text: str) -> str:
+    return hashlib.sha256(normalize_submission(text).encode('utf-8')).hexdigest()
+
+
+def _submission_path(digest: str, submission_dir: Optional[str] = None) -> str:
+    return os.path.join(submission_dir or _submission_dir(), digest[:2], f"{digest}.abif")
+
+
+def store_submission(text: str, submission_dir: Optional[str] = None) -> str:
+    """Store text (if not stored already); return its hash.
+
+    Raises SubmissionTooLarge if text is over submission_max_bytes().
+    """
+    text = normalize_submission(text)
+    max_bytes = submission_max_bytes()
+    if max_bytes is not None and len(text.encode('utf-8')) > max_bytes:
+        raise SubmissionTooLarge(f"submission is over {max_bytes} bytes")
+    digest = submission_hash(text)
+    submission_dir = submission_dir or _submission_dir()
+    path = _submission_path(digest, submission_dir)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so concurrent readers never see partial text
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        now = time.monotonic()
+        if now - _last_prune.get(submission_dir, float('-inf')) >= PRUNE_INTERVAL:
+            _last_prune[submission_dir] = now
+            prune_submissions(submission_dir)
+    return digest
+
+
+def prune_submissions(submission_dir: Optional[str] = None, *,
+                      max_files: Optional[int] = None,
+                      max_age_days: Optional[float] = None) -> int:
+    """Delete unused and excess submissions; return how many were deleted.
+
+    max_files and max_age_days default to $AWT_SUBMISSION_MAX_FILES and
+    $AWT_SUBMISSION_MAX_AGE_DAYS.  Files are ranked by mtime, which
+    load_submission() refreshes.
+    """
+    submission_dir = submission_dir or _submission_dir()
+    if max_files is None:
+        max_files = _env_limit('AWT_SUBMISSION_MAX_FILES', DEFAULT_SUBMISSION_MAX_FILES)
+    if max_age_days is None:
+        max_age_days = _env_limit('AWT_SUBMISSION_MAX_AGE_DAYS', float(DEFAULT_SUBMISSION_MAX_AGE_DAYS))
+    entries = []
+    try:
+        subdirs = [entry.path for entry in os.scandir(submission_dir) if entry.is_dir()]
+    except OSError:
+        return 0
+    for subdir in subdirs:
+        try:
+            with os.scandir(subdir) as it:
+                for entry in it:
+                    if entry.name.endswith('.abif'):
+                        try:
+                            entries.append((entry.stat().st_mtime, entry.path))
+                        except OSError:
+                            pass
+        except OSError:
+            pass
+    entries.sort(reverse=True)
+    keep = entries
+    if max_age_days:
+        cutoff = time.time() - max_age_days * 86400
+        keep = [entry for entry in keep if entry[0] >= cutoff]
+    if max_files:
+        keep = keep[:max_files]
+    deleted = 0
+    for _, path in entries[len(keep):]:
+        try:
+            os.remove(path)
+            deleted += 1
+        except OSError:
+            pass
+    return deleted
+
+
+def load_submission(digest: str, submission_dir: Optional[str] = None) -> Optional[str]:
+    """Text stored under digest, or None if the hash is malformed or unknown."""
+    if not _HASH_RE.match(digest or ''):
+        return None
+    path = _submission_path(digest, submission_dir)
+    try:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+    except OSError:
+        return None
+    try:
+        if time.time() - os.stat(path).st_mtime > _TOUCH_INTERVAL:
+            os.utime(path)
+    except OSError:
+        pass
+    return text
+
+
+def methods_from_form(form) -> List[str]:
+    """Method tokens checked in a POST /awt form, in canonical order."""
+    return [method for method, field in SUBMISSION_METHODS.items() if form.get(field)]
+
+
+def parse_methods(value: Optional[str]) -> List[str]:
+    """Method tokens of a `methods` query value, unknown ones dropped."""
+    requested = set((value or '').split(','))
+    return [method for method in SUBMISSION_METHODS if method in requested]
+
+
+def submission_query(methods: Iterable[str], *, transform_ballots: bool = False,
+                     include_irv_extra: bool = False) -> dict:
+    """Query arguments of a /sub permalink.
+
+    Always the same keys in the same order, so that equivalent
+    submissions share one cache entry.
+    """
+    return {
+        'methods': ','.join(parse_methods(','.join(methods))),
+        'transform_ballots': '1' if transform_ballots else '0',
+        'include_irv_extra': '1' if include_irv_extra else '0',
+    }
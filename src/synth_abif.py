@@ -0,0 +1,102 @@
+"""Synthetic ABIF elections for scaling benchmarks.
+
+generate_abif() writes a random election with a chosen number of ballots
+and candidates, ranking depth, ballot type and share of duplicated
+ballot patterns, so the /id pipeline can be timed well beyond the sizes
+of the elections in the catalog.  `perf_awt.py synth` writes one to a
+file and `perf_awt.py scale` benchmarks a grid of them.
+
+Candidate support follows a Zipf-like curve (candidate k is drawn with
+weight 1/k), which gives elections with clear front-runners and long
+tails, roughly like real multi-candidate races.
+"""
+
+from __future__ import annotations
+
+import random
+from collections import Counter
+from typing import List, Optional
+
+__all__ = [
+    'BALLOT_TYPES',
+    'candidate_tokens',
+    'generate_abif',
+]
+
+BALLOT_TYPES = ('ranked', 'rated', 'choose_many')
+
+# Highest score on rated ballots (0-5, like STAR)
+MAX_RATING = 5
+
+
+def candidate_tokens(candidates: int) -> List[str]:
+    width = max(2, len(str(candidates)))
+    return [f"C{i:0{width}d}" for i in range(1, candidates + 1)]
+
+
+def _weighted_order(rng: random.Random, tokens: List[str], weights: List[float], depth: int) -> List[str]:
+    # Plackett-Luce order: sorting by Exp(weight) keys is equivalent to
+    # repeatedly drawing the next candidate in proportion to weight
+    keys = [rng.expovariate(weight) for weight in weights]
+    order = sorted(range(len(tokens)), key=keys.__getitem__)
+    return [tokens[index] for index in order[:depth]]
+
+
+def _pattern(rng: random.Random, tokens: List[str], weights: List[float], depth: int, ballot_type: str) -> str:
+    order = _weighted_order(rng, tokens, weights, depth)
+    if ballot_type == 'ranked':
+        return '>'.join(order)
+    if ballot_type == 'rated':
+        # Ratings fall off along the voter's order, with some ties
+        ratings = sorted((rng.randint(0, MAX_RATING) for _ in order), reverse=True)
+        ratings[0] = MAX_RATING
+        return ','.join(f"{token}/{rating}" for token, rating in zip(order, ratings))
+    # choose_many: approve the first 1..depth of the voter's order and
+    # explicitly disapprove the rest of the candidates
+    approved = set(order[:rng.randint(1, depth)])
+    return ','.join(f"{token}/{1 if token in approved else 0}" for token in tokens)
+
+
+def generate_abif(ballots: int, candidates: int, *, depth: Optional[int] = None,
+                  ballot_type: str = 'ranked', dup_ratio: float = 0.0,
+                  seed: int = 0, aggregate: bool = False) -> str:
+    """Return ABIF text for a random election.
+
+    depth: candidates ranked/rated per ballot (default: all); for
+        choose_many, the most candidates a voter approves.
+    dup_ratio: share of ballots (0.0-1.0) that repeat an earlier ballot's
+        pattern, picked in proportion to how often it has been cast.
+    aggregate: write one `qty:pattern` line per distinct pattern instead
+        of one line per ballot (as cast vote records usually are).
+    """
+    if ballot_type not in BALLOT_TYPES:
+        raise ValueError(f"ballot_type must be one of {', '.join(BALLOT_TYPES)}")
+    if ballots < 1 or candidates < 1:
+        raise ValueError("ballots and candidates must be positive")
+    if not 0.0 <= dup_ratio <= 1.0:
+        raise ValueError("dup_ratio must be between 0.0 and 1.0")
+    depth = candidates if depth is None else max(1, min(depth, candidates))
+    rng = random.Random(seed)
+    tokens = candidate_tokens(candidates)
+    weights = [1.0 / rank for rank in range(1, candidates + 1)]
+    rng.shuffle(weights)
+
+    cast: List[str] = []
+    for _ in range(ballots):
+        if cast and rng.random() < dup_ratio:
+            # Uniform over cast ballots == proportional to pattern frequency
+            cast.append(cast[rng.randrange(len(cast))])
+        else:
+            cast.append(_pattern(rng, tokens, weights, depth, ballot_type))
+
+    lines = [
+        f'{{"title": "Synthetic {ballot_type} election: {ballots} ballots, {candidates} candidates"}}',
+        f'{{"description": "generate_abif(ballots={ballots}, candidates={candidates}, depth={depth}, '
+        f'ballot_type={ballot_type}, dup_ratio={dup_ratio}, seed={seed})"}}',
+    ]
+    lines.extend(f"={token}:[Candidate {token[1:].lstrip('0') or '0'}]" for token in tokens)
+    if aggregate:
+        lines.extend(f"{qty}:{pattern}" for pattern, qty in Counter(cast).most_common())
+    else:
+        lines.extend(f"1:{pattern}" for pattern in cast)
+    return '\n'.join(lines) + '\n'
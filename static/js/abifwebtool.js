@@ -311,8 +311,51 @@ document.addEventListener('DOMContentLoaded', function() {
   initDependentCheckbox('include_IRV', 'include_irv_extra');
 });
 
+// Results pages for large elections embed only the start of the ABIF
+// (see src/abif_source.py); the rest is fetched from /id/<id>.abif.
+function clearAbifPreview() {
+  var textarea = document.getElementById("abifinput");
+  ["abifpreview-note", "abifpreview_id"].forEach(function(id) {
+    var el = document.getElementById(id);
+    if (el) el.remove();
+  });
+  if (textarea) {
+    textarea.readOnly = false;
+    textarea.removeAttribute("data-abif-src");
+  }
+}
+
+function loadFullAbif() {
+  var textarea = document.getElementById("abifinput");
+  var src = textarea && textarea.dataset.abifSrc;
+  if (!src) return Promise.resolve();
+  return fetch(src)
+    .then(function(response) {
+      if (!response.ok) throw new Error(response.status);
+      return response.text();
+    })
+    .then(function(text) {
+      textarea.value = text;
+      clearAbifPreview();
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+  var link = document.getElementById("abifpreview-load");
+  if (!link) return;
+  link.addEventListener('click', function(event) {
+    event.preventDefault();
+    loadFullAbif().catch(function() { window.location = link.href; });
+  });
+  // Editing needs the whole text: load it on first focus
+  document.getElementById("abifinput").addEventListener('focus', function() {
+    loadFullAbif().catch(function() {});
+  }, {once: true});
+});
+
 function pushTextFromID(exampleID) {
   var exampleText = document.getElementById(exampleID).value;
+  clearAbifPreview();
   document.getElementById("abifbox").classList.add('active');
   document.getElementById("abifinput").value = exampleText;
   document.getElementById("ABIF_submission_area").scrollIntoView({behavior: "smooth"});
@@ -361,3 +404,43 @@ window.addEventListener('DOMContentLoaded', () => {
     }
   }
 });
+
+// Catalog search box: suggestions from /search/suggest as the user types
+// (see src/catalog_index.py); picking one opens that election.
+document.addEventListener('DOMContentLoaded', function() {
+  var input = document.getElementById("catalog-search");
+  var datalist = document.getElementById("catalog-suggestions");
+  if (!input || !datalist || !window.fetch) return;
+  var timer = null;
+  var pending = null;
+  var urls = {};
+
+  input.addEventListener('input', function() {
+    var value = input.value;
+    if (urls[value]) {
+      window.location = urls[value];
+      return;
+    }
+    clearTimeout(timer);
+    timer = setTimeout(function() {
+      if (pending) pending.abort();
+      if (value.trim().length < 2) return;
+      pending = new AbortController();
+      var url = new URL(input.dataset.suggestUrl, window.location.href);
+      url.searchParams.set('q', value);
+      fetch(url, {signal: pending.signal})
+        .then(function(response) { return response.ok ? response.json() : {results: []}; })
+        .then(function(data) {
+          urls = {};
+          datalist.replaceChildren.apply(datalist, data.results.map(function(hit) {
+            var option = document.createElement('option');
+            option.value = hit.id;
+            option.label = hit.title || hit.id;
+            urls[hit.id] = hit.url;
+            return option;
+          }));
+        })
+        .catch(function() {});
+    }, 150);
+  });
+});
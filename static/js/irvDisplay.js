@@ -1,9 +1,15 @@
 import { showPopover, hidePopover } from './popover.js';
 
+// Round data arrives in the columnar form built by src/irv_payload.py.
+// roundsData holds it decoded per round as {transfers, next_choices}
+// maps; next_choices stays null until the round's detail is fetched.
+let payload = null;
 let roundsData = [];
+let roundsUrl = null;
 let candidateNames = {};
 let candidateColors = {};
 let startingQty = 0;
+const detailRequests = {};
 
 /**
  * Gets the color for a specific candidate.
@@ -14,6 +20,54 @@ function getColor(candidateKey) {
     return candidateColors[candidateKey] || '#dddddd'; // Default grey
 }
 
+/**
+ * Expands sparse [from, to, votes] triples into {from: {to: votes}}.
+ * @param {Array} triples Triples of candidate indexes and a vote count.
+ * @returns {object} Nested tallies keyed by candidate token.
+ */
+function decodeSparse(triples) {
+    const tallies = {};
+    (triples || []).forEach(([from, to, votes]) => {
+        const fromKey = payload.cands[from];
+        (tallies[fromKey] = tallies[fromKey] || {})[payload.cands[to]] = votes;
+    });
+    return tallies;
+}
+
+/**
+ * Fetches a round's next-choice detail once, if the page didn't embed it.
+ * Only called when the reader opens one of the round's popovers.
+ * @param {number} roundIndex The index of the round.
+ * @returns {Promise} Settles when roundsData[roundIndex] is as complete as it gets.
+ */
+function loadRoundDetail(roundIndex) {
+    const roundData = roundsData[roundIndex];
+    if (!roundData || roundData.next_choices || !roundsUrl || !payload.detail[roundIndex]) {
+        return Promise.resolve();
+    }
+    if (!detailRequests[roundIndex]) {
+        const url = new URL(roundsUrl, window.location.href);
+        url.searchParams.set('round', roundIndex);
+        // Lets the server answer from the tally this page was rendered from
+        url.searchParams.set('digest', payload.digest);
+        detailRequests[roundIndex] = fetch(url)
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(detail => {
+                // A random tiebreak can come out differently on a recount
+                if (detail.digest !== payload.digest) throw new Error('IRV rounds differ from this page');
+                roundData.next_choices = decodeSparse(detail.next_choices);
+            })
+            .catch(e => {
+                console.error(`Failed to load IRV round ${roundIndex + 1} detail:`, e);
+                roundData.failed = true;
+            });
+    }
+    return detailRequests[roundIndex];
+}
+
 /**
  * Initializes the IRV display module with data from the page.
  */
@@ -34,12 +88,14 @@ export function initializeIrvDisplay() {
     }
 
     try {
-        roundsData = JSON.parse(container.dataset.roundsData);
+        payload = JSON.parse(container.dataset.irvPayload);
         candidateNames = JSON.parse(container.dataset.candidateNames);
-        // Extract starting quantity from the first round's metadata
-        if (roundsData.length > 0 && roundsData[0].startingqty) {
-            startingQty = roundsData[0].startingqty;
-        }
+        roundsUrl = container.dataset.roundsUrl || null;
+        startingQty = payload.startingqty || 0;
+        roundsData = payload.transfers.map((transfers, roundIndex) => ({
+            transfers: decodeSparse(transfers),
+            next_choices: payload.next_choices ? decodeSparse(payload.next_choices[roundIndex]) : null,
+        }));
     } catch (e) {
         console.error('Failed to parse IRV data from container:', e);
         return;
@@ -50,16 +106,25 @@ export function initializeIrvDisplay() {
         const roundIndex = parseInt(indicator.dataset.roundIndex, 10);
         const candidateKey = indicator.dataset.candidateKey;
 
-        indicator.addEventListener('mouseover', () => {
+        const openPopover = () => {
             showPopover(indicator, () => getIrvPopoverContent(roundIndex, candidateKey));
-        });
+            loadRoundDetail(roundIndex).then(() => {
+                drawRoundDataBars(container, roundIndex);
+                const popover = indicator.parentElement.querySelector('.irv-popover');
+                if (popover && popover.classList.contains('show')) {
+                    popover.innerHTML = getIrvPopoverContent(roundIndex, candidateKey);
+                }
+            });
+        };
+        indicator.addEventListener('mouseover', openPopover);
+        indicator.addEventListener('click', openPopover);
         indicator.addEventListener('mouseout', () => {
             hidePopover(indicator);
         });
     });
 
     // Initialize data bars
-    initializeDataBars();
+    initializeDataBars(container);
 }
 
 /**
@@ -90,8 +155,14 @@ function getIrvPopoverContent(roundIndex, candidateKey) {
         hasContent = true;
     }
 
-    // Check hypothetical transfers
-    if (roundData.next_choices && roundData.next_choices[candidateKey]) {
+    // Check hypothetical transfers, which may still be on their way
+    const awaitingDetail = payload.detail[roundIndex] && !roundData.next_choices && !hasContent;
+    if (awaitingDetail) {
+        content += roundData.failed ?
+            '<div><em>Next choices could not be loaded.</em></div>' :
+            '<div><em>Loading next choices…</em></div>';
+        hasContent = true;
+    } else if (roundData.next_choices && roundData.next_choices[candidateKey]) {
         if (hasContent) {
             content += '<hr style="margin: 8px 0;">';
         }
@@ -154,20 +225,31 @@ function formatCandidateNextChoices(transfers, candidateName) {
 
 /**
  * Creates and injects the data bars into the transfer indicators.
+ * Rounds whose next-choice detail isn't on the page get the rest of
+ * their bars once a popover fetches it.
+ * @param {HTMLElement} container The IRV display container.
  */
-function initializeDataBars() {
-    roundsData.forEach((roundData, roundIndex) => {
-        document.querySelectorAll(`.irv-transfer-indicator[data-round-index="${roundIndex}"]`).forEach(indicator => {
-            const candidateKey = indicator.dataset.candidateKey;
-            const transferData = (roundData.transfers && roundData.transfers[candidateKey]) ||
-                                 (roundData.next_choices && roundData.next_choices[candidateKey]);
-
-            if (transferData) {
-                const dataBarHTML = createDataBar(transferData);
-                const arrowHTML = '<div class="transfer-arrow">→</div>';
-                indicator.innerHTML = dataBarHTML + arrowHTML;
-            }
-        });
+function initializeDataBars(container) {
+    roundsData.forEach((roundData, roundIndex) => drawRoundDataBars(container, roundIndex));
+}
+
+/**
+ * Draws the data bars for one round from whatever data it has so far.
+ * @param {HTMLElement} container The IRV display container.
+ * @param {number} roundIndex The index of the round.
+ */
+function drawRoundDataBars(container, roundIndex) {
+    const roundData = roundsData[roundIndex];
+    container.querySelectorAll(`.irv-transfer-indicator[data-round-index="${roundIndex}"]`).forEach(indicator => {
+        const candidateKey = indicator.dataset.candidateKey;
+        const transferData = (roundData.transfers && roundData.transfers[candidateKey]) ||
+                             (roundData.next_choices && roundData.next_choices[candidateKey]);
+
+        if (transferData) {
+            const dataBarHTML = createDataBar(transferData);
+            const arrowHTML = '<div class="transfer-arrow">→</div>';
+            indicator.innerHTML = dataBarHTML + arrowHTML;
+        }
     });
 }
 
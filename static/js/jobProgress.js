@@ -0,0 +1,62 @@
+// Follow a queued /awt submission (see src/job_queue.py) until its
+// results page is ready by polling the JSON status, backing off while
+// the job runs.  Server-Sent Events are used only when the server
+// offers them (AWT_JOB_EVENTS); their short streams end in polling too.
+(function () {
+  const container = document.getElementById('job-progress');
+  if (!container) {
+    return;
+  }
+  const stateElem = document.getElementById('job-state');
+  const errorElem = document.getElementById('job-error');
+
+  function render(job) {
+    stateElem.textContent = job.status;
+    const done = new Set(job.steps);
+    document.querySelectorAll('#job-steps li').forEach(item => {
+      if (done.has(item.dataset.step) && item.className !== 'done') {
+        item.className = 'done';
+        item.textContent = item.dataset.step + ' ✓';
+      }
+    });
+    if (job.status === 'done' && job.result_url) {
+      window.location.replace(job.result_url);
+      return true;
+    }
+    if (job.status === 'failed') {
+      errorElem.textContent = job.error || 'The job failed.';
+      errorElem.hidden = false;
+      return true;
+    }
+    return false;
+  }
+
+  let delay = 1000;
+
+  function poll() {
+    fetch(container.dataset.statusUrl, { cache: 'no-store' })
+      .then(response => response.json())
+      .then(job => {
+        if (!render(job)) {
+          setTimeout(poll, delay);
+          delay = Math.min(delay * 1.5, 5000);
+        }
+      })
+      .catch(() => setTimeout(poll, 5000));
+  }
+
+  if (container.dataset.eventsUrl && window.EventSource) {
+    const source = new EventSource(container.dataset.eventsUrl);
+    source.onmessage = event => {
+      if (render(JSON.parse(event.data))) {
+        source.close();
+      }
+    };
+    source.onerror = () => {
+      source.close();
+      poll();
+    };
+  } else {
+    poll();
+  }
+})();
@@ -12,6 +12,13 @@ import abiflib
 
 ABIFTOOL_DIR = abiflib.get_abiftool_dir()
 
+def pytest_configure(config):
+    """
+    Keep the test run out of the developer's span database; this runs
+    before awt is imported and is inherited by awt_server subprocesses.
+    """
+    os.environ['AWT_SPAN_DB'] = 'none'
+
 def pytest_terminal_summary(terminalreporter, exitstatus, config):
     """
     Called at the end of the test session to display additional information.
@@ -27,6 +34,13 @@ def pytest_terminal_summary(terminalreporter, exitstatus, config):
         terminalreporter.write_line("")
         terminalreporter.write_line(f"AWT_PYTEST_CACHING: {caching_backend}", yellow=True)
 
+@pytest.fixture(autouse=True)
+def submission_dir(tmp_path, monkeypatch):
+    """Store POST /awt submissions under tmp_path, not the home directory."""
+    path = tmp_path / 'submissions'
+    monkeypatch.setenv('AWT_SUBMISSION_DIR', str(path))
+    return path
+
 @pytest.fixture(scope="session")
 def awt_dir():
     """Return the absolute path to the awt project root."""
@@ -0,0 +1,92 @@
+"""
+Tests for out-of-band catalog ABIF (/id/<id>.abif) and the truncated
+abifbox preview on results pages (src/abif_source.py).
+"""
+import pytest
+import yaml
+
+from awt import app, build_election_list, cache
+from src.abif_source import abif_preview
+from src.submissions import submission_hash
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setenv('AWT_ABIF_PREVIEW_CHARS', '2000')
+    monkeypatch.setenv('AWT_SUBMISSION_DIR', str(tmp_path))
+    monkeypatch.setenv('AWT_CATALOG_DB', str(tmp_path / 'catalog.sqlite'))
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    cache.init_app(app)
+    return app.test_client()
+
+
+@pytest.fixture(scope='module')
+def texts():
+    return {e['id']: e['text'] for e in build_election_list()}
+
+
+def test_fetch_abif(client, texts):
+    response = client.get('/id/sf2018special.abif')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert response.headers['ETag']
+    assert response.get_data(as_text=True) == texts['sf2018special']
+
+
+def test_abif_not_modified(client):
+    etag = client.get('/id/sf2018special.abif').headers['ETag']
+    response = client.get('/id/sf2018special.abif', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+def test_abif_range(client, texts):
+    response = client.get('/id/sf2018special.abif', headers={'Range': 'bytes=0-99'})
+    assert response.status_code == 206
+    assert response.get_data(as_text=True) == texts['sf2018special'][:100]
+
+
+def test_unknown_abif(client):
+    assert client.get('/id/no-such-election.abif').status_code == 404
+
+
+def test_abif_fetch_does_not_parse_catalog(client, texts, monkeypatch):
+    assert client.get('/id/sf2018special.abif').status_code == 200
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError("abif_list.yml parsed again")
+    monkeypatch.setattr(yaml, 'load', no_parsing)
+    monkeypatch.setattr(yaml, 'safe_load', no_parsing)
+    response = client.get('/id/sf2018special.abif')
+    assert response.get_data(as_text=True) == texts['sf2018special']
+
+
+def test_large_election_page_shows_preview(client, texts):
+    page = client.get('/id/sf2018special').get_data(as_text=True)
+    assert 'id="abifpreview_id"' in page
+    assert 'data-abif-src="/id/sf2018special.abif"' in page
+    assert texts['sf2018special'][2000:] not in page
+
+
+def test_small_election_page_shows_whole_abif(client):
+    page = client.get('/id/TNexample').get_data(as_text=True)
+    assert 'id="abifpreview_id"' not in page
+    assert 'data-abif-src' not in page
+
+
+def _post_preview(client, text, identifier, extra=''):
+    preview, truncated = abif_preview(text)
+    assert truncated
+    submitted = preview.replace('\n', '\r\n') + extra
+    response = client.post('/awt', data={'abifinput': submitted, 'abifpreview_id': identifier})
+    assert response.status_code == 303
+    return submitted, response.headers['Location']
+
+
+def test_unedited_preview_tallies_whole_election(client, texts):
+    _, location = _post_preview(client, texts['sf2018special'], 'sf2018special')
+    assert submission_hash(texts['sf2018special']) in location
+
+
+def test_edited_preview_tallies_as_submitted(client, texts):
+    submitted, location = _post_preview(client, texts['sf2018special'], 'sf2018special', '1:A>B\r\n')
+    assert submission_hash(submitted) in location
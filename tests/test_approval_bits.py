@@ -0,0 +1,90 @@
+"""
+Tests for approval tallies over ballot bitmasks (src/approval_bits.py)
+against abiflib.
+"""
+import random
+
+import pytest
+
+from abiflib import convert_abif_to_jabmod, convert_jabmod_to_abif
+from abiflib.approval_tally import approval_result_from_abifmodel, get_approval_report
+from abiflib.irv_tally import IRV_dict_from_jabmod
+from abiflib.pairwise_tally import pairwise_count_dict
+from abiflib.transform_core import (
+    choose_many_to_ranked_least_approval_first,
+    ranked_to_choose_many_all_ranked_approved,
+)
+from abiflib.util import find_ballot_type
+from src import approval_bits
+from src.synth_abif import generate_abif
+
+
+def _catalog_texts():
+    import awt
+    return [(entry['id'], entry['text']) for entry in awt.build_election_list()
+            if not entry['text'].startswith('NOT FOUND')]
+
+
+@pytest.fixture(scope="module")
+def elections():
+    """(identifier, ABIF text) of the catalog and synthetic elections."""
+    return _catalog_texts() + [
+        ("ranked", generate_abif(2000, 8, depth=4, dup_ratio=0.3, seed=1)),
+        ("rated", generate_abif(2000, 6, ballot_type='rated', seed=2)),
+        ("choose_many", generate_abif(2000, 6, depth=3, ballot_type='choose_many', seed=3)),
+        ("choose_one", "=A:[Alice]\n=B:[Bob]\n=C:[Carol]\n3:A\n2:B\n1:C\n"),
+    ]
+
+
+def _models(elections, *ballot_types):
+    """(identifier, jabmod) of each election, or of those of ballot_types."""
+    for identifier, text in elections:
+        jabmod = convert_abif_to_jabmod(text)
+        if not ballot_types or find_ballot_type(jabmod) in ballot_types:
+            yield identifier, jabmod
+
+
+def test_approval_matches_abiflib(elections):
+    for identifier, jabmod in _models(elections):
+        result = approval_bits.approval_result_from_masks(jabmod)
+        assert result == approval_result_from_abifmodel(jabmod), identifier
+        assert approval_bits.approval_report_from_result(result, jabmod['candidates']) == \
+            get_approval_report(jabmod), identifier
+
+
+def test_all_ranked_approved(elections):
+    for identifier, jabmod in _models(elections):
+        if find_ballot_type(jabmod) == 'choose_many':
+            continue
+        result = approval_bits.approval_result_from_masks(jabmod, all_ranked_approved=True)
+        if 'ballot_type' not in jabmod['metadata']:
+            assert result == approval_result_from_abifmodel(
+                ranked_to_choose_many_all_ranked_approved(jabmod)), identifier
+
+
+def test_choose_many_to_ranked(elections):
+    for identifier, jabmod in _models(elections, 'choose_many'):
+        expected = choose_many_to_ranked_least_approval_first(jabmod)
+        per_ballot = approval_bits.choose_many_to_ranked(jabmod, aggregate=False)
+        assert convert_jabmod_to_abif(per_ballot) == convert_jabmod_to_abif(expected), identifier
+        assert per_ballot['_conversion_meta'] == expected['_conversion_meta'], identifier
+
+
+def test_aggregated_choose_many_same_tallies(elections):
+    # Merging identical patterns leaves the tallies unchanged
+    for identifier, jabmod in _models(elections, 'choose_many'):
+        expected = choose_many_to_ranked_least_approval_first(jabmod)
+        aggregated = approval_bits.choose_many_to_ranked(jabmod)
+        assert len(aggregated['votelines']) <= len(expected['votelines'])
+        assert pairwise_count_dict(aggregated) == pairwise_count_dict(expected), identifier
+        random.seed(identifier)
+        expected_irv = IRV_dict_from_jabmod(expected, include_irv_extra=True)
+        random.seed(identifier)
+        assert IRV_dict_from_jabmod(aggregated, include_irv_extra=True) == expected_irv, identifier
+
+
+def test_undeclared_candidate_falls_back():
+    # The parser declares every token it sees; jabmods from elsewhere may not
+    jabmod = convert_abif_to_jabmod("=A:[Alice]\n=B:[Bob]\n3:A/1,B/0\n2:B/1,Zed/1\n")
+    del jabmod['candidates']['Zed']
+    assert approval_bits.approval_result_from_masks(jabmod) is None
@@ -0,0 +1,101 @@
+"""
+Tests for the NumPy pairwise, IRV and STAR engines (src/array_tally.py)
+against abiflib.
+"""
+import random
+
+import pytest
+
+import conduits
+from abiflib import add_ratings_to_jabmod_votelines, convert_abif_to_jabmod, pairwise_count_dict
+from abiflib.irv_tally import IRV_result_from_abifmodel
+from abiflib.score_star_tally import STAR_report, STAR_result_from_abifmodel, scaled_scores
+from src import array_tally
+from src.synth_abif import generate_abif
+
+pytest.importorskip("numpy")
+
+
+def _catalog_texts():
+    import awt
+    return [(entry['id'], entry['text']) for entry in awt.build_election_list()
+            if not entry['text'].startswith('NOT FOUND')]
+
+
+EDGE_CASES = [
+    # IRV ties broken at random, in a batch, and in the final round
+    ("random_elim", "=A:[A]\n=B:[B]\n=C:[C]\n=D:[D]\n5:A>B\n5:B>A\n3:C>D\n3:D>C\n2:A=B>C\n"),
+    ("batch_elim", "=A:[A]\n=B:[B]\n=C:[C]\n=D:[D]\n9:A>C\n7:B>A\n2:C>B\n2:D>B=C\n"),
+    ("final_tie", "=A:[A]\n=B:[B]\n4:A>B\n4:B>A\n"),
+    # STAR with one candidate, and with unrated candidates
+    ("one_candidate", "=A:[A]\n3:A\n"),
+    ("partly_rated", "=A:[A]\n=B:[B]\n=C:[C]\n4:A/5,B/2\n3:C/4,A/0\n2:B/3\n"),
+]
+
+
+@pytest.fixture(scope="module")
+def elections():
+    """(identifier, ABIF text) of the catalog, synthetic and edge-case elections."""
+    return _catalog_texts() + [
+        ("ranked", generate_abif(2000, 8, depth=4, dup_ratio=0.3, seed=1)),
+        ("rated", generate_abif(2000, 6, ballot_type='rated', seed=2)),
+        ("choose_many", generate_abif(2000, 6, depth=3, ballot_type='choose_many', seed=3)),
+    ] + EDGE_CASES
+
+
+@pytest.fixture
+def array_on(monkeypatch):
+    monkeypatch.setenv('AWT_ARRAY_TALLY', 'on')
+
+
+def test_pairwise_counts(array_on, elections):
+    for identifier, text in elections:
+        jabmod = convert_abif_to_jabmod(text)
+        assert array_tally.pairwise_count_dict(jabmod) == pairwise_count_dict(jabmod), identifier
+
+
+def test_pairwise_result_same_either_engine(monkeypatch, elections):
+    for identifier, text in elections:
+        jabmod = convert_abif_to_jabmod(text)
+        for transform_ballots in (True, False):
+            resblobs = []
+            for setting in ('off', 'on'):
+                monkeypatch.setenv('AWT_ARRAY_TALLY', setting)
+                resconduit = conduits.ResultConduit(jabmod=jabmod).update_pairwise_result(
+                    jabmod, transform_ballots=transform_ballots, include_html=False)
+                resblobs.append(resconduit.resblob)
+            assert resblobs[0] == resblobs[1], identifier
+
+
+def test_irv_matches_abiflib(array_on, elections):
+    for identifier, text in elections:
+        jabmod = convert_abif_to_jabmod(text)
+        for transform_ballots in (True, False):
+            # Same seed for both, since IRV breaks some ties at random
+            random.seed(identifier)
+            expected = IRV_result_from_abifmodel(jabmod, transform_ballots=transform_ballots,
+                                                 include_irv_extra=True)
+            random.seed(identifier)
+            assert array_tally.IRV_result_from_arrays(jabmod, transform_ballots=transform_ballots,
+                                                      include_irv_extra=True) == expected, identifier
+
+
+def test_star_matches_abiflib(array_on, elections):
+    # STAR from the plain model against abiflib on its rated copy
+    for identifier, text in elections:
+        jabmod = convert_abif_to_jabmod(text)
+        rated = add_ratings_to_jabmod_votelines(convert_abif_to_jabmod(text))
+        star_result = array_tally.STAR_result_from_arrays(jabmod)
+        assert star_result == STAR_result_from_abifmodel(rated), identifier
+        assert array_tally.STAR_report_from_result(star_result) == STAR_report(rated), identifier
+        assert array_tally.scaled_scores_from_result(jabmod, star_result, target_scale=50) == \
+            scaled_scores(rated, target_scale=50), identifier
+
+
+def test_disabled_engine_returns_none(monkeypatch):
+    monkeypatch.setenv('AWT_ARRAY_TALLY', 'off')
+    jabmod = convert_abif_to_jabmod(generate_abif(50, 4, seed=4))
+    assert array_tally.pairwise_count_dict(jabmod) is None
+    assert array_tally.pairwise_result_from_arrays(jabmod) is None
+    assert array_tally.IRV_result_from_arrays(jabmod) is None
+    assert array_tally.STAR_result_from_arrays(jabmod) is None
@@ -0,0 +1,81 @@
+"""
+Tests for merging identical vote lines ahead of the method pipeline
+(src/ballot_patterns.py).
+"""
+import random
+
+import pytest
+
+import awt
+from abiflib import convert_abif_to_jabmod
+from src.ballot_patterns import aggregate_ballot_patterns
+from src.server_util import RouteProfiler
+from src.synth_abif import generate_abif
+
+
+def _catalog_text(identifier):
+    return [entry['text'] for entry in awt.build_election_list() if entry['id'] == identifier][0]
+
+
+DUPLICATE_PREFSTRS = "=A:[A]\n=B:[B]\n3:A>B\n2:B>A\n4:A > B\n1:A>B\n"
+
+
+@pytest.fixture(scope="module")
+def texts():
+    """(identifier, ABIF text) of catalog and synthetic elections."""
+    return [
+        ('TNexample', _catalog_text('TNexample')),
+        ('sf2018special', _catalog_text('sf2018special')),
+        ('ranked', generate_abif(1000, 5, depth=3, dup_ratio=0.6, seed=11)),
+        ('rated', generate_abif(500, 4, ballot_type='rated', dup_ratio=0.6, seed=12)),
+        ('choose_many', generate_abif(1000, 5, depth=2, ballot_type='choose_many', dup_ratio=0.6, seed=13)),
+        ('same_prefs', DUPLICATE_PREFSTRS),
+    ]
+
+
+def _pattern_stats(text):
+    return aggregate_ballot_patterns(convert_abif_to_jabmod(text))[1]
+
+
+def test_stats_without_duplicates():
+    assert _pattern_stats(_catalog_text('TNexample')) == {'votelines': 4, 'patterns': 4, 'reduction': '1.00x'}
+
+
+def test_stats_for_catalog_election():
+    assert _pattern_stats(_catalog_text('sf2018special')) == \
+        {'votelines': 538, 'patterns': 410, 'reduction': '1.31x'}
+
+
+def test_same_prefs_in_other_prefstr_merge():
+    assert _pattern_stats(DUPLICATE_PREFSTRS) == {'votelines': 4, 'patterns': 3, 'reduction': '1.33x'}
+
+
+def test_merge_keeps_ballots(texts):
+    for identifier, text in texts:
+        jabmod = convert_abif_to_jabmod(text)
+        reduced, stats = aggregate_ballot_patterns(jabmod)
+        assert len(reduced['votelines']) == stats['patterns'], identifier
+        assert sum(v['qty'] for v in reduced['votelines']) == sum(v['qty'] for v in jabmod['votelines'])
+        if stats['patterns'] == stats['votelines']:
+            assert reduced is jabmod, identifier
+        else:
+            assert stats['patterns'] < stats['votelines'], identifier
+            assert reduced['metadata'] is jabmod['metadata'], identifier
+
+
+def test_merge_keeps_results(monkeypatch, texts):
+    # Every method gives the same result with and without the merge; only
+    # the transformed ABIF shown with some methods lists merged lines
+    for identifier, text in texts:
+        resblobs = []
+        for merge in (False, True):
+            if not merge:
+                monkeypatch.setattr(awt, 'aggregate_ballot_patterns', lambda j: (j, {}))
+            else:
+                monkeypatch.setattr(awt, 'aggregate_ballot_patterns', aggregate_ballot_patterns)
+            random.seed(identifier)
+            resblob = awt.compute_method_results(convert_abif_to_jabmod(text), awt.PIPELINE_METHODS,
+                                                 RouteProfiler(identifier, 'all'))
+            resblob.pop('transforms', None)
+            resblobs.append(resblob)
+        assert resblobs[0] == resblobs[1], identifier
@@ -0,0 +1,194 @@
+"""
+Tests for the SQLite catalog index and the paginated listing routes
+(src/catalog_index.py, /id, /browse, /tag, /tag/<tag>, /awt).
+"""
+import html
+import re
+import shutil
+import threading
+
+import pytest
+import yaml
+
+from awt import TESTFILEDIR, app, build_election_list, cache, catalog_index
+from src import catalog_index as catalog_index_module
+from src.bifhub import get_fileentries_by_tag
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setenv('AWT_CATALOG_DB', str(tmp_path / 'catalog.sqlite'))
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    cache.init_app(app)
+    # As `awt.py --build-catalog-index` would
+    with app.test_request_context():
+        assert catalog_index().build()
+    return app.test_client()
+
+
+@pytest.fixture
+def page_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv('AWT_CATALOG_DB', str(tmp_path / 'catalog.sqlite'))
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.SimpleCache'
+    cache.init_app(app)
+    cache.clear()
+    yield cache
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    cache.init_app(app)
+
+
+@pytest.fixture
+def slow_parse(monkeypatch):
+    """Holds up every ABIF parse until slow_parse.set()."""
+    release = threading.Event()
+    ballot_stats = catalog_index_module._ballot_stats
+
+    def held_ballot_stats(path):
+        release.wait(10)
+        return ballot_stats(path)
+
+    monkeypatch.setattr(catalog_index_module, '_ballot_stats', held_ballot_stats)
+    yield release
+    release.set()
+
+
+@pytest.fixture(scope='module')
+def election_list():
+    return build_election_list()
+
+
+def _unique_ids(election_list):
+    return list(dict.fromkeys(e['id'] for e in election_list))
+
+
+def _get_page(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def _listed_ids(page):
+    return re.findall(r'<span class="election-id">\s*(?:\d+\. )?<a href="/id/([^"]+)">', page)
+
+
+def _ballot_counts(page):
+    return [int(n) for n in re.findall(r'<li class="election-stats">(\d+) ballots', page)]
+
+
+def _check_listing_page(client, election_list, path, first):
+    page = _get_page(client, path)
+    ids = _listed_ids(page)
+    unique_ids = _unique_ids(election_list)
+    numbers = re.findall(r'<span class="election-id">\s*(\d+)\. ', page)
+    assert int(numbers[0]) == first
+    assert ids == unique_ids[first - 1:first - 1 + len(ids)]
+    assert len(ids) < len(unique_ids)
+    assert f"of {len(unique_ids)}" in page and 'rel="next"' in page
+
+
+def test_first_listing_page(client, election_list):
+    _check_listing_page(client, election_list, '/id', 1)
+
+
+def test_second_listing_page(client, election_list):
+    _check_listing_page(client, election_list, '/browse?page=2&per_page=20', 21)
+
+
+def test_tag_listing(client, election_list):
+    expected = [e['id'] for e in get_fileentries_by_tag('2009', election_list)]
+    assert _listed_ids(_get_page(client, '/tag/2009')) == expected
+
+
+def test_year_filter(client, election_list):
+    ids = _listed_ids(_get_page(client, '/id?year=2018&per_page=500'))
+    assert ids and all('2018' in e['id'] + e['title'] + e.get('tags', '')
+                       for e in election_list if e['id'] in ids)
+
+
+def test_ballot_filter_and_sort(client):
+    page = _get_page(client, '/id?min_ballots=100&sort=-ballots')
+    counts = _ballot_counts(page)
+    assert counts and len(counts) == len(_listed_ids(page))
+    assert counts == sorted(counts, reverse=True) and min(counts) >= 100
+
+
+def test_tag_counts(client, election_list):
+    shown = {name: int(count) for name, count in re.findall(
+        r'href="/tag/([^"]+)">[^<]*</a>\s*<span class="tag-count">\((\d+)\)', _get_page(client, '/tag'))}
+    assert shown
+    for name, count in list(shown.items())[:25]:
+        assert count == len(get_fileentries_by_tag(name, election_list))
+
+
+def test_awt_examples(client, election_list):
+    # Only the example tabs carry ABIF text; the rest is one page of links
+    page = _get_page(client, '/awt')
+    tabs = re.findall(r"<textarea readonly class=\"vscroll examplearea\" id='formtext\d+'>", page)
+    assert len(tabs) == 5
+    assert html.escape(election_list[0]['text'].strip().splitlines()[-1], quote=False) in page
+    more = re.findall(r'<li>\d+\. <a href="/id/', page)
+    assert 0 < len(more) < len(_unique_ids(election_list)) - 5
+
+
+def test_resync_picks_up_changes(tmp_path):
+    # Catalog and file changes show up on the next sync
+    from src.catalog_index import CatalogIndex
+    testdata = tmp_path / 'testdata'
+    shutil.copytree(TESTFILEDIR, testdata)
+    catalog = tmp_path / 'abif_list.yml'
+    entries = [e for e in yaml.safe_load(open(app.root_path + '/abif_list.yml'))
+               if (testdata / e['filename']).is_file()]
+    catalog.write_text(yaml.safe_dump(entries))
+    index = CatalogIndex(str(tmp_path / 'resync.sqlite'), str(catalog), str(testdata))
+    assert index.build()
+    before = index.listing(tag='CenterSqueeze')
+    assert before['entries'][0]['id'] == 'TNexample'
+    assert before['entries'][0]['ballot_count'] == 100
+    with open(testdata / entries[0]['filename'], 'a') as f:
+        f.write('7:Knox>Chat>Nash>Memph\n')
+    others = [dict(e, tags=e.get('tags', '') + ',resync') for e in entries if e['id'] != 'TNexample']
+    catalog.write_text(yaml.safe_dump(others + entries[:1]))
+    assert index.build()
+    after = {e['id']: e for e in index.listing(tag='CenterSqueeze')['entries']}
+    assert after['TNexample']['ballot_count'] == 107
+    assert index.listing(tag='resync')['total'] == len(entries) - 1
+    assert index.listing()['entries'][-1]['id'] == 'TNexample'
+
+
+def _check_not_page_cached_before_parsing(slow_parse, path):
+    # Files are parsed in the background, so the page comes back at once
+    # without their statistics, and isn't kept
+    client = app.test_client()
+    page = _get_page(client, path)
+    assert _listed_ids(page) and not _ballot_counts(page)
+    slow_parse.set()
+    with app.test_request_context():
+        assert catalog_index().build()
+    assert _ballot_counts(_get_page(client, path))
+
+
+def test_listing_before_parsing_is_not_page_cached(page_cache, slow_parse):
+    _check_not_page_cached_before_parsing(slow_parse, '/id')
+
+
+def test_browse_before_parsing_is_not_page_cached(page_cache, slow_parse):
+    _check_not_page_cached_before_parsing(slow_parse, '/browse')
+
+
+def test_one_connection_per_query(client, monkeypatch):
+    # The sync before a query uses the query's connection
+    from src.catalog_index import CatalogIndex
+    with app.test_request_context():
+        index = catalog_index()
+    connects = []
+    connect = CatalogIndex._connect
+
+    def counted(self):
+        connects.append(self)
+        return connect(self)
+
+    monkeypatch.setattr(CatalogIndex, '_connect', counted)
+    monkeypatch.setenv('AWT_CATALOG_RECHECK', '0')
+    index.listing(tag='2009')
+    index.facets()
+    assert len(connects) == 2
@@ -0,0 +1,81 @@
+"""
+Tests for compact results-page markup (class-based candidate colors from
+html_util.candidate_stylesheet()) against the inline-style markup.
+"""
+import re
+
+import pytest
+
+from awt import app, cache
+
+bs4 = pytest.importorskip("bs4")
+
+SWATCH_CLASSES = ('color-box', 'tab-color-box', 'colorblock', 'irv-colorblock')
+
+# A Copeland tie, many candidates, and a pairwise-only page
+PATHS = ["/id/TNexample", "/id/TNexampleTie", "/id/sf2018special", "/id/Burl2009/pairwise"]
+
+
+@pytest.fixture
+def render_both(monkeypatch):
+    """render_both(path) -> {'off': inline-style page, 'on': compact page}"""
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    cache.init_app(app)
+    client = app.test_client()
+
+    def render_both(path):
+        pages = {}
+        for mode in ('off', 'on'):
+            monkeypatch.setenv('AWT_COMPACT_MARKUP', mode)
+            response = client.get(path)
+            assert response.status_code == 200
+            pages[mode] = response.get_data(as_text=True)
+        return pages
+    return render_both
+
+
+def _soups(pages):
+    return (bs4.BeautifulSoup(pages[mode], 'html.parser') for mode in ('off', 'on'))
+
+
+def _swatch_colors(soup):
+    """(swatch classes, background color) for every color box, with
+    colors resolved through the page's <style> rules when not inline."""
+    classcolors = {}
+    for style in soup.find_all('style'):
+        for selectors, body in re.findall(r'([^{}]+)\{([^{}]*)\}', style.get_text()):
+            color = re.search(r'background-color:\s*([^;}\s]+)', body)
+            for selector in selectors.split(','):
+                selector = selector.strip()
+                if color and re.fullmatch(r'\.(irv-)?color-[\w-]+', selector):
+                    classcolors[selector[1:]] = color.group(1)
+    swatches = []
+    for element in soup.find_all(class_=lambda v: v and any(c in v.split() for c in SWATCH_CLASSES)):
+        inline = re.search(r'background-color:\s*([^;]+);', element.get('style') or '')
+        color = inline.group(1).strip() if inline else next(
+            (classcolors[c] for c in element['class'] if c in classcolors), None)
+        swatches.append((tuple(c for c in element['class'] if c in SWATCH_CLASSES), color))
+    return swatches
+
+
+def test_same_swatch_colors(render_both):
+    for path in PATHS:
+        inline, compact = _soups(render_both(path))
+        swatches = _swatch_colors(inline)
+        assert swatches and all(color for _, color in swatches), path
+        assert _swatch_colors(compact) == swatches, path
+
+
+def test_same_text(render_both):
+    for path in PATHS:
+        inline, compact = _soups(render_both(path))
+        assert re.sub(r'\s+', ' ', compact.get_text()) == re.sub(r'\s+', ' ', inline.get_text()), path
+
+
+def test_fewer_style_attributes(render_both):
+    for path in PATHS:
+        pages = render_both(path)
+        assert len(pages['on']) < len(pages['off']), path
+        assert pages['on'].count(' style="') < pages['off'].count(' style="'), path
+        compact = bs4.BeautifulSoup(pages['on'], 'html.parser')
+        assert 'style="background-color' not in str(compact.find(class_='pairwise-table') or ''), path
@@ -0,0 +1,125 @@
+"""
+Tests for cached, bounded Graphviz rendering (src/dot_render.py).
+"""
+import threading
+import time
+
+import pytest
+
+from awt import app, cache
+from src import dot_render
+
+COPECOUNT = {
+    'winningvotes': {'A': {'A': 0, 'B': 6}, 'B': {'A': 4, 'B': 0}},
+    'winlosstie': {'A': {'wins': 1, 'losses': 0, 'ties': 0}, 'B': {'wins': 0, 'losses': 1, 'ties': 0}},
+}
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Replaces Graphviz with a fake; lists the graph keys it rendered.
+
+    Set renders.delay or renders.fail to slow it down or make it fail.
+    """
+    dot_render.clear_diagram_cache()
+
+    class Renders(list):
+        delay = 0
+        fail = False
+
+    calls = Renders()
+
+    def fake_render(copecount):
+        calls.append(dot_render.copecount_key(copecount))
+        time.sleep(calls.delay)
+        if calls.fail:
+            raise RuntimeError("dot exited with status 1")
+        return f"<svg>{len(copecount['winlosstie'])}</svg>"
+
+    monkeypatch.setattr(dot_render, '_render', fake_render)
+    return calls
+
+
+def test_repeat_renders_once(renders):
+    results = [dot_render.copecount_svg(COPECOUNT) for _ in range(3)]
+    assert results == [("<svg>2</svg>", True)] * 3
+    assert len(renders) == 1
+
+
+def test_concurrent_requests_share_render(renders):
+    renders.delay = 0.2
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(dot_render.copecount_svg(COPECOUNT)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [("<svg>2</svg>", True)] * 4
+    assert len(renders) == 1
+
+
+def test_timeout_gives_placeholder_then_caches(renders):
+    renders.delay = 0.5
+    svg, rendered = dot_render.copecount_svg(COPECOUNT, timeout=0.05)
+    assert 'timed out' in svg and 'dot-fallback' in svg and not rendered
+    # The timed-out render finishes in the background and is kept
+    time.sleep(renders.delay + 0.2)
+    assert dot_render.copecount_svg(COPECOUNT) == ("<svg>2</svg>", True)
+    assert len(renders) == 1
+
+
+def test_failure_gives_placeholder_and_retries(renders):
+    renders.fail = True
+    results = [dot_render.copecount_svg(COPECOUNT) for _ in range(2)]
+    assert all('unavailable' in svg and 'dot-fallback' in svg and not rendered for svg, rendered in results)
+    assert len(renders) == 2
+
+
+def test_key_keeps_node_order():
+    # Same graph with nodes in another order is another diagram
+    reordered = dict(COPECOUNT, winlosstie=dict(reversed(list(COPECOUNT['winlosstie'].items()))))
+    assert dot_render.copecount_key(reordered) != dot_render.copecount_key(COPECOUNT)
+
+
+def test_page_and_diagram_link_share_render(renders):
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    cache.init_app(app)
+    client = app.test_client()
+    page = client.get('/id/TNexample/pairwise')
+    diagram = client.get('/id/TNexample/dot/svg')
+    assert page.status_code == diagram.status_code == 200
+    assert diagram.get_data(as_text=True) == "<svg>4</svg>"
+    assert "<svg>4</svg>" in page.get_data(as_text=True)
+    assert len(renders) == 1
+
+
+@pytest.fixture
+def page_cache():
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.SimpleCache'
+    cache.init_app(app)
+    cache.clear()
+    yield cache
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    cache.init_app(app)
+
+
+def _check_placeholder_not_page_cached(renders, path):
+    # One failed render mustn't pin the placeholder in the page cache
+    client = app.test_client()
+    renders.fail = True
+    assert 'dot-fallback' in client.get(path).get_data(as_text=True)
+    renders.fail = False
+    assert "<svg>4</svg>" in client.get(path).get_data(as_text=True)
+    assert len(renders) == 2
+    # ...while a page with the real diagram is cached as before
+    assert "<svg>4</svg>" in client.get(path).get_data(as_text=True)
+    assert len(renders) == 2
+
+
+def test_page_placeholder_is_not_page_cached(renders, page_cache):
+    _check_placeholder_not_page_cached(renders, '/id/TNexample/pairwise')
+
+
+def test_diagram_placeholder_is_not_page_cached(renders, page_cache):
+    _check_placeholder_not_page_cached(renders, '/id/TNexample/dot/svg')
@@ -0,0 +1,98 @@
+"""
+Tests for incremental tallies of catalog elections that grow by appended
+vote lines (src/incremental_tally.py).
+"""
+import pytest
+
+import awt
+from abiflib import convert_abif_to_jabmod
+from src.incremental_tally import parse_catalog_abif, reset_incremental_state
+from src.server_util import RouteProfiler
+
+TN_ABIF = """=Memph:[Memphis, TN]
+=Nash:[Nashville, TN]
+=Chat:[Chattanooga, TN]
+=Knox:[Knoxville, TN]
+42:Memph>Nash>Chat>Knox
+26:Nash>Chat>Knox>Memph
+15:Chat>Knox>Nash>Memph
+17:Knox>Chat>Nash>Memph
+"""
+
+APPROVAL_ABIF = """=A:[Alice]
+=B:[Bob]
+=C:[Carol]
+30:A/1,B/1,C/0
+25:B/1,A/0,C/0
+20:C/1,B/1,A/0
+"""
+
+COMPARED_KEYS = ('FPTP_result', 'pairwise_dict', 'paircells', 'copewinners',
+                 'approval_result', 'approval_text')
+# IRV tiebreaks are random, so only these methods' notices are compared
+COMPARED_NOTICES = ('fptp', 'pairwise', 'approval')
+
+
+@pytest.fixture
+def reparse(monkeypatch):
+    """reparse(base, text, min_ballots) parses base, primes its running
+    counts as a first page view would, then parses text; returns
+    (jabmod, tallies) for text.  Runs in a request context."""
+    reset_incremental_state()
+    with awt.app.test_request_context('/'):
+        def reparse(base, text, min_ballots):
+            monkeypatch.setenv('AWT_INCREMENTAL_MIN_BALLOTS', min_ballots)
+            jabmod, tallies = parse_catalog_abif('incremental-test', base)
+            if tallies is not None:
+                awt.compute_method_results(jabmod, awt.PIPELINE_METHODS, RouteProfiler('incremental-test', None),
+                                           transform_ballots=True, tallies=tallies)
+            return parse_catalog_abif('incremental-test', text)
+        yield reparse
+    reset_incremental_state()
+
+
+def _check_reparse(reparse, base, text, min_ballots, appended):
+    """Checks the lines taken as appended, and that the parsed election and
+    every method's results match a full parse and tally of text."""
+    jabmod, tallies = reparse(base, text, min_ballots)
+    assert (tallies.appended if tallies else None) == appended
+    assert jabmod == convert_abif_to_jabmod(text)
+    for transform_ballots in (True, False):
+        expected = awt.compute_method_results(
+            convert_abif_to_jabmod(text), awt.PIPELINE_METHODS, RouteProfiler('reference', None),
+            transform_ballots=transform_ballots)
+        resblob = awt.compute_method_results(
+            jabmod, awt.PIPELINE_METHODS, RouteProfiler('incremental-test', None),
+            transform_ballots=transform_ballots, tallies=tallies)
+        for key in COMPARED_KEYS:
+            assert resblob.get(key) == expected.get(key), key
+        for method in COMPARED_NOTICES:
+            assert resblob['notices'].get(method) == expected['notices'].get(method), method
+
+
+def test_appended_ranked_lines(reparse):
+    _check_reparse(reparse, TN_ABIF, TN_ABIF + "5:Knox>Memph>Nash\n9:Nash>Memph\n", "0", 2)
+
+
+def test_appended_lines_with_comments(reparse):
+    _check_reparse(reparse, TN_ABIF, TN_ABIF + "# batch 2\n\n3:Memph=Chat>Knox # tie\n", "0", 1)
+
+
+def test_appended_approval_lines(reparse):
+    _check_reparse(reparse, APPROVAL_ABIF, APPROVAL_ABIF + "10:A/1,C/1,B/0\n4:A/0,B/0,C/0\n", "0", 2)
+
+
+def test_edited_line_recounts(reparse):
+    _check_reparse(reparse, TN_ABIF, TN_ABIF.replace("42:", "40:"), "0", 0)
+
+
+def test_new_candidate_recounts(reparse):
+    _check_reparse(reparse, TN_ABIF, TN_ABIF + "6:Jack>Nash\n", "0", 0)
+
+
+def test_new_metadata_recounts(reparse):
+    _check_reparse(reparse, TN_ABIF, TN_ABIF + '{"title": "TN, updated"}\n4:Knox\n', "0", 0)
+
+
+def test_small_election_is_not_tracked(reparse):
+    _check_reparse(reparse, TN_ABIF, TN_ABIF + "5:Knox>Memph\n", "1000", None)
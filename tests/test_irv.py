@@ -39,7 +39,7 @@ Wright:6''',
     print("\n" + "="*60 + "\n")
 
     # Make POST request
-    response = client.post('/awt', data=test_data)
+    response = client.post('/awt', data=test_data, follow_redirects=True)
 
     if response.status_code == 200:
         html_content = response.data.decode('utf-8')
@@ -0,0 +1,214 @@
+"""
+Tests for the columnar IRV round payload and lazily fetched round detail
+(src/irv_payload.py, /id/<id>/IRV/rounds, /sub/<hash>/IRV/rounds).
+"""
+import html
+import json
+import re
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from awt import IRV_ROUND_ARGS, app, build_election_list, cache, get_fileentry_from_election_list
+
+TN_ABIF = """=Memph:[Memphis, TN]
+=Nash:[Nashville, TN]
+=Chat:[Chattanooga, TN]
+=Knox:[Knoxville, TN]
+42:Memph>Nash>Chat>Knox
+26:Nash>Chat>Knox>Memph
+15:Chat>Knox>Nash>Memph
+17:Knox>Chat>Nash>Memph
+"""
+
+
+def _nonempty(tallies):
+    # Candidates with no ballots to move have no triples
+    return {cand: tally for cand, tally in (tallies or {}).items() if tally}
+
+
+def _decode(payload, triples):
+    tallies = {}
+    for src, dest, votes in triples:
+        tallies.setdefault(payload['cands'][src], {})[payload['cands'][dest]] = votes
+    return tallies
+
+
+def _page_payload(page):
+    payload = re.search(r"data-irv-payload='([^']*)'", page)
+    url = re.search(r'data-rounds-url="([^"]*)"', page)
+    return json.loads(html.unescape(payload.group(1))), url and html.unescape(url.group(1))
+
+
+def _round_url(url, round_index, digest=None):
+    url = f"{url}{'&' if '?' in url else '?'}round={round_index}"
+    return f"{url}&digest={digest}" if digest else url
+
+
+@pytest.fixture
+def client():
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    cache.init_app(app)
+    return app.test_client()
+
+
+@pytest.fixture
+def cached_client():
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.SimpleCache'
+    cache.init_app(app)
+    cache.clear()
+    yield app.test_client()
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    cache.init_app(app)
+
+
+@pytest.fixture
+def irv_tallies(monkeypatch):
+    """Counts ResultConduit.update_IRV_result() calls."""
+    import conduits
+    calls = []
+    update_irv_result = conduits.ResultConduit.update_IRV_result
+
+    def counted(self, *args, **kwargs):
+        calls.append(args)
+        return update_irv_result(self, *args, **kwargs)
+
+    monkeypatch.setattr(conduits.ResultConduit, 'update_IRV_result', counted)
+    return calls
+
+
+def _check_page_detail(client, page_path):
+    page = client.get(page_path).get_data(as_text=True)
+    assert 'data-rounds-data' not in page
+    payload, url = _page_payload(page)
+    assert url and 'next_choices' not in payload
+    # The detail is tallied with the page's ballot options
+    page_args, url_args = (parse_qs(urlsplit(u).query) for u in (page_path, url))
+    assert {k: v for k, v in page_args.items() if k in IRV_ROUND_ARGS} == url_args
+    assert any(payload['detail'])
+    for i in range(len(payload['detail'])):
+        detail = client.get(_round_url(url, i, payload['digest'])).get_json()
+        assert detail['round'] == i and detail['digest'] == payload['digest']
+        assert bool(detail['next_choices']) == payload['detail'][i]
+    return payload, url
+
+
+def _check_round_trip(election, lazy):
+    # Decoding the payload and every round's detail gives back roundmeta
+    import conduits
+    from abiflib import convert_abif_to_jabmod
+    from src.irv_payload import irv_payload, irv_round_detail, irv_round_details
+    fileentry = get_fileentry_from_election_list(election, build_election_list())
+    jabmod = convert_abif_to_jabmod(fileentry['text'], cleanws=True)
+    irv_dict = conduits.ResultConduit(jabmod=jabmod).update_IRV_result(
+        jabmod, include_irv_extra=True).resblob['IRV_dict']
+    payload = irv_payload(irv_dict, lazy=lazy)
+    details = irv_round_details(irv_dict)
+    assert ('next_choices' in payload) != lazy
+    for i, (rnd, meta) in enumerate(zip(irv_dict['rounds'], irv_dict['roundmeta'])):
+        assert {c: n for c, n in zip(payload['cands'], payload['counts'][i]) if n is not None} == rnd
+        assert _decode(payload, payload['transfers'][i]) == _nonempty(meta['transfers'])
+        detail = irv_round_detail(details, i)
+        assert detail['digest'] == payload['digest']
+        next_choices = payload['next_choices'][i] if not lazy else detail['next_choices']
+        assert _decode(payload, next_choices) == _nonempty(meta.get('next_choices'))
+    with pytest.raises(IndexError):
+        irv_round_detail(details, len(irv_dict['roundmeta']))
+
+
+def test_lazy_payload_round_trips():
+    _check_round_trip('TNexample', lazy=True)
+
+
+def test_lazy_payload_round_trips_many_rounds():
+    _check_round_trip('sf2018special', lazy=True)
+
+
+def test_embedded_payload_round_trips():
+    _check_round_trip('TNexample', lazy=False)
+
+
+def test_catalog_page_fetches_detail(client):
+    _check_page_detail(client, '/id/sf2018special')
+
+
+def test_detail_keeps_page_ballot_options(client):
+    _check_page_detail(client, '/id/TNexample?transform_ballots=0')
+
+
+def test_submission_page_fetches_detail(client, monkeypatch, tmp_path):
+    monkeypatch.setenv('AWT_SUBMISSION_DIR', str(tmp_path))
+    response = client.post('/awt', data={'abifinput': TN_ABIF, 'include_IRV': 'yes', 'include_irv_extra': 'yes'})
+    assert response.status_code == 303
+    _check_page_detail(client, response.headers['Location'])
+
+
+def test_round_past_last_is_not_found(client):
+    payload, url = _page_payload(client.get('/id/TNexample').get_data(as_text=True))
+    assert client.get(_round_url(url, len(payload['detail']))).status_code == 404
+
+
+def test_round_not_a_number_is_rejected(client):
+    _, url = _page_payload(client.get('/id/TNexample').get_data(as_text=True))
+    assert client.get(_round_url(url, 'last')).status_code == 400
+
+
+def test_unknown_election(client):
+    assert client.get(_round_url("/id/no-such-election/IRV/rounds", 0)).status_code == 404
+
+
+def _check_detail_from_page_tally(cached_client, irv_tallies, page_path):
+    # Opening popovers slices the tally the page was rendered from
+    payload, url = _page_payload(cached_client.get(page_path).get_data(as_text=True))
+    assert len(irv_tallies) == 1
+    for i in range(len(payload['detail'])):
+        assert cached_client.get(_round_url(url, i, payload['digest'])).status_code == 200
+    assert len(irv_tallies) == 1
+
+
+def test_detail_comes_from_page_tally(cached_client, irv_tallies):
+    _check_detail_from_page_tally(cached_client, irv_tallies, '/id/sf2018special')
+
+
+def test_detail_without_transform_comes_from_page_tally(cached_client, irv_tallies):
+    _check_detail_from_page_tally(cached_client, irv_tallies, '/id/TNexample?transform_ballots=0')
+
+
+def test_detail_without_page_tallies_once(cached_client, irv_tallies):
+    payload, url = _page_payload(cached_client.get('/id/sf2018special').get_data(as_text=True))
+    cache.clear()
+    del irv_tallies[:]
+    for i in range(len(payload['detail'])):
+        assert cached_client.get(_round_url(url, i, payload['digest'])).status_code == 200
+    assert len(irv_tallies) == 1
+
+
+def test_digest_mismatch_is_not_kept(cached_client, irv_tallies):
+    # A recount with another tiebreak outcome is an error that mustn't stick
+    payload, url = _page_payload(cached_client.get('/id/TNexample').get_data(as_text=True))
+    for expected_tallies in (2, 3):
+        response = cached_client.get(_round_url(url, 0, 'stale'))
+        assert response.status_code == 409 and 'error' in response.get_json()
+        assert 'max-age' not in response.headers.get('Cache-Control', '')
+        assert len(irv_tallies) == expected_tallies
+    assert cached_client.get(_round_url(url, 0, payload['digest'])).status_code == 200
+
+
+def test_rounds_take_no_page_cache_entries(cached_client):
+    # However many popovers are opened; the browser keeps the rounds instead
+    payload, url = _page_payload(cached_client.get('/id/sf2018special').get_data(as_text=True))
+    entries = len(cache.cache._cache)
+    for i in range(len(payload['detail'])):
+        response = cached_client.get(_round_url(url, i, payload['digest']))
+        assert 'max-age' in response.headers['Cache-Control']
+    assert len(cache.cache._cache) == entries
+
+
+def test_pages_with_one_tally_share_detail(cached_client, monkeypatch):
+    from src import irv_payload
+    written = []
+    irv_round_details = irv_payload.irv_round_details
+    monkeypatch.setattr(irv_payload, 'irv_round_details', lambda d: written.append(1) or irv_round_details(d))
+    cached_client.get('/id/TNexample')
+    cached_client.get('/id/TNexample/IRV')
+    assert len(written) == 1
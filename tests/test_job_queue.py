@@ -0,0 +1,112 @@
+"""
+Tests for background jobs for large POST /awt submissions (src/job_queue.py).
+"""
+import json
+import time
+import pytest
+
+import awt
+from awt import app, cache
+from src import job_queue
+
+TN_ABIF = """=Memph:[Memphis, TN]
+=Nash:[Nashville, TN]
+=Chat:[Chattanooga, TN]
+=Knox:[Knoxville, TN]
+42:Memph>Nash>Chat>Knox
+26:Nash>Chat>Knox>Memph
+15:Chat>Knox>Nash>Memph
+17:Knox>Chat>Nash>Memph
+"""
+
+FORM = {"abifinput": TN_ABIF, "include_FPTP": "yes", "include_pairtable": "yes"}
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setenv('AWT_SUBMISSION_DIR', str(tmp_path / 'submissions'))
+    test_queue = job_queue.JobQueue(str(tmp_path / 'jobs.sqlite'), str(tmp_path / 'jobs'))
+    monkeypatch.setattr(job_queue, '_QUEUE', test_queue)
+    yield test_queue
+    test_queue.shutdown()
+
+
+@pytest.fixture
+def client(queue, monkeypatch):
+    monkeypatch.setenv('AWT_JOB_THRESHOLD', '100')
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    cache.init_app(app)
+    return app.test_client()
+
+
+def _queue_job(client):
+    """POSTs FORM; returns the /job/<id> URL it redirects to."""
+    response = client.post('/awt', data=FORM)
+    assert response.status_code == 303
+    location = response.headers['Location']
+    assert location.startswith('/job/')
+    return location
+
+
+def _finished_status(client, location):
+    job_id = location.rsplit('/', 1)[-1]
+    deadline = time.time() + 120
+    while True:
+        status = json.loads(client.get(f'/job/{job_id}/status').data)
+        if status['status'] in ('done', 'failed') or time.time() > deadline:
+            break
+        time.sleep(0.5)
+    assert status['status'] == 'done', status
+    return status
+
+
+def test_submission_below_threshold_is_not_queued(client, monkeypatch):
+    monkeypatch.setenv('AWT_JOB_THRESHOLD', 'none')
+    response = client.post('/awt', data=FORM)
+    assert response.status_code == 303
+    assert response.headers['Location'].startswith('/sub/')
+
+
+def test_resubmission_shares_job(client):
+    location = _queue_job(client)
+    assert client.post('/awt', data=FORM).headers['Location'] == location
+    assert client.get(location).status_code in (200, 303)
+
+
+def test_job_runs_requested_methods(client):
+    status = _finished_status(client, _queue_job(client))
+    assert status['expected'][:3] == ['convert_abif_to_jabmod', 'ballot_patterns', 'result_conduit_init']
+    # Every expected step is reported, in the order it runs
+    assert [step for step in status['steps'] if step in status['expected']] == status['expected']
+    assert 'pairwise' in status['steps'] and 'IRV' not in status['steps']
+
+
+def test_finished_job_leads_to_result(client):
+    location = _queue_job(client)
+    status = _finished_status(client, location)
+    assert client.get(location).headers['Location'] == status['result_url']
+    result = client.get(status['result_url'])
+    assert result.status_code == 200 and b'<h2 id="results"' in result.data
+
+
+def test_progress_page_polls_by_default(client):
+    location = _queue_job(client)
+    page = client.get(location).get_data(as_text=True)
+    assert 'data-status-url=' in page and 'data-events-url=' not in page
+    assert client.get(location + '/events').status_code == 404
+
+
+def test_events_are_opt_in_and_short(client, monkeypatch):
+    monkeypatch.setenv('AWT_JOB_EVENTS', '1')
+    monkeypatch.setattr(awt, 'JOB_EVENTS_MAX_SECONDS', 0.2)
+    monkeypatch.setattr(job_queue.JobQueue, 'get', lambda self, job_id: dict(
+        id=job_id, status='running', expected=[], steps=[], error=None,
+        created=time.time(), started=time.time(), finished=None))
+    started = time.monotonic()
+    events = client.get('/job/stuckjob/events').data.decode()
+    assert time.monotonic() - started < 5
+    assert events.count('data: ') == 1 and '"status": "running"' in events
+
+
+def test_unknown_job(client):
+    assert client.get('/job/nosuchjob/status').status_code == 404
@@ -0,0 +1,105 @@
+"""
+Tests for RouteProfiler's tracemalloc memory mode (AWT_PROFILE_MEMORY=1).
+"""
+import tracemalloc
+import pytest
+
+from src import server_util, span_store
+from src.server_util import RouteProfiler
+
+KEPT = []
+
+
+def _allocate_kept():
+    KEPT.append(bytearray(2 * 1024 * 1024))
+
+
+def _allocate_temporary():
+    scratch = [bytearray(1024) for _ in range(4096)]
+    return len(scratch)
+
+
+@pytest.fixture(autouse=True)
+def stop_tracemalloc():
+    """RouteProfiler leaves tracemalloc running; don't slow the rest of the suite."""
+    was_tracing = tracemalloc.is_tracing()
+    yield
+    if not was_tracing:
+        tracemalloc.stop()
+
+
+def _profile_alloc(func):
+    profiler = RouteProfiler('TNexample', 'IRV', memory=True)
+    profiler.time_block('alloc', func)
+    profiler.time_block('noop', lambda: None)
+    entry = profiler.memory_spans['alloc']
+    assert entry['sites'] and entry['sites'][0][0].startswith('tests/test_memory_profile.py:')
+    assert profiler.memory_spans['noop']['peak'] < entry['peak']
+    return entry
+
+
+def test_kept_allocation_counts_as_net_growth():
+    entry = _profile_alloc(_allocate_kept)
+    assert entry['net'] >= 2 * 1024 * 1024
+    assert entry['peak'] >= 2 * 1024 * 1024
+
+
+def test_temporary_allocation_shows_in_peak_only():
+    entry = _profile_alloc(_allocate_temporary)
+    assert entry['peak'] >= 4 * 1024 * 1024
+    assert entry['net'] < 2 * 1024 * 1024
+
+
+def test_memory_report():
+    profiler = RouteProfiler('TNexample', 'IRV', memory=True)
+    profiler.time_block('alloc', _allocate_kept)
+    report = profiler.render_debug_output()
+    assert report.splitlines()[0].startswith('memory alloc: ')
+    assert 'tests/test_memory_profile.py:' in report
+
+
+def test_memory_peaks_stored_apart_from_timings(tmp_path):
+    profiler = RouteProfiler('TNexample', 'IRV', memory=True)
+    profiler.time_block('alloc', _allocate_temporary)
+    db_path = str(tmp_path / 'spans.sqlite')
+    store = span_store.SpanStore(db_path)
+    store.record(profiler, profiler.finalize())
+    assert store.flush()
+    peaks = span_store.summarize_spans(db_path, span='alloc', metric='mem_peak_bytes')
+    assert peaks[0]['median'] == profiler.memory_spans['alloc']['peak']
+    # Memory-profiled requests are too slow to count as timings
+    assert span_store.summarize_spans(db_path, span='alloc') == []
+
+
+def test_memory_mode_off_by_default(monkeypatch):
+    monkeypatch.delenv('AWT_PROFILE_MEMORY', raising=False)
+    profiler = RouteProfiler('TNexample', 'IRV')
+    profiler.time_block('alloc', _allocate_temporary)
+    assert profiler.memory_spans == {}
+    assert 'memory' not in profiler.render_debug_output()
+
+
+def test_nested_block_keeps_outer_peak():
+    profiler = RouteProfiler('TNexample', 'IRV', memory=True)
+
+    def outer():
+        _allocate_temporary()
+        profiler.time_block('inner', lambda: None)
+    profiler.time_block('outer', outer)
+    assert profiler.memory_spans['outer']['peak'] >= 4 * 1024 * 1024
+    assert profiler.memory_spans['inner']['peak'] < 1024 * 1024
+
+
+def test_nested_peak_counts_toward_outer():
+    profiler = RouteProfiler('TNexample', 'IRV', memory=True)
+    profiler.time_block('outer', lambda: profiler.time_block('inner', _allocate_temporary))
+    assert profiler.memory_spans['inner']['peak'] >= 4 * 1024 * 1024
+    assert profiler.memory_spans['outer']['peak'] >= profiler.memory_spans['inner']['peak']
+
+
+def test_without_reset_peak(monkeypatch):
+    """Python 3.8 has no tracemalloc.reset_peak(); peaks fall back to net growth."""
+    monkeypatch.setattr(server_util, '_HAS_RESET_PEAK', False)
+    monkeypatch.delattr(tracemalloc, 'reset_peak')
+    entry = _profile_alloc(_allocate_kept)
+    assert entry['peak'] >= 2 * 1024 * 1024
@@ -0,0 +1,80 @@
+"""
+Tests for the shared voting-method pipeline (awt.compute_method_results).
+"""
+import pytest
+
+import conduits
+from awt import app, cache
+
+TN_ABIF = """=Memph:[Memphis, TN]
+=Nash:[Nashville, TN]
+=Chat:[Chattanooga, TN]
+=Knox:[Knoxville, TN]
+42:Memph>Nash>Chat>Knox
+26:Nash>Chat>Knox>Memph
+15:Chat>Knox>Nash>Memph
+17:Knox>Chat>Nash>Memph
+"""
+
+ALL = {"include_FPTP": "yes", "include_IRV": "yes", "include_STAR": "yes", "include_approval": "yes",
+       "include_pairtable": "yes", "include_dotsvg": "yes"}
+
+ONLY_PAIRWISE = {"FPTP": 0, "pairwise": 1, "IRV": 0, "STAR": 0, "approval": 0, "fptp_tally": 1}
+EVERY_METHOD = {"FPTP": 1, "pairwise": 1, "IRV": 1, "STAR": 1, "approval": 1, "fptp_tally": 1}
+
+
+@pytest.fixture
+def tally_calls(tmp_path, monkeypatch):
+    """Counts each method's tally (and the FPTP tally under it)."""
+    monkeypatch.setenv('AWT_SUBMISSION_DIR', str(tmp_path))
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    cache.init_app(app)
+    calls = dict.fromkeys(EVERY_METHOD, 0)
+
+    def counting(name, func):
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    for name in ("FPTP", "pairwise", "IRV", "STAR", "approval"):
+        method = f"update_{name}_result"
+        monkeypatch.setattr(conduits.ResultConduit, method,
+                            counting(name, getattr(conduits.ResultConduit, method)))
+    import abiflib.fptp_tally
+    # Imported first so it keeps the unpatched tally whatever ran before:
+    # the approval transform's own FPTP count isn't the pipeline's
+    import abiflib.transform_core  # noqa: F401
+    monkeypatch.setattr(abiflib.fptp_tally, 'FPTP_result_from_abifmodel',
+                        counting("fptp_tally", abiflib.fptp_tally.FPTP_result_from_abifmodel))
+    monkeypatch.setattr(conduits, 'FPTP_result_from_abifmodel',
+                        counting("fptp_tally", conduits.FPTP_result_from_abifmodel))
+    return calls
+
+
+def _post_counts(tally_calls, form):
+    response = app.test_client().post('/awt', data=dict(form, abifinput=TN_ABIF), follow_redirects=True)
+    assert response.status_code == 200
+    return tally_calls
+
+
+def _get_counts(tally_calls, path):
+    assert app.test_client().get(path).status_code == 200
+    return tally_calls
+
+
+def test_submission_tallies_each_method_once(tally_calls):
+    assert _post_counts(tally_calls, ALL) == EVERY_METHOD
+
+
+def test_pairtable_and_dot_share_pairwise_tally(tally_calls):
+    form = {"include_pairtable": "yes", "include_dotsvg": "yes"}
+    assert _post_counts(tally_calls, form) == ONLY_PAIRWISE
+
+
+def test_catalog_page_tallies_each_method_once(tally_calls):
+    assert _get_counts(tally_calls, '/id/TNexample') == EVERY_METHOD
+
+
+def test_pairwise_page_tallies_only_pairwise(tally_calls):
+    assert _get_counts(tally_calls, '/id/TNexample/pairwise') == ONLY_PAIRWISE
@@ -0,0 +1,140 @@
+"""
+Tests for the /metrics endpoint and multi-process metric aggregation.
+"""
+import json
+import os
+import pytest
+
+from awt import app, cache
+from src import metrics
+
+ID_ROUTE = "/id/<identifier>/<resulttype>"
+
+
+@pytest.fixture
+def client():
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    cache.init_app(app)
+    metrics.instrument_cache(cache)
+    return app.test_client()
+
+
+def _metrics_after(client, path):
+    client.get(path)
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    return response.get_data(as_text=True)
+
+
+def test_id_request_records_span_duration(client):
+    body = _metrics_after(client, '/id/TNexample/FPTP')
+    assert 'awt_span_duration_seconds_count{resulttype="FPTP",span="FPTP"}' in body, body
+
+
+def test_id_request_is_counted_by_route(client):
+    body = _metrics_after(client, '/id/TNexample/FPTP')
+    assert f'awt_requests_total{{method="GET",route="{ID_ROUTE}",status="200"}}' in body, body
+
+
+def test_unmatched_request_is_counted(client):
+    body = _metrics_after(client, '/no/such/page')
+    assert 'awt_requests_total{method="GET",route="<unmatched>",status="404"}' in body, body
+
+
+def test_cache_miss_is_counted(client):
+    body = _metrics_after(client, '/id/TNexample/FPTP')
+    assert f'awt_cache_requests_total{{result="miss",route="{ID_ROUTE}"}}' in body, body
+
+
+def test_metrics_merge_across_processes(tmp_path):
+    """Counters/histograms from other (even exited) workers are summed;
+    gauges only count live processes."""
+    dead_pid = 2 ** 22 + 12345  # above the default pid_max, so never alive
+    registry = metrics.MetricsRegistry()
+    registry.inc('awt_requests_total', {'route': '/id', 'method': 'GET', 'status': 200}, 3)
+    registry.add_gauge('awt_requests_in_flight', {'route': '/id'}, 2)
+    registry.observe('awt_span_duration_seconds', 0.3, {'span': 'IRV', 'resulttype': 'all'})
+    snap = registry.snapshot()
+    snap['pid'] = dead_pid
+    (tmp_path / f"metrics-{dead_pid}.json").write_text(json.dumps(snap))
+
+    live = metrics.MetricsRegistry()
+    live.inc('awt_requests_total', {'route': '/id', 'method': 'GET', 'status': 200}, 2)
+    live.add_gauge('awt_requests_in_flight', {'route': '/id'}, 1)
+    live.observe('awt_span_duration_seconds', 3.0, {'span': 'IRV', 'resulttype': 'all'})
+
+    writer = metrics._SnapshotWriter(live, str(tmp_path))
+    text = metrics.render_prometheus(metrics.merge_snapshots(writer.collect()))
+
+    assert 'awt_requests_total{method="GET",route="/id",status="200"} 5' in text
+    assert 'awt_requests_in_flight{route="/id"} 1' in text
+    assert 'awt_span_duration_seconds_bucket{resulttype="all",span="IRV",le="0.5"} 1' in text
+    assert 'awt_span_duration_seconds_count{resulttype="all",span="IRV"} 2' in text
+
+
+def test_metrics_refused_to_remote_callers(client):
+    remote = {'REMOTE_ADDR': '203.0.113.7'}
+    assert client.get('/metrics', environ_base=remote).status_code == 403
+
+
+def test_metrics_refused_through_a_proxy(client):
+    assert client.get('/metrics', headers={'X-Forwarded-For': '203.0.113.7'}).status_code == 403
+
+
+def test_metrics_with_admin_token(client, monkeypatch):
+    monkeypatch.setenv('AWT_ADMIN_TOKEN', 'admintok')
+    remote = {'REMOTE_ADDR': '203.0.113.7'}
+    assert client.get('/metrics', environ_base=remote,
+                      headers={'Authorization': 'Bearer admintok'}).status_code == 200
+    assert client.get('/metrics', environ_base=remote,
+                      headers={'X-AWT-Admin-Token': 'admintok'}).status_code == 200
+    assert client.get('/metrics', environ_base=remote,
+                      headers={'Authorization': 'Bearer nope'}).status_code == 403
+
+
+def test_metrics_made_public(client, monkeypatch):
+    monkeypatch.setenv('AWT_METRICS_PUBLIC', '1')
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.7'}).status_code == 200
+
+
+def _requests_total(writer):
+    text = metrics.render_prometheus(metrics.merge_snapshots(writer.collect()))
+    line = next(line for line in text.splitlines() if line.startswith('awt_requests_total{'))
+    return int(line.rsplit(' ', 1)[1])
+
+
+def _write_snapshot(tmp_path, pid, count, instance=None):
+    registry = metrics.MetricsRegistry()
+    registry.inc('awt_requests_total', {'route': '/id', 'method': 'GET', 'status': 200}, count)
+    snap = registry.snapshot()
+    snap['pid'] = pid
+    snap['instance'] = instance or snap['instance']
+    (tmp_path / f"metrics-{pid}.json").write_text(json.dumps(snap))
+
+
+def test_exited_workers_are_folded_and_deleted(tmp_path):
+    dead_pids = [2 ** 22 + 1, 2 ** 22 + 2]
+    for pid in dead_pids:
+        _write_snapshot(tmp_path, pid, 3)
+    live = metrics.MetricsRegistry()
+    live.inc('awt_requests_total', {'route': '/id', 'method': 'GET', 'status': 200}, 1)
+    writer = metrics._SnapshotWriter(live, str(tmp_path))
+    assert _requests_total(writer) == 7
+    assert not any((tmp_path / f"metrics-{pid}.json").exists() for pid in dead_pids)
+    assert (tmp_path / metrics.DEAD_SNAPSHOT).exists()
+    # Another exited worker adds to the folded total
+    _write_snapshot(tmp_path, dead_pids[0], 2)
+    assert _requests_total(writer) == 9
+
+
+def test_reused_pid_keeps_old_counters(tmp_path):
+    """A new process with an exited one's pid must not overwrite its file."""
+    _write_snapshot(tmp_path, os.getpid(), 3, instance='exited-process')
+    live = metrics.MetricsRegistry()
+    live.inc('awt_requests_total', {'route': '/id', 'method': 'GET', 'status': 200}, 2)
+    writer = metrics._SnapshotWriter(live, str(tmp_path))
+    writer.flush(force=True)
+    own = json.loads((tmp_path / f"metrics-{os.getpid()}.json").read_text())
+    assert own['instance'] == live.instance
+    assert _requests_total(writer) == 5
@@ -148,8 +148,9 @@ def get_html_from_awt(post_data=None, url_path=None):
         # GET request to specific URL path
         resp = client.get(url_path)
     elif post_data is not None:
-        # POST request to /awt with form data
-        resp = client.post("/awt", data=post_data)
+        # POST request to /awt with form data; it redirects to the
+        # /sub/<hash> permalink that renders the results
+        resp = client.post("/awt", data=post_data, follow_redirects=True)
     else:
         raise ValueError("Either post_data or url_path must be provided")
 
@@ -0,0 +1,54 @@
+"""
+Tests for the in-process catalog benchmark and compare in perf_awt.py.
+"""
+import copy
+import json
+import pytest
+
+import perf_awt
+from awt import app, cache
+
+
+@pytest.fixture(scope="module")
+def bench_report(tmp_path_factory):
+    saved = dict(app.config)
+    output_path = str(tmp_path_factory.mktemp("bench") / "bench.json")
+    try:
+        report = perf_awt.run_catalog_benchmark(ids=['TNexample'], resulttypes=('FPTP',), reps=2,
+                                                output_path=output_path)
+    finally:
+        app.config.clear()
+        app.config.update(saved)
+        cache.init_app(app)
+    with open(output_path) as f:
+        assert json.load(f) == json.loads(json.dumps(report))
+    return report
+
+
+def test_bench_report(bench_report):
+    entry = bench_report['results']['TNexample/FPTP']
+    assert entry['status'] == 200
+    assert entry['cold']['n'] == 2 and entry['warm']['n'] == 2
+    assert 'FPTP' in entry['cold']['spans']
+    assert entry['warm']['spans'] == {}  # cache hits never reach RouteProfiler
+
+
+def _compare_slowed(bench_report, slowdown=1.0, span=None):
+    new = copy.deepcopy(bench_report)
+    new_cold = new['results']['TNexample/FPTP']['cold']
+    new_cold['median'] = new_cold['median'] * slowdown + (1.0 if slowdown > 1 else 0)
+    if span:
+        new_cold['spans'][span]['median'] += 1.0
+    return perf_awt.compare_benchmarks(bench_report, new, spans=True)
+
+
+def test_compare_same_run_has_no_regressions(bench_report):
+    assert _compare_slowed(bench_report) == []
+
+
+def test_compare_flags_slower_total(bench_report):
+    assert len(_compare_slowed(bench_report, slowdown=3.0)) == 1
+
+
+def test_compare_flags_slower_span(bench_report):
+    assert len(_compare_slowed(bench_report, span='FPTP')) == 1
@@ -0,0 +1,66 @@
+"""
+Tests for the request-log replay load generator in perf_awt.py.
+"""
+import threading
+import pytest
+from werkzeug.serving import make_server
+
+import perf_awt
+from awt import app, cache
+from cache_awt import _SQLiteRequestLogger
+from src.metrics import instrument_cache
+
+
+@pytest.fixture(scope="module")
+def replay_server():
+    saved = dict(app.config)
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.SimpleCache'
+    cache.init_app(app)
+    instrument_cache(cache)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        app.config.clear()
+        app.config.update(saved)
+        cache.init_app(app)
+
+
+@pytest.fixture
+def request_log(tmp_path):
+    db_path = str(tmp_path / 'requests.sqlite')
+    req_logger = _SQLiteRequestLogger(db_path)
+    for _ in range(5):
+        req_logger.log_request('/id/TNexample/FPTP?', 200, 100)
+    req_logger.log_request('/no/such/page?', 200, 100)
+    return db_path
+
+
+def test_load_replay_urls(request_log):
+    assert perf_awt.load_replay_urls(request_log) == [('/id/TNexample/FPTP', 5), ('/no/such/page', 1)]
+    assert perf_awt.load_replay_urls(request_log, min_count=2) == [('/id/TNexample/FPTP', 5)]
+
+
+def _check_replay_summary(summary, total):
+    assert summary['requests'] == total
+    assert sum(summary['statuses'].values()) == total
+    assert summary['error_rate'] == summary['statuses'].get('404', 0) / total
+    assert summary['statuses'].get('200', 0) > summary['statuses'].get('404', 0)
+    assert 0.0 <= summary['cache_hit_ratio'] <= 1.0
+    assert summary['latency_s']['p50'] <= summary['latency_s']['p99']
+
+
+def test_replay_unpaced(replay_server, request_log):
+    summary = perf_awt.run_replay(replay_server, perf_awt.load_replay_urls(request_log), total=30, seed=1,
+                                  concurrency=4)
+    _check_replay_summary(summary, 30)
+
+
+def test_replay_paced(replay_server, request_log):
+    summary = perf_awt.run_replay(replay_server, perf_awt.load_replay_urls(request_log), total=30, seed=1,
+                                  concurrency=2, rate=200.0)
+    _check_replay_summary(summary, 30)
+    assert summary['wall_s'] >= 29 / 200.0
@@ -0,0 +1,99 @@
+"""
+Tests for on-demand per-request profiling (src/request_profiling.py).
+"""
+import json
+import os
+import pytest
+
+from awt import app, cache
+from src import request_profiling
+
+PATH = '/id/TNexample/FPTP'
+
+
+@pytest.fixture
+def profiling(tmp_path, monkeypatch):
+    """Profiling configured; returns get(query, headers, sample_rate),
+    which requests PATH past a primed page cache and returns the response
+    and the profiles stored for it."""
+    monkeypatch.setenv('AWT_PROFILE_SECRET', 'testsecret')
+    monkeypatch.setenv('AWT_ADMIN_TOKEN', 'admintok')
+    monkeypatch.setenv('AWT_PROFILE_DIR', str(tmp_path))
+    monkeypatch.delenv('AWT_PROFILE_OUTPUT', raising=False)
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.SimpleCache'
+    cache.init_app(app)
+    client = app.test_client()
+
+    def get(query='', headers=None, sample_rate='0'):
+        # Prime the page cache: profiled requests must bypass it anyway
+        monkeypatch.setenv('AWT_PROFILE_SAMPLE_RATE', '0')
+        client.get(PATH + query)
+        for leftover in os.listdir(tmp_path):
+            os.remove(tmp_path / leftover)
+        monkeypatch.setenv('AWT_PROFILE_SAMPLE_RATE', sample_rate)
+        response = client.get(PATH + query, headers=headers or {})
+        assert response.status_code == 200
+        return response, request_profiling.list_request_profiles(str(tmp_path))
+
+    return get
+
+
+def _check_profiled(response, profiles, reason):
+    profile_id = response.headers.get('X-AWT-Profile-Id')
+    assert [p['req_id'] for p in profiles] == [profile_id]
+    meta = profiles[0]
+    assert meta['reason'] == reason
+    assert meta['election_id'] == 'TNexample'
+    assert 'FPTP' in meta['spans']
+    assert 'admintok' not in json.dumps(meta)
+    assert os.path.basename(meta['cprof']).endswith(f"-TNexample-{profile_id}.cprof")
+
+
+def _check_not_profiled(response, profiles):
+    assert response.headers.get('X-AWT-Profile-Id') is None
+    assert profiles == []
+
+
+def test_signed_header_profiles_request(profiling):
+    header = {'X-AWT-Profile': request_profiling.sign_profile_header(PATH)}
+    _check_profiled(*profiling(headers=header), 'header')
+
+
+def test_admin_token_profiles_request(profiling):
+    _check_profiled(*profiling('?profile=admintok'), 'admin')
+
+
+def test_sampled_request_is_profiled(profiling):
+    _check_profiled(*profiling(sample_rate='1.0'), 'sample')
+
+
+def test_bad_signature_is_not_profiled(profiling):
+    header = {'X-AWT-Profile': request_profiling.sign_profile_header(PATH, secret='othersecret')}
+    _check_not_profiled(*profiling(headers=header))
+
+
+def test_expired_header_is_not_profiled(profiling):
+    header = {'X-AWT-Profile': request_profiling.sign_profile_header(PATH, ttl=-10)}
+    _check_not_profiled(*profiling(headers=header))
+
+
+def test_wrong_admin_token_is_not_profiled(profiling):
+    _check_not_profiled(*profiling('?profile=nope'))
+
+
+def test_unrequested_request_is_not_profiled(profiling):
+    _check_not_profiled(*profiling())
+
+
+def test_profile_rotation(tmp_path, monkeypatch):
+    monkeypatch.setenv('AWT_PROFILE_DIR', str(tmp_path))
+    monkeypatch.setenv('AWT_PROFILE_KEEP', '2')
+    monkeypatch.setenv('AWT_PROFILE_SAMPLE_RATE', '1.0')
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    cache.init_app(app)
+    client = app.test_client()
+    profile_ids = [client.get(PATH).headers['X-AWT-Profile-Id'] for _ in range(3)]
+    kept = request_profiling.list_request_profiles(str(tmp_path))
+    assert len(kept) == 2
+    assert profile_ids[0] not in {p['req_id'] for p in kept}
+    assert len(os.listdir(tmp_path)) == 4
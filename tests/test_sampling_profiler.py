@@ -0,0 +1,83 @@
+"""
+Tests for the /admin/profile/sample stack-sampling endpoint.
+"""
+import threading
+import pytest
+
+from awt import app
+from src import sampling_profiler
+
+
+def _busy_leaf(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _busy_root(stop):
+    _busy_leaf(stop)
+
+
+@pytest.fixture
+def busy_worker(monkeypatch):
+    """A client, with a thread busy in _busy_root() -> _busy_leaf()."""
+    monkeypatch.setenv('AWT_ADMIN_TOKEN', 'admintok')
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_root, args=(stop,), name='busy-worker')
+    worker.start()
+    yield app.test_client()
+    stop.set()
+    worker.join()
+
+
+def _sample_stacks(client, query, headers=None):
+    """Samples the busy worker; returns the busy stack's frames."""
+    response = client.get(f"/admin/profile/sample?{query}", headers=headers or {})
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    busy_lines = [line for line in body.splitlines() if '_busy_leaf' in line]
+    assert busy_lines, body
+    stack, count = busy_lines[0].rsplit(' ', 1)
+    assert 0 < int(count) <= int(response.headers['X-AWT-Samples'])
+    return stack
+
+
+def test_sample_with_header_token(busy_worker):
+    frames = _sample_stacks(busy_worker, "seconds=0.3", {"X-AWT-Admin-Token": "admintok"}).split(';')
+    assert frames.index(next(f for f in frames if f.startswith('_busy_root'))) < frames.index(
+        next(f for f in frames if f.startswith('_busy_leaf')))
+
+
+def test_sample_per_thread(busy_worker):
+    stack = _sample_stacks(busy_worker, "seconds=0.3&threads=1", {"X-AWT-Admin-Token": "admintok"})
+    assert stack.startswith('thread:busy-worker;')
+
+
+def test_sample_with_query_token_is_forbidden(busy_worker):
+    assert busy_worker.get("/admin/profile/sample?seconds=0.3&token=admintok").status_code == 403
+
+
+def test_sample_without_token_is_forbidden(busy_worker):
+    assert busy_worker.get("/admin/profile/sample?seconds=0.3").status_code == 403
+
+
+def test_sample_with_wrong_token_is_forbidden(busy_worker):
+    response = busy_worker.get("/admin/profile/sample?seconds=0.3", headers={"X-AWT-Admin-Token": "nope"})
+    assert response.status_code == 403
+
+
+def test_sample_too_long_is_rejected(busy_worker):
+    response = busy_worker.get("/admin/profile/sample?seconds=600", headers={"X-AWT-Admin-Token": "admintok"})
+    assert response.status_code == 400
+
+
+def test_sample_bad_interval_is_rejected(busy_worker):
+    response = busy_worker.get("/admin/profile/sample?interval_ms=x", headers={"X-AWT-Admin-Token": "admintok"})
+    assert response.status_code == 400
+
+
+def test_sample_while_sampling(busy_worker):
+    # One sampler at a time
+    with sampling_profiler._SAMPLING_LOCK:
+        response = busy_worker.get("/admin/profile/sample?seconds=0.3",
+                                   headers={"X-AWT-Admin-Token": "admintok"})
+    assert response.status_code == 409
@@ -0,0 +1,110 @@
+"""
+Tests for full-text catalog search (CatalogIndex.listing(q=...),
+CatalogIndex.suggest(), /search and /search/suggest).
+"""
+import re
+import shutil
+
+import pytest
+import yaml
+
+from awt import SEARCH_MAX_AGE, TESTFILEDIR, app, cache, catalog_index
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setenv('AWT_CATALOG_DB', str(tmp_path / 'catalog.sqlite'))
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    cache.init_app(app)
+    with app.test_request_context():
+        assert catalog_index().build()
+    return app.test_client()
+
+
+def _search_page(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert 'id="catalog-search"' in page
+    ids = re.findall(r'<span class="election-id">\s*(?:\d+\. )?<a href="/id/([^"]+)">', page)
+    assert len(re.findall(r'class="search-snippet"', page)) == len(ids)
+    return page, ids
+
+
+BURLINGTON = ["2009_Burlington_VT-vote", "Burl2009"]
+
+
+def test_search_by_title(client):
+    assert _search_page(client, '/search?q=burlington')[1] == BURLINGTON
+
+
+def test_search_candidate_prefix_is_highlighted(client):
+    page, ids = _search_page(client, '/search?q=Memph')
+    assert 'TNexample' in ids
+    assert '<mark>Memph</mark>' in page
+
+
+def test_search_operators_are_text(client):
+    assert _search_page(client, '/search?q=(burlington%22+OR+nyc')[1] == []
+
+
+def test_search_quotes_ignored(client):
+    assert _search_page(client, '/search?q=%22burlington*)')[1] == BURLINGTON
+
+
+def test_search_sort(client):
+    assert _search_page(client, '/search?q=burl&sort=-ballots')[1] == ["Burl2009", "2009_Burlington_VT-vote"]
+
+
+def test_suggest(client):
+    response = client.get('/search/suggest?q=burl&limit=1')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    results = response.get_json()['results']
+    assert [hit['id'] for hit in results] == ["2009_Burlington_VT-vote"]
+    assert all(hit['url'] == f"/id/{hit['id']}" and hit['title'] for hit in results)
+
+
+def test_search_and_suggest_are_not_page_cached(client):
+    # Every prefix typed into the box is another q: browsers keep them briefly
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.SimpleCache'
+    cache.init_app(app)
+    cache.clear()
+    try:
+        for path in ('/search?q=burl', '/search/suggest?q=bur', '/search/suggest?q=burl'):
+            response = client.get(path)
+            assert response.headers['Cache-Control'] == f'public, max-age={SEARCH_MAX_AGE}'
+        assert not cache.cache._cache
+    finally:
+        app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+        cache.init_app(app)
+
+
+def test_suggest_bad_limit(client):
+    response = client.get('/search/suggest?q=burl&limit=many')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert 'max-age' not in response.headers.get('Cache-Control', '')
+
+
+def test_reindex_picks_up_changes(tmp_path):
+    # Edited entries and files are searchable after the next sync
+    from src.catalog_index import CatalogIndex
+    testdata = tmp_path / 'testdata'
+    shutil.copytree(TESTFILEDIR, testdata)
+    catalog = tmp_path / 'abif_list.yml'
+    entries = [e for e in yaml.safe_load(open(app.root_path + '/abif_list.yml'))
+               if (testdata / e['filename']).is_file()]
+    catalog.write_text(yaml.safe_dump(entries))
+    index = CatalogIndex(str(tmp_path / 'search.sqlite'), str(catalog), str(testdata))
+    assert index.build()
+    assert index.listing(q='Memphis')['total'] > 0
+    assert index.suggest('zanzibar') == []
+    entries[0]['title'] = 'Zanzibar runoff'
+    with open(testdata / entries[0]['filename'], 'a') as f:
+        f.write('=Quux:[Quuxville]\n')
+    catalog.write_text(yaml.safe_dump(entries[:-1]))
+    assert index.build()
+    assert [hit['id'] for hit in index.suggest('zanzi')] == [entries[0]['id']]
+    assert [e['id'] for e in index.listing(q='quuxville')['entries']] == [entries[0]['id']]
+    assert index.listing(q=entries[-1]['id'])['total'] == 0
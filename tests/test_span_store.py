@@ -0,0 +1,91 @@
+"""
+Tests for the persistent RouteProfiler span store (src/span_store.py).
+"""
+import sqlite3
+import time
+
+from src import span_store
+from src.server_util import RouteProfiler
+
+
+def _record(store, monkeypatch, git_rev, irv_times):
+    monkeypatch.setattr(span_store, '_git_rev', lambda: git_rev)
+    # A fresh writer thread picks up the patched revision
+    store._pid = None
+    for elapsed in irv_times:
+        profiler = RouteProfiler('TNexample', 'IRV', request_path='/id/TNexample/IRV')
+        profiler.ballots, profiler.candidates = 100, 4
+        profiler.spans['IRV'].append(elapsed)
+        store.record(profiler, elapsed + 0.01)
+    assert store.flush()
+
+
+def _store_runs(tmp_path, monkeypatch, before, after):
+    """Records IRV spans for rev1 then rev2; returns the database path."""
+    db_path = str(tmp_path / 'spans.sqlite')
+    store = span_store.SpanStore(db_path)
+    _record(store, monkeypatch, 'rev1', before)
+    _record(store, monkeypatch, 'rev2', after)
+    return db_path
+
+
+def test_summaries_per_revision(tmp_path, monkeypatch):
+    db_path = _store_runs(tmp_path, monkeypatch, [0.10, 0.11, 0.12], [0.30, 0.31])
+    summaries = span_store.summarize_spans(db_path, election='TNexample', span='IRV')
+    assert [s['git_rev'] for s in summaries] == ['rev1', 'rev2']
+    assert [s['n'] for s in summaries] == [3, 2]
+    assert (summaries[0]['ballots'], summaries[0]['candidates']) == (100, 4)
+    assert len(span_store.summarize_spans(db_path, span='total')) == 2
+
+
+def _regressions(tmp_path, monkeypatch, before, after):
+    db_path = _store_runs(tmp_path, monkeypatch, before, after)
+    summaries = span_store.summarize_spans(db_path, election='TNexample', span='IRV')
+    return span_store.find_regressions(summaries, threshold=1.25)
+
+
+def test_slower_revision_is_a_regression(tmp_path, monkeypatch):
+    assert _regressions(tmp_path, monkeypatch, [0.10, 0.11, 0.12], [0.30, 0.31, 0.29])
+
+
+def test_slowdown_within_threshold_is_not_a_regression(tmp_path, monkeypatch):
+    assert not _regressions(tmp_path, monkeypatch, [0.10, 0.11, 0.12], [0.12, 0.12, 0.13])
+
+
+def test_faster_revision_is_not_a_regression(tmp_path, monkeypatch):
+    assert not _regressions(tmp_path, monkeypatch, [0.30, 0.31, 0.29], [0.10, 0.11, 0.12])
+
+
+def test_too_few_samples_is_not_a_regression(tmp_path, monkeypatch):
+    assert not _regressions(tmp_path, monkeypatch, [0.10, 0.11, 0.12], [0.90])
+
+
+def _count_rows(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT COUNT(*), MIN(ts) FROM spans").fetchone()
+
+
+def test_rows_over_the_cap_are_pruned(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'spans.sqlite')
+    store = span_store.SpanStore(db_path, max_rows=5, prune_interval=0)
+    # Each request stores two rows: the IRV span and the total
+    _record(store, monkeypatch, 'rev1', [0.10, 0.11, 0.12, 0.13])
+    _record(store, monkeypatch, 'rev2', [0.20])
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT git_rev, elapsed FROM spans ORDER BY id").fetchall()
+    assert len(rows) == 5
+    assert [rev for rev, _ in rows] == ['rev1'] * 3 + ['rev2'] * 2
+    assert rows[-2][1] == 0.20
+
+
+def test_old_rows_are_pruned(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'spans.sqlite')
+    store = span_store.SpanStore(db_path, max_age_days=30, prune_interval=0)
+    _record(store, monkeypatch, 'rev1', [0.10, 0.11])
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE spans SET ts = ts - 31 * 86400")
+    assert _count_rows(db_path)[0] == 4
+    _record(store, monkeypatch, 'rev2', [0.20])
+    count, oldest = _count_rows(db_path)
+    assert count == 2
+    assert oldest > time.time() - 86400
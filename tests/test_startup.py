@@ -0,0 +1,93 @@
+"""
+Startup tests: importing awt should stay cheap.
+
+Heavy or optional modules are deferred until a route needs them; the test
+imports awt in a fresh interpreter and checks that none of them were loaded.
+Use `python perf_awt.py startup` for actual timings.  The path discovery
+cache (awt-paths.json) that keeps warm starts from probing is tested too.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src import server_util
+
+
+DEFERRED_MODULES = ['abiflib', 'conduits', 'yaml', 'src.linkpreview', 'cairosvg']
+
+
+def test_import_awt_defers_heavy_modules(awt_dir, tmp_path):
+    env = os.environ.copy()
+    env['AWT_CACHE_TYPE'] = 'none'
+    env['AWT_PATHS_CACHE'] = str(tmp_path / 'awt-paths.json')
+    code = f"import awt, sys; print([m for m in {DEFERRED_MODULES!r} if m in sys.modules])"
+    # First run populates the path cache; the second is a normal warm start
+    for _ in range(2):
+        proc = subprocess.run([sys.executable, '-c', code], cwd=awt_dir, env=env,
+                              capture_output=True, text=True)
+        assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip().splitlines()[-1] == '[]', \
+        f"import awt eagerly loaded {proc.stdout.strip()}"
+
+
+@pytest.fixture
+def probes(monkeypatch, tmp_path):
+    """Fakes discover_awt_paths() with directories under tmp_path; lists
+    the awt dirs it was called for."""
+    calls = []
+    for name in ('static', 'templates', 'abiftool'):
+        (tmp_path / name).mkdir()
+    (tmp_path / 'templates' / 'base.html').write_text('<html></html>')
+    (tmp_path / 'abiftool' / 'abiftool.py').write_text('')
+
+    def fake_discover(awt_py_dir):
+        calls.append(awt_py_dir)
+        return {'static': str(tmp_path / 'static'), 'templates': str(tmp_path / 'templates'),
+                'template_dirs': [str(tmp_path / 'templates')],
+                'abiftool_dir': str(tmp_path / 'abiftool'), 'testfiledir': str(tmp_path / 'abiftool')}
+
+    monkeypatch.setattr(server_util, 'discover_awt_paths', fake_discover)
+    return calls
+
+
+def _cache_entries(cache_path):
+    with open(cache_path) as f:
+        return json.load(f)['entries']
+
+
+def test_launchers_and_directories_share_paths_entry(probes, monkeypatch, tmp_path, awt_dir):
+    cache_path = str(tmp_path / 'awt-paths.json')
+    for launcher, cwd in (('awt.py', awt_dir), ('/usr/bin/flask', str(tmp_path)), ('gunicorn', '/')):
+        monkeypatch.setattr(sys, 'argv', [launcher])
+        monkeypatch.chdir(cwd)
+        server_util.load_awt_paths(awt_dir, cache_path)
+    assert len(probes) == 1
+    assert len(_cache_entries(cache_path)) == 1
+
+
+def test_paths_cache_is_capped(probes, tmp_path):
+    cache_path = str(tmp_path / 'awt-paths.json')
+    for i in range(server_util.MAX_PATHS_CACHE_ENTRIES + 3):
+        server_util.load_awt_paths(str(tmp_path / f'awt{i}'), cache_path)
+    entries = _cache_entries(cache_path)
+    assert len(entries) == server_util.MAX_PATHS_CACHE_ENTRIES
+    assert all(key.startswith(str(tmp_path / "awt")) for key in entries)
+    assert any(key.startswith(str(tmp_path / f"awt{i}|")) for key in entries)
+
+
+def test_changed_install_is_probed_again(probes, tmp_path, awt_dir):
+    # e.g. abiftool upgraded in place: same directory, newer files
+    cache_path = str(tmp_path / 'awt-paths.json')
+    server_util.load_awt_paths(awt_dir, cache_path)
+    server_util.load_awt_paths(awt_dir, cache_path)
+    assert len(probes) == 1
+    stat = os.stat(tmp_path / 'abiftool' / 'abiftool.py')
+    os.utime(tmp_path / 'abiftool' / 'abiftool.py', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    server_util.load_awt_paths(awt_dir, cache_path)
+    assert len(probes) == 2
+    (tmp_path / 'templates' / 'base.html').unlink()
+    server_util.load_awt_paths(awt_dir, cache_path)
+    assert len(probes) == 3
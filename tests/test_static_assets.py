@@ -0,0 +1,125 @@
+"""
+Tests for fingerprinted, precompressed static assets (src/static_assets.py).
+"""
+import gzip
+import re
+import shutil
+
+import pytest
+
+from awt import app, cache
+from src.static_assets import IMMUTABLE_CACHE_CONTROL, build_static_assets, fingerprinted_filename, stale_sources
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setenv('AWT_STATIC_BUILD', str(tmp_path / 'dist'))
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.NullCache'
+    cache.init_app(app)
+    return app.test_client()
+
+
+@pytest.fixture
+def manifest(client, tmp_path):
+    return build_static_assets(app.static_folder, str(tmp_path / 'dist'))
+
+
+def _static_links(page):
+    return re.findall(r'''(?:src|href)=["'](/static/[^"']+)''', page)
+
+
+def test_pages_link_fingerprinted_assets(client, manifest):
+    links = _static_links(client.get('/id/TNexample').get_data(as_text=True))
+    assert links
+    for link in links:
+        assert link.startswith('/static/dist/') and link[len('/static/dist/'):] in manifest.values()
+        response = client.get(link)
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+
+
+def _get_built(client, manifest, asset, accept):
+    response = client.get(f"/static/dist/{manifest[asset]}", headers={'Accept-Encoding': accept})
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+    assert 'Accept-Encoding' in response.headers['Vary']
+    return response
+
+
+def _check_same_as_source(body, tmp_path, manifest, asset):
+    assert body == (tmp_path / 'dist' / manifest[asset]).read_bytes()
+    with open(f"{app.static_folder}/{asset}", 'rb') as f:
+        assert body == f.read()
+
+
+def test_gzip_asset(client, manifest, tmp_path):
+    response = _get_built(client, manifest, 'css/electostyle.css', 'gzip, deflate')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    _check_same_as_source(gzip.decompress(response.data), tmp_path, manifest, 'css/electostyle.css')
+
+
+def test_uncompressed_asset(client, manifest, tmp_path):
+    response = _get_built(client, manifest, 'js/popover.js', 'identity')
+    assert 'Content-Encoding' not in response.headers
+    _check_same_as_source(response.data, tmp_path, manifest, 'js/popover.js')
+
+
+def test_brotli_asset(client, manifest, tmp_path):
+    brotli = pytest.importorskip('brotli')
+    response = _get_built(client, manifest, 'img/awtonly.svg', 'gzip, br')
+    assert response.headers['Content-Encoding'] == 'br'
+    _check_same_as_source(brotli.decompress(response.data), tmp_path, manifest, 'img/awtonly.svg')
+
+
+def test_module_imports_are_fingerprinted(client, manifest):
+    body = client.get(f"/static/dist/{manifest['js/main.js']}").data.decode('utf-8')
+    assert re.findall(r"from '\./([^']+)'", body) == [manifest['js/irvDisplay.js'].split('/')[-1]]
+
+
+def test_changed_file_gets_new_names(client, manifest, tmp_path):
+    # A new version is a new name; the old copy stays for cached pages
+    static_copy = tmp_path / 'static'
+    shutil.copytree(app.static_folder, static_copy)
+    with open(static_copy / 'js/popover.js', 'a') as f:
+        f.write('\n// changed\n')
+    rebuilt = build_static_assets(str(static_copy), str(tmp_path / 'dist'))
+    assert rebuilt['js/popover.js'] != manifest['js/popover.js']
+    # ...and so is everything that imports it
+    assert rebuilt['js/irvDisplay.js'] != manifest['js/irvDisplay.js']
+    assert rebuilt['css/electostyle.css'] == manifest['css/electostyle.css']
+    assert (tmp_path / 'dist' / manifest['js/popover.js']).is_file()
+    assert fingerprinted_filename(str(tmp_path / 'dist'), 'js/main.js', str(static_copy)) == \
+        f"dist/{rebuilt['js/main.js']}"
+
+
+def test_stale_build_links_originals(client, manifest, monkeypatch, tmp_path):
+    # Editing a source without rebuilding drops back to the originals
+    static_copy = tmp_path / 'static'
+    shutil.copytree(app.static_folder, static_copy)
+    build_dir = str(tmp_path / 'dist')
+    build_static_assets(str(static_copy), build_dir)
+    assert stale_sources(str(static_copy), build_dir) == []
+    assert fingerprinted_filename(build_dir, 'js/popover.js', str(static_copy)).startswith('dist/')
+    (static_copy / 'css/electostyle.css').touch()
+    assert stale_sources(str(static_copy), build_dir) == []
+    monkeypatch.setenv('AWT_STATIC_RECHECK', '0')
+    with open(static_copy / 'js/popover.js', 'a') as f:
+        f.write('\n// edited\n')
+    assert stale_sources(str(static_copy), build_dir) == ['js/popover.js']
+    assert fingerprinted_filename(build_dir, 'js/popover.js', str(static_copy)) == 'js/popover.js'
+    assert fingerprinted_filename(build_dir, 'css/electostyle.css', str(static_copy)) == 'css/electostyle.css'
+    build_static_assets(str(static_copy), build_dir)
+    assert fingerprinted_filename(build_dir, 'js/popover.js', str(static_copy)).startswith('dist/')
+
+
+def test_build_metadata_and_other_paths_not_served(client, manifest):
+    for path in ("/static/dist/manifest.json", "/static/dist/sources.json",
+                 "/static/dist/../awt.py", "/static/dist/css/missing.0123456789ab.css"):
+        assert client.get(path).status_code == 404, path
+
+
+def test_without_build_links_originals(client):
+    links = _static_links(client.get('/id/TNexample').get_data(as_text=True))
+    assert links
+    for link in links:
+        assert '/dist/' not in link and client.get(link).status_code == 200
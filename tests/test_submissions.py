@@ -0,0 +1,133 @@
+"""
+Tests for content-addressed POST /awt submissions and /sub permalinks.
+"""
+import os
+import time
+
+import pytest
+
+import awt
+from awt import app, cache
+from src import submissions
+
+TN_ABIF = """=Memph:[Memphis, TN]
+=Nash:[Nashville, TN]
+=Chat:[Chattanooga, TN]
+=Knox:[Knoxville, TN]
+42:Memph>Nash>Chat>Knox
+26:Nash>Chat>Knox>Memph
+15:Chat>Knox>Nash>Memph
+17:Knox>Chat>Nash>Memph
+"""
+
+FORM = {"include_FPTP": "yes", "include_pairtable": "yes"}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """A client with a fresh submission store and page cache; client.renders
+    lists the methods of each render_submission() call."""
+    monkeypatch.setenv('AWT_SUBMISSION_DIR', str(tmp_path))
+    app.config['CACHE_TYPE'] = 'flask_caching.backends.SimpleCache'
+    cache.init_app(app)
+    cache.clear()
+    client = app.test_client()
+    client.renders = []
+    real_render = awt.render_submission
+
+    def counting_render(*args, **kwargs):
+        client.renders.append(args[1])
+        return real_render(*args, **kwargs)
+    monkeypatch.setattr(awt, 'render_submission', counting_render)
+    return client
+
+
+def _submit(client, text, form):
+    """POSTs text to /awt, follows the redirect, and returns its URL."""
+    response = client.post('/awt', data=dict(form, abifinput=text))
+    assert response.status_code == 303
+    url = response.headers['Location']
+    page = client.get(url)
+    assert page.status_code == 200
+    assert b'<h2 id="results"' in page.data
+    return url
+
+
+def test_submission_permalink(client):
+    url = _submit(client, TN_ABIF, FORM)
+    assert url.startswith('/sub/')
+    assert 'methods=FPTP,wlt' in url.replace('%2C', ',')
+
+
+def test_resubmission_reuses_permalink_and_page(client):
+    assert _submit(client, TN_ABIF, FORM) == _submit(client, TN_ABIF, FORM)
+    assert len(client.renders) == 1
+
+
+def test_line_ending_changes_reuse_permalink(client):
+    first = _submit(client, TN_ABIF, FORM)
+    assert _submit(client, TN_ABIF.replace("\n", "\r\n") + "  \r\n", FORM) == first
+    assert len(client.renders) == 1
+
+
+def test_other_methods_get_another_permalink(client):
+    first = _submit(client, TN_ABIF, FORM)
+    assert _submit(client, TN_ABIF, {"include_IRV": "yes"}) != first
+    assert len(client.renders) == 2
+
+
+def test_other_abif_gets_another_permalink(client):
+    first = _submit(client, TN_ABIF, FORM)
+    assert _submit(client, TN_ABIF.replace("42:", "43:"), FORM) != first
+    assert len(client.renders) == 2
+
+
+def test_unknown_submission(client):
+    assert client.get('/sub/' + '0' * 64 + '?methods=FPTP').status_code == 404
+
+
+def test_oversized_submission_is_refused(client, tmp_path, monkeypatch):
+    monkeypatch.setenv('AWT_SUBMISSION_MAX_BYTES', '100')
+    response = client.post('/awt', data=dict(FORM, abifinput=TN_ABIF))
+    assert response.status_code == 413
+    assert not list(tmp_path.iterdir())
+    assert client.renders == []
+
+
+def _stored(tmp_path, count):
+    """Stores count submissions, oldest first; returns their hashes."""
+    digests = []
+    for i in range(count):
+        digest = submissions.store_submission(TN_ABIF.replace("42:", f"{i}:"), str(tmp_path))
+        path = submissions._submission_path(digest, str(tmp_path))
+        os.utime(path, (time.time() - (count - i) * 3600,) * 2)
+        digests.append(digest)
+    return digests
+
+
+def _remaining(tmp_path, digests):
+    return [d for d in digests if submissions.load_submission(d, str(tmp_path)) is not None]
+
+
+def test_prune_keeps_most_recently_used(tmp_path):
+    digests = _stored(tmp_path, 4)
+    # Loading the oldest one counts as a use
+    os.utime(submissions._submission_path(digests[0], str(tmp_path)), (time.time() - 2 * 86400,) * 2)
+    assert submissions.load_submission(digests[0], str(tmp_path)) is not None
+    assert submissions.prune_submissions(str(tmp_path), max_files=2, max_age_days=0) == 2
+    assert _remaining(tmp_path, digests) == [digests[0], digests[3]]
+
+
+def test_prune_drops_unused_submissions(tmp_path):
+    digests = _stored(tmp_path, 3)
+    os.utime(submissions._submission_path(digests[0], str(tmp_path)), (time.time() - 31 * 86400,) * 2)
+    assert submissions.prune_submissions(str(tmp_path), max_files=0, max_age_days=30) == 1
+    assert _remaining(tmp_path, digests) == digests[1:]
+
+
+def test_store_prunes_periodically(tmp_path, monkeypatch):
+    monkeypatch.setenv('AWT_SUBMISSION_MAX_FILES', '2')
+    monkeypatch.setattr(submissions, '_last_prune', {})
+    monkeypatch.setattr(submissions, 'PRUNE_INTERVAL', 0)
+    digests = _stored(tmp_path, 3)
+    assert _remaining(tmp_path, digests) == digests[1:]
@@ -0,0 +1,49 @@
+"""
+Tests for the synthetic ABIF generator used by `perf_awt.py synth/scale`.
+"""
+from abiflib import convert_abif_to_jabmod, find_ballot_type
+
+from src.synth_abif import generate_abif
+
+
+def _jabmod(ballots, candidates, **kwargs):
+    return convert_abif_to_jabmod(generate_abif(ballots, candidates, seed=7, **kwargs))
+
+
+def test_same_seed_same_election():
+    assert generate_abif(200, 6, seed=7) == generate_abif(200, 6, seed=7)
+    assert generate_abif(150, 4, seed=7, ballot_type='rated') == \
+        generate_abif(150, 4, seed=7, ballot_type='rated')
+
+
+def test_ranked_election():
+    jabmod = _jabmod(200, 6)
+    assert jabmod['metadata']['ballotcount'] == 200
+    assert len(jabmod['candidates']) == 6
+    assert find_ballot_type(jabmod) == 'ranked'
+
+
+def test_truncated_rankings():
+    jabmod = _jabmod(200, 6, depth=2)
+    assert jabmod['metadata']['ballotcount'] == 200
+    assert all(len(vl['prefs']) <= 2 for vl in jabmod['votelines'])
+
+
+def test_rated_election():
+    jabmod = _jabmod(150, 4, ballot_type='rated')
+    assert jabmod['metadata']['ballotcount'] == 150
+    assert len(jabmod['candidates']) == 4
+    assert find_ballot_type(jabmod) == 'rated'
+
+
+def test_choose_many_election():
+    jabmod = _jabmod(150, 4, ballot_type='choose_many')
+    assert jabmod['metadata']['ballotcount'] == 150
+    assert find_ballot_type(jabmod) == 'choose_many'
+
+
+def test_aggregated_duplicates():
+    # 90% duplicates of a few hundred ballots: far fewer distinct lines
+    jabmod = _jabmod(500, 5, dup_ratio=0.9, aggregate=True)
+    assert jabmod['metadata']['ballotcount'] == 500
+    assert len(jabmod['votelines']) < 500 / 3